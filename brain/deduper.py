@@ -1,5 +1,7 @@
-from typing import List, Dict, Any, Tuple
+from typing import List, Dict, Any, Optional, Tuple
+from collections import OrderedDict
 import asyncio
+import re
 from langchain_openai import ChatOpenAI
 from openai import APIConnectionError, InternalServerError, RateLimitError
 from config import get_extra_body
@@ -9,25 +11,89 @@ import json
 
 logger = get_module_logger(__name__, "Agent")
 
+VERDICT_CACHE_SIZE = 1024
+
+_LATIN_WORD_RE = re.compile(r"[a-z0-9]+")
+_LATIN_LETTER_RE = re.compile(r"[a-z]")
+_CJK_RUN_RE = re.compile(r"[\u3040-\u30ff\u3400-\u9fff\uac00-\ud7af]+")
+_NON_WORD_RE = re.compile(r"[\W_]+")
+_STOPWORDS = frozenset({
+    "a", "an", "the", "to", "for", "of", "in", "on", "at", "by", "with", "from", "and", "or",
+    "is", "it", "this", "that", "me", "my", "please", "can", "you",
+})
+
+
+def normalize_task(text: str) -> str:
+    """Casefold and drop whitespace/punctuation; equal results mean the same task text."""
+    return _NON_WORD_RE.sub("", (text or "").casefold())
+
+
+def _lexical_features(text: str) -> frozenset:
+    """Latin/digit words (minus stopwords) plus CJK character bigrams."""
+    lowered = (text or "").casefold()
+    features = {w for w in _LATIN_WORD_RE.findall(lowered) if w not in _STOPWORDS}
+    for run in _CJK_RUN_RE.findall(lowered):
+        if len(run) == 1:
+            features.add(run)
+        features.update(run[i:i + 2] for i in range(len(run) - 1))
+    return frozenset(features)
+
+
+def _scripts(text: str) -> frozenset:
+    lowered = (text or "").casefold()
+    scripts = set()
+    if _LATIN_LETTER_RE.search(lowered):
+        scripts.add("latin")
+    if _CJK_RUN_RE.search(lowered):
+        scripts.add("cjk")
+    return frozenset(scripts)
+
+
+def is_clearly_distinct(a: str, b: str) -> bool:
+    """
+    True only when both texts are written in the same script(s) and share no word
+    or CJK bigram at all. Paraphrases usually share at least one feature, and
+    cross-language pairs share none by construction, so both still go to the LLM.
+    """
+    scripts = _scripts(a)
+    if not scripts or scripts != _scripts(b):
+        return False
+    fa, fb = _lexical_features(a), _lexical_features(b)
+    return bool(fa) and bool(fb) and not (fa & fb)
+
 
 class TaskDeduper:
     """
     LLM-based deduplication for task scheduling. Given a new task description and
     a list of existing task descriptions, decide if the new task is semantically
     duplicate (equivalent or strict subset) of an existing one.
+
+    Pairs are settled locally when possible: identical normalized text is a duplicate,
+    same-script texts sharing no word at all are not, and earlier LLM verdicts are reused from a cache
+    keyed by the normalized (new task, existing task) pair. Only the remaining
+    candidates are sent to the LLM.
     """
 
-    def __init__(self):
-        config_manager = get_config_manager()
-        api_config = config_manager.get_model_api_config('summary')
-        self.llm = ChatOpenAI(
-            model=api_config['model'],
-            base_url=api_config['base_url'],
-            api_key=api_config['api_key'],
-            temperature=0,
-            max_retries=0,
-            extra_body=get_extra_body(api_config['model']) or None
-        )
+    def __init__(self, llm=None, cache_size: int = VERDICT_CACHE_SIZE):
+        if llm is None:
+            config_manager = get_config_manager()
+            api_config = config_manager.get_model_api_config('summary')
+            llm = ChatOpenAI(
+                model=api_config['model'],
+                base_url=api_config['base_url'],
+                api_key=api_config['api_key'],
+                temperature=0,
+                max_retries=0,
+                extra_body=get_extra_body(api_config['model']) or None
+            )
+        self.llm = llm
+        self.cache_size = cache_size
+        # (normalized new task, normalized existing task) -> duplicate?
+        self._verdicts: "OrderedDict[Tuple[str, str], bool]" = OrderedDict()
+        self._stats = {
+            "judges": 0, "identical": 0, "distinct": 0, "cache_hits": 0,
+            "llm_calls": 0, "llm_candidates": 0,
+        }
 
     def _build_prompt(self, new_task: str, candidates: List[Tuple[str, str]]) -> str:
         lines = ["New task:", new_task.strip(), "\nExisting tasks:"]
@@ -41,10 +107,71 @@ class TaskDeduper:
         )
         return "\n".join(lines)
 
+    def _cache_put(self, key: Tuple[str, str], duplicate: bool) -> None:
+        self._verdicts[key] = duplicate
+        self._verdicts.move_to_end(key)
+        while len(self._verdicts) > self.cache_size:
+            self._verdicts.popitem(last=False)
+
+    def _prefilter(self, new_task: str, candidates: List[Tuple[str, str]]):
+        """
+        Settle what can be settled locally.
+        Returns (matched_id or None, candidates still needing the LLM).
+        """
+        new_norm = normalize_task(new_task)
+        pending: List[Tuple[str, str]] = []
+        for tid, desc in candidates:
+            desc_norm = normalize_task(desc)
+            if not desc_norm:
+                continue
+            if desc_norm == new_norm:
+                self._stats["identical"] += 1
+                return tid, []
+            verdict = self._verdicts.get((new_norm, desc_norm))
+            if verdict is not None:
+                self._stats["cache_hits"] += 1
+                self._verdicts.move_to_end((new_norm, desc_norm))
+                if verdict:
+                    return tid, []
+                continue
+            if is_clearly_distinct(new_task, desc):
+                self._stats["distinct"] += 1
+                continue
+            pending.append((tid, desc))
+        return None, pending
+
     async def judge(self, new_task: str, candidates: List[Tuple[str, str]]) -> Dict[str, Any]:
         if not new_task or not candidates:
             return {"duplicate": False, "matched_id": None}
 
+        self._stats["judges"] += 1
+        matched_id, pending = self._prefilter(new_task, candidates)
+        if matched_id is not None:
+            return {"duplicate": True, "matched_id": matched_id}
+        if not pending:
+            return {"duplicate": False, "matched_id": None}
+
+        result = await self._ask_llm(new_task, pending)
+        if result is None:
+            # LLM unavailable / quota exceeded: don't cache, fall back to "not duplicate"
+            return {"duplicate": False, "matched_id": None}
+
+        new_norm = normalize_task(new_task)
+        pending_ids = {str(tid): tid for tid, _ in pending}
+        matched = pending_ids.get(str(result["matched_id"])) if result["matched_id"] is not None else None
+        if result["duplicate"] and matched is not None:
+            self._cache_put((new_norm, normalize_task(dict(pending)[matched])), True)
+        elif not result["duplicate"]:
+            # "No duplicate" covers every candidate the LLM was shown
+            for _, desc in pending:
+                self._cache_put((new_norm, normalize_task(desc)), False)
+        return result
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {**self._stats, "cached_verdicts": len(self._verdicts)}
+
+    async def _ask_llm(self, new_task: str, candidates: List[Tuple[str, str]]) -> Optional[Dict[str, Any]]:
+        """One LLM round-trip over the given candidates; None when no verdict was obtained."""
         prompt = self._build_prompt(new_task, candidates)
         
         # Retry策略：重试2次，间隔1秒、2秒
@@ -63,7 +190,9 @@ class TaskDeduper:
                         info.get("used"),
                         info.get("limit"),
                     )
-                    return {"duplicate": False, "matched_id": None}
+                    return None
+                self._stats["llm_calls"] += 1
+                self._stats["llm_candidates"] += len(candidates)
                 resp = await self.llm.ainvoke([
                     {"role": "system", "content": "You are a careful deduplication judge."},
                     {"role": "user", "content": prompt},
@@ -85,9 +214,9 @@ class TaskDeduper:
                             "matched_id": data.get("matched_id")
                         }
                     # Unknown shape
-                    return {"duplicate": False, "matched_id": None}
+                    return None
                 except Exception:
-                    return {"duplicate": False, "matched_id": None}
+                    return None
             except (APIConnectionError, InternalServerError, RateLimitError) as e:
                 logger.info(f"ℹ️ 捕获到 {type(e).__name__} 错误")
                 if attempt < max_retries - 1:
@@ -96,9 +225,9 @@ class TaskDeduper:
                     await asyncio.sleep(wait_time)
                 else:
                     logger.error(f"[Deduper] LLM调用失败，已达到最大重试次数: {e}")
-                    return {"duplicate": False, "matched_id": None}
+                    return None
             except Exception as e:
                 logger.error(f"[Deduper] LLM调用失败: {e}")
-                return {"duplicate": False, "matched_id": None}
+                return None
 
 
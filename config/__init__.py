@@ -145,6 +145,8 @@ DEFAULT_OPENROUTER_URL = "https://dashscope.aliyuncs.com/compatible-mode/v1"
 NATIVE_IMAGE_MIN_INTERVAL = 1.5
 # 无语音活动时图片发送间隔倍数（实际间隔 = NATIVE_IMAGE_MIN_INTERVAL × 此值）
 IMAGE_IDLE_RATE_MULTIPLIER = 5
+# 屏幕帧去重：与上一张已发送帧的感知哈希（64位 dHash）汉明距离不超过此值视为画面未变化，不再上传
+SCREEN_FRAME_DEDUP_MAX_DISTANCE = 5
 
 # 用户自定义模型配置的默认 Provider/URL/API_KEY（空字符串表示使用全局配置）
 DEFAULT_CONVERSATION_MODEL_URL = ""
@@ -618,6 +620,7 @@ __all__ = [
     'TFLINK_ALLOWED_HOSTS',
     'NATIVE_IMAGE_MIN_INTERVAL',
     'IMAGE_IDLE_RATE_MULTIPLIER',
+    'SCREEN_FRAME_DEDUP_MAX_DISTANCE',
     # API 和模型配置的默认值
     'DEFAULT_CORE_API_KEY',
     'DEFAULT_AUDIO_API_KEY',
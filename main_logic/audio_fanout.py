@@ -0,0 +1,125 @@
+"""
+语音数据的进程内订阅分发（主终端 -> 副终端 monitor）
+
+以前 send_speech 对每个音频块都执行
+``sync_message_queue.put({"type": "binary", "data": ...})``：即使没有任何副终端
+在看，每块音频也要打包成字典进入与文本共用的同步队列，再由 cross_server 以
+20ms 轮询取出转发。这里改为按角色的订阅分发：
+
+- 发布端（LLMSessionManager.send_speech）只把 bytes 引用交给当前订阅者，
+  bytes 不可变，无需复制或序列化；没有订阅者时 publish 立即返回。
+- 订阅端（cross_server 的同步连接器）只在 monitor 报告有查看客户端时订阅，
+  每个订阅是一个有界环形缓冲，消费过慢时丢弃最旧的数据而不是无限堆积，
+  新数据到达时通过 call_soon_threadsafe 唤醒订阅者所在的事件循环。
+"""
+
+import asyncio
+import threading
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+from utils.logger_config import get_module_logger
+
+logger = get_module_logger(__name__, "Main")
+
+
+class AudioSubscription:
+    """一个订阅者的有界环形缓冲（由发布线程写入，订阅者所在事件循环读取）。"""
+
+    def __init__(self, fanout: "AudioFanout", max_chunks: int):
+        self._fanout = fanout
+        self._chunks: deque = deque(maxlen=max_chunks)
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._event: Optional[asyncio.Event] = None
+        self.dropped = 0
+        self.closed = False
+
+    def _offer(self, data: bytes) -> None:
+        with self._lock:
+            if len(self._chunks) == self._chunks.maxlen:
+                self.dropped += 1
+            self._chunks.append(data)
+            loop, event = self._loop, self._event
+        if loop is not None and event is not None:
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                pass  # 订阅者的事件循环已关闭
+
+    def drain(self) -> List[bytes]:
+        """取出当前缓冲中的全部音频块（不阻塞）。"""
+        with self._lock:
+            chunks = list(self._chunks)
+            self._chunks.clear()
+        return chunks
+
+    async def get_batch(self) -> List[bytes]:
+        """等待并取出至少一个音频块。"""
+        if self._event is None:
+            with self._lock:
+                self._loop = asyncio.get_running_loop()
+                self._event = asyncio.Event()
+        while True:
+            # 先清除再检查，避免清除前到达的唤醒丢失
+            self._event.clear()
+            chunks = self.drain()
+            if chunks:
+                return chunks
+            await self._event.wait()
+
+    def close(self) -> None:
+        if not self.closed:
+            self.closed = True
+            self._fanout.unsubscribe(self)
+
+
+class AudioFanout:
+    """单个角色的语音分发点。"""
+
+    def __init__(self, name: str):
+        self.name = name
+        # 写时复制的订阅者元组：publish 热路径无需加锁
+        self._subscribers: Tuple[AudioSubscription, ...] = ()
+        self._lock = threading.Lock()
+
+    @property
+    def has_subscribers(self) -> bool:
+        return bool(self._subscribers)
+
+    def publish(self, data: bytes) -> None:
+        subscribers = self._subscribers
+        if not subscribers:
+            return
+        if not isinstance(data, bytes):
+            data = bytes(data)
+        for sub in subscribers:
+            sub._offer(data)
+
+    def subscribe(self, max_chunks: int = 256) -> AudioSubscription:
+        sub = AudioSubscription(self, max_chunks)
+        with self._lock:
+            self._subscribers = self._subscribers + (sub,)
+        logger.debug(f"[{self.name}] 语音分发新增订阅，当前 {len(self._subscribers)} 个")
+        return sub
+
+    def unsubscribe(self, sub: AudioSubscription) -> None:
+        with self._lock:
+            self._subscribers = tuple(s for s in self._subscribers if s is not sub)
+        if sub.dropped:
+            logger.info(f"[{self.name}] 语音订阅结束，消费过慢共丢弃 {sub.dropped} 个音频块")
+
+
+_fanouts: Dict[str, AudioFanout] = {}
+_fanouts_lock = threading.Lock()
+
+
+def get_audio_fanout(lanlan_name: str) -> AudioFanout:
+    """获取角色对应的语音分发点（不存在时创建）。"""
+    fanout = _fanouts.get(lanlan_name)
+    if fanout is None:
+        with _fanouts_lock:
+            fanout = _fanouts.get(lanlan_name)
+            if fanout is None:
+                fanout = _fanouts[lanlan_name] = AudioFanout(lanlan_name)
+    return fanout
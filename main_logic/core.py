@@ -14,10 +14,17 @@ from websockets import exceptions as web_exceptions
 from fastapi import WebSocket, WebSocketDisconnect
 from utils.frontend_utils import contains_chinese, replace_blank, replace_corner_mark, remove_bracket, \
     is_only_punctuation
-from utils.screenshot_utils import process_screen_data
+from utils.screenshot_utils import process_screen_frame
+from utils.audio_processor import PCMRingBuffer
 from main_logic.omni_realtime_client import OmniRealtimeClient
 from main_logic.omni_offline_client import OmniOfflineClient
-from main_logic.tts_client import get_tts_worker
+from main_logic.tts_client import get_tts_worker, TTSResponseQueue
+from main_logic.tts_worker_pool import get_tts_worker_pool
+from main_logic.audio_fanout import get_audio_fanout
+from main_logic.speech_output import SpeechOutputStream, AUDIO_FORMAT_OGG_OPUS, negotiate_audio_format
+from main_logic.session_prompt_cache import get_session_prompt_cache
+from main_logic.turn_latency import get_turn_latency_tracer
+from main_logic.delta_coalescer import DeltaCoalescer
 from config import MEMORY_SERVER_PORT, TOOL_SERVER_PORT
 from config.prompts_sys import (
     _loc,
@@ -33,7 +40,6 @@ from utils.config_manager import get_config_manager, get_reserved
 from utils.logger_config import get_module_logger
 from utils.api_config_loader import get_free_voices
 from utils.language_utils import normalize_language_code, get_global_language
-from threading import Thread
 from queue import Queue
 from uuid import uuid4
 import numpy as np
@@ -54,10 +60,18 @@ class LLMSessionManager:
         self.active_session_is_idle = False
         self.current_expression = None
         self.tts_request_queue = Queue()  # TTS request (线程队列)
-        self.tts_response_queue = Queue()  # TTS response (线程队列)
+        self.tts_response_queue = TTSResponseQueue()  # TTS response (线程队列，put 时唤醒事件循环)
         self.tts_thread = None  # TTS线程
+        self._tts_worker = None  # 从 TTS worker 池租用的 worker（持有上面的队列和线程）
         # 流式音频重采样器（24kHz→48kHz）- 维护内部状态避免 chunk 边界不连续
         self.audio_resampler = soxr.ResampleStream(24000, 48000, 1, dtype='float32')
+        # 语音下行通道：按前端协商的格式编码（Opus/PCM16），并在延迟上限内合并小块
+        self._speech_output = SpeechOutputStream(self._send_audio_frame)
+        # 文本增量合包：前端/同步队列帧与 TTS 请求各自在 40ms 时间窗内合并
+        self._text_frame_coalescer = DeltaCoalescer(self._emit_lanlan_response, name="text_frame")
+        self._tts_text_coalescer = DeltaCoalescer(self._emit_tts_text, name="tts_text")
+        # 轮次延迟追踪（各阶段直方图见 /api/latency/stats）
+        self.latency = get_turn_latency_tracer(lanlan_name)
         self.lock = asyncio.Lock()  # 使用异步锁替代同步锁
         self.websocket_lock = None  # websocket操作的共享锁，由main_server设置
         self._screenshot_future: asyncio.Future | None = None
@@ -162,10 +176,15 @@ class LLMSessionManager:
         self.input_cache_lock = asyncio.Lock()  # 保护输入缓存的锁
         
         # 热切换音频缓存机制：确保热切换期间的用户输入语音不丢失
-        self.hot_swap_audio_cache = []  # 热切换期间缓存的音频数据: [bytes, ...]
+        # 缓存的是处理后的16kHz PCM16音频，有界环形缓冲：超过上限时覆盖最旧的数据
+        self.HOT_SWAP_BYTES_PER_SECOND = 32000  # 16000 samples/s × 2 bytes
+        self.HOT_SWAP_CACHE_MAX_SECONDS = 30  # 缓存上限
+        self.HOT_SWAP_MAX_REPLAY_SECONDS = 10  # 最多回放的旧音频时长，更早的视为过期丢弃
+        self.HOT_SWAP_REPLAY_CHUNK_MS = 100  # 回放时每次推送的音频时长
+        self.HOT_SWAP_REPLAY_SPEED = 4.0  # 回放速度（相对实时），用于追上实时输入
+        self.hot_swap_audio_cache = PCMRingBuffer(self.HOT_SWAP_BYTES_PER_SECOND * self.HOT_SWAP_CACHE_MAX_SECONDS)
         self.hot_swap_cache_lock = asyncio.Lock()  # 保护热切换音频缓存的锁
         self.is_flushing_hot_swap_cache = False  # 是否正在推送热切换缓存（推送期间新音频继续缓存）
-        self.HOT_SWAP_FLUSH_CHUNK_MULTIPLIER = 5  # 热切换后发送的chunk大小倍数(节流)
         
         # 用户活动时间戳：用于主动搭话检测最近是否有用户输入
         self.last_user_activity_time = None  # float timestamp or None
@@ -189,8 +208,19 @@ class LLMSessionManager:
         except Exception:
             return 400
 
+    def _release_tts_worker(self):
+        """把当前租用的 TTS worker 归还给池，并换上空队列，避免读到已归还 worker 的后续输出。"""
+        worker = self._tts_worker
+        self._tts_worker = None
+        self.tts_thread = None
+        self.tts_request_queue = Queue()
+        self.tts_response_queue = TTSResponseQueue()
+        if worker is not None:
+            get_tts_worker_pool().release(worker)
+
     async def _clear_tts_pipeline(self):
         """清空 TTS 请求/响应队列和待处理缓存，停止当前合成。"""
+        self._tts_text_coalescer.discard()
         if self.use_tts and self.tts_thread and self.tts_thread.is_alive():
             while not self.tts_response_queue.empty():
                 try:
@@ -212,6 +242,10 @@ class LLMSessionManager:
         async with self.tts_cache_lock:
             self.tts_pending_chunks.clear()
 
+    async def handle_speech_stopped(self):
+        """服务端 VAD 报告用户说完（speech_stopped）：以此作为本轮延迟追踪的起点"""
+        self.latency.begin_turn()
+
     async def handle_new_message(self):
         """处理新模型输出：清空TTS队列并通知前端"""
         # 重置音频重采样器状态（新轮次音频不应与上轮次连续）
@@ -228,9 +262,11 @@ class LLMSessionManager:
 
     async def handle_text_data(self, text: str, is_first_chunk: bool = False):
         """文本回调：处理文本显示和TTS（用于文本模式）"""
+        self.latency.mark("first_token")
         
         # 如果是新消息的第一个chunk，清空TTS队列和缓存以打断之前的语音
         if is_first_chunk and self.use_tts:
+            self._tts_text_coalescer.discard()
             async with self.tts_cache_lock:
                 self.tts_pending_chunks.clear()
             
@@ -245,24 +281,16 @@ class LLMSessionManager:
         # 文本模式下，无论是否使用TTS，都要发送文本到前端显示
         await self.send_lanlan_response(text, is_first_chunk)
         
-        # 如果配置了TTS，将文本发送到TTS队列或缓存
+        # 如果配置了TTS，将文本（合包后）发送到TTS队列或缓存
         if self.use_tts:
-            async with self.tts_cache_lock:
-                # 检查TTS是否就绪
-                if self.tts_ready and self.tts_thread and self.tts_thread.is_alive():
-                    # TTS已就绪，直接发送
-                    try:
-                        self.tts_request_queue.put((self.current_speech_id, text))
-                    except Exception as e:
-                        logger.warning(f"⚠️ 发送TTS请求失败: {e}")
-                else:
-                    # TTS未就绪，先缓存
-                    self.tts_pending_chunks.append((self.current_speech_id, text))
-                    if len(self.tts_pending_chunks) == 1:
-                        logger.info("TTS未就绪，开始缓存文本chunk...")
+            await self._tts_text_coalescer.push(text, is_first_chunk, key=self.current_speech_id)
 
     async def handle_response_complete(self):
         """Qwen完成回调：用于处理Core API的响应完成事件，包含TTS和热切换逻辑"""
+        # 使用 TTS 时语音在回复结束后才陆续合成，本轮追踪由首帧语音下发时结束
+        if not self.use_tts:
+            self.latency.end_turn()
+        await self._flush_text_deltas()
         
         # 预热期间跳过TTS信号发送（避免local TTS收到空包产生参考prompt音频）
         if self._is_warmup_in_progress:
@@ -343,6 +371,7 @@ class LLMSessionManager:
         logger.warning(f"[{self.lanlan_name}] 响应异常已丢弃 (reason={reason}, attempt={attempt}/{max_attempts}, will_retry={will_retry})")
         
         await self._clear_tts_pipeline()
+        self._text_frame_coalescer.discard()
         
         if self.websocket and hasattr(self.websocket, 'client_state') and \
                 self.websocket.client_state == self.websocket.client_state.CONNECTED:
@@ -369,6 +398,7 @@ class LLMSessionManager:
 
     async def handle_audio_data(self, audio_data: bytes):
         """Qwen音频回调：推送音频到WebSocket前端"""
+        self.latency.mark("first_token")
         if not self.use_tts:
             if self.websocket and hasattr(self.websocket, 'client_state') and self.websocket.client_state == self.websocket.client_state.CONNECTED:
                 # 这里假设audio_data为PCM16字节流，使用流式重采样器处理
@@ -418,28 +448,42 @@ class LLMSessionManager:
         # 否则会导致前端把同一轮 AI 语音误判为新轮次, 出现首包被重置/吞掉的问题.
 
     async def handle_output_transcript(self, text: str, is_first_chunk: bool = False):
-        """输出转录回调：处理文本显示和TTS（用于语音模式）"""        
+        """输出转录回调：处理文本显示和TTS（用于语音模式）"""
+        self.latency.mark("first_token")
         # 无论是否使用TTS，都要发送文本到前端显示
         await self.send_lanlan_response(text, is_first_chunk)
         
-        # 如果配置了TTS，将文本发送到TTS队列或缓存
+        # 如果配置了TTS，将文本（合包后）发送到TTS队列或缓存
         if self.use_tts:
-            async with self.tts_cache_lock:
-                # 检查TTS是否就绪
-                if self.tts_ready and self.tts_thread and self.tts_thread.is_alive():
-                    # TTS已就绪，直接发送
-                    try:
-                        self.tts_request_queue.put((self.current_speech_id, text))
-                    except Exception as e:
-                        logger.warning(f"⚠️ 发送TTS请求失败: {e}")
-                else:
-                    # TTS未就绪，先缓存
-                    self.tts_pending_chunks.append((self.current_speech_id, text))
-                    if len(self.tts_pending_chunks) == 1:
-                        logger.info("TTS未就绪，开始缓存文本chunk...")
+            await self._tts_text_coalescer.push(text, is_first_chunk, key=self.current_speech_id)
+
+    async def _emit_tts_text(self, text: str, is_first_chunk: bool, speech_id: Optional[str]):
+        """把合包后的文本发送到TTS队列；TTS未就绪时先缓存"""
+        async with self.tts_cache_lock:
+            # 检查TTS是否就绪
+            if self.tts_ready and self.tts_thread and self.tts_thread.is_alive():
+                # TTS已就绪，直接发送
+                try:
+                    self.tts_request_queue.put((speech_id, text))
+                except Exception as e:
+                    logger.warning(f"⚠️ 发送TTS请求失败: {e}")
+            else:
+                # TTS未就绪，先缓存
+                self.tts_pending_chunks.append((speech_id, text))
+                if len(self.tts_pending_chunks) == 1:
+                    logger.info("TTS未就绪，开始缓存文本chunk...")
+
+    async def _flush_text_deltas(self):
+        """轮次结束前发送所有出口上尚未发送的合包文本，保证其先于 turn end / TTS 结束信号。"""
+        await self._text_frame_coalescer.flush()
+        await self._tts_text_coalescer.flush()
 
     async def send_lanlan_response(self, text: str, is_first_chunk: bool = False):
-        """Qwen输出转录回调：可用于前端显示/缓存/同步。"""
+        """Qwen输出转录回调：可用于前端显示/缓存/同步。高频增量在时间窗内合并后再发送。"""
+        await self._text_frame_coalescer.push(text, is_first_chunk)
+
+    async def _emit_lanlan_response(self, text: str, is_first_chunk: bool, _key=None):
+        """发送一帧（合包后的）回复文本到前端，并同步到 sync_message_queue 与热切换缓存"""
         try:
             if self.websocket and hasattr(self.websocket, 'client_state') and self.websocket.client_state == self.websocket.client_state.CONNECTED:
                 # 去掉情绪标签
@@ -475,36 +519,18 @@ class LLMSessionManager:
             
             # 清空热切换音频缓存的最后4秒数据（静默期间的音频主要是噪音）
             async with self.hot_swap_cache_lock:
-                if self.hot_swap_audio_cache:
+                if len(self.hot_swap_audio_cache) > 0:
                     # 计算4秒的字节数
                     # 缓存的是处理后的16kHz音频：16000 samples/s × 2 bytes = 32000 bytes/s
                     # 4秒 = 128000 bytes，稍微少扣掉一点
                     SILENCE_DURATION_BYTES = 120000
                     
                     # 计算当前缓存的总字节数
-                    total_bytes = sum(len(chunk) for chunk in self.hot_swap_audio_cache)
+                    total_bytes = len(self.hot_swap_audio_cache)
                     
                     if total_bytes > SILENCE_DURATION_BYTES:
                         # 从缓存末尾删除最后4秒的数据
-                        bytes_to_remove = SILENCE_DURATION_BYTES
-                        removed_bytes = 0
-                        
-                        while bytes_to_remove > 0 and self.hot_swap_audio_cache:
-                            last_chunk = self.hot_swap_audio_cache[-1]
-                            chunk_size = len(last_chunk)
-                            
-                            if chunk_size <= bytes_to_remove:
-                                # 整个chunk都要删除
-                                self.hot_swap_audio_cache.pop()
-                                bytes_to_remove -= chunk_size
-                                removed_bytes += chunk_size
-                            else:
-                                # 只删除chunk的一部分
-                                keep_size = chunk_size - bytes_to_remove
-                                self.hot_swap_audio_cache[-1] = last_chunk[:keep_size]
-                                removed_bytes += bytes_to_remove
-                                bytes_to_remove = 0
-                        
+                        removed_bytes = self.hot_swap_audio_cache.drop_tail(SILENCE_DURATION_BYTES)
                         logger.info(f"🗑️ 静默超时：已清空音频缓存的最后 {removed_bytes} 字节（约{removed_bytes/32000:.1f}秒）")
                     else:
                         # 如果缓存总量不足4秒，全部清空
@@ -657,52 +683,45 @@ class LLMSessionManager:
                     self.hot_swap_audio_cache.clear()
                 return
             
-            max_iterations = 20  # 最多迭代20次，防止无限循环
-            iteration = 0
-            total_chunks_sent = 0
-            
-            logger.info("🔄 开始循环推送热切换音频缓存...")
-            
-            while iteration < max_iterations:
-                # 检查并取出当前缓存
+            bytes_per_second = self.HOT_SWAP_BYTES_PER_SECOND
+            chunk_size = bytes_per_second * self.HOT_SWAP_REPLAY_CHUNK_MS // 1000
+            speed = self.HOT_SWAP_REPLAY_SPEED
+
+            # 超出回放上限的最旧音频已过期，直接丢弃
+            async with self.hot_swap_cache_lock:
+                cached_bytes = len(self.hot_swap_audio_cache)
+                overwritten = self.hot_swap_audio_cache.dropped_bytes
+                self.hot_swap_audio_cache.dropped_bytes = 0
+                stale = self.hot_swap_audio_cache.skip(cached_bytes - bytes_per_second * self.HOT_SWAP_MAX_REPLAY_SECONDS)
+            if stale or overwritten:
+                logger.info(f"🗑️ 热切换音频缓存过长，丢弃最旧的 {(stale + overwritten) / bytes_per_second:.1f}秒")
+
+            logger.info(f"🔄 开始推送热切换音频缓存: {(cached_bytes - stale) / bytes_per_second:.1f}秒，{speed:.0f}倍速回放")
+
+            # 按音频的实际时长节流：已推送的音频时长 / speed 不超过已用时间，
+            # 推送期间新到的音频继续进入缓存，以 speed 倍速追上实时输入后结束
+            loop = asyncio.get_running_loop()
+            start_time = loop.time()
+            sent_bytes = 0
+            while True:
                 async with self.hot_swap_cache_lock:
-                    cache_len = len(self.hot_swap_audio_cache)
-                    
-                    if cache_len == 0:
-                        break
-                    else:
-                        audio_chunks = self.hot_swap_audio_cache.copy()
-                        self.hot_swap_audio_cache.clear()
-                
-                # 如果有缓存，合并并发送
-                if cache_len > 0:
-                    logger.info(f"🔄 推送第{iteration+1}批音频缓存: {cache_len} 个chunk")
-                    
-                    # 合并小chunk成大chunk（节流）
-                    combined_audio = b''.join(audio_chunks)
-                    
-                    # 计算每个大chunk的大小（16kHz，约10ms = 160 samples = 320 bytes）
-                    original_chunk_size = 320  # 16kHz: 160 samples × 2 bytes
-                    large_chunk_size = original_chunk_size * self.HOT_SWAP_FLUSH_CHUNK_MULTIPLIER
-                    
-                    # 分批发送
-                    for i in range(0, len(combined_audio), large_chunk_size):
-                        chunk = combined_audio[i:i + large_chunk_size]
-                        try:
-                            await self.session.stream_audio(chunk)
-                            await asyncio.sleep(0.025)
-                            total_chunks_sent += 1
-                        except Exception as e:
-                            logger.error(f"💥 推送音频缓存失败: {e}")
-                            return  # 推送失败，放弃
-                
-                iteration += 1
-                
-            if iteration >= max_iterations:
-                logger.warning(f"⚠️ 达到最大迭代次数({max_iterations})，停止推送")
-            
-            logger.info(f"✅ 热切换音频缓存推送完成，共推送约 {total_chunks_sent} 个大chunk，迭代 {iteration} 次")
-            
+                    chunk = self.hot_swap_audio_cache.read(chunk_size)
+                if not chunk:
+                    break
+                try:
+                    await self.session.stream_audio(chunk)
+                except Exception as e:
+                    logger.error(f"💥 推送音频缓存失败: {e}")
+                    return  # 推送失败，放弃
+                sent_bytes += len(chunk)
+                target_time = start_time + sent_bytes / bytes_per_second / speed
+                delay = target_time - loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+
+            elapsed = loop.time() - start_time
+            logger.info(f"✅ 热切换音频缓存推送完成，共推送 {sent_bytes / bytes_per_second:.1f}秒音频，用时 {elapsed:.1f}秒")
+
         finally:
             # 无论如何都要清除flag，恢复正常音频输入
             self.is_flushing_hot_swap_cache = False
@@ -778,7 +797,7 @@ class LLMSessionManager:
         self.audio_api_key = self._config_manager.get_core_config()['AUDIO_API_KEY']
         
         # 重新读取角色配置以获取最新的voice_id（支持角色切换后的音色热更新）
-        _, _, _, self.lanlan_basic_config, _, _, _, _, _, _ = self._config_manager.get_character_data()
+        _, _, _, self.lanlan_basic_config, _, _, _, _, _, _ = get_session_prompt_cache().get_character_data()
         old_voice_id = self.voice_id
         raw_voice_id = self._get_voice_id()
         block_free_preset = self._should_block_free_preset_voice(raw_voice_id, realtime_config.get('base_url', ''))
@@ -858,26 +877,22 @@ class LLMSessionManager:
             await asyncio.sleep(0.5)
             logger.info("旧session清理完成")
         
-        # 如果当前不需要TTS但TTS线程仍在运行，发送停止信号
-        if not self.use_tts and self.tts_thread and self.tts_thread.is_alive():
-            logger.info("当前模式不需要TTS，关闭TTS线程")
-            try:
-                self.tts_request_queue.put((None, None))  # 通知线程退出
-                self.tts_thread.join(timeout=1.0)  # 等待线程结束
-            except Exception as e:
-                logger.error(f"关闭TTS线程时出错: {e}")
-            finally:
-                self.tts_thread = None
+        # 如果当前不需要TTS但TTS线程仍在运行，归还到 worker 池
+        if not self.use_tts and self._tts_worker is not None:
+            logger.info("当前模式不需要TTS，归还TTS worker")
+            self._release_tts_worker()
 
         # 定义 TTS 启动协程（如果需要）
         async def start_tts_if_needed():
-            """异步启动 TTS 进程并等待就绪"""
+            """从 TTS worker 池租用 worker（优先复用已预热的）并等待就绪"""
             if not self.use_tts:
                 return True
             
-            # 启动TTS线程
+            # 租用TTS worker
             tts_ready = False
-            if self.tts_thread is None or not self.tts_thread.is_alive():
+            if self._tts_worker is None or not self._tts_worker.is_alive():
+                if self._tts_worker is not None:
+                    self._release_tts_worker()
                 # 判断是否使用自定义 TTS：有 voice_id（但不是免费预设）或 配置了自定义 TTS URL
                 core_config = self._config_manager.get_core_config()
                 has_custom_tts = (bool(self.voice_id) and not self._is_free_preset_voice) or (
@@ -891,8 +906,6 @@ class LLMSessionManager:
                     has_custom_voice=has_custom_tts
                 )
                 
-                self.tts_request_queue = Queue()  # TTS request (线程队列)
-                self.tts_response_queue = Queue()  # TTS response (线程队列)
                 # 根据是否有自定义音色/TTS配置选择 TTS API 配置
                 # 免费预设音色使用 tts_default（走 step/free TTS 通道）
                 if has_custom_tts:
@@ -900,57 +913,23 @@ class LLMSessionManager:
                 else:
                     tts_config = self._config_manager.get_model_api_config('tts_default')
                 
-                self.tts_thread = Thread(
-                    target=tts_worker,
-                    args=(self.tts_request_queue, self.tts_response_queue, tts_config['api_key'], self.voice_id)
-                )
-                self.tts_thread.daemon = True
-                self.tts_thread.start()
-                
-                # 等待TTS进程发送就绪信号（最多等待12秒）
                 tts_type = "free-preset-TTS" if self._is_free_preset_voice else ("custom-TTS" if has_custom_tts else f"{self.core_api_type}-default-TTS")
-                logger.info(f"🎤 TTS进程已启动，等待就绪... (使用: {tts_type})")
-                logger.info("[语音会话诊断] 开始等待 TTS 就绪信号 (超时: 12秒)")
-                start_time = time.time()
-                timeout = 12.0  # 最多等待12秒
-                _last_tts_log = 0.0
-                while time.time() - start_time < timeout:
-                    try:
-                        # 非阻塞检查队列
-                        if not self.tts_response_queue.empty():
-                            msg = self.tts_response_queue.get_nowait()
-                            # 检查是否是就绪信号
-                            if isinstance(msg, tuple) and len(msg) == 2 and msg[0] == "__ready__":
-                                tts_ready = msg[1]
-                                if tts_ready:
-                                    logger.info(f"✅ TTS进程已就绪 (用时: {time.time() - start_time:.2f}秒)")
-                                else:
-                                    logger.error("❌ TTS进程初始化失败")
-                                break
-                            else:
-                                # 不是就绪信号，放回队列
-                                self.tts_response_queue.put(msg)
-                                break
-                    except: # noqa
-                        pass
-                    # 每约2秒输出一次诊断日志，便于定位卡在哪一阶段
-                    _elapsed = time.time() - start_time
-                    if _elapsed - _last_tts_log >= 2.0:
-                        _last_tts_log = _elapsed
-                        logger.info(f"[语音会话诊断] TTS 就绪等待中... 已等待 {_elapsed:.1f}秒 / {timeout}秒")
-                    # 小睡眠避免忙等
-                    await asyncio.sleep(0.05)
-                
-                if not tts_ready:
-                    if time.time() - start_time >= timeout:
-                        logger.warning(f"⚠️ TTS进程就绪信号超时 ({timeout}秒)，继续执行...")
-                        logger.warning(f"[语音会话诊断] TTS 在 {timeout} 秒内未就绪，可能为 TTS 服务慢或网络问题")
-                    else:
-                        logger.error("❌ TTS进程初始化失败，但继续执行...")
+                logger.info(f"🎤 正在获取TTS worker... (使用: {tts_type})")
+                # 池键包含 base_url：用户修改 TTS 地址后不会复用旧 worker
+                self._tts_worker = await get_tts_worker_pool().acquire(
+                    tts_worker,
+                    tts_config['api_key'],
+                    self.voice_id,
+                    extra=(tts_config.get('base_url') or '',),
+                )
+                self.tts_request_queue = self._tts_worker.request_queue
+                self.tts_response_queue = self._tts_worker.response_queue
+                self.tts_thread = self._tts_worker.thread
+                tts_ready = self._tts_worker.ready
             else:
-                # TTS线程已存活，复用现有线程；保留上次的就绪状态（避免失败的 worker 被误标为就绪）
+                # 已租用的 worker 仍存活，继续使用；保留上次的就绪状态（避免失败的 worker 被误标为就绪）
                 tts_ready = self.tts_ready
-                logger.info(f"🎤 TTS线程已在运行，复用现有线程 (ready={tts_ready})")
+                logger.info(f"🎤 TTS worker已在运行，继续使用 (ready={tts_ready})")
             
             # 确保旧的 TTS handler task 已经停止
             if self.tts_handler_task and not self.tts_handler_task.done():
@@ -992,9 +971,7 @@ class LLMSessionManager:
             _mem_start = time.time()
             logger.info(f"[语音会话诊断] 开始获取记忆上下文 (端口 {self.memory_server_port})")
             try:
-                async with httpx.AsyncClient(timeout=2.0) as client:
-                    resp = await client.get(f"http://127.0.0.1:{self.memory_server_port}/new_dialog/{self.lanlan_name}")
-                    initial_prompt += resp.text + _loc(CONTEXT_SUMMARY_READY, _lang).format(name=self.lanlan_name, master=self.master_name)
+                initial_prompt += await self._get_memory_context() + _loc(CONTEXT_SUMMARY_READY, _lang).format(name=self.lanlan_name, master=self.master_name)
                 logger.info(f"[语音会话诊断] 记忆上下文获取完成 (耗时: {time.time() - _mem_start:.2f}秒)")
             except httpx.ConnectError:
                 raise ConnectionError(f"❌ 记忆服务未启动！请先启动记忆服务 (端口 {self.memory_server_port})")
@@ -1041,6 +1018,7 @@ class LLMSessionManager:
                     on_text_delta=self.handle_text_data,
                     on_audio_delta=self.handle_audio_data,
                     on_new_message=self.handle_new_message,
+                    on_speech_stopped=self.handle_speech_stopped,
                     on_input_transcript=self.handle_input_transcript,
                     on_output_transcript=self.handle_output_transcript,
                     on_connection_error=self.handle_connection_error,
@@ -1224,6 +1202,8 @@ class LLMSessionManager:
 
     async def send_user_activity(self, interrupted_speech_id: Optional[str] = None):
         """发送用户活动信号，附带被打断的 speech_id 用于精确打断控制"""
+        # 被打断的语音不再下发：丢弃尚未发送的合包缓冲和编码流
+        self._speech_output.discard()
         try:
             if self.websocket and hasattr(self.websocket, 'client_state') and self.websocket.client_state == self.websocket.client_state.CONNECTED:
                 if interrupted_speech_id is None:
@@ -1255,6 +1235,20 @@ class LLMSessionManager:
             or self.agent_flags.get('browser_use_enabled', False)
         )
 
+    async def _get_memory_context(self) -> str:
+        """获取 memory_server 的 /new_dialog 记忆上下文；记忆、设置与角色配置均未变化时复用上次结果。"""
+        cache = get_session_prompt_cache()
+        key = cache.memory_context_key(self.lanlan_name, self.user_language)
+        memory_context = cache.get_memory_context(self.lanlan_name, key)
+        if memory_context is not None:
+            logger.info(f"♻️ 复用缓存的记忆上下文: {self.lanlan_name}")
+            return memory_context
+        async with httpx.AsyncClient(timeout=2.0) as client:
+            resp = await client.get(f"http://127.0.0.1:{self.memory_server_port}/new_dialog/{self.lanlan_name}")
+        if resp.status_code == 200:
+            cache.put_memory_context(self.lanlan_name, key, resp.text)
+        return resp.text
+
     async def _fetch_active_agent_tasks_prompt(self) -> str:
         """Query agent server for active tasks and return a prompt snippet."""
         if not self._is_agent_enabled():
@@ -1299,7 +1293,7 @@ class LLMSessionManager:
             self.audio_api_key = self._config_manager.get_core_config()['AUDIO_API_KEY']
             
             # 重新读取角色配置以获取最新的voice_id（支持角色切换后的音色热更新）
-            _, _, _, self.lanlan_basic_config, _, _, _, _, _, _ = self._config_manager.get_character_data()
+            _, _, _, self.lanlan_basic_config, _, _, _, _, _, _ = get_session_prompt_cache().get_character_data()
             old_voice_id = self.voice_id
             raw_voice_id = self._get_voice_id()
             block_free_preset = self._should_block_free_preset_voice(raw_voice_id, realtime_config.get('base_url', ''))
@@ -1356,6 +1350,7 @@ class LLMSessionManager:
                     on_text_delta=self.handle_text_data,
                     on_audio_delta=self.handle_audio_data,
                     on_new_message=self.handle_new_message,
+                    on_speech_stopped=self.handle_speech_stopped,
                     on_input_transcript=self.handle_input_transcript,
                     on_output_transcript=self.handle_output_transcript,
                     on_connection_error=self.handle_connection_error,
@@ -1371,9 +1366,7 @@ class LLMSessionManager:
             initial_prompt = _loc(_init_tmpl, _lang).format(name=self.lanlan_name) + self.lanlan_prompt
             initial_prompt += await self._fetch_active_agent_tasks_prompt()
             self.initial_cache_snapshot_len = len(self.message_cache_for_new_session)
-            async with httpx.AsyncClient(timeout=2.0) as client:
-                resp = await client.get(f"http://127.0.0.1:{self.memory_server_port}/new_dialog/{self.lanlan_name}")
-                initial_prompt += resp.text + self._convert_cache_to_str(self.message_cache_for_new_session)
+            initial_prompt += await self._get_memory_context() + self._convert_cache_to_str(self.message_cache_for_new_session)
             print(initial_prompt)
             await self.pending_session.connect(initial_prompt, native_audio = not self.use_tts)
 
@@ -1504,6 +1497,7 @@ class LLMSessionManager:
                 return False
             await self.handle_text_data(chunk, is_first_chunk=(i == 0))
             await asyncio.sleep(0.15)
+        await self._flush_text_deltas()
 
         # TTS end signal
         if self.use_tts and self.tts_thread and self.tts_thread.is_alive():
@@ -1610,18 +1604,12 @@ class LLMSessionManager:
         """只把文本喂给 TTS 管线，不发送到前端显示。"""
         if not self.use_tts:
             return
-        async with self.tts_cache_lock:
-            if self.tts_ready and self.tts_thread and self.tts_thread.is_alive():
-                try:
-                    self.tts_request_queue.put((self.current_speech_id, text))
-                except Exception as e:
-                    logger.warning(f"⚠️ feed_tts_chunk 失败: {e}")
-            else:
-                self.tts_pending_chunks.append((self.current_speech_id, text))
+        await self._tts_text_coalescer.push(text, key=self.current_speech_id)
 
     async def finish_proactive_delivery(self, full_text: str):
         """流式完成后收尾：一次性投递完整文本 + 记录历史 + TTS/turn end 信号。"""
         await self.send_lanlan_response(full_text, is_first_chunk=True)
+        await self._flush_text_deltas()
 
         from langchain_core.messages import AIMessage as _AIMsg
         if self.session and hasattr(self.session, '_conversation_history'):
@@ -1928,7 +1916,8 @@ class LLMSessionManager:
         self.sync_message_queue.put({'type': 'system', 'data': 'API server disconnected'})
         await self.cleanup()
     
-    async def stream_data(self, message: dict):  # 向Core API发送Media数据
+    async def stream_data(self, message: dict, received_at: Optional[float] = None):  # 向Core API发送Media数据
+        """received_at: websocket_router 收到该消息时的 latency 时钟读数，用于延迟追踪"""
         input_type = message.get("input_type")
         
         # 检查session是否就绪
@@ -1958,9 +1947,9 @@ class LLMSessionManager:
                     return
         
         # Session已就绪，直接处理
-        await self._process_stream_data_internal(message)
+        await self._process_stream_data_internal(message, received_at)
     
-    async def _process_stream_data_internal(self, message: dict):
+    async def _process_stream_data_internal(self, message: dict, received_at: Optional[float] = None):
         """内部方法：实际处理stream_data的逻辑"""
         data = message.get("data")
         input_type = message.get("input_type")
@@ -2054,6 +2043,8 @@ class LLMSessionManager:
                     # 再为本次新回复生成新的speech_id（用于TTS和lipsync）
                     async with self.lock:
                         self.current_speech_id = str(uuid4())
+                    # 文本模式以文本到达作为本轮延迟追踪的起点
+                    self.latency.begin_turn(received_at)
 
                     # 文本模式：在发送用户输入前，将挂起的 agent 任务回调注入 LLM 上下文
                     if self.pending_agent_callbacks:
@@ -2107,16 +2098,19 @@ class LLMSessionManager:
                         is_48khz = (num_samples == 480)
                         
                         processed_audio = audio_bytes  # 默认使用原始音频
+                        self.latency.observe_since("ws_queue", received_at)
                         if is_48khz and isinstance(self.session, OmniRealtimeClient):
                             # 使用session的AudioProcessor处理音频
                             if hasattr(self.session, '_audio_processor') and self.session._audio_processor:
                                 try:
                                     # Use async wrapper to avoid blocking main loop
+                                    dsp_start = self.latency.now()
                                     if hasattr(self.session, 'process_audio_chunk_async'):
                                         processed_audio = await self.session.process_audio_chunk_async(audio_bytes)
                                     else:
                                         # Fallback (should not happen if client updated)
                                         processed_audio = self.session._audio_processor.process_chunk(audio_bytes)
+                                    self.latency.observe_since("dsp", dsp_start)
                                         
                                     # RNNoise可能返回空字节（缓冲中），跳过
                                     if len(processed_audio) == 0:
@@ -2133,8 +2127,9 @@ class LLMSessionManager:
                         # 热切换期间或推送缓存期间，缓存处理后的音频（16kHz，已降噪）
                         if self.is_hot_swap_imminent or self.is_flushing_hot_swap_cache:
                             async with self.hot_swap_cache_lock:
-                                self.hot_swap_audio_cache.append(processed_audio)
-                                if len(self.hot_swap_audio_cache) == 1:
+                                is_first_chunk = len(self.hot_swap_audio_cache) == 0
+                                self.hot_swap_audio_cache.write(processed_audio)
+                                if is_first_chunk:
                                     logger.info("🔄 热切换进行中，开始缓存处理后的音频（16kHz）...")
                             return
                         
@@ -2160,7 +2155,9 @@ class LLMSessionManager:
                             return
                         
                         # 发送音频到session（stream_audio会检测是否48kHz，16kHz不会再处理）
+                        send_start = self.latency.now()
                         await self.session.stream_audio(processed_audio)
+                        self.latency.observe_since("upstream_send", send_start)
                     else:
                         logger.error(f"💥 Stream: Invalid audio data type: {type(data)}")
                         return
@@ -2194,14 +2191,15 @@ class LLMSessionManager:
 
             elif input_type in ['screen', 'camera']:
                 try:
-                    # 使用统一的屏幕分享工具处理数据（只验证，不缩放）
-                    image_b64 = await process_screen_data(data)
+                    # 使用统一的屏幕分享工具处理数据（只验证，不缩放；解码在线程池中进行）
+                    frame = await process_screen_frame(data)
                     
-                    if image_b64:
+                    if frame:
+                        image_b64, frame_hash = frame
                         # 如果是文本模式（OmniOfflineClient），只存储图片，不立即发送
                         if isinstance(self.session, OmniOfflineClient):
                             # 只添加到待发送队列，等待与文本一起发送
-                            await self.session.stream_image(image_b64)
+                            await self.session.stream_image(image_b64, frame_hash)
                         
                         # 如果是语音模式（OmniRealtimeClient），检查是否支持视觉并直接发送
                         elif isinstance(self.session, OmniRealtimeClient):
@@ -2211,7 +2209,7 @@ class LLMSessionManager:
                                 return
                             
                             # 语音模式直接发送图片
-                            await self.session.stream_image(image_b64)
+                            await self.session.stream_image(image_b64, frame_hash)
                     else:
                         logger.error("💥 Stream: 屏幕数据验证失败")
                         return
@@ -2279,14 +2277,31 @@ class LLMSessionManager:
                 pass
             self.tts_handler_task = None
             
-        if self.tts_thread and self.tts_thread.is_alive():
+        # 发送剩余的文本与语音并结束编码流
+        try:
+            await self._text_frame_coalescer.flush()
+            self._tts_text_coalescer.discard()
+            frame_stats = self._text_frame_coalescer.get_stats()
+            if frame_stats["frames_out"]:
+                logger.info(f"💬 文本下行统计: {frame_stats['deltas_in']} 个增量合并为 {frame_stats['frames_out']} 帧")
+            self._text_frame_coalescer.reset_stats()
+            await self._speech_output.close()
+            stats = self._speech_output.get_stats()
+            if stats["audio_seconds"] > 0:
+                logger.info(
+                    f"🔈 语音下行统计: {stats['format']}, {stats['audio_seconds']:.1f}秒音频, "
+                    f"{stats['kbps']:.0f}kbit/s, {stats['frames_per_audio_second']:.1f}帧/秒"
+                )
+            self._speech_output.reset_stats()
+        except Exception as e:
+            logger.error(f"💥 结束语音下行时出错: {e}")
+
+        # 归还TTS worker到池中，保持预热以便下次会话直接复用
+        if self._tts_worker is not None:
             try:
-                self.tts_request_queue.put((None, None))  # 通知线程退出
-                self.tts_thread.join(timeout=2.0)  # 等待线程结束
+                self._release_tts_worker()
             except Exception as e:
-                logger.error(f"💥 关闭TTS线程时出错: {e}")
-            finally:
-                self.tts_thread = None
+                logger.error(f"💥 归还TTS worker时出错: {e}")
                 
         # 清理TTS队列和缓存状态
         try:
@@ -2461,18 +2476,38 @@ class LLMSessionManager:
         except Exception as e:
             logger.error(f"💥 WS Send Session Ended By Server Error: {e}")
 
-    async def send_speech(self, tts_audio, speech_id: Optional[str] = None):
-        """发送语音数据到前端，先发送 speech_id 头信息用于精确打断控制"""
+    def set_audio_output_formats(self, client_formats):
+        """根据前端声明支持的音频格式协商语音下行格式（见 main_logic/speech_output.py）"""
+        self._speech_output.set_format(negotiate_audio_format(client_formats))
+
+    async def send_speech(self, tts_audio, speech_id: Optional[str] = None, encoded_format: Optional[str] = None):
+        """
+        发送语音数据到前端。PCM16 会按协商格式编码并合包后发送；
+        encoded_format 不为空时表示 provider 已编码好的音频，直接下发。
+        """
+        effective_speech_id = speech_id if speech_id is not None else self.current_speech_id
+        try:
+            if encoded_format:
+                await self._speech_output.push_encoded(effective_speech_id, tts_audio, encoded_format)
+            else:
+                await self._speech_output.push_pcm(effective_speech_id, tts_audio)
+            # 副终端（monitor）按需订阅同一份音频；无订阅者时不产生任何开销
+            get_audio_fanout(self.lanlan_name).publish(tts_audio)
+        except Exception as e:
+            logger.error(f"💥 WS Send Response Error: {e}")
+
+    async def _send_audio_frame(self, speech_id: Optional[str], payload: bytes, audio_format: str):
+        """实际下发一帧语音：先发送 speech_id 头信息用于精确打断控制，再发送二进制数据"""
         try:
             if self.websocket and hasattr(self.websocket, 'client_state') and self.websocket.client_state == self.websocket.client_state.CONNECTED:
-                effective_speech_id = speech_id if speech_id is not None else self.current_speech_id
                 await self.websocket.send_json({
                     "type": "audio_chunk",
-                    "speech_id": effective_speech_id
+                    "speech_id": speech_id,
+                    "format": audio_format
                 })
-                await self.websocket.send_bytes(tts_audio)
-                logger.debug(f"🔊 send_speech OK: {len(tts_audio)} bytes, speech_id={effective_speech_id}")
-                self.sync_message_queue.put({"type": "binary", "data": tts_audio})
+                await self.websocket.send_bytes(payload)
+                self.latency.mark("first_speech_frame")
+                logger.debug(f"🔊 send_speech OK: {len(payload)} bytes ({audio_format}), speech_id={speech_id}")
             else:
                 ws_state = getattr(self.websocket, 'client_state', None) if self.websocket else None
                 logger.warning(f"⚠️ send_speech skipped: ws={self.websocket is not None}, state={ws_state}")
@@ -2482,20 +2517,18 @@ class LLMSessionManager:
             logger.error(f"💥 WS Send Response Error: {e}")
 
     async def tts_response_handler(self):
-        import queue as _queue_mod
         q = self.tts_response_queue
         logger.info(f"🎧 tts_response_handler started (queue id={id(q):#x})")
         while True:
             try:
-                try:
-                    data = q.get_nowait()
-                except _queue_mod.Empty:
-                    await asyncio.sleep(0.01)
-                    continue
+                # 由 worker 的 put() 唤醒，无数据时不占用 CPU
+                data = await q.get_async()
 
                 if isinstance(data, tuple) and len(data) == 2:
                     if data[0] == "__ready__":
                         ready_flag = bool(data[1])
+                        if self._tts_worker is not None:
+                            self._tts_worker.ready = ready_flag
                         async with self.tts_cache_lock:
                             self.tts_ready = ready_flag
                         if ready_flag:
@@ -2526,11 +2559,13 @@ class LLMSessionManager:
                         continue
                 elif isinstance(data, tuple) and len(data) == 3 and data[0] == "__audio__":
                     _, speech_id, audio_payload = data
-                    await self.send_speech(audio_payload, speech_id=speech_id)
+                    self.latency.mark("first_tts_byte")
+                    await self.send_speech(audio_payload, speech_id=speech_id, encoded_format=AUDIO_FORMAT_OGG_OPUS)
                     continue
 
                 size = len(data) if isinstance(data, (bytes, bytearray)) else f"type={type(data).__name__}"
                 logger.debug(f"🎧 handler dequeued audio: {size}, qsize≈{q.qsize()}")
+                self.latency.mark("first_tts_byte")
                 await self.send_speech(data)
             except asyncio.CancelledError:
                 logger.info("🎧 tts_response_handler cancelled")
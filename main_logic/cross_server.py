@@ -9,8 +9,11 @@
 import ssl
 
 import asyncio
+import queue
+import threading
 import time
 import pickle
+from typing import Optional
 import aiohttp
 from config import MONITOR_SERVER_PORT, MEMORY_SERVER_PORT, COMMENTER_SERVER_PORT
 from datetime import datetime
@@ -19,6 +22,7 @@ import re
 from utils.frontend_utils import replace_blank, is_only_punctuation
 from utils.logger_config import get_module_logger
 from main_logic.agent_event_bus import publish_analyze_request_reliably
+from main_logic.audio_fanout import get_audio_fanout
 
 # Setup logger for this module
 logger = get_module_logger(__name__, "Main")
@@ -113,14 +117,95 @@ def merge_unsynced_tail_assistants(chat_history, last_synced_index):
     return removed
 
 
-async def keep_reader(ws: aiohttp.ClientWebSocketResponse):
-    """保持 WebSocket 连接活跃的读取循环"""
+# 连接维护（重连/心跳）的最小间隔；空闲时连接器每隔这么久醒来一次
+CONNECTION_CHECK_INTERVAL = 1.0
+# 连接失败后的重连间隔
+RECONNECT_INTERVAL = 3.0
+
+
+class SyncMessageQueue(queue.Queue):
+    """
+    主进程 -> 同步连接器的消息队列。
+
+    put() 时通过 call_soon_threadsafe 唤醒连接器的事件循环，
+    连接器用 get_batch_async() 阻塞等待，一次取走同时到达的全部消息，
+    不再以 20ms 间隔轮询 empty()。
+    """
+
+    def __init__(self, maxsize: int = 0):
+        super().__init__(maxsize)
+        self._notify_lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._event: Optional[asyncio.Event] = None
+
+    def put(self, item, block=True, timeout=None):
+        super().put(item, block, timeout)
+        self.wake()
+
+    def wake(self) -> None:
+        """唤醒等待中的连接器（也用于关闭时让其及时检查 shutdown_event）。"""
+        with self._notify_lock:
+            loop, event = self._loop, self._event
+        if loop is not None and event is not None:
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                pass  # 连接器的事件循环已关闭
+
+    def _drain(self) -> list:
+        items = []
+        while True:
+            try:
+                items.append(self.get_nowait())
+            except queue.Empty:
+                return items
+
+    async def get_batch_async(self, timeout: float) -> list:
+        """等待消息到达（最多 timeout 秒），返回当前已到达的全部消息（可能为空）。"""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            with self._notify_lock:
+                self._loop = loop
+                self._event = asyncio.Event()
+        # 先清除再检查，避免清除前到达的唤醒丢失
+        self._event.clear()
+        items = self._drain()
+        if items:
+            return items
+        try:
+            await asyncio.wait_for(self._event.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+        return self._drain()
+
+
+async def _next_message_batch(message_queue, timeout: float) -> list:
+    """取出同时到达的一批消息；兼容普通 queue.Queue（退化为短轮询）。"""
+    if isinstance(message_queue, SyncMessageQueue):
+        return await message_queue.get_batch_async(timeout)
+    items = []
+    deadline = time.time() + timeout
+    while not items and time.time() < deadline:
+        while not message_queue.empty():
+            items.append(message_queue.get_nowait())
+        if not items:
+            await asyncio.sleep(0.02)
+    return items
+
+
+async def keep_reader(ws: aiohttp.ClientWebSocketResponse, on_text=None):
+    """保持 WebSocket 连接活跃的读取循环；on_text 用于处理对端发来的文本消息"""
     try:
         while True:
             try:
                 msg = await ws.receive(timeout=30)
                 if msg.type in (aiohttp.WSMsgType.CLOSED, aiohttp.WSMsgType.ERROR):
                     break
+                if on_text is not None and msg.type == aiohttp.WSMsgType.TEXT:
+                    try:
+                        on_text(json.loads(msg.data))
+                    except Exception:
+                        pass
             except asyncio.TimeoutError:
                 pass
             except asyncio.CancelledError:
@@ -142,15 +227,22 @@ def sync_connector_process(message_queue, shutdown_event, lanlan_name, sync_serv
     config = default_config | config
 
     async def maintain_connection(chat_history, lanlan_name):
-        sync_session = None
+        # 每个目标一个长期复用的 ClientSession（连接池），不再每次请求/重连都新建
+        monitor_session = None
+        memory_session = None
         sync_ws = None
         sync_reader = None
-        binary_session = None
         binary_ws = None
         binary_reader = None
+        # monitor 报告的查看客户端数量；只有大于 0 时才订阅语音分发
+        monitor_state = {'listeners': 0}
+        audio_sub = None
+        audio_task = None
         bullet_session = None
         bullet_ws = None
         bullet_reader = None
+        last_connection_check = 0.0
+        last_connect_attempt = 0.0
 
         user_input_cache = ''
         text_output_cache = '' # lanlan的当前消息
@@ -159,11 +251,30 @@ def sync_connector_process(message_queue, shutdown_event, lanlan_name, sync_serv
         last_screen = None
         last_synced_index = 0  # 用于 turn end 时仅同步新增消息到 memory，避免 memory_browser 不更新
 
+        def on_binary_text(data):
+            if isinstance(data, dict) and data.get('type') == 'listeners':
+                monitor_state['listeners'] = int(data.get('count') or 0)
+
+        def get_memory_session():
+            """memory_server 的长连接会话（keep-alive 复用 TCP 连接）"""
+            nonlocal memory_session
+            if memory_session is None or memory_session.closed:
+                memory_session = aiohttp.ClientSession(
+                    connector=aiohttp.TCPConnector(limit=4, keepalive_timeout=60)
+                )
+            return memory_session
+
+        async def forward_audio(sub, ws):
+            """把语音订阅中的音频块转发给 monitor（出错时由主循环重连）"""
+            while True:
+                for chunk in await sub.get_batch():
+                    await ws.send_bytes(chunk)
+
         while not shutdown_event.is_set():
             try:
-                # 检查消息队列
-                while not message_queue.empty():
-                    message = message_queue.get()
+                # 阻塞等待消息（由 put 唤醒），一次处理同时到达的一批；
+                # 空闲时每 CONNECTION_CHECK_INTERVAL 秒醒来一次维护连接
+                for message in await _next_message_batch(message_queue, CONNECTION_CHECK_INTERVAL):
 
                     if message["type"] == "json":
                         # Forward to monitor if enabled
@@ -269,17 +380,16 @@ def sync_connector_process(message_queue, shutdown_event, lanlan_name, sync_serv
                                 logger.info(f"[{lanlan_name}] 热重置：聊天历史 {len(chat_history)} 条，增量 {len(remaining)} 条")
                                 if remaining:
                                     try:
-                                        async with aiohttp.ClientSession() as session:
-                                            async with session.post(
-                                                f"http://127.0.0.1:{MEMORY_SERVER_PORT}/renew/{lanlan_name}",
-                                                json={'input_history': json.dumps(remaining, indent=2, ensure_ascii=False)},
-                                                timeout=aiohttp.ClientTimeout(total=30.0)
-                                            ) as response:
-                                                result = await response.json()
-                                                if result.get('status') == 'error':
-                                                    logger.error(f"[{lanlan_name}] 热重置记忆处理失败: {result.get('message')}")
-                                                else:
-                                                    logger.info(f"[{lanlan_name}] 热重置记忆已成功上传到 memory_server")
+                                        async with get_memory_session().post(
+                                            f"http://127.0.0.1:{MEMORY_SERVER_PORT}/renew/{lanlan_name}",
+                                            json={'input_history': json.dumps(remaining, indent=2, ensure_ascii=False)},
+                                            timeout=aiohttp.ClientTimeout(total=30.0)
+                                        ) as response:
+                                            result = await response.json()
+                                            if result.get('status') == 'error':
+                                                logger.error(f"[{lanlan_name}] 热重置记忆处理失败: {result.get('message')}")
+                                            else:
+                                                logger.info(f"[{lanlan_name}] 热重置记忆已成功上传到 memory_server")
                                     except RuntimeError as e:
                                         if "shutdown" in str(e).lower() or "closed" in str(e).lower():
                                             logger.info(f"[{lanlan_name}] 进程正在关闭，renew请求已取消")
@@ -342,15 +452,14 @@ def sync_connector_process(message_queue, shutdown_event, lanlan_name, sync_serv
                                 if had_user_input_this_turn and not shutdown_event.is_set() and last_synced_index < len(chat_history):
                                     new_messages = chat_history[last_synced_index:]
                                     try:
-                                        async with aiohttp.ClientSession() as session:
-                                            async with session.post(
-                                                f"http://127.0.0.1:{MEMORY_SERVER_PORT}/cache/{lanlan_name}",
-                                                json={'input_history': json.dumps(new_messages, indent=2, ensure_ascii=False)},
-                                                timeout=aiohttp.ClientTimeout(total=10.0)
-                                            ) as response:
-                                                result = await response.json()
-                                                if result.get('status') != 'error':
-                                                    last_synced_index = len(chat_history)
+                                        async with get_memory_session().post(
+                                            f"http://127.0.0.1:{MEMORY_SERVER_PORT}/cache/{lanlan_name}",
+                                            json={'input_history': json.dumps(new_messages, indent=2, ensure_ascii=False)},
+                                            timeout=aiohttp.ClientTimeout(total=10.0)
+                                        ) as response:
+                                            result = await response.json()
+                                            if result.get('status') != 'error':
+                                                last_synced_index = len(chat_history)
                                     except Exception as e:
                                         logger.debug(f"[{lanlan_name}] turn end cache 失败: {e}")
 
@@ -422,39 +531,52 @@ def sync_connector_process(message_queue, shutdown_event, lanlan_name, sync_serv
                                 logger.info(f"[{lanlan_name}] 会话结束：聊天历史 {len(chat_history)} 条，增量 {len(remaining)} 条")
                                 if not shutdown_event.is_set() and remaining:
                                     try:
-                                        async with aiohttp.ClientSession() as session:
-                                            async with session.post(
-                                                f"http://127.0.0.1:{MEMORY_SERVER_PORT}/process/{lanlan_name}",
-                                                json={'input_history': json.dumps(remaining, indent=2, ensure_ascii=False)},
-                                                timeout=aiohttp.ClientTimeout(total=30.0)
-                                            ) as response:
-                                                result = await response.json()
-                                                if result.get('status') == 'error':
-                                                    logger.debug(f"[{lanlan_name}] session end 记忆结算失败: {result.get('message')}")
-                                                else:
-                                                    logger.info(f"[{lanlan_name}] session end 记忆结算完成，{len(remaining)} 条消息")
+                                        async with get_memory_session().post(
+                                            f"http://127.0.0.1:{MEMORY_SERVER_PORT}/process/{lanlan_name}",
+                                            json={'input_history': json.dumps(remaining, indent=2, ensure_ascii=False)},
+                                            timeout=aiohttp.ClientTimeout(total=30.0)
+                                        ) as response:
+                                            result = await response.json()
+                                            if result.get('status') == 'error':
+                                                logger.debug(f"[{lanlan_name}] session end 记忆结算失败: {result.get('message')}")
+                                            else:
+                                                logger.info(f"[{lanlan_name}] session end 记忆结算完成，{len(remaining)} 条消息")
                                     except Exception as e:
                                         logger.debug(f"[{lanlan_name}] session end 记忆结算失败: {e}")
                                 chat_history.clear()
                                 last_synced_index = 0
                         except Exception as e:
                             logger.error(f"[{lanlan_name}] System message error: {e}", exc_info=True)
-                    await asyncio.sleep(0.02)
             except Exception as e:
                 logger.error(f"[{lanlan_name}] Message processing error: {e}", exc_info=True)
                 await asyncio.sleep(0.02)
-            
-            # WebSocket 连接管理（独立于消息处理）
+
+            # WebSocket 连接管理（独立于消息处理，限频执行）
+            now = time.time()
+            if now - last_connection_check < CONNECTION_CHECK_INTERVAL:
+                continue
+            last_connection_check = now
+            # 对端关闭的连接及时标记为断开
+            if sync_ws is not None and sync_ws.closed:
+                sync_ws = None
+            if binary_ws is not None and binary_ws.closed:
+                binary_ws = None
+            if bullet_ws is not None and bullet_ws.closed:
+                bullet_ws = None
+            # 连接失败后按 RECONNECT_INTERVAL 重试，而不是每轮都新建连接
+            missing = (config['monitor'] and (sync_ws is None or binary_ws is None)) or (config['bullet'] and bullet_ws is None)
+            may_connect = missing and now - last_connect_attempt >= RECONNECT_INTERVAL
+            if may_connect:
+                last_connect_attempt = now
             try:
                 # 如果连接不存在，尝试建立连接
                 try:
                     if config['monitor']:
-                        if sync_ws is None:
-                            if sync_session:
-                                await sync_session.close()
-                            sync_session = aiohttp.ClientSession()
+                        if may_connect and (monitor_session is None or monitor_session.closed):
+                            monitor_session = aiohttp.ClientSession()
+                        if sync_ws is None and may_connect:
                             try:
-                                sync_ws = await sync_session.ws_connect(
+                                sync_ws = await monitor_session.ws_connect(
                                     f"{sync_server_url}/sync/{lanlan_name}",
                                     heartbeat=10,
                                 )
@@ -464,17 +586,15 @@ def sync_connector_process(message_queue, shutdown_event, lanlan_name, sync_serv
                                 # logger.warning(f"[{lanlan_name}] Monitor文本连接失败: {e}")
                                 sync_ws = None
 
-                        if binary_ws is None:
-                            if binary_session:
-                                await binary_session.close()
-                            binary_session = aiohttp.ClientSession()
+                        if binary_ws is None and may_connect:
+                            monitor_state['listeners'] = 0  # 新连接建立后由 monitor 重新报告
                             try:
-                                binary_ws = await binary_session.ws_connect(
+                                binary_ws = await monitor_session.ws_connect(
                                     f"{sync_server_url}/sync_binary/{lanlan_name}",
                                     heartbeat=10,
                                 )
                                 # print(f"[Sync Process] [{lanlan_name}] 二进制连接已建立")
-                                binary_reader = asyncio.create_task(keep_reader(binary_ws))
+                                binary_reader = asyncio.create_task(keep_reader(binary_ws, on_binary_text))
                             except Exception:
                                 # logger.warning(f"[{lanlan_name}] Monitor二进制连接失败: {e}")
                                 binary_ws = None
@@ -492,6 +612,23 @@ def sync_connector_process(message_queue, shutdown_event, lanlan_name, sync_serv
                             except Exception:
                                 binary_ws = None
 
+                        # 按需订阅语音：monitor 有查看客户端且二进制连接可用时才订阅
+                        if audio_task is not None and audio_task.done():
+                            audio_task = None
+                            audio_sub.close()
+                            audio_sub = None
+                            binary_ws = None  # 转发失败，下一轮重连
+                        want_audio = binary_ws is not None and monitor_state['listeners'] > 0
+                        if want_audio and audio_task is None:
+                            audio_sub = get_audio_fanout(lanlan_name).subscribe()
+                            audio_task = asyncio.create_task(forward_audio(audio_sub, binary_ws))
+                        elif not want_audio and audio_sub is not None:
+                            if audio_task is not None:
+                                audio_task.cancel()
+                                audio_task = None
+                            audio_sub.close()
+                            audio_sub = None
+
                 except Exception as e:
                     logger.error(f"[{lanlan_name}] Monitor连接异常: {e}", exc_info=True)
                     sync_ws = None
@@ -499,10 +636,9 @@ def sync_connector_process(message_queue, shutdown_event, lanlan_name, sync_serv
 
                 try:
                     if config['bullet']:
-                        if bullet_ws is None:
-                            if bullet_session:
-                                await bullet_session.close()
-                            bullet_session = aiohttp.ClientSession()
+                        if bullet_ws is None and may_connect:
+                            if bullet_session is None or bullet_session.closed:
+                                bullet_session = aiohttp.ClientSession()
                             try:
                                 bullet_ws = await bullet_session.ws_connect(
                                     f"wss://127.0.0.1:{COMMENTER_SERVER_PORT}/sync/{lanlan_name}",
@@ -516,9 +652,6 @@ def sync_connector_process(message_queue, shutdown_event, lanlan_name, sync_serv
                 except Exception as e:
                     logger.error(f"[{lanlan_name}] Bullet连接异常: {e}", exc_info=True)
                     bullet_ws = None
-                
-                # 短暂休眠避免CPU占用过高
-                await asyncio.sleep(0.02)
 
             except asyncio.CancelledError:
                 break
@@ -531,13 +664,17 @@ def sync_connector_process(message_queue, shutdown_event, lanlan_name, sync_serv
                 await asyncio.sleep(0.03)  # 重连前等待
 
         # 关闭资源
+        if audio_task is not None:
+            audio_task.cancel()
+        if audio_sub is not None:
+            audio_sub.close()
         for ws in [sync_ws, binary_ws, bullet_ws]:
             if ws:
                 try:
                     await ws.close()
                 except Exception:
                     pass
-        for sess in [sync_session, binary_session, bullet_session]:
+        for sess in [monitor_session, memory_session, bullet_session]:
             if sess:
                 try:
                     await sess.close()
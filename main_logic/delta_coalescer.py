@@ -0,0 +1,99 @@
+"""
+文本增量合包（send_lanlan_response 的前端/同步队列帧，以及 TTS 请求队列）
+
+实时/文本模型按 token 粒度回调文本增量，以前每个增量都会单独：
+发送一条 gemini_response JSON、放入一次 sync_message_queue、放入一次 TTS 请求队列。
+高 token 速率下，一次回复会在三个出口上产生数千条小消息。
+
+DeltaCoalescer 对单个出口在 window_ms 时间窗内合并增量：
+- 新消息的第一个增量立即发送（首字延迟不变，isNewMessage 标记落在第一帧上）；
+- 之后的增量在时间窗内累积，到期合并为一帧发送；
+- key（如 speech_id）变化时先发送旧 key 下的累积文本，保证不会串到新的 key；
+- 轮次结束前由调用方 flush()，打断/丢弃响应时 discard()。
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, List, Optional
+
+from utils.logger_config import get_module_logger
+
+logger = get_module_logger(__name__, "Main")
+
+DEFAULT_WINDOW_MS = 40
+
+
+class DeltaCoalescer:
+    """单个出口的文本增量合包器（在事件循环中使用）。"""
+
+    def __init__(
+        self,
+        emit: Callable[[str, bool, Any], Awaitable[None]],
+        window_ms: float = DEFAULT_WINDOW_MS,
+        name: str = "",
+    ):
+        # emit(text, is_first_chunk, key)
+        self._emit = emit
+        self.window_ms = window_ms
+        self.name = name
+        self._buffer: List[str] = []
+        self._key: Any = None
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._emit_lock = asyncio.Lock()
+        self._stats = {"deltas_in": 0, "frames_out": 0}
+
+    async def push(self, text: str, is_first_chunk: bool = False, key: Any = None) -> None:
+        if not text and not is_first_chunk:
+            return
+        self._stats["deltas_in"] += 1
+        if is_first_chunk or key != self._key:
+            await self.flush()
+            self._key = key
+        if is_first_chunk:
+            await self._send(text, True, key)
+            return
+        self._buffer.append(text)
+        if self._flush_handle is None:
+            loop = asyncio.get_running_loop()
+            self._flush_handle = loop.call_later(self.window_ms / 1000, self._schedule_flush)
+
+    def _schedule_flush(self) -> None:
+        self._flush_handle = None
+        asyncio.ensure_future(self.flush())
+
+    async def flush(self) -> None:
+        """立即发送已累积的文本。"""
+        self._cancel_flush()
+        if not self._buffer:
+            return
+        text = "".join(self._buffer)
+        self._buffer.clear()
+        await self._send(text, False, self._key)
+
+    def discard(self) -> None:
+        """丢弃尚未发送的文本（打断或响应被丢弃时）。"""
+        self._cancel_flush()
+        self._buffer.clear()
+
+    def _cancel_flush(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+    async def _send(self, text: str, is_first_chunk: bool, key: Any) -> None:
+        # 保证帧按产生顺序发出（定时 flush 与新消息首帧可能并发）
+        async with self._emit_lock:
+            self._stats["frames_out"] += 1
+            try:
+                await self._emit(text, is_first_chunk, key)
+            except Exception as e:
+                logger.error(f"💥 文本合包发送失败 ({self.name}): {e}")
+
+    def reset_stats(self) -> None:
+        self._stats = {"deltas_in": 0, "frames_out": 0}
+
+    def get_stats(self) -> dict:
+        deltas, frames = self._stats["deltas_in"], self._stats["frames_out"]
+        return {
+            **self._stats,
+            "deltas_per_frame": (deltas / frames) if frames else 0.0,
+        }
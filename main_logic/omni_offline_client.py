@@ -1,17 +1,55 @@
 # -- coding: utf-8 --
 
 import asyncio
-from typing import Optional, Callable, Dict, Any, Awaitable
+from typing import Optional, Callable, Dict, Any, Awaitable, List
 from langchain_openai import ChatOpenAI
 from langchain_core.messages import SystemMessage, HumanMessage, AIMessage
 from openai import APIConnectionError, InternalServerError, RateLimitError
-from config import get_extra_body
+from config import get_extra_body, SCREEN_FRAME_DEDUP_MAX_DISTANCE
 from utils.frontend_utils import calculate_text_similarity, count_words_and_chars
+from utils.screenshot_utils import frame_hash_distance
 from utils.logger_config import get_module_logger
 
 # Setup logger for this module
 logger = get_module_logger(__name__, "Main")
 
+# 上下文预算的估算参数（不依赖具体 tokenizer，只需数量级正确）
+_TOKENS_PER_UNIT = 1.3      # count_words_and_chars 的每个单位（汉字/英文单词）约合的 token 数
+_TOKENS_PER_MESSAGE = 4     # 每条消息的格式开销
+_TOKENS_PER_IMAGE = 1000    # 单张截图的典型 token 开销
+_EVICTED_IMAGE_NOTE = "[此前发送过{count}张图片，已从上下文中省略]"
+
+
+def _is_image_part(part) -> bool:
+    return isinstance(part, dict) and part.get("type") == "image_url"
+
+
+def _image_part_bytes(part) -> int:
+    url = (part.get("image_url") or {}).get("url", "") if isinstance(part, dict) else ""
+    return len(url)
+
+
+def _message_text(message) -> str:
+    content = message.content
+    if isinstance(content, str):
+        return content
+    return "".join(p.get("text", "") for p in content if isinstance(p, dict) and p.get("type") == "text")
+
+
+def _message_images(message) -> List[dict]:
+    content = message.content
+    if isinstance(content, list):
+        return [p for p in content if _is_image_part(p)]
+    return []
+
+
+def _estimate_message_tokens(message) -> int:
+    return (
+        int(count_words_and_chars(_message_text(message)) * _TOKENS_PER_UNIT)
+        + _TOKENS_PER_MESSAGE
+        + _TOKENS_PER_IMAGE * len(_message_images(message))
+    )
+
 class OmniOfflineClient:
     """
     A client for text-based chat that mimics the interface of OmniRealtimeClient.
@@ -66,12 +104,16 @@ class OmniOfflineClient:
         on_repetition_detected: Optional[Callable[[], Awaitable[None]]] = None,
         on_response_discarded: Optional[Callable[[str, int, int, bool, Optional[str]], Awaitable[None]]] = None,
         extra_event_handlers: Optional[Dict[str, Callable[[Dict[str, Any]], Awaitable[None]]]] = None,
-        max_response_length: Optional[int] = None
+        max_response_length: Optional[int] = None,
+        max_context_tokens: int = 24000,
+        max_image_bytes: int = 3 * 1024 * 1024,
+        image_ttl_turns: int = 2
     ):
         # Use base_url directly without conversion
         self.base_url = base_url
         self.api_key = api_key if api_key and api_key != '' else None
         self.model = model
+        self.text_model = model  # 上下文中不再有图片时切回的文本模型
         self.vision_model = vision_model  # Store vision model for temporary switching
         # 视觉模型独立配置（如果未指定则回退到主配置）
         self.vision_base_url = vision_base_url if vision_base_url else base_url
@@ -101,6 +143,15 @@ class OmniOfflineClient:
         self._instructions = ""
         self._stream_task = None
         self._pending_images = []  # Store pending images to send with next text
+        self._last_pending_image_hash: Optional[int] = None  # 最后一张待发送图片的感知哈希
+
+        # ========== 上下文预算 ==========
+        # 每次请求前按预算压缩 _conversation_history：旧图片先被省略，再按 token 预算丢弃最早的消息
+        self.max_context_tokens = max_context_tokens
+        self.max_image_bytes = max_image_bytes      # 上下文中图片（base64）的总字节上限
+        self.image_ttl_turns = image_ttl_turns      # 图片最多保留的用户轮数（含当前轮）
+        self.last_request_stats: Dict[str, Any] = {}
+        self._payload_totals = {"requests": 0, "bytes": 0, "tokens": 0, "images_evicted": 0, "messages_dropped": 0}
         
         # 重复度检测
         self._recent_responses = []  # 存储最近3轮助手回复
@@ -235,12 +286,8 @@ class OmniOfflineClient:
         
         # Prepare user message content
         if has_images:
-            # Switch to vision model permanently for this session
-            # (cannot switch back because image data remains in conversation history)
-            if self.vision_model and self.vision_model != self.model:
-                logger.info(f"🖼️ Temporarily switching to vision model: {self.vision_model} (from {self.model})")
-                self.switch_model(self.vision_model, use_vision_config=True)
-            
+            # 模型切换由 _prepare_context() 根据上下文中是否仍有图片决定
+
             # Multi-modal message: images + text
             content = []
             
@@ -264,11 +311,13 @@ class OmniOfflineClient:
             
             # Clear pending images after using them
             self._pending_images.clear()
+            self._last_pending_image_hash = None
         else:
             # Text-only message
             user_message = HumanMessage(content=text.strip())
         
         self._conversation_history.append(user_message)
+        self._prepare_context()
         
         # Callback for user input
         if self.on_input_transcript:
@@ -419,20 +468,122 @@ class OmniOfflineClient:
             if self.on_response_done:
                 await self.on_response_done()
     
+    def _prepare_context(self) -> None:
+        """
+        每次请求前按预算压缩对话历史，并据此选择模型：
+        1. 超过 image_ttl_turns 轮或超出 max_image_bytes 的旧图片替换为文字说明；
+        2. 估算 token 超出 max_context_tokens 时，从最早的消息开始丢弃（保留系统指令和最新一条消息）；
+        3. 上下文中仍有图片时使用视觉模型，否则切回文本模型。
+        """
+        history = self._conversation_history
+        start = 1 if history and isinstance(history[0], SystemMessage) else 0
+
+        # 1. 图片淘汰（从新到旧）
+        user_turn = 0
+        image_bytes = 0
+        evicted = 0
+        for idx in range(len(history) - 1, start - 1, -1):
+            message = history[idx]
+            if not isinstance(message, HumanMessage):
+                continue
+            user_turn += 1
+            images = _message_images(message)
+            if not images:
+                continue
+            keep = []
+            for part in images:
+                size = _image_part_bytes(part)
+                # 最新一轮的图片总是保留；更早的受轮数和字节预算限制
+                if user_turn == 1 or (user_turn <= self.image_ttl_turns and image_bytes + size <= self.max_image_bytes):
+                    keep.append(part)
+                    image_bytes += size
+            if len(keep) == len(images):
+                continue
+            dropped = len(images) - len(keep)
+            evicted += dropped
+            note = {"type": "text", "text": _EVICTED_IMAGE_NOTE.format(count=dropped)}
+            text_parts = [p for p in message.content if not _is_image_part(p)]
+            if keep:
+                history[idx] = HumanMessage(content=keep + [note] + text_parts)
+            else:
+                history[idx] = HumanMessage(content=f"{note['text']} {_message_text(message)}".strip())
+
+        # 2. token 预算
+        tokens = [_estimate_message_tokens(m) for m in history]
+        total = sum(tokens)
+        drop = 0
+        while total > self.max_context_tokens and start + drop < len(history) - 1:
+            total -= tokens[start + drop]
+            drop += 1
+        # 不以助手消息开头，避免部分 provider 拒绝
+        while start + drop < len(history) - 1 and isinstance(history[start + drop], AIMessage):
+            total -= tokens[start + drop]
+            drop += 1
+        if drop:
+            del history[start:start + drop]
+
+        # 3. 按上下文中是否仍有图片选择模型
+        image_count = sum(len(_message_images(m)) for m in history)
+        if image_count and self.vision_model and self.model != self.vision_model:
+            logger.info(f"🖼️ 上下文中有图片，切换到视觉模型: {self.vision_model} (from {self.model})")
+            self.switch_model(self.vision_model, use_vision_config=True)
+        elif not image_count and self.text_model and self.model != self.text_model:
+            logger.info(f"📝 上下文中已无图片，切回文本模型: {self.text_model} (from {self.model})")
+            self.switch_model(self.text_model)
+
+        # 请求体积统计
+        payload_bytes = sum(len(_message_text(m).encode("utf-8")) for m in history) + image_bytes
+        self.last_request_stats = {
+            "messages": len(history),
+            "tokens": total,
+            "bytes": payload_bytes,
+            "images": image_count,
+            "images_evicted": evicted,
+            "messages_dropped": drop,
+            "model": self.model,
+        }
+        self._payload_totals["requests"] += 1
+        self._payload_totals["bytes"] += payload_bytes
+        self._payload_totals["tokens"] += total
+        self._payload_totals["images_evicted"] += evicted
+        self._payload_totals["messages_dropped"] += drop
+        logger.info(
+            f"📦 文本请求上下文: {len(history)}条消息, 约{total} tokens, {payload_bytes / 1024:.1f}KB, "
+            f"图片{image_count}张 (本次省略{evicted}张, 丢弃{drop}条旧消息), 模型 {self.model}"
+        )
+
+    def get_payload_stats(self) -> Dict[str, Any]:
+        """最近一次请求及本会话累计的上下文体积统计。"""
+        return {"last": dict(self.last_request_stats), "totals": dict(self._payload_totals)}
+
     async def stream_audio(self, audio_chunk: bytes) -> None:
         """Compatibility method - not used in text mode"""
         pass
     
-    async def stream_image(self, image_b64: str) -> None:
+    async def stream_image(self, image_b64: str, frame_hash: Optional[int] = None) -> None:
         """
         Add an image to pending images queue.
         Images will be sent together with the next text message.
+        A frame that is a near-duplicate of the last pending one (by perceptual
+        hash) replaces it instead of being queued again.
         """
         if not image_b64:
             return
         
+        if (
+            frame_hash is not None
+            and self._pending_images
+            and self._last_pending_image_hash is not None
+            and frame_hash_distance(frame_hash, self._last_pending_image_hash) <= SCREEN_FRAME_DEDUP_MAX_DISTANCE
+        ):
+            # 画面未变化：只保留最新一帧
+            self._pending_images[-1] = image_b64
+            self._last_pending_image_hash = frame_hash
+            return
+        
         # Store base64 image
         self._pending_images.append(image_b64)
+        self._last_pending_image_hash = frame_hash
         logger.info(f"Added image to pending queue (total: {len(self._pending_images)})")
     
     def has_pending_images(self) -> bool:
@@ -468,6 +619,7 @@ class OmniOfflineClient:
 
         # 临时注入：instruction 已由调用方用 ======== 格式封装，作为 HumanMessage 发送，
         # 不持久化到 _conversation_history，避免污染长期上下文。
+        self._prepare_context()
         messages_to_send = (
             self._conversation_history
             + [HumanMessage(content=instruction)]
@@ -533,4 +685,5 @@ class OmniOfflineClient:
         self._is_responding = False
         self._conversation_history = []
         self._pending_images.clear()
+        self._last_pending_image_hash = None
         logger.info("OmniOfflineClient closed")
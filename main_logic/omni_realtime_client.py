@@ -10,10 +10,11 @@ from pathlib import Path
 
 from typing import Optional, Callable, Dict, Any, Awaitable
 from enum import Enum
-from config import NATIVE_IMAGE_MIN_INTERVAL, IMAGE_IDLE_RATE_MULTIPLIER
+from config import NATIVE_IMAGE_MIN_INTERVAL, IMAGE_IDLE_RATE_MULTIPLIER, SCREEN_FRAME_DEDUP_MAX_DISTANCE
 from utils.config_manager import get_config_manager
-from utils.audio_processor import AudioProcessor
+from utils.audio_processor import AudioProcessor, AudioDSPWorker
 from utils.frontend_utils import calculate_text_similarity
+from utils.screenshot_utils import frame_hash_distance
 from utils.logger_config import get_module_logger
 from utils.ssl_env_diagnostics import write_ssl_diagnostic
 
@@ -140,6 +141,8 @@ class OmniRealtimeClient:
         on_input_transcript (Callable[[str], Awaitable[None]]):
             Callback for input transcript events.
             Takes in a string and returns an awaitable.
+        on_speech_stopped (Callable[[], Awaitable[None]]):
+            Callback for the server VAD speech_stopped event (user finished speaking).
         on_interrupt (Callable[[], Awaitable[None]]):
             Callback for user interrupt events, should be used to stop audio playback.
         on_output_transcript (Callable[[str, bool], Awaitable[None]]):
@@ -159,6 +162,7 @@ class OmniRealtimeClient:
         on_text_delta: Optional[Callable[[str, bool], Awaitable[None]]] = None,
         on_audio_delta: Optional[Callable[[bytes], Awaitable[None]]] = None,
         on_new_message: Optional[Callable[[], Awaitable[None]]] = None,
+        on_speech_stopped: Optional[Callable[[], Awaitable[None]]] = None,
         on_input_transcript: Optional[Callable[[str], Awaitable[None]]] = None,
         on_output_transcript: Optional[Callable[[str, bool], Awaitable[None]]] = None,
         on_connection_error: Optional[Callable[[str], Awaitable[None]]] = None,
@@ -178,6 +182,7 @@ class OmniRealtimeClient:
         self.on_text_delta = on_text_delta
         self.on_audio_delta = on_audio_delta
         self.on_new_message = on_new_message
+        self.on_speech_stopped = on_speech_stopped
         self.on_input_transcript = on_input_transcript
         self.on_output_transcript = on_output_transcript
         self.turn_detection_mode = turn_detection_mode
@@ -226,6 +231,8 @@ class OmniRealtimeClient:
             noise_reduce_enabled=False,  # RNNoise with auto-reset enabled
             on_silence_reset=self._on_silence_reset  # 静音重置时发送 input_audio_buffer.clear
         )
+        # 每个会话独占一个 DSP 线程，不与默认线程池中的其他阻塞任务争抢
+        self._dsp_worker = AudioDSPWorker(self._audio_processor, name=f"audio-dsp-{id(self):x}")
         
         # 静音重置事件异步队列
         self._silence_reset_pending = False
@@ -250,6 +257,9 @@ class OmniRealtimeClient:
         
         # Native image input rate limiting
         self._last_native_image_time = 0.0  # 上次原生图片输入时间戳
+        # 屏幕帧去重：本轮已发送帧的感知哈希（每轮响应结束后重置，保证每轮至少带一帧画面）
+        self._last_native_image_hash: Optional[int] = None
+        self._dedup_skipped_frames = 0
         
         # Unified VAD for image throttling (priority: server VAD > RNNoise > RMS)
         # All native-image paths use _client_vad_active to adjust send rate
@@ -265,9 +275,6 @@ class OmniRealtimeClient:
         # Image processing lock
         self._image_lock = asyncio.Lock()
         
-        # Audio processing lock to ensure sequential processing in thread pool
-        self._audio_processing_lock = asyncio.Lock()
-        
         # Gemini Live API specific attributes
         self._is_gemini = self._api_type.lower() == 'gemini'
         
@@ -294,19 +301,18 @@ class OmniRealtimeClient:
         """
         Asynchronously process audio chunk using RNNoise in a separate thread.
         This prevents blocking the main event loop during heavy calculation.
+
+        Chunks run on the session's dedicated DSP thread (single-worker FIFO),
+        so ordering is preserved and the default executor is left alone.
         """
         if self._audio_processor is None:
             return audio_chunk
 
-        async with self._audio_processing_lock:
-            # Use run_in_executor to offload heavy processing
-            # None = use default ThreadPoolExecutor
-            loop = asyncio.get_running_loop()
-            return await loop.run_in_executor(
-                None, 
-                self._audio_processor.process_chunk, 
-                audio_chunk
-            )
+        return await self._dsp_worker.process(audio_chunk)
+
+    def get_dsp_stats(self) -> Dict[str, Any]:
+        """DSP queue latency / processing time metrics for this session."""
+        return self._dsp_worker.get_stats()
 
     async def _check_silence_timeout(self):
         """定期检查是否超过静默超时时间，如果是则触发超时回调"""
@@ -704,15 +710,16 @@ class OmniRealtimeClient:
             if "closed" in str(e).lower():
                 self._fatal_error_occurred = True
 
-    async def _analyze_image_with_vision_model(self, image_b64: str) -> str:
+    async def _analyze_image_with_vision_model(self, image_b64: str, frame_hash: Optional[int] = None) -> str:
         """Use VISION_MODEL to analyze image and return description."""
         try:
-            # 使用统一的视觉分析函数
+            # 使用统一的视觉分析函数（画面未变化时复用缓存的描述）
             from utils.screenshot_utils import analyze_image_with_vision_model
             
             description = await analyze_image_with_vision_model(
                 image_b64=image_b64,
-                max_tokens=500
+                max_tokens=500,
+                frame_hash=frame_hash,
             )
             
             if description:
@@ -738,17 +745,29 @@ class OmniRealtimeClient:
                     await self.on_status_message("⚠️ 图片内容被审查系统拦截，请尝试更换图片或内容。")
             return "图片识别发生严重错误！"
     
-    async def stream_image(self, image_b64: str) -> None:
-        """Stream raw image data to the API."""
+    async def stream_image(self, image_b64: str, frame_hash: Optional[int] = None) -> None:
+        """Stream raw image data to the API.
+
+        frame_hash is the perceptual hash from process_screen_frame; frames that are
+        near-duplicates of the last frame sent in this turn are dropped before upload.
+        """
 
         try:
             # Models without native vision (step, free on lanlan.tech) — first frame triggers VISION_MODEL analysis
             if '实时屏幕截图或相机画面正在分析中' in self._image_description and not self._supports_native_image:
-                await self._analyze_image_with_vision_model(image_b64)
+                await self._analyze_image_with_vision_model(image_b64, frame_hash=frame_hash)
                 return
             
             # Rate limiting for native image input (with VAD-based throttling)
             if self._supports_native_image:
+                if (
+                    frame_hash is not None
+                    and self._last_native_image_hash is not None
+                    and frame_hash_distance(frame_hash, self._last_native_image_hash) <= SCREEN_FRAME_DEDUP_MAX_DISTANCE
+                ):
+                    # 画面未变化，跳过上传
+                    self._dedup_skipped_frames += 1
+                    return
                 current_time = time.time()
                 elapsed = current_time - self._last_native_image_time
                 min_interval = NATIVE_IMAGE_MIN_INTERVAL
@@ -758,6 +777,7 @@ class OmniRealtimeClient:
                     # Skip this image frame due to rate limiting
                     return
                 self._last_native_image_time = current_time
+                self._last_native_image_hash = frame_hash
 
             # Gemini uses SDK, not WebSocket events (_audio_in_buffer is not set for Gemini)
             if self._is_gemini:
@@ -828,7 +848,7 @@ class OmniRealtimeClient:
                                 }
                                 logger.info("Sending image description before recognition.")
                                 await self.send_event(text_event)
-                                await self._analyze_image_with_vision_model(image_b64)
+                                await self._analyze_image_with_vision_model(image_b64, frame_hash=frame_hash)
                         elif not self._image_sent_this_turn:
                             self._image_sent_this_turn = True
                             text_event = {
@@ -1057,6 +1077,10 @@ class OmniRealtimeClient:
                     self._output_transcript_buffer = ""
                     self._image_recognized_this_turn = False
                     self._image_sent_this_turn = False
+                    self._last_native_image_hash = None
+                    if self._dedup_skipped_frames:
+                        logger.debug(f"屏幕帧去重: 本轮跳过 {self._dedup_skipped_frames} 张重复画面")
+                        self._dedup_skipped_frames = 0
                     if self.on_response_done:
                         await self.on_response_done()
                 elif event_type == "response.created":
@@ -1083,6 +1107,8 @@ class OmniRealtimeClient:
                         await self.handle_interruption()
                 elif event_type == "input_audio_buffer.speech_stopped":
                     logger.info("Speech ended")
+                    if self.on_speech_stopped:
+                        await self.on_speech_stopped()
                     if self.on_new_message:
                         await self.on_new_message()
                     self._audio_in_buffer = False
@@ -1179,6 +1205,18 @@ class OmniRealtimeClient:
         if self._audio_processor is not None:
             self._audio_processor.reset()
 
+        # 停止 DSP 线程并输出本会话的队列延迟统计
+        stats = self._dsp_worker.get_stats()
+        if stats["processed"]:
+            logger.info(
+                f"🎛️ DSP stats: processed={stats['processed']}, "
+                f"queue_wait avg={stats['queue_wait_avg_ms']:.2f}ms max={stats['queue_wait_max_ms']:.2f}ms, "
+                f"process avg={stats['process_avg_ms']:.2f}ms max={stats['process_max_ms']:.2f}ms, "
+                f"max_pending={stats['max_pending']}"
+            )
+        self._dsp_worker.shutdown()
+        self._dsp_worker.reset_stats()
+
         # Gemini uses different cleanup
         if self._is_gemini:
             await self._close_gemini()
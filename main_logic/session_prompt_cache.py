@@ -0,0 +1,131 @@
+"""
+会话 instructions 的按角色缓存（start_session / 热切换预热共用）
+
+每次 start_session 和 _background_prepare_pending_session 都会重新
+get_character_data()（读取并解析 characters.json）、请求 memory_server 的
+/new_dialog 并重新拼接 instructions，即使距离上一个会话只有几秒、期间什么都没变。
+
+这里按角色缓存这两部分准备数据，失效条件基于真实的变化而不是时间：
+- 角色配置：characters.json 的 (mtime_ns, size) 与全局语言
+- 记忆上下文：recent_<角色>.json（/cache、/process、/renew 及记忆整理都会写回）、
+  settings_<角色>.json、characters.json 的文件签名，以及全局语言与用户语言
+
+检查签名只需要几次 os.stat，常见情况下热切换不再有任何文件解析或 HTTP 请求。
+记忆上下文中带有生成时的时间戳，所以额外设置了 TTL，避免时间信息过旧。
+
+关于 /new_dialog 中断记忆整理任务的副作用：整理任务只会由 /process 或 /renew
+触发，而二者在启动整理前都会先写回 recent 文件，因此签名必然变化、下一次一定
+会重新请求 /new_dialog，命中缓存时不存在需要中断的整理任务。
+"""
+
+import copy
+import os
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from utils.config_manager import get_config_manager
+from utils.language_utils import get_global_language_full
+from utils.logger_config import get_module_logger
+
+logger = get_module_logger(__name__, "Main")
+
+# 记忆上下文中包含生成时间，超过该时长即使文件未变化也重新获取
+MEMORY_CONTEXT_TTL_SECONDS = 300
+
+
+def _file_signature(path) -> Optional[Tuple[int, int]]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+class SessionPromptCache:
+    """按角色缓存会话准备阶段的角色配置与记忆上下文。"""
+
+    def __init__(self, config_manager=None):
+        self._config_manager = config_manager or get_config_manager()
+        self._lock = threading.Lock()
+        self._character_data: Optional[tuple] = None
+        self._character_key = None
+        # lanlan_name -> (key, memory_text, created_at)
+        self._memory_context: Dict[str, Tuple[tuple, str, float]] = {}
+        self._stats = {"character_hits": 0, "character_misses": 0, "memory_hits": 0, "memory_misses": 0}
+
+    def _characters_path(self):
+        return self._config_manager.get_config_path('characters.json')
+
+    def _character_key_now(self) -> tuple:
+        return _file_signature(self._characters_path()), get_global_language_full()
+
+    def get_character_data(self) -> tuple:
+        """等价于 config_manager.get_character_data()，characters.json 未变化时直接返回缓存副本。"""
+        key = self._character_key_now()
+        with self._lock:
+            if self._character_data is not None and key == self._character_key and key[0] is not None:
+                self._stats["character_hits"] += 1
+                return copy.deepcopy(self._character_data)
+        data = self._config_manager.get_character_data()
+        # get_character_data 可能修正并写回配置，重新取一次签名
+        key = self._character_key_now()
+        with self._lock:
+            self._stats["character_misses"] += 1
+            self._character_data = copy.deepcopy(data)
+            self._character_key = key
+        return data
+
+    def memory_context_key(self, lanlan_name: str, user_language: str) -> tuple:
+        memory_dir = self._config_manager.memory_dir
+        return (
+            _file_signature(os.path.join(memory_dir, f'recent_{lanlan_name}.json')),
+            _file_signature(os.path.join(memory_dir, f'settings_{lanlan_name}.json')),
+            _file_signature(self._characters_path()),
+            get_global_language_full(),
+            user_language,
+        )
+
+    def get_memory_context(self, lanlan_name: str, key: tuple) -> Optional[str]:
+        with self._lock:
+            entry = self._memory_context.get(lanlan_name)
+            if entry is not None:
+                cached_key, text, created_at = entry
+                if cached_key == key and time.monotonic() - created_at < MEMORY_CONTEXT_TTL_SECONDS:
+                    self._stats["memory_hits"] += 1
+                    return text
+                del self._memory_context[lanlan_name]
+            self._stats["memory_misses"] += 1
+        return None
+
+    def put_memory_context(self, lanlan_name: str, key: tuple, text: str) -> None:
+        with self._lock:
+            self._memory_context[lanlan_name] = (key, text, time.monotonic())
+
+    def invalidate(self, lanlan_name: Optional[str] = None) -> None:
+        """显式失效（lanlan_name 为空时清空全部）。"""
+        with self._lock:
+            if lanlan_name is None:
+                self._memory_context.clear()
+                self._character_data = None
+                self._character_key = None
+            else:
+                self._memory_context.pop(lanlan_name, None)
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return dict(self._stats)
+
+
+_session_prompt_cache: Optional[SessionPromptCache] = None
+_session_prompt_cache_lock = threading.Lock()
+
+
+def get_session_prompt_cache() -> SessionPromptCache:
+    """获取进程级会话 instructions 缓存单例。"""
+    global _session_prompt_cache
+    if _session_prompt_cache is None:
+        with _session_prompt_cache_lock:
+            if _session_prompt_cache is None:
+                _session_prompt_cache = SessionPromptCache()
+    return _session_prompt_cache
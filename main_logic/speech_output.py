@@ -0,0 +1,337 @@
+"""
+前端语音下行通道：按客户端协商的格式编码，并在延迟上限内合并小块
+
+以前除 cosyvoice_vc 外，所有 TTS worker 和原生 realtime 音频都以 48kHz PCM16
+直接下发（约 768kbit/s/听众），而且每个小 chunk 都要发一次 JSON 头 + 一帧二进制。
+这里为每个会话维护一个 SpeechOutputStream：
+
+- 格式协商：前端在 start_session 中携带 ``audio_formats``，双方都支持
+  ``ogg_opus`` 时在服务端把 PCM 编码为 OGG/Opus（前端已内置 Opus 解码器），
+  否则保持 PCM16，旧客户端不受影响。
+- 合包：同一 speech_id 的小块先缓冲，攒够 max_chunk_ms 或最早的数据等待
+  超过 max_delay_ms 时一次性发送，减少帧数的同时限制额外延迟。
+- 每个 speech_id 对应一条独立的 OGG 逻辑流，打断/切换时丢弃或收尾。
+
+Opus 编码依赖可选的 PyAV（``av``，自带 libopus）；未安装时自动回退到 PCM16。
+"""
+
+import asyncio
+import time
+from typing import Awaitable, Callable, Iterable, List, Optional
+
+import numpy as np
+
+from utils.logger_config import get_module_logger
+
+try:
+    import av
+except ImportError:  # 可选依赖：未安装时只提供 PCM16
+    av = None
+
+logger = get_module_logger(__name__, "Main")
+
+AUDIO_FORMAT_PCM16 = "pcm16"
+AUDIO_FORMAT_OGG_OPUS = "ogg_opus"
+
+SAMPLE_RATE = 48000
+BYTES_PER_MS = SAMPLE_RATE * 2 // 1000  # 48kHz 单声道 PCM16
+
+# 服务端偏好顺序
+_FORMAT_PREFERENCE = (AUDIO_FORMAT_OGG_OPUS, AUDIO_FORMAT_PCM16)
+
+
+def opus_encoding_available() -> bool:
+    """当前环境能否在服务端编码 OGG/Opus。"""
+    if av is None:
+        return False
+    try:
+        av.codec.Codec("libopus", "w")
+        return True
+    except Exception:
+        return False
+
+
+def negotiate_audio_format(client_formats: Optional[Iterable[str]]) -> str:
+    """按服务端偏好选出客户端也支持的下行格式；客户端未声明时使用 PCM16。"""
+    offered = set(client_formats or ())
+    for fmt in _FORMAT_PREFERENCE:
+        if fmt not in offered:
+            continue
+        if fmt == AUDIO_FORMAT_OGG_OPUS and not opus_encoding_available():
+            continue
+        return fmt
+    return AUDIO_FORMAT_PCM16
+
+
+class _ByteSink:
+    """供 PyAV 写入的最小 file-like 对象（不可 seek，OGG 封装只顺序写）。"""
+
+    def __init__(self):
+        self._parts: List[bytes] = []
+
+    def write(self, data) -> int:
+        self._parts.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def take(self) -> bytes:
+        data = b"".join(self._parts)
+        self._parts.clear()
+        return data
+
+
+class OggOpusStreamEncoder:
+    """
+    把 48kHz 单声道 PCM16 增量编码为 OGG/Opus 页，每个实例对应一条 OGG 逻辑流。
+
+    encode() 只编码凑满 20ms 的帧；pad() 用静音补齐剩余样本并立即输出，
+    finish() 冲刷编码器并写入流结束页。返回值都是完整的 OGG 页。
+    """
+
+    FRAME_SAMPLES = 960  # 20ms @ 48kHz
+
+    def __init__(self, bitrate: int = 32000):
+        if av is None:
+            raise RuntimeError("PyAV 未安装，无法编码 Opus")
+        self._sink = _ByteSink()
+        # page_duration=20ms + flush_packets：每个 Opus 包立即成页写出，不在封装层积攒延迟
+        self._container = av.open(
+            self._sink, mode="w", format="ogg",
+            container_options={"page_duration": "20000", "flush_packets": "1"},
+        )
+        self._stream = self._container.add_stream("libopus", rate=SAMPLE_RATE)
+        self._stream.bit_rate = bitrate
+        try:
+            self._stream.layout = "mono"
+        except AttributeError:
+            self._stream.channels = 1
+        self._pending = bytearray()
+        self._pts = 0
+        self._closed = False
+
+    def encode(self, pcm: bytes) -> bytes:
+        self._pending.extend(pcm)
+        frame_bytes = self.FRAME_SAMPLES * 2
+        usable = len(self._pending) - len(self._pending) % frame_bytes
+        for offset in range(0, usable, frame_bytes):
+            self._encode_frame(bytes(self._pending[offset:offset + frame_bytes]))
+        del self._pending[:usable]
+        return self._sink.take()
+
+    def pad(self) -> bytes:
+        """用静音把剩余不足一帧的样本补齐后编码（回合末尾的短暂停顿时调用）。"""
+        if self._pending:
+            frame_bytes = self.FRAME_SAMPLES * 2
+            self._pending.extend(b"\x00" * (frame_bytes - len(self._pending)))
+            self._encode_frame(bytes(self._pending))
+            self._pending.clear()
+        return self._sink.take()
+
+    def finish(self) -> bytes:
+        if self._closed:
+            return b""
+        data = self.pad()
+        try:
+            for packet in self._stream.encode(None):
+                self._container.mux(packet)
+            self._container.close()
+        finally:
+            self._closed = True
+        return data + self._sink.take()
+
+    def _encode_frame(self, frame_pcm: bytes) -> None:
+        samples = np.frombuffer(frame_pcm, dtype=np.int16).reshape(1, -1)
+        frame = av.AudioFrame.from_ndarray(samples, format="s16", layout="mono")
+        frame.sample_rate = SAMPLE_RATE
+        frame.pts = self._pts
+        self._pts += samples.shape[1]
+        for packet in self._stream.encode(frame):
+            self._container.mux(packet)
+
+
+SendFn = Callable[[Optional[str], bytes, str], Awaitable[None]]
+
+
+class SpeechOutputStream:
+    """
+    单个前端连接的语音下行通道。
+
+    Args:
+        send_fn: 实际发送一帧的协程 ``send_fn(speech_id, payload, audio_format)``
+        audio_format: 协商后的下行格式
+        max_delay_ms: 合包带来的额外延迟上限
+        max_chunk_ms: 单帧最多包含的音频时长
+        idle_pad_ms: Opus 流中音频停顿超过此时长时补齐并发出尾帧
+    """
+
+    def __init__(
+        self,
+        send_fn: SendFn,
+        audio_format: str = AUDIO_FORMAT_PCM16,
+        max_delay_ms: int = 40,
+        max_chunk_ms: int = 200,
+        idle_pad_ms: int = 120,
+    ):
+        self._send_fn = send_fn
+        self.audio_format = audio_format
+        self.max_delay_ms = max_delay_ms
+        self.max_chunk_ms = max_chunk_ms
+        self.idle_pad_ms = idle_pad_ms
+        self._speech_id: Optional[str] = None
+        self._buffer = bytearray()
+        self._buffer_started = 0.0
+        self._encoder: Optional[OggOpusStreamEncoder] = None
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._pad_handle: Optional[asyncio.TimerHandle] = None
+        self._send_lock = asyncio.Lock()
+        self.reset_stats()
+
+    # ---------- 对外接口 ----------
+
+    def set_format(self, audio_format: str) -> None:
+        if audio_format != self.audio_format:
+            logger.info(f"🔈 语音下行格式: {self.audio_format} -> {audio_format}")
+        self.discard()
+        self.audio_format = audio_format
+
+    async def push_pcm(self, speech_id: Optional[str], pcm: bytes) -> None:
+        """追加一段 48kHz PCM16；凑够一帧或到达延迟上限时发送。"""
+        if not pcm:
+            return
+        if speech_id != self._speech_id:
+            await self._end_speech()
+            self._speech_id = speech_id
+        if not self._buffer:
+            self._buffer_started = time.monotonic()
+        self._buffer.extend(pcm)
+        self._stats["pcm_bytes_in"] += len(pcm)
+        self._cancel_pad()
+        if len(self._buffer) >= self.max_chunk_ms * BYTES_PER_MS:
+            await self.flush()
+        elif self._flush_handle is None:
+            loop = asyncio.get_running_loop()
+            self._flush_handle = loop.call_later(self.max_delay_ms / 1000, self._schedule_flush)
+
+    async def push_encoded(self, speech_id: Optional[str], payload: bytes, audio_format: str) -> None:
+        """直接下发 provider 已编码好的音频（如 cosyvoice_vc 的 OGG/Opus）。"""
+        if speech_id != self._speech_id:
+            await self._end_speech()
+            self._speech_id = speech_id
+        else:
+            await self.flush()
+        await self._send(speech_id, payload, audio_format)
+
+    async def flush(self) -> None:
+        """立即发送已缓冲的音频。"""
+        self._cancel_flush()
+        if not self._buffer:
+            return
+        pcm = bytes(self._buffer)
+        self._buffer.clear()
+        self._stats["max_added_delay_ms"] = max(
+            self._stats["max_added_delay_ms"], (time.monotonic() - self._buffer_started) * 1000
+        )
+        if self.audio_format == AUDIO_FORMAT_OGG_OPUS:
+            payload = self._encode(pcm)
+            if payload is not None:
+                self._cancel_pad()
+                loop = asyncio.get_running_loop()
+                self._pad_handle = loop.call_later(self.idle_pad_ms / 1000, self._schedule_pad)
+                if payload:
+                    await self._send(self._speech_id, payload, AUDIO_FORMAT_OGG_OPUS)
+                return
+        await self._send(self._speech_id, pcm, AUDIO_FORMAT_PCM16)
+
+    def discard(self) -> None:
+        """打断时丢弃未发送的音频和当前编码流（不再发送尾页）。"""
+        self._cancel_flush()
+        self._cancel_pad()
+        self._buffer.clear()
+        self._encoder = None
+        self._speech_id = None
+
+    async def close(self) -> None:
+        await self._end_speech()
+
+    def reset_stats(self) -> None:
+        self._stats = {
+            "pcm_bytes_in": 0,
+            "bytes_out": 0,
+            "frames_out": 0,
+            "max_added_delay_ms": 0.0,
+        }
+
+    def get_stats(self) -> dict:
+        audio_seconds = self._stats["pcm_bytes_in"] / (SAMPLE_RATE * 2)
+        return {
+            **self._stats,
+            "format": self.audio_format,
+            "audio_seconds": audio_seconds,
+            "kbps": (self._stats["bytes_out"] * 8 / 1000 / audio_seconds) if audio_seconds else 0.0,
+            "frames_per_audio_second": (self._stats["frames_out"] / audio_seconds) if audio_seconds else 0.0,
+        }
+
+    # ---------- 内部实现 ----------
+
+    def _encode(self, pcm: bytes) -> Optional[bytes]:
+        try:
+            if self._encoder is None:
+                self._encoder = OggOpusStreamEncoder()
+            return self._encoder.encode(pcm)
+        except Exception as e:
+            # 编码失败时本连接回退到 PCM16，不影响播放
+            logger.warning(f"⚠️ Opus 编码失败，回退到 PCM16: {e}")
+            self._encoder = None
+            self.audio_format = AUDIO_FORMAT_PCM16
+            return None
+
+    async def _end_speech(self) -> None:
+        """当前 speech_id 结束：发送剩余音频，Opus 流写入结束页。"""
+        await self.flush()
+        self._cancel_pad()
+        encoder, self._encoder = self._encoder, None
+        if encoder is not None:
+            try:
+                tail = encoder.finish()
+            except Exception as e:
+                logger.warning(f"⚠️ Opus 流收尾失败: {e}")
+                tail = b""
+            if tail:
+                await self._send(self._speech_id, tail, AUDIO_FORMAT_OGG_OPUS)
+
+    async def _pad_tail(self) -> None:
+        self._pad_handle = None
+        if self._encoder is None or self._buffer:
+            return
+        try:
+            payload = self._encoder.pad()
+        except Exception as e:
+            logger.warning(f"⚠️ Opus 尾帧编码失败: {e}")
+            return
+        if payload:
+            await self._send(self._speech_id, payload, AUDIO_FORMAT_OGG_OPUS)
+
+    async def _send(self, speech_id: Optional[str], payload: bytes, audio_format: str) -> None:
+        async with self._send_lock:
+            await self._send_fn(speech_id, payload, audio_format)
+        self._stats["bytes_out"] += len(payload)
+        self._stats["frames_out"] += 1
+
+    def _schedule_flush(self) -> None:
+        self._flush_handle = None
+        asyncio.ensure_future(self.flush())
+
+    def _schedule_pad(self) -> None:
+        asyncio.ensure_future(self._pad_tail())
+
+    def _cancel_flush(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+    def _cancel_pad(self) -> None:
+        if self._pad_handle is not None:
+            self._pad_handle.cancel()
+            self._pad_handle = None
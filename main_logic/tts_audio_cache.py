@@ -0,0 +1,195 @@
+"""
+TTS 合成音频的磁盘 LRU 缓存
+
+伴侣角色会反复说很多短句（问候、应答、主动搭话开场白等），以前每次都要
+重新走一遍 TTS provider。这里按 (provider, voice_id, 规范化文本, 输出格式)
+缓存整句合成结果，命中时直接回放缓存音频，完全跳过 provider。
+
+存储使用标准库 sqlite3（单文件、原子写入、跨进程安全），按 last_access
+做 LRU 淘汰，总大小受 max_bytes 限制。只缓存短句（max_text_chars 以内），
+长回复几乎不会重复，没有缓存价值。
+
+由 tts_client 中的缓存包装 worker 使用，所有 get_tts_worker 返回的 worker 共享。
+"""
+
+import hashlib
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional, Set, Tuple
+
+from utils.config_manager import get_config_manager
+from utils.logger_config import get_module_logger
+
+logger = get_module_logger(__name__, "Main")
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024  # 64MB
+DEFAULT_MAX_TEXT_CHARS = 40
+
+
+def normalize_tts_text(text: str) -> str:
+    """缓存键用的文本规范化：去掉首尾空白并合并连续空白。"""
+    return " ".join((text or "").split())
+
+
+class TTSAudioCache:
+    """线程安全的磁盘 LRU 音频缓存。"""
+
+    def __init__(
+        self,
+        db_path: Path,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        max_text_chars: int = DEFAULT_MAX_TEXT_CHARS,
+    ):
+        self.db_path = Path(db_path)
+        self.max_bytes = max_bytes
+        self.max_text_chars = max_text_chars
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._total_bytes = 0
+        # (provider, voice_id, fmt) -> 已缓存的规范化文本，用于前缀判断（是否值得等待整句）
+        self._texts: Dict[Tuple[str, str, str], Set[str]] = {}
+        self._stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0, "errors": 0}
+        self._open()
+
+    def _open(self) -> None:
+        try:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.db_path), check_same_thread=False, timeout=5.0)
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS audio ("
+                " key TEXT PRIMARY KEY, provider TEXT, voice TEXT, fmt TEXT, text TEXT,"
+                " data BLOB, size INTEGER, last_access REAL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_audio_last_access ON audio(last_access)")
+            conn.commit()
+            for provider, voice, fmt, text, size in conn.execute(
+                "SELECT provider, voice, fmt, text, size FROM audio"
+            ):
+                self._texts.setdefault((provider, voice, fmt), set()).add(text)
+                self._total_bytes += size or 0
+            self._conn = conn
+            logger.info(
+                f"🗄️ TTS音频缓存已加载: {sum(len(v) for v in self._texts.values())} 条, "
+                f"{self._total_bytes / 1024 / 1024:.1f}MB ({self.db_path})"
+            )
+        except Exception as e:
+            logger.warning(f"⚠️ TTS音频缓存不可用，将直接合成: {e}")
+            self._conn = None
+
+    @property
+    def enabled(self) -> bool:
+        return self._conn is not None
+
+    @staticmethod
+    def make_key(provider: str, voice_id: str, text: str, fmt: str) -> str:
+        raw = "\x1f".join((provider, voice_id or "", normalize_tts_text(text), fmt))
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def is_cacheable(self, text: str) -> bool:
+        normalized = normalize_tts_text(text)
+        return 0 < len(normalized) <= self.max_text_chars
+
+    def has_prefix(self, provider: str, voice_id: str, fmt: str, text: str) -> bool:
+        """是否存在以 text 为前缀的已缓存句子（用于决定是否短暂等待整句文本）。"""
+        normalized = normalize_tts_text(text)
+        if not normalized:
+            return False
+        # 集合由各会话的 TTS 线程共享，put() 可能同时写入
+        with self._lock:
+            texts = self._texts.get((provider, voice_id or "", fmt))
+            if not texts:
+                return False
+            return any(t.startswith(normalized) for t in texts)
+
+    def get(self, provider: str, voice_id: str, text: str, fmt: str) -> Optional[bytes]:
+        if self._conn is None:
+            return None
+        key = self.make_key(provider, voice_id, text, fmt)
+        with self._lock:
+            try:
+                row = self._conn.execute("SELECT data FROM audio WHERE key = ?", (key,)).fetchone()
+                if row is None:
+                    self._stats["misses"] += 1
+                    return None
+                self._conn.execute("UPDATE audio SET last_access = ? WHERE key = ?", (time.time(), key))
+                self._conn.commit()
+                self._stats["hits"] += 1
+                return bytes(row[0])
+            except Exception as e:
+                self._stats["errors"] += 1
+                logger.warning(f"⚠️ 读取TTS音频缓存失败: {e}")
+                return None
+
+    def note_miss(self) -> None:
+        """可缓存的短句未经 get() 查找就直接合成时，也计入未命中。"""
+        self._stats["misses"] += 1
+
+    def put(self, provider: str, voice_id: str, text: str, fmt: str, data: bytes) -> None:
+        if self._conn is None or not data or not self.is_cacheable(text):
+            return
+        if len(data) > self.max_bytes // 4:
+            return
+        normalized = normalize_tts_text(text)
+        key = self.make_key(provider, voice_id, normalized, fmt)
+        with self._lock:
+            try:
+                old = self._conn.execute("SELECT size FROM audio WHERE key = ?", (key,)).fetchone()
+                if old:
+                    self._total_bytes -= old[0] or 0
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO audio (key, provider, voice, fmt, text, data, size, last_access)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (key, provider, voice_id or "", fmt, normalized, sqlite3.Binary(data), len(data), time.time()),
+                )
+                self._total_bytes += len(data)
+                self._texts.setdefault((provider, voice_id or "", fmt), set()).add(normalized)
+                self._stats["stores"] += 1
+                self._evict_locked()
+                self._conn.commit()
+            except Exception as e:
+                self._stats["errors"] += 1
+                logger.warning(f"⚠️ 写入TTS音频缓存失败: {e}")
+
+    def _evict_locked(self) -> None:
+        while self._total_bytes > self.max_bytes:
+            row = self._conn.execute(
+                "SELECT key, provider, voice, fmt, text, size FROM audio ORDER BY last_access LIMIT 1"
+            ).fetchone()
+            if row is None:
+                self._total_bytes = 0
+                return
+            key, provider, voice, fmt, text, size = row
+            self._conn.execute("DELETE FROM audio WHERE key = ?", (key,))
+            self._total_bytes -= size or 0
+            texts = self._texts.get((provider, voice, fmt))
+            if texts is not None:
+                texts.discard(text)
+            self._stats["evictions"] += 1
+
+    def get_stats(self) -> dict:
+        lookups = self._stats["hits"] + self._stats["misses"]
+        return {
+            **self._stats,
+            "hit_rate": (self._stats["hits"] / lookups) if lookups else 0.0,
+            "entries": sum(len(v) for v in self._texts.values()),
+            "bytes": self._total_bytes,
+            "max_bytes": self.max_bytes,
+            "enabled": self.enabled,
+        }
+
+
+_tts_audio_cache: Optional[TTSAudioCache] = None
+_tts_audio_cache_lock = threading.Lock()
+
+
+def get_tts_audio_cache() -> TTSAudioCache:
+    """获取进程级 TTS 音频缓存单例（位于 <app_docs_dir>/cache/tts_audio.sqlite3）。"""
+    global _tts_audio_cache
+    if _tts_audio_cache is None:
+        with _tts_audio_cache_lock:
+            if _tts_audio_cache is None:
+                cache_dir = Path(get_config_manager().app_docs_dir) / "cache"
+                _tts_audio_cache = TTSAudioCache(cache_dir / "tts_audio.sqlite3")
+    return _tts_audio_cache
@@ -3,17 +3,19 @@ TTS Helper模块
 负责处理TTS语音合成，支持自定义音色（阿里云CosyVoice）和默认音色（各core_api的原生TTS）
 """
 import numpy as np
-import soxr
 import time
 import json
 import base64
 import websockets
-import io
-import wave
 import aiohttp
 import asyncio
+import queue
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from functools import partial
 from config import GSV_VOICE_PREFIX
+from main_logic.tts_pcm import PCMResampler, WavChunkDecoder, resample_pcm
 from utils.config_manager import get_config_manager
 from utils.logger_config import get_module_logger
 
@@ -76,35 +78,101 @@ async def get_custom_tts_voices(base_url: str, provider: str = 'gptsovits'):
     return voices
 
 
-def _resample_audio(audio_int16: np.ndarray, src_rate: int, dst_rate: int, 
-                    resampler: 'soxr.ResampleStream | None' = None) -> bytes:
-    """使用 soxr 进行高质量音频重采样
-    
-    Args:
-        audio_int16: int16 格式的音频 numpy 数组
-        src_rate: 源采样率
-        dst_rate: 目标采样率
-        resampler: 可选的流式重采样器，用于维护 chunk 间状态
-        
-    Returns:
-        重采样后的 bytes
+# 发送到 request_queue 的 (TTS_SHUTDOWN_SIGNAL, None) 让 worker 释放连接并退出线程
+# （(None, None) 只表示当前回合文本结束，worker 会继续等待下一回合）
+TTS_SHUTDOWN_SIGNAL = "__shutdown__"
+
+
+class TTSResponseQueue(queue.Queue):
+    """TTS worker -> 事件循环 的响应队列。
+
+    worker 线程仍然通过普通的 ``put()`` 投递数据；每次投递会用
+    ``call_soon_threadsafe`` 唤醒绑定的事件循环，消费者通过 ``await get_async()``
+    等待，不再需要 10ms 轮询，空闲会话也不会产生任何唤醒。
     """
-    if src_rate == dst_rate:
-        return audio_int16.tobytes()
-    
-    # 转换为 float32 进行高质量重采样
-    audio_float = audio_int16.astype(np.float32) / 32768.0
-    
-    if resampler is not None:
-        # 使用流式重采样器（维护 chunk 边界状态）
-        resampled_float = resampler.resample_chunk(audio_float)
-    else:
-        # 无状态重采样（不推荐用于流式音频）
-        resampled_float = soxr.resample(audio_float, src_rate, dst_rate, quality='HQ')
-    
-    # 转回 int16
-    resampled_int16 = (resampled_float * 32768.0).clip(-32768, 32767).astype(np.int16)
-    return resampled_int16.tobytes()
+
+    def __init__(self, maxsize: int = 0):
+        super().__init__(maxsize)
+        self._loop = None
+        self._data_event = None
+
+    def _bind_loop(self) -> asyncio.Event:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._data_event is None:
+            self._loop = loop
+            self._data_event = asyncio.Event()
+        return self._data_event
+
+    def put(self, item, block=True, timeout=None):
+        super().put(item, block, timeout)
+        loop, event = self._loop, self._data_event
+        if loop is None or event is None:
+            return
+        try:
+            loop.call_soon_threadsafe(event.set)
+        except RuntimeError:
+            # 事件循环已关闭（会话结束后 worker 仍在退出中）
+            pass
+
+    async def get_async(self):
+        """在事件循环中等待下一条数据，数据到达即返回。"""
+        while True:
+            try:
+                return self.get_nowait()
+            except queue.Empty:
+                pass
+            event = self._bind_loop()
+            event.clear()
+            # clear 之后再检查一次，避免与 put() 之间的竞态丢失唤醒
+            try:
+                return self.get_nowait()
+            except queue.Empty:
+                await event.wait()
+
+
+class _SentenceSegmenter:
+    """把流式文本增量切分成句子，供 HTTP 类 TTS（openai / gemini）逐句并发合成。
+
+    - 句末标点（。！？!?；;… 换行，以及后接空白的英文句点）处切分；
+    - 不足 min_chars 的短句与下一句合并，避免过碎的请求；
+    - 超过 max_chars 仍无句末标点时在逗号/空格处强制切分，保证首句尽早合成。
+    """
+
+    _BOUNDARY = re.compile(r'[。！？!?；;…\n]+|(?<=[^\d\s])\.+(?=\s)')
+    _SOFT_BREAKS = '，,、：: '
+
+    def __init__(self, min_chars: int = 6, max_chars: int = 120):
+        self.min_chars = min_chars
+        self.max_chars = max_chars
+        self._buffer = ""
+
+    def feed(self, text: str) -> list:
+        """追加文本，返回已完整的句子列表。"""
+        if not text:
+            return []
+        self._buffer += text
+        sentences = []
+        start = 0
+        for m in self._BOUNDARY.finditer(self._buffer):
+            if len(self._buffer[start:m.end()].strip()) >= self.min_chars:
+                sentences.append(self._buffer[start:m.end()])
+                start = m.end()
+        self._buffer = self._buffer[start:]
+        while len(self._buffer) > self.max_chars:
+            cut = max(self._buffer.rfind(ch, 0, self.max_chars) for ch in self._SOFT_BREAKS)
+            cut = cut + 1 if cut > 0 else self.max_chars
+            sentences.append(self._buffer[:cut])
+            self._buffer = self._buffer[cut:]
+        return [x.strip() for x in sentences if x.strip()]
+
+    def flush(self) -> list:
+        """回合结束：返回剩余文本。"""
+        rest = self._buffer.strip()
+        self._buffer = ""
+        return [rest] if rest else []
+
+    def reset(self) -> None:
+        self._buffer = ""
 
 
 def _enqueue_error(response_queue, error_value):
@@ -194,7 +262,9 @@ def step_realtime_tts_worker(request_queue, response_queue, audio_api_key, voice
         session_ready = asyncio.Event()
         response_done = asyncio.Event()  # 用于标记当前响应是否完成
         # 流式重采样器（24kHz→48kHz）- 维护 chunk 边界状态
-        resampler = soxr.ResampleStream(24000, 48000, 1, dtype='float32')
+        resampler = PCMResampler(24000)
+        # 每个增量都是完整 WAV，header 只在格式变化时重新解析
+        wav_decoder = WavChunkDecoder("StepFun")
         
         try:
             # 连接WebSocket
@@ -289,16 +359,10 @@ def step_realtime_tts_worker(request_queue, response_queue, audio_api_key, voice
                                 audio_b64 = event.get("data", {}).get("audio", "")
                                 if audio_b64:
                                     audio_bytes = base64.b64decode(audio_b64)
-                                    # 使用 wave 模块读取 WAV 数据
-                                    with io.BytesIO(audio_bytes) as wav_io:
-                                        with wave.open(wav_io, 'rb') as wav_file:
-                                            # 读取音频数据
-                                            pcm_data = wav_file.readframes(wav_file.getnframes())
-                                    
-                                    # 转换为 numpy 数组
-                                    audio_array = np.frombuffer(pcm_data, dtype=np.int16)
+                                    # header 每个流只完整解析一次，之后直接取 data 区视图
+                                    pcm_data = wav_decoder.decode(audio_bytes)
                                     # 使用流式重采样器 24000Hz -> 48000Hz
-                                    response_queue.put(_resample_audio(audio_array, 24000, 48000, resampler))
+                                    response_queue.put(resampler.process(pcm_data))
                             except Exception as e:
                                 logger.error(f"处理音频数据时出错: {e}")
                         elif event_type in ["tts.response.done", "tts.response.audio.done"]:
@@ -320,6 +384,9 @@ def step_realtime_tts_worker(request_queue, response_queue, audio_api_key, voice
                 except Exception:
                     break
 
+                if sid == TTS_SHUTDOWN_SIGNAL:
+                    break
+
                 if sid == "__interrupt__":
                     sid = None
                 
@@ -434,16 +501,10 @@ def step_realtime_tts_worker(request_queue, response_queue, audio_api_key, voice
                                             audio_b64 = event.get("data", {}).get("audio", "")
                                             if audio_b64:
                                                 audio_bytes = base64.b64decode(audio_b64)
-                                                # 使用 wave 模块读取 WAV 数据
-                                                with io.BytesIO(audio_bytes) as wav_io:
-                                                    with wave.open(wav_io, 'rb') as wav_file:
-                                                        # 读取音频数据
-                                                        pcm_data = wav_file.readframes(wav_file.getnframes())
-                                                
-                                                # 转换为 numpy 数组
-                                                audio_array = np.frombuffer(pcm_data, dtype=np.int16)
+                                                # header 每个流只完整解析一次，之后直接取 data 区视图
+                                                pcm_data = wav_decoder.decode(audio_bytes)
                                                 # 使用流式重采样器 24000Hz -> 48000Hz
-                                                response_queue.put(_resample_audio(audio_array, 24000, 48000, resampler))
+                                                response_queue.put(resampler.process(pcm_data))
                                         except Exception as e:
                                             logger.error(f"处理音频数据时出错: {e}")
                                     elif event_type in ["tts.response.done", "tts.response.audio.done"]:
@@ -536,7 +597,7 @@ def qwen_realtime_tts_worker(request_queue, response_queue, audio_api_key, voice
         session_ready = asyncio.Event()
         response_done = asyncio.Event()  # 用于标记当前响应是否完成
         # 流式重采样器（24kHz→48kHz）- 维护 chunk 边界状态
-        resampler = soxr.ResampleStream(24000, 48000, 1, dtype='float32')
+        resampler = PCMResampler(24000)
         
         try:
             # 连接WebSocket
@@ -611,9 +672,8 @@ def qwen_realtime_tts_worker(request_queue, response_queue, audio_api_key, voice
                         elif event_type == "response.audio.delta":
                             try:
                                 audio_bytes = base64.b64decode(event.get("delta", ""))
-                                audio_array = np.frombuffer(audio_bytes, dtype=np.int16)
                                 # 使用流式重采样器 24000Hz -> 48000Hz
-                                response_queue.put(_resample_audio(audio_array, 24000, 48000, resampler))
+                                response_queue.put(resampler.process(audio_bytes))
                             except Exception as e:
                                 logger.error(f"处理音频数据时出错: {e}")
                         elif event_type in ["response.done", "response.audio.done", "output.done"]:
@@ -636,6 +696,9 @@ def qwen_realtime_tts_worker(request_queue, response_queue, audio_api_key, voice
                 except Exception:
                     break
 
+                if sid == TTS_SHUTDOWN_SIGNAL:
+                    break
+
                 if sid == "__interrupt__":
                     sid = None
                 
@@ -733,9 +796,8 @@ def qwen_realtime_tts_worker(request_queue, response_queue, audio_api_key, voice
                                     elif event_type == "response.audio.delta":
                                         try:
                                             audio_bytes = base64.b64decode(event.get("delta", ""))
-                                            audio_array = np.frombuffer(audio_bytes, dtype=np.int16)
                                             # 使用流式重采样器 24000Hz -> 48000Hz
-                                            response_queue.put(_resample_audio(audio_array, 24000, 48000, resampler))
+                                            response_queue.put(resampler.process(audio_bytes))
                                         except Exception as e:
                                             logger.error(f"处理音频数据时出错: {e}")
                                     elif event_type in ["response.done", "response.audio.done", "output.done"]:
@@ -980,6 +1042,9 @@ def cosyvoice_vc_tts_worker(request_queue, response_queue, audio_api_key, voice_
 
         sid, tts_text = request_queue.get()
 
+        if sid == TTS_SHUTDOWN_SIGNAL:
+            break
+
         if sid == "__interrupt__":
             # 打断：立即静音回调 → 关闭 synthesizer → 清理状态
             # 先 mute 再 close，确保旧 SDK websocket 线程不再往 response_queue 灌数据
@@ -1087,6 +1152,14 @@ def cosyvoice_vc_tts_worker(request_queue, response_queue, audio_api_key, voice_
                     callback.accepted_speech_id = None
                     callback.reset_bootstrap_state()
 
+    # 收到退出信号：静音回调并关闭 synthesizer
+    callback._muted = True
+    if synthesizer is not None:
+        try:
+            synthesizer.close()
+        except Exception:
+            pass
+
 
 def cogtts_tts_worker(request_queue, response_queue, audio_api_key, voice_id):
     """
@@ -1126,6 +1199,9 @@ def cogtts_tts_worker(request_queue, response_queue, audio_api_key, voice_id):
                 except Exception:
                     break
 
+                if sid == TTS_SHUTDOWN_SIGNAL:
+                    break
+
                 if sid == "__interrupt__":
                     sid = None
                 
@@ -1165,6 +1241,7 @@ def cogtts_tts_worker(request_queue, response_queue, audio_api_key, voice_id):
                                             # 使用缓冲区逐块读取，避免 "Chunk too big" 错误
                                             buffer = ""
                                             first_audio_received = False  # 用于调试第一个音频块
+                                            resampler = None  # 收到第一个音频块后按返回的采样率创建
                                             async for chunk in resp.content.iter_any():
                                                 # 解码并添加到缓冲区
                                                 buffer += chunk.decode('utf-8')
@@ -1204,12 +1281,10 @@ def cogtts_tts_worker(request_queue, response_queue, audio_api_key, voice_id):
                                                                     # 从返回的 return_sample_rate 获取采样率
                                                                     sample_rate = delta.get('return_sample_rate', 24000)
                                                                     
-                                                                    # 转换为 float32 进行高质量重采样
-                                                                    audio_array = np.frombuffer(audio_bytes, dtype=np.int16).astype(np.float32) / 32768.0
-                                                                    
                                                                     # 对第一个音频块，裁剪掉开头的噪音部分（CogTTS有初始化噪音）
                                                                     if not first_audio_received:
                                                                         first_audio_received = True
+                                                                        audio_array = np.frombuffer(audio_bytes, dtype=np.int16)
                                                                         # 裁剪掉前 1s 的音频（通常包含初始化噪音）
                                                                         trim_samples = int(sample_rate)
                                                                         if len(audio_array) > trim_samples:
@@ -1218,18 +1293,25 @@ def cogtts_tts_worker(request_queue, response_queue, audio_api_key, voice_id):
                                                                         # 对裁剪后的开头应用短淡入（10ms），平滑过渡
                                                                         fade_samples = min(int(sample_rate * 0.01), len(audio_array))
                                                                         if fade_samples > 0:
+                                                                            audio_array = audio_array.copy()
                                                                             fade_curve = np.linspace(0.0, 1.0, fade_samples)
-                                                                            audio_array[:fade_samples] *= fade_curve
+                                                                            audio_array[:fade_samples] = (audio_array[:fade_samples] * fade_curve).astype(np.int16)
+                                                                        audio_bytes = audio_array.tobytes()
+                                                                        # 本次合成的音频按流式重采样，保持 chunk 边界连续
+                                                                        resampler = PCMResampler(sample_rate)
                                                                     
-                                                                    # 使用 soxr 进行高质量重采样
-                                                                    resampled = soxr.resample(audio_array, sample_rate, 48000, quality='HQ')
-                                                                    # 转回 int16 格式
-                                                                    resampled_int16 = (resampled * 32768.0).clip(-32768, 32767).astype(np.int16)
-                                                                    response_queue.put(resampled_int16.tobytes())
+                                                                    resampled = resampler.process(audio_bytes)
+                                                                    if resampled:
+                                                                        response_queue.put(resampled)
                                                         except json.JSONDecodeError as e:
                                                             logger.warning(f"解析SSE JSON失败: {e}")
                                                         except Exception as e:
                                                             logger.error(f"处理音频数据时出错: {e}")
+                                            # 输出重采样器缓存的尾部样本
+                                            if resampler is not None:
+                                                tail = resampler.flush()
+                                                if tail:
+                                                    response_queue.put(tail)
                                         else:
                                             error_text = await resp.text()
                                             _enqueue_error(response_queue, f"CogTTS API错误 ({resp.status}): {error_text}")
@@ -1294,6 +1376,7 @@ def gemini_tts_worker(request_queue, response_queue, audio_api_key, voice_id):
     Gemini TTS worker（用于默认音色）
     使用 httpx 直连 Gemini REST API（绕过 google-genai SDK 以减少 AFC 开销）
     独立连接池 + 连接预热 + 超时重试
+    文本按句切分后并发合成，按顺序投递，首句合成完即可开始播放
 
     Args:
         request_queue: 线程队列，接收 (speech_id, text) 元组
@@ -1313,6 +1396,7 @@ def gemini_tts_worker(request_queue, response_queue, audio_api_key, voice_id):
     )
     TTS_TIMEOUT = 12   # 单次请求超时（>12s 大概率是慢实例，及时放弃换下一个）
     MAX_RETRIES = 3    # 最多重试次数
+    MAX_PARALLEL = 3   # 同时合成的句子数（与连接池 max_connections=4 匹配）
 
     try:
         http_client = httpx.Client(
@@ -1325,6 +1409,8 @@ def gemini_tts_worker(request_queue, response_queue, audio_api_key, voice_id):
         while True:
             try:
                 sid, _ = request_queue.get()
+                if sid == TTS_SHUTDOWN_SIGNAL:
+                    break
                 if sid is None:
                     continue
             except Exception:
@@ -1347,8 +1433,74 @@ def gemini_tts_worker(request_queue, response_queue, audio_api_key, voice_id):
     logger.info(f"Gemini TTS 已就绪，发送就绪信号 (response_queue id={id(response_queue):#x})")
     response_queue.put(("__ready__", True))
 
+    def synthesize_sentence(text, gen):
+        """合成一句并重采样到 48kHz（在合成线程池中执行）。gen 为提交时的回合代号。"""
+        logger.info(f"Gemini TTS 开始合成: {len(text)} chars, voice={voice_id}")
+        audio_data = None
+        for attempt in range(1, MAX_RETRIES + 1):
+            t0 = time.time()
+            try:
+                audio_data = _gemini_tts_httpx_call(
+                    http_client, url, text, voice_id,
+                    timeout_s=TTS_TIMEOUT,
+                )
+                dt = time.time() - t0
+                if audio_data:
+                    logger.info(f"Gemini TTS API 返回: {len(audio_data)}B, {dt:.1f}s (attempt {attempt})")
+                break
+            except Exception as e:
+                dt = time.time() - t0
+                logger.warning(f"Gemini TTS attempt {attempt}/{MAX_RETRIES} 失败 ({dt:.1f}s): {e}")
+                if attempt == MAX_RETRIES and gen == generation:
+                    # 已被打断/放弃的回合不再上报错误，避免旧错误发到新回合的客户端
+                    _enqueue_error(response_queue, f"Gemini TTS失败: {e}")
+        if not audio_data:
+            logger.warning("Gemini TTS 所有尝试均未返回音频数据")
+            return None
+        return resample_pcm(audio_data, 24000)
+
+    # 逐句并发合成（最多 MAX_PARALLEL 句同时请求），由投递线程按提交顺序输出，保证播放顺序
+    synth_pool = ThreadPoolExecutor(max_workers=MAX_PARALLEL, thread_name_prefix="gemini-tts")
+    ordered_results = queue.Queue()
+    generation = 0  # 打断/新回合时递增，旧回合的结果直接丢弃
+
+    def deliver_in_order():
+        while True:
+            item = ordered_results.get()
+            if item is None:
+                break
+            gen, future = item
+            try:
+                audio_bytes = future.result()
+            except Exception as e:
+                if gen == generation:
+                    logger.warning(f"Gemini TTS 句子合成失败: {e}")
+                continue
+            if audio_bytes and gen == generation:
+                response_queue.put(audio_bytes)
+                logger.debug(f"Gemini TTS 投递: {len(audio_bytes)}B → queue(id={id(response_queue):#x})")
+
+    deliver_thread = threading.Thread(target=deliver_in_order, name="gemini-tts-deliver", daemon=True)
+    deliver_thread.start()
+
+    pending_futures = []
+
+    def submit(sentences):
+        for sentence in sentences:
+            future = synth_pool.submit(synthesize_sentence, sentence, generation)
+            pending_futures.append(future)
+            ordered_results.put((generation, future))
+
+    def abandon_pending():
+        """新回合/打断：旧回合未开始的请求直接取消，已在途的结果由投递线程丢弃。"""
+        nonlocal generation
+        generation += 1
+        for future in pending_futures:
+            future.cancel()
+        pending_futures.clear()
+
     current_speech_id = None
-    text_buffer = []
+    segmenter = _SentenceSegmenter()
 
     while True:
         try:
@@ -1356,59 +1508,40 @@ def gemini_tts_worker(request_queue, response_queue, audio_api_key, voice_id):
         except Exception:
             break
 
+        if sid == TTS_SHUTDOWN_SIGNAL:
+            break
+
         if sid == "__interrupt__":
-            sid = None
+            abandon_pending()
+            segmenter.reset()
+            current_speech_id = None
+            continue
 
         if current_speech_id != sid and sid is not None:
+            if current_speech_id is not None:
+                abandon_pending()
             current_speech_id = sid
-            text_buffer = []
+            segmenter.reset()
 
         if sid is None:
-            if text_buffer and current_speech_id is not None:
-                full_text = "".join(text_buffer)
-                if full_text.strip():
-                    logger.info(f"Gemini TTS 开始合成: {len(full_text)} chars, voice={voice_id}")
-                    audio_data = None
-                    for attempt in range(1, MAX_RETRIES + 1):
-                        t0 = time.time()
-                        try:
-                            audio_data = _gemini_tts_httpx_call(
-                                http_client, url, full_text, voice_id,
-                                timeout_s=TTS_TIMEOUT,
-                            )
-                            dt = time.time() - t0
-                            if audio_data:
-                                logger.info(f"Gemini TTS API 返回: {len(audio_data)}B, {dt:.1f}s (attempt {attempt})")
-                            break
-                        except Exception as e:
-                            dt = time.time() - t0
-                            logger.warning(f"Gemini TTS attempt {attempt}/{MAX_RETRIES} 失败 ({dt:.1f}s): {e}")
-                            if attempt == MAX_RETRIES:
-                                _enqueue_error(response_queue, f"Gemini TTS失败: {e}")
-
-                    if audio_data:
-                        audio_array = np.frombuffer(audio_data, dtype=np.int16).astype(np.float32) / 32768.0
-                        resampled = soxr.resample(audio_array, 24000, 48000, quality='HQ')
-                        resampled_int16 = (resampled * 32768.0).clip(-32768, 32767).astype(np.int16)
-                        audio_bytes = resampled_int16.tobytes()
-                        response_queue.put(audio_bytes)
-                        logger.info(
-                            f"Gemini TTS 合成完成: {len(resampled_int16)} samples, "
-                            f"{len(audio_bytes)}B → queue(id={id(response_queue):#x}, qsize≈{response_queue.qsize()})"
-                        )
-                    else:
-                        logger.warning("Gemini TTS 所有尝试均未返回音频数据")
-                else:
-                    logger.debug("Gemini TTS 跳过: 累积文本为空白")
-            else:
-                logger.debug(f"Gemini TTS flush 无操作: buffer_len={len(text_buffer)}, speech_id={current_speech_id}")
-
-            text_buffer = []
+            # 回合结束：合成剩余不完整的句子
+            if current_speech_id is not None:
+                submit(segmenter.flush())
+            segmenter.reset()
+            pending_futures.clear()
             current_speech_id = None
             continue
 
-        if tts_text and tts_text.strip():
-            text_buffer.append(tts_text)
+        if tts_text:
+            submit(segmenter.feed(tts_text))
+
+    abandon_pending()
+    ordered_results.put(None)
+    synth_pool.shutdown(wait=False, cancel_futures=True)
+    try:
+        http_client.close()
+    except Exception:
+        pass
 
 
 def openai_tts_worker(request_queue, response_queue, audio_api_key, voice_id):
@@ -1416,7 +1549,7 @@ def openai_tts_worker(request_queue, response_queue, audio_api_key, voice_id):
     OpenAI TTS worker（用于默认音色）
     使用 OpenAI 的 TTS API（gpt-4o-mini-tts）
     注意：OpenAI TTS 不支持流式输入，只支持流式输出
-    因此需要累积文本后一次性发送，但可以流式接收音频
+    因此按句切分文本，每凑够一句就发起请求（有限并发），按顺序投递音频
     
     Args:
         request_queue: 多进程请求队列，接收(speech_id, text)元组
@@ -1434,6 +1567,8 @@ def openai_tts_worker(request_queue, response_queue, audio_api_key, voice_id):
         while True:
             try:
                 sid, _ = request_queue.get()
+                if sid == TTS_SHUTDOWN_SIGNAL:
+                    break
                 if sid is None:
                     continue
             except Exception:
@@ -1444,10 +1579,12 @@ def openai_tts_worker(request_queue, response_queue, audio_api_key, voice_id):
     if not voice_id:
         voice_id = "marin"
     
+    MAX_PARALLEL = 3  # 同时合成的句子数
+
     async def async_worker():
         """异步TTS worker主循环"""
         current_speech_id = None
-        text_buffer = []  # 累积文本缓冲区
+        segmenter = _SentenceSegmenter()
         
         # 初始化 OpenAI 客户端
         client = AsyncOpenAI(api_key=audio_api_key)
@@ -1455,6 +1592,74 @@ def openai_tts_worker(request_queue, response_queue, audio_api_key, voice_id):
         # OpenAI TTS 是基于 HTTP 的，无需建立持久连接，直接发送就绪信号
         logger.info("OpenAI TTS 已就绪，发送就绪信号")
         response_queue.put(("__ready__", True))
+
+        semaphore = asyncio.Semaphore(MAX_PARALLEL)
+        ordered_tasks = asyncio.Queue()  # (generation, task)，按提交顺序投递音频；None 表示退出
+        generation = 0  # 打断/新回合时递增，旧回合的结果直接丢弃
+        pending_tasks = []
+
+        async def synthesize_sentence(text):
+            """合成一句，返回 48kHz PCM chunk 列表。"""
+            async with semaphore:
+                # 每句独立的流式重采样器，维护句内 chunk 边界状态
+                resampler = PCMResampler(24000)
+                chunks = []
+                # PCM 格式: 24000Hz, 16-bit, mono（奇数尾字节由重采样器留到下一个 chunk）
+                async with client.audio.speech.with_streaming_response.create(
+                    model="gpt-4o-mini-tts",
+                    voice=voice_id,
+                    input=text,
+                    response_format="pcm",
+                ) as response:
+                    async for chunk in response.iter_bytes(chunk_size=4096):
+                        if not chunk:
+                            continue
+                        resampled = resampler.process(chunk)
+                        if resampled:
+                            chunks.append(resampled)
+                tail = resampler.flush()
+                if tail:
+                    chunks.append(tail)
+                return chunks
+
+        async def deliver_in_order():
+            while True:
+                item = await ordered_tasks.get()
+                if item is None:
+                    break
+                gen, task = item
+                try:
+                    chunks = await task
+                except asyncio.CancelledError:
+                    # 只吞掉被放弃的句子任务自身的取消；投递协程本身被取消时必须向上抛出
+                    if asyncio.current_task().cancelling() or not task.cancelled():
+                        raise
+                    continue
+                except Exception as e:
+                    if gen == generation:
+                        _enqueue_error(response_queue, f"OpenAI TTS 合成失败: {e}")
+                    continue
+                if gen != generation:
+                    continue
+                for chunk in chunks:
+                    if chunk:
+                        response_queue.put(chunk)
+
+        def submit(sentences):
+            for sentence in sentences:
+                task = asyncio.create_task(synthesize_sentence(sentence))
+                pending_tasks.append(task)
+                ordered_tasks.put_nowait((generation, task))
+
+        def abandon_pending():
+            nonlocal generation
+            generation += 1
+            for task in pending_tasks:
+                if not task.done():
+                    task.cancel()
+            pending_tasks.clear()
+
+        deliver_task = asyncio.create_task(deliver_in_order())
         
         try:
             loop = asyncio.get_running_loop()
@@ -1465,51 +1670,46 @@ def openai_tts_worker(request_queue, response_queue, audio_api_key, voice_id):
                 except Exception:
                     break
 
+                if sid == TTS_SHUTDOWN_SIGNAL:
+                    break
+
                 if sid == "__interrupt__":
-                    sid = None
+                    abandon_pending()
+                    segmenter.reset()
+                    current_speech_id = None
+                    continue
                 
-                # 新的语音ID，清空缓冲区并重新开始
+                # 新的语音ID，丢弃旧回合并重新开始
                 if current_speech_id != sid and sid is not None:
+                    if current_speech_id is not None:
+                        abandon_pending()
                     current_speech_id = sid
-                    text_buffer = []
+                    segmenter.reset()
                 
                 if sid is None:
-                    # 收到终止信号，合成累积的文本
-                    if text_buffer and current_speech_id is not None:
-                        full_text = "".join(text_buffer)
-                        if full_text.strip():
-                            try:
-                                # 使用 OpenAI TTS API 进行流式合成
-                                # PCM 格式: 24000Hz, 16-bit, mono
-                                async with client.audio.speech.with_streaming_response.create(
-                                    model="gpt-4o-mini-tts",
-                                    voice=voice_id,
-                                    input=full_text,
-                                    response_format="pcm",
-                                ) as response:
-                                    # 流式接收音频数据
-                                    async for chunk in response.iter_bytes(chunk_size=4096):
-                                        if chunk:
-                                            # OpenAI TTS 返回 PCM 16-bit @ 24000Hz
-                                            audio_array = np.frombuffer(chunk, dtype=np.int16)
-                                            # 重采样到 48000Hz
-                                            resampled_bytes = _resample_audio(audio_array, 24000, 48000)
-                                            response_queue.put(resampled_bytes)
-                                            
-                            except Exception as e:
-                                _enqueue_error(response_queue, f"OpenAI TTS 合成失败: {e}")
-                    
-                    # 清空缓冲区
-                    text_buffer = []
+                    # 回合结束：合成剩余不完整的句子
+                    if current_speech_id is not None:
+                        submit(segmenter.flush())
+                    segmenter.reset()
+                    pending_tasks[:] = [t for t in pending_tasks if not t.done()]
                     current_speech_id = None
                     continue
                 
-                # 累积文本到缓冲区（不立即发送）
-                if tts_text and tts_text.strip():
-                    text_buffer.append(tts_text)
+                # 凑够一句立即开始合成，不再等整轮回复结束
+                if tts_text:
+                    submit(segmenter.feed(tts_text))
+                    pending_tasks[:] = [t for t in pending_tasks if not t.done()]
         
         except Exception as e:
             _enqueue_error(response_queue, f"OpenAI TTS Worker错误: {e}")
+        finally:
+            abandon_pending()
+            # 与 gemini worker 一致：用 None 通知投递协程退出，不依赖取消
+            ordered_tasks.put_nowait(None)
+            try:
+                await deliver_task
+            except asyncio.CancelledError:
+                pass
     
     # 运行异步worker
     try:
@@ -1586,25 +1786,13 @@ def gptsovits_tts_worker(request_queue, response_queue, audio_api_key, voice_id)
         # fallback: 旧版 websockets
         return not getattr(ws_conn, 'closed', True)
 
-    def _extract_pcm_from_wav(wav_bytes: bytes) -> tuple:
-        """从 WAV chunk 中提取 PCM 数据和采样率"""
-        if len(wav_bytes) < 44:
-            return None, 0
-        src_rate = int.from_bytes(wav_bytes[24:28], 'little')
-        pcm_data = wav_bytes[44:]
-        if len(pcm_data) < 2:
-            return None, 0
-        # 确保偶数长度
-        if len(pcm_data) % 2 != 0:
-            pcm_data = pcm_data[:-1]
-        return pcm_data, src_rate
-
     async def async_worker():
         """异步 TTS worker 主循环 - WebSocket 双工模式"""
         ws = None
         receive_task = None
         current_speech_id = None
         resampler = None
+        wav_decoder = WavChunkDecoder("GPT-SoVITS v3")
 
         async def receive_loop(ws_conn):
             """独立接收协程：处理 WS 返回的音频 chunk 和 JSON 消息"""
@@ -1612,16 +1800,17 @@ def gptsovits_tts_worker(request_queue, response_queue, audio_api_key, voice_id)
             try:
                 async for message in ws_conn:
                     if isinstance(message, bytes):
-                        # 每个 binary frame 是完整 WAV chunk（含 header）
-                        pcm_data, src_rate = _extract_pcm_from_wav(message)
-                        if pcm_data is not None and len(pcm_data) > 0:
-                            audio_array = np.frombuffer(pcm_data, dtype=np.int16)
-                            if src_rate != 48000:
-                                if resampler is None:
-                                    resampler = soxr.ResampleStream(src_rate, 48000, 1, dtype='float32')
-                                resampled_bytes = _resample_audio(audio_array, src_rate, 48000, resampler)
-                            else:
-                                resampled_bytes = audio_array.tobytes()
+                        # 每个 binary frame 是完整 WAV chunk（含 header），header 只在格式变化时重新解析
+                        try:
+                            pcm_data = wav_decoder.decode(message)
+                        except ValueError as e:
+                            logger.warning(f"[GPT-SoVITS v3] 跳过无效音频 chunk: {e}")
+                            continue
+                        src_rate = wav_decoder.format.sample_rate
+                        if resampler is None or resampler.src_rate != src_rate:
+                            resampler = PCMResampler(src_rate)
+                        resampled_bytes = resampler.process(pcm_data)
+                        if resampled_bytes:
                             response_queue.put(resampled_bytes)
                     else:
                         # JSON 消息（日志用）
@@ -1718,6 +1907,9 @@ def gptsovits_tts_worker(request_queue, response_queue, audio_api_key, voice_id)
                 except Exception:
                     break
 
+                if sid == TTS_SHUTDOWN_SIGNAL:
+                    break
+
                 if sid == "__interrupt__":
                     sid = None
 
@@ -1799,6 +1991,8 @@ def dummy_tts_worker(request_queue, response_queue, audio_api_key, voice_id):
         try:
             # 持续清空队列以避免阻塞，但不做任何处理
             sid, tts_text = request_queue.get()
+            if sid == TTS_SHUTDOWN_SIGNAL:
+                break
             if sid is None or sid == "__interrupt__":
                 continue
         except Exception as e:
@@ -1806,10 +2000,227 @@ def dummy_tts_worker(request_queue, response_queue, audio_api_key, voice_id):
             break
 
 
+_TTS_FORMAT_PCM = "pcm16_48k_mono"
+_TTS_FORMAT_OGG = "ogg_opus_48k_mono"
+_RELAY_STOP = object()
+
+
+class _AudioCachingWorker:
+    """
+    为任意 TTS worker 增加短句音频缓存（存储见 main_logic/tts_audio_cache.py）。
+
+    包装后的 worker 在自己的线程里启动真实 worker，两者之间插入一对内部队列：
+    - 请求侧：新回合的文本若是某条已缓存句子的前缀，则短暂暂存（最多等待
+      HOLD_GAP_SECONDS 的文本间隔）；回合结束时整句命中缓存就直接回放，
+      真实 worker 完全不参与。其余文本立即透传，不增加延迟。
+    - 响应侧：转发线程把真实 worker 的输出原样转交给会话，同时录制可缓存
+      短句的音频；回合结束且音频静默 QUIET_SECONDS 后写入缓存。录制期间
+      出现错误、打断或下一回合抢先开始时放弃本次录制，避免缓存残缺音频。
+    """
+
+    HOLD_GAP_SECONDS = 0.3
+    QUIET_SECONDS = 1.0
+    FIRST_AUDIO_TIMEOUT = 15.0
+    REPLAY_CHUNK_BYTES = 9600  # 100ms @ 48kHz PCM16
+    POLL_SECONDS = 0.2
+
+    def __init__(self, worker_fn, provider: str, output_format: str):
+        self._worker_fn = worker_fn
+        self.provider = provider
+        self.output_format = output_format
+        # TTS worker 池的键（见 tts_worker_pool._provider_name）：包装后各 provider 仍互不复用
+        self.pool_key = provider
+
+    def __call__(self, request_queue, response_queue, audio_api_key, voice_id):
+        from main_logic.tts_audio_cache import get_tts_audio_cache, normalize_tts_text
+
+        cache = get_tts_audio_cache()
+        if not cache.enabled:
+            return self._worker_fn(request_queue, response_queue, audio_api_key, voice_id)
+
+        provider, fmt = self.provider, self.output_format
+        inner_req = queue.Queue()
+        inner_resp = queue.Queue()
+        inner = threading.Thread(
+            target=self._worker_fn,
+            args=(inner_req, inner_resp, audio_api_key, voice_id),
+            name=f"{threading.current_thread().name}-inner",
+            daemon=True,
+        )
+        inner.start()
+
+        lock = threading.Lock()
+        state = {"recording": None, "last_audio": 0.0}
+
+        def relay():
+            while True:
+                msg = inner_resp.get()
+                if msg is _RELAY_STOP:
+                    break
+                payload = None
+                if isinstance(msg, (bytes, bytearray)):
+                    payload = bytes(msg)
+                elif isinstance(msg, tuple) and len(msg) == 3 and msg[0] == "__audio__":
+                    payload = msg[2]
+                with lock:
+                    rec = state["recording"]
+                    if payload is not None:
+                        state["last_audio"] = time.time()
+                        if rec is not None:
+                            rec["chunks"].append(payload)
+                            rec["last_chunk"] = state["last_audio"]
+                    elif isinstance(msg, tuple) and len(msg) == 2 and msg[0] == "__error__":
+                        state["recording"] = None  # 出错的回合不缓存
+                response_queue.put(msg)
+
+        relay_thread = threading.Thread(target=relay, name=f"{threading.current_thread().name}-relay", daemon=True)
+        relay_thread.start()
+
+        def start_passthrough(sid, parts):
+            now = time.time()
+            text = "".join(p for p in parts if p)
+            with lock:
+                # 上一回合音频仍在输出时无法区分归属，本回合不录制
+                quiet = now - state["last_audio"] >= self.QUIET_SECONDS and state["recording"] is None
+                state["recording"] = {
+                    "sid": sid, "text": text, "chunks": [],
+                    "started": now, "last_chunk": now, "ended": False,
+                } if quiet and len(normalize_tts_text(text)) <= cache.max_text_chars else None
+            for part in parts:
+                inner_req.put((sid, part))
+
+        def try_commit():
+            now = time.time()
+            with lock:
+                rec = state["recording"]
+                if rec is None or not rec["ended"]:
+                    return
+                if rec["chunks"] and now - rec["last_chunk"] >= self.QUIET_SECONDS:
+                    state["recording"] = None
+                elif not rec["chunks"] and now - rec["started"] > self.FIRST_AUDIO_TIMEOUT:
+                    state["recording"] = None
+                    return
+                else:
+                    return
+            cache.put(provider, voice_id, rec["text"], fmt, b"".join(rec["chunks"]))
+
+        def replay(sid, data):
+            if fmt == _TTS_FORMAT_OGG:
+                response_queue.put(("__audio__", sid, data))
+                return
+            for i in range(0, len(data), self.REPLAY_CHUNK_BYTES):
+                response_queue.put(data[i:i + self.REPLAY_CHUNK_BYTES])
+
+        holding = None  # {"sid", "parts", "last"}：疑似命中缓存、暂未透传的文本
+        current_sid = None
+
+        while True:
+            timeout = None
+            if holding is not None:
+                timeout = max(0.0, self.HOLD_GAP_SECONDS - (time.time() - holding["last"]))
+            elif state["recording"] is not None:
+                timeout = self.POLL_SECONDS
+            try:
+                sid, tts_text = request_queue.get(timeout=timeout) if timeout is not None else request_queue.get()
+            except queue.Empty:
+                if holding is not None:
+                    # 文本间隔超时：不再等待整句，按普通回合透传
+                    start_passthrough(holding["sid"], holding["parts"])
+                    current_sid = holding["sid"]
+                    holding = None
+                try_commit()
+                continue
+            except Exception:
+                break
+
+            try_commit()
+
+            if sid == TTS_SHUTDOWN_SIGNAL:
+                inner_req.put((sid, tts_text))
+                break
+
+            if sid == "__interrupt__":
+                holding = None
+                current_sid = None
+                with lock:
+                    state["recording"] = None
+                inner_req.put((sid, tts_text))
+                continue
+
+            if sid is None:
+                if holding is not None:
+                    full_text = "".join(holding["parts"])
+                    data = cache.get(provider, voice_id, full_text, fmt) if cache.is_cacheable(full_text) else None
+                    if data:
+                        logger.info(f"🗄️ TTS缓存命中 ({provider}): {len(data)}B")
+                        replay(holding["sid"], data)
+                        holding = None
+                        continue
+                    start_passthrough(holding["sid"], holding["parts"])
+                    current_sid = holding["sid"]
+                    holding = None
+                else:
+                    with lock:
+                        rec = state["recording"]
+                        if rec is not None and rec["sid"] == current_sid and cache.is_cacheable(rec["text"]):
+                            cache.note_miss()
+                with lock:
+                    rec = state["recording"]
+                    if rec is not None:
+                        if rec["sid"] == current_sid and cache.is_cacheable(rec["text"]):
+                            rec["ended"] = True
+                        else:
+                            state["recording"] = None
+                current_sid = None
+                inner_req.put((None, None))
+                continue
+
+            if holding is not None:
+                if holding["sid"] == sid:
+                    holding["parts"].append(tts_text)
+                    joined = "".join(p for p in holding["parts"] if p)
+                    if cache.is_cacheable(joined) and cache.has_prefix(provider, voice_id, fmt, joined):
+                        holding["last"] = time.time()
+                        continue
+                    start_passthrough(sid, holding["parts"])
+                    current_sid = sid
+                    holding = None
+                    continue
+                # 新回合开始但上一回合未结束：上一回合按普通文本透传
+                start_passthrough(holding["sid"], holding["parts"])
+                holding = None
+
+            if sid == current_sid:
+                inner_req.put((sid, tts_text))
+                with lock:
+                    rec = state["recording"]
+                    if rec is not None and rec["sid"] == sid:
+                        rec["text"] += tts_text or ""
+                        if not cache.is_cacheable(rec["text"]):
+                            state["recording"] = None
+                continue
+
+            # 新回合
+            with lock:
+                state["recording"] = None
+            if tts_text and cache.has_prefix(provider, voice_id, fmt, normalize_tts_text(tts_text)):
+                holding = {"sid": sid, "parts": [tts_text], "last": time.time()}
+                current_sid = None
+            else:
+                start_passthrough(sid, [tts_text])
+                current_sid = sid
+
+        inner.join(timeout=5.0)
+        inner_resp.put(_RELAY_STOP)
+        relay_thread.join(timeout=1.0)
+
+
 def get_tts_worker(core_api_type='qwen', has_custom_voice=False):
     """
     根据 core_api 类型和是否有自定义音色，返回对应的 TTS worker 函数
     
+    除 dummy 外，返回的 worker 都带有短句音频缓存（见 _AudioCachingWorker）。
+    
     Args:
         core_api_type: core API 类型 ('qwen', 'step', 'glm' 等)
         has_custom_voice: 是否有自定义音色 (voice_id)
@@ -1826,29 +2237,30 @@ def get_tts_worker(core_api_type='qwen', has_custom_voice=False):
             base_url = tts_config.get('base_url') or ''
             # GPT-SoVITS v3：配置 http/https URL，worker 内部自动转为 ws:// 连接
             # local_cosyvoice：配置 ws:// URL，直接使用 WebSocket
+            # 本地服务的模型可能随地址变化，缓存 provider 中带上 base_url
             if base_url.startswith('http://') or base_url.startswith('https://'):
-                return gptsovits_tts_worker
-            return local_cosyvoice_worker
+                return _AudioCachingWorker(gptsovits_tts_worker, f"gptsovits@{base_url}", _TTS_FORMAT_PCM)
+            return _AudioCachingWorker(local_cosyvoice_worker, f"local_cosyvoice@{base_url}", _TTS_FORMAT_PCM)
     except Exception as e:
         logger.warning(f'TTS调度器检查报告:{e}')
 
     # 如果有自定义音色，使用 CosyVoice（仅阿里云支持）
     if has_custom_voice:
-        return cosyvoice_vc_tts_worker
+        return _AudioCachingWorker(cosyvoice_vc_tts_worker, "cosyvoice_vc", _TTS_FORMAT_OGG)
 
     # 没有自定义音色时，使用与 core_api 匹配的默认 TTS
     if core_api_type == 'qwen':
-        return qwen_realtime_tts_worker
+        return _AudioCachingWorker(qwen_realtime_tts_worker, "qwen_realtime", _TTS_FORMAT_PCM)
     if core_api_type == 'free':
-        return partial(step_realtime_tts_worker, free_mode=True)
+        return _AudioCachingWorker(partial(step_realtime_tts_worker, free_mode=True), "step_realtime_free", _TTS_FORMAT_PCM)
     elif core_api_type == 'step':
-        return step_realtime_tts_worker
+        return _AudioCachingWorker(step_realtime_tts_worker, "step_realtime", _TTS_FORMAT_PCM)
     elif core_api_type == 'glm':
-        return cogtts_tts_worker
+        return _AudioCachingWorker(cogtts_tts_worker, "cogtts", _TTS_FORMAT_PCM)
     elif core_api_type == 'gemini':
-        return gemini_tts_worker
+        return _AudioCachingWorker(gemini_tts_worker, "gemini", _TTS_FORMAT_PCM)
     elif core_api_type == 'openai':
-        return openai_tts_worker
+        return _AudioCachingWorker(openai_tts_worker, "openai", _TTS_FORMAT_PCM)
     else:
         logger.error(f"{core_api_type}不支持原生TTS，请使用自定义语音")
         return dummy_tts_worker
@@ -1888,6 +2300,8 @@ def local_cosyvoice_worker(request_queue, response_queue, audio_api_key, voice_i
         while True:
             try:
                 sid, _ = request_queue.get()
+                if sid == TTS_SHUTDOWN_SIGNAL:
+                    break
                 if sid is None:
                     continue
             except Exception:
@@ -1916,7 +2330,7 @@ def local_cosyvoice_worker(request_queue, response_queue, audio_api_key, voice_i
         receive_task = None
         current_speech_id = None
         
-        resampler = soxr.ResampleStream(SRC_RATE, 48000, 1, dtype='float32')
+        resampler = PCMResampler(SRC_RATE)
 
         async def receive_loop(ws_conn):
             """独立接收任务，处理音频流"""
@@ -1924,9 +2338,9 @@ def local_cosyvoice_worker(request_queue, response_queue, audio_api_key, voice_i
                 async for message in ws_conn:
                     if isinstance(message, bytes):
                         # 服务器返回 16-bit PCM @ 22050Hz
-                        audio_array = np.frombuffer(message, dtype=np.int16)
-                        resampled_bytes = _resample_audio(audio_array, SRC_RATE, 48000, resampler)
-                        response_queue.put(resampled_bytes)
+                        resampled_bytes = resampler.process(message)
+                        if resampled_bytes:
+                            response_queue.put(resampled_bytes)
             except websockets.exceptions.ConnectionClosed:
                 logger.debug("本地 WebSocket 连接已关闭")
             except asyncio.CancelledError:
@@ -1960,7 +2374,7 @@ def local_cosyvoice_worker(request_queue, response_queue, audio_api_key, voice_i
                     pass
             
             # 重置 resampler
-            resampler = soxr.ResampleStream(SRC_RATE, 48000, 1, dtype='float32')
+            resampler.clear()
             
             logger.info(f"🔄 [LocalTTS] 正在连接: {WS_URL}")
             ws = await websockets.connect(WS_URL, ping_interval=None)
@@ -1997,6 +2411,9 @@ def local_cosyvoice_worker(request_queue, response_queue, audio_api_key, voice_i
                 logger.error(f'队列获取异常: {e}')
                 break
 
+            if sid == TTS_SHUTDOWN_SIGNAL:
+                break
+
             if sid == "__interrupt__":
                 sid = None
 
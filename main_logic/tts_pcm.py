@@ -0,0 +1,174 @@
+"""
+TTS worker 共用的 WAV/PCM 解码与流式重采样
+
+各 TTS 服务返回的音频格式不一：StepFun 每个增量都是带 header 的完整 WAV，
+GPT-SoVITS 每个 binary frame 也是一个 WAV chunk，其余服务返回裸 PCM16。
+以前每个 worker 各自处理：对每个 chunk 用 io.BytesIO + wave.open 解析、
+按固定 44 字节偏移截取 header、遇到奇数长度直接丢掉最后一个字节，
+重采样时再经过 int16 → float32 → 重采样 → 缩放/裁剪 → int16 多次整段拷贝。
+
+这里提供统一的解码路径：
+- WavChunkDecoder：每个音频流只完整解析一次 RIFF header（校验 PCM16 单声道），
+  之后的 chunk 只比对 header 签名并读取 data 长度，返回 data 区的 memoryview；
+- PCMResampler：直接以 int16 驱动 soxr 流式重采样（soxr 内部完成定点/浮点转换与饱和），
+  跨 chunk 保留奇数尾字节，源采样率与目标一致时直接透传。
+"""
+
+import struct
+from typing import NamedTuple, Optional, Union
+
+import numpy as np
+import soxr
+
+# 前端播放使用的采样率
+OUTPUT_SAMPLE_RATE = 48000
+
+_WAVE_FORMAT_PCM = 0x0001
+_WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+# 流式 WAV 常用的"长度未知"占位值
+_STREAMING_SIZES = (0, 0xFFFFFFFF)
+
+BytesLike = Union[bytes, bytearray, memoryview]
+
+
+class WavFormat(NamedTuple):
+    sample_rate: int
+    channels: int
+    bits_per_sample: int
+    # data 区在 chunk 中的起始偏移
+    data_offset: int
+    # header 中声明的 data 长度（流式 WAV 可能为 0 或 0xFFFFFFFF）
+    data_size: int
+
+
+def parse_wav_header(buf: BytesLike) -> WavFormat:
+    """解析并校验 RIFF/WAVE header，只接受 16-bit PCM。
+
+    按 chunk 遍历（跳过 LIST 等附加 chunk），不假设 header 固定为 44 字节。
+    格式不合法或 header 不完整时抛出 ValueError。
+    """
+    mv = memoryview(buf)
+    if len(mv) < 12 or mv[0:4] != b"RIFF" or mv[8:12] != b"WAVE":
+        raise ValueError("不是 RIFF/WAVE 数据")
+    pos = 12
+    fmt = None
+    while pos + 8 <= len(mv):
+        chunk_id = mv[pos:pos + 4].tobytes()
+        size = int.from_bytes(mv[pos + 4:pos + 8], "little")
+        body = pos + 8
+        if chunk_id == b"fmt ":
+            if size < 16 or body + 16 > len(mv):
+                raise ValueError("WAV fmt chunk 不完整")
+            audio_format, channels, sample_rate, _, _, bits = struct.unpack_from("<HHIIHH", mv, body)
+            if audio_format == _WAVE_FORMAT_EXTENSIBLE and size >= 40 and body + 26 <= len(mv):
+                # WAVE_FORMAT_EXTENSIBLE 的 SubFormat GUID 前两个字节即实际格式
+                audio_format = int.from_bytes(mv[body + 24:body + 26], "little")
+            if audio_format not in (_WAVE_FORMAT_PCM, _WAVE_FORMAT_EXTENSIBLE):
+                raise ValueError(f"不支持的 WAV 编码格式: 0x{audio_format:04x}")
+            if bits != 16:
+                raise ValueError(f"不支持的 WAV 位深: {bits}")
+            if channels < 1 or sample_rate <= 0:
+                raise ValueError(f"WAV 参数无效: channels={channels}, sample_rate={sample_rate}")
+            fmt = (sample_rate, channels, bits)
+        elif chunk_id == b"data":
+            if fmt is None:
+                raise ValueError("WAV data chunk 出现在 fmt chunk 之前")
+            return WavFormat(fmt[0], fmt[1], fmt[2], body, size)
+        pos = body + size + (size & 1)
+    raise ValueError("WAV header 不完整")
+
+
+class WavChunkDecoder:
+    """单个音频流的 WAV chunk 解码器。
+
+    第一个带 header 的 chunk 完整解析并缓存格式；之后的 chunk 若 header 签名
+    （RIFF 长度与 data 长度之外的全部 header 字节）一致，则只读取 data 长度。
+    不以 RIFF 开头的 chunk 视为同一格式下的后续裸 PCM。
+    """
+
+    def __init__(self, name: str = "TTS"):
+        self.name = name
+        self.format: Optional[WavFormat] = None
+        self._signature: Optional[bytes] = None
+
+    def reset(self) -> None:
+        self.format = None
+        self._signature = None
+
+    def decode(self, chunk: BytesLike) -> memoryview:
+        """返回 chunk 中 PCM 数据区的 memoryview（不拷贝，长度可能为奇数）。"""
+        mv = memoryview(chunk)
+        if mv[0:4] != b"RIFF":
+            if self.format is None:
+                raise ValueError(f"{self.name} 音频流首个 chunk 缺少 WAV header")
+            return mv
+        fmt = self.format
+        if fmt is not None and len(mv) >= fmt.data_offset and mv[8:fmt.data_offset - 4] == self._signature:
+            data_size = int.from_bytes(mv[fmt.data_offset - 4:fmt.data_offset], "little")
+        else:
+            fmt = parse_wav_header(mv)
+            if fmt.channels != 1:
+                raise ValueError(f"{self.name} 只支持单声道 PCM，收到 {fmt.channels} 声道")
+            self.format = fmt
+            self._signature = mv[8:fmt.data_offset - 4].tobytes()
+            data_size = fmt.data_size
+        start = fmt.data_offset
+        if data_size in _STREAMING_SIZES or start + data_size > len(mv):
+            return mv[start:]
+        return mv[start:start + data_size]
+
+
+class PCMResampler:
+    """单声道 PCM16 流式重采样器（维护 chunk 边界状态）。"""
+
+    def __init__(self, src_rate: int, dst_rate: int = OUTPUT_SAMPLE_RATE, quality: str = "HQ"):
+        self.src_rate = src_rate
+        self.dst_rate = dst_rate
+        self.quality = quality
+        self._stream = self._new_stream()
+        self._carry = b""
+
+    def _new_stream(self):
+        if self.src_rate == self.dst_rate:
+            return None
+        return soxr.ResampleStream(self.src_rate, self.dst_rate, 1, dtype="int16", quality=self.quality)
+
+    def process(self, pcm: BytesLike) -> bytes:
+        """重采样一段 PCM16 字节（任意长度，奇数尾字节留到下一段）。"""
+        if self._carry:
+            pcm = self._carry + bytes(pcm)
+            self._carry = b""
+        usable = len(pcm) - (len(pcm) & 1)
+        if usable != len(pcm):
+            self._carry = bytes(pcm[usable:])
+            pcm = memoryview(pcm)[:usable]
+        if not usable:
+            return b""
+        if self._stream is None:
+            return bytes(pcm)
+        samples = np.frombuffer(pcm, dtype=np.int16)
+        return self._stream.resample_chunk(samples).tobytes()
+
+    def flush(self) -> bytes:
+        """输出重采样器内部缓存的尾部样本（一段音频结束时调用），之后可继续用于新的音频。"""
+        self._carry = b""
+        if self._stream is None:
+            return b""
+        tail = self._stream.resample_chunk(np.zeros(0, dtype=np.int16), last=True)
+        self._stream = self._new_stream()
+        return tail.tobytes()
+
+    def clear(self) -> None:
+        """丢弃内部状态（新轮次音频不应与上一轮连续）。"""
+        self._carry = b""
+        if self._stream is not None:
+            self._stream.clear()
+
+
+def resample_pcm(pcm: BytesLike, src_rate: int, dst_rate: int = OUTPUT_SAMPLE_RATE) -> bytes:
+    """一次性重采样一整段 PCM16（非流式音频）。"""
+    usable = len(pcm) - (len(pcm) & 1)
+    samples = np.frombuffer(pcm, dtype=np.int16, count=usable // 2)
+    if src_rate == dst_rate:
+        return samples.tobytes()
+    return soxr.resample(samples, src_rate, dst_rate, quality="HQ").tobytes()
@@ -0,0 +1,300 @@
+"""
+TTS worker 池
+
+以前每次 start_session 都会新建一个 TTS 线程，并在 end_session 时丢弃，
+websocket 类的 provider（qwen / cosyvoice_vc / step 等）每次都要重新握手、
+重新等待 ``__ready__``。这里把已就绪的 worker 按
+(provider, voice, base_url, 凭据指纹) 保存在进程级的池中，会话结束时归还，
+下一次重连、热切换或切换到同音色的角色时直接租用，跳过冷启动。
+
+后台健康检查会回收：线程已退出的 worker、报告未就绪/出错的 worker、
+空闲过久或存活过久的 worker（避免长连接被服务端静默回收后仍被复用）。
+
+所有方法都应在主事件循环中调用；worker 线程只通过两个队列与池交互。
+"""
+
+import asyncio
+import hashlib
+import queue
+import time
+from functools import partial
+from queue import Queue
+from threading import Thread
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from main_logic.tts_client import TTSResponseQueue, TTS_SHUTDOWN_SIGNAL
+from utils.logger_config import get_module_logger
+
+logger = get_module_logger(__name__, "Main")
+
+
+def _provider_name(worker_fn: Callable) -> str:
+    """worker 函数的稳定名称（partial 会带上绑定的参数，如 step 的 free_mode）。"""
+    pool_key = getattr(worker_fn, "pool_key", None)
+    if pool_key:
+        return pool_key
+    if isinstance(worker_fn, partial):
+        kwargs = ",".join(f"{k}={v}" for k, v in sorted(worker_fn.keywords.items()))
+        return f"{_provider_name(worker_fn.func)}({kwargs})"
+    return getattr(worker_fn, "__name__", repr(worker_fn))
+
+
+def _credential_fingerprint(api_key: Optional[str]) -> str:
+    """池键中只保存凭据的哈希，不保存明文 key。"""
+    if not api_key:
+        return ""
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16]
+
+
+class PooledTTSWorker:
+    """一个运行中的 TTS worker 线程及其请求/响应队列。"""
+
+    def __init__(self, key: Tuple, worker_fn: Callable, api_key: str, voice_id: str):
+        self.key = key
+        self.request_queue: Queue = Queue()
+        self.response_queue: TTSResponseQueue = TTSResponseQueue()
+        self.thread = Thread(
+            target=worker_fn,
+            args=(self.request_queue, self.response_queue, api_key, voice_id),
+            name=f"TTSWorker-{key[0]}",
+            daemon=True,
+        )
+        self.ready: bool = False
+        self.healthy: bool = True
+        self.leased: bool = False
+        self.created_at = time.time()
+        self.last_used = self.created_at
+        self.lease_count = 0
+
+    def start(self) -> None:
+        self.thread.start()
+
+    def is_alive(self) -> bool:
+        return self.thread.is_alive()
+
+    def drain_responses(self) -> None:
+        """丢弃响应队列中的残留数据；若发现未就绪/错误信号则标记为不健康。"""
+        while True:
+            try:
+                msg = self.response_queue.get_nowait()
+            except queue.Empty:
+                break
+            if isinstance(msg, tuple) and len(msg) == 2:
+                if msg[0] == "__ready__":
+                    self.ready = bool(msg[1])
+                    if not self.ready:
+                        self.healthy = False
+                elif msg[0] == "__error__":
+                    self.healthy = False
+
+    def stop(self) -> None:
+        """通知 worker 释放连接并退出线程（不等待，线程为 daemon）。"""
+        try:
+            self.request_queue.put((TTS_SHUTDOWN_SIGNAL, None))
+        except Exception as e:
+            logger.warning(f"⚠️ 通知 TTS worker 退出失败: {e}")
+
+
+class TTSWorkerPool:
+    """
+    进程级 TTS worker 池。
+
+    Args:
+        max_idle_per_key: 每个键最多保留的空闲 worker 数
+        idle_ttl: 空闲超过此秒数的 worker 会被回收
+        max_age: worker 存活超过此秒数后在空闲时回收（定期刷新长连接）
+        health_check_interval: 后台健康检查间隔（秒）
+    """
+
+    def __init__(
+        self,
+        max_idle_per_key: int = 1,
+        idle_ttl: float = 600.0,
+        max_age: float = 3600.0,
+        health_check_interval: float = 30.0,
+    ):
+        self.max_idle_per_key = max_idle_per_key
+        self.idle_ttl = idle_ttl
+        self.max_age = max_age
+        self.health_check_interval = health_check_interval
+        self._idle: Dict[Tuple, List[PooledTTSWorker]] = {}
+        self._leased: Dict[int, PooledTTSWorker] = {}
+        self._health_task: Optional[asyncio.Task] = None
+        self._stats = {"hits": 0, "misses": 0, "recycled": 0, "spawn_failures": 0}
+
+    @staticmethod
+    def make_key(worker_fn: Callable, api_key: str, voice_id: str, extra: Tuple = ()) -> Tuple:
+        return (_provider_name(worker_fn), voice_id or "", _credential_fingerprint(api_key), *extra)
+
+    async def acquire(
+        self,
+        worker_fn: Callable,
+        api_key: str,
+        voice_id: str,
+        extra: Tuple = (),
+        ready_timeout: float = 12.0,
+    ) -> PooledTTSWorker:
+        """
+        租用一个 worker：优先复用同键的空闲 worker，否则新建并等待就绪信号。
+
+        即使等待超时也会返回 worker（``ready`` 为 False），
+        之后到达的 ``__ready__`` 会由会话的 tts_response_handler 处理。
+        """
+        self._ensure_health_task()
+        key = self.make_key(worker_fn, api_key, voice_id, extra)
+
+        idle = self._idle.get(key, [])
+        while idle:
+            worker = idle.pop()
+            worker.drain_responses()
+            if worker.is_alive() and worker.healthy and worker.ready:
+                self._stats["hits"] += 1
+                logger.info(
+                    f"♻️ 复用预热的 TTS worker ({key[0]}, 已使用 {worker.lease_count} 次, "
+                    f"存活 {time.time() - worker.created_at:.0f}秒)"
+                )
+                return self._lease(worker)
+            self._retire(worker, "复用前检查不健康")
+        if not idle:
+            self._idle.pop(key, None)
+
+        self._stats["misses"] += 1
+        worker = PooledTTSWorker(key, worker_fn, api_key, voice_id)
+        worker.start()
+        await self._wait_ready(worker, ready_timeout)
+        if not worker.ready:
+            self._stats["spawn_failures"] += 1
+        return self._lease(worker)
+
+    def release(self, worker: PooledTTSWorker) -> None:
+        """会话结束时归还 worker：打断当前合成，健康的放回空闲池，否则退出。"""
+        self._leased.pop(id(worker), None)
+        worker.leased = False
+        worker.last_used = time.time()
+        if not worker.is_alive():
+            self._stats["recycled"] += 1
+            return
+        try:
+            worker.request_queue.put(("__interrupt__", None))
+        except Exception:
+            worker.healthy = False
+        worker.drain_responses()
+
+        idle = self._idle.setdefault(worker.key, [])
+        if not worker.healthy or not worker.ready:
+            self._retire(worker, "未就绪或出错")
+        elif len(idle) >= self.max_idle_per_key:
+            self._retire(worker, "空闲池已满")
+        else:
+            idle.append(worker)
+            logger.debug(f"TTS worker 已归还到池 ({worker.key[0]})")
+        if not idle:
+            self._idle.pop(worker.key, None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self._stats,
+            "idle": sum(len(v) for v in self._idle.values()),
+            "leased": len(self._leased),
+        }
+
+    def shutdown(self) -> None:
+        """退出所有空闲 worker（租用中的 worker 由会话自行归还）。"""
+        if self._health_task and not self._health_task.done():
+            self._health_task.cancel()
+        self._health_task = None
+        for workers in self._idle.values():
+            for worker in workers:
+                worker.stop()
+        self._idle.clear()
+
+    def _lease(self, worker: PooledTTSWorker) -> PooledTTSWorker:
+        worker.leased = True
+        worker.lease_count += 1
+        worker.last_used = time.time()
+        self._leased[id(worker)] = worker
+        return worker
+
+    def _retire(self, worker: PooledTTSWorker, reason: str) -> None:
+        self._stats["recycled"] += 1
+        logger.info(f"🧹 回收 TTS worker ({worker.key[0]}): {reason}")
+        worker.stop()
+
+    async def _wait_ready(self, worker: PooledTTSWorker, timeout: float) -> None:
+        start_time = time.time()
+        logger.info(f"[语音会话诊断] 开始等待 TTS 就绪信号 (超时: {timeout:.0f}秒)")
+        while True:
+            remaining = timeout - (time.time() - start_time)
+            if remaining <= 0:
+                logger.warning(f"⚠️ TTS进程就绪信号超时 ({timeout}秒)，继续执行...")
+                logger.warning(f"[语音会话诊断] TTS 在 {timeout} 秒内未就绪，可能为 TTS 服务慢或网络问题")
+                return
+            try:
+                # 事件驱动等待：worker put 后立即唤醒；每约2秒超时一次输出诊断日志
+                msg = await asyncio.wait_for(worker.response_queue.get_async(), timeout=min(2.0, remaining))
+            except asyncio.TimeoutError:
+                logger.info(f"[语音会话诊断] TTS 就绪等待中... 已等待 {time.time() - start_time:.1f}秒 / {timeout}秒")
+                continue
+            if isinstance(msg, tuple) and len(msg) == 2 and msg[0] == "__ready__":
+                worker.ready = bool(msg[1])
+                if worker.ready:
+                    logger.info(f"✅ TTS进程已就绪 (用时: {time.time() - start_time:.2f}秒)")
+                else:
+                    worker.healthy = False
+                    logger.error("❌ TTS进程初始化失败，但继续执行...")
+            else:
+                # 不是就绪信号，放回队列交给会话处理
+                worker.response_queue.put(msg)
+            return
+
+    def _ensure_health_task(self) -> None:
+        if self._health_task is None or self._health_task.done():
+            self._health_task = asyncio.create_task(self._health_check_loop())
+
+    async def _health_check_loop(self) -> None:
+        try:
+            while True:
+                await asyncio.sleep(self.health_check_interval)
+                self._check_idle_workers()
+                if not self._idle and not self._leased:
+                    break
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.error(f"TTS worker 池健康检查出错: {e}")
+
+    def _check_idle_workers(self) -> None:
+        now = time.time()
+        for key in list(self._idle.keys()):
+            keep = []
+            for worker in self._idle[key]:
+                worker.drain_responses()
+                if not worker.is_alive():
+                    self._stats["recycled"] += 1
+                elif not worker.healthy:
+                    self._retire(worker, "空闲期间报告错误")
+                elif now - worker.last_used > self.idle_ttl:
+                    self._retire(worker, f"空闲超过 {self.idle_ttl:.0f}秒")
+                elif now - worker.created_at > self.max_age:
+                    self._retire(worker, f"存活超过 {self.max_age:.0f}秒")
+                else:
+                    keep.append(worker)
+            if keep:
+                self._idle[key] = keep
+            else:
+                del self._idle[key]
+        # 租用中但线程已退出的 worker 只从记录中移除，会话会在下次启动时重新租用
+        for wid, worker in list(self._leased.items()):
+            if not worker.is_alive():
+                del self._leased[wid]
+
+
+_tts_worker_pool: Optional[TTSWorkerPool] = None
+
+
+def get_tts_worker_pool() -> TTSWorkerPool:
+    """获取进程级 TTS worker 池单例。"""
+    global _tts_worker_pool
+    if _tts_worker_pool is None:
+        _tts_worker_pool = TTSWorkerPool()
+    return _tts_worker_pool
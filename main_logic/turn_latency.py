@@ -0,0 +1,216 @@
+"""
+按轮次的端到端延迟追踪与分阶段直方图
+
+一次慢回复的时间可能耗在任意环节：麦克风音频块在 websocket_router 排队、
+AudioProcessor 降噪、OmniRealtimeClient 上行发送、模型首个输出、TTS worker
+首个音频字节、首帧语音下发到前端。这里为每个角色维护一个轻量的追踪器：
+
+- 逐块阶段（ws_queue / dsp / upstream_send）直接记录每个音频块的耗时；
+- 逐轮阶段以"用户输入结束"为起点（语音模式为服务端 speech_stopped，
+  文本模式为文本到达），每个阶段只记录本轮第一次出现的时间点。
+
+每个阶段对应一个固定桶的内存直方图，记录开销只有一次二分查找；
+快照通过 main_server 的 /api/latency/stats 暴露。
+"""
+
+import bisect
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, Optional
+
+from utils.logger_config import get_module_logger
+
+logger = get_module_logger(__name__, "Main")
+
+# 阶段名 -> 含义（区间）
+STAGES = {
+    "ws_queue": "麦克风音频块到达 websocket_router → 开始 DSP",
+    "dsp": "AudioProcessor 处理单个音频块",
+    "upstream_send": "OmniRealtimeClient 上行发送单个音频块",
+    "first_token": "用户输入结束 → 模型首个输出",
+    "first_tts_byte": "模型首个输出 → TTS worker 首个音频字节",
+    "first_speech_frame": "TTS 首个音频字节（原生语音为模型首个输出）→ 首帧语音下发到前端",
+    "end_to_end": "用户输入结束 → 首帧语音下发到前端",
+}
+
+# 直方图桶上界（毫秒），最后一个桶收纳所有更大的值
+BUCKET_BOUNDS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 30000)
+
+RECENT_TURNS = 20
+# 超过该时长仍未完成的轮次视为已放弃（例如 TTS 失败），之后的输出不再计入该轮
+MAX_TURN_SECONDS = 60.0
+
+
+class LatencyHistogram:
+    """固定桶的延迟直方图（毫秒）。"""
+
+    def __init__(self, bounds_ms=BUCKET_BOUNDS_MS):
+        self.bounds_ms = tuple(bounds_ms)
+        self.counts = [0] * (len(self.bounds_ms) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.min_ms: Optional[float] = None
+        self.max_ms: Optional[float] = None
+
+    def observe(self, value_ms: float) -> None:
+        if value_ms < 0:
+            value_ms = 0.0
+        self.counts[bisect.bisect_left(self.bounds_ms, value_ms)] += 1
+        self.count += 1
+        self.total_ms += value_ms
+        if self.min_ms is None or value_ms < self.min_ms:
+            self.min_ms = value_ms
+        if self.max_ms is None or value_ms > self.max_ms:
+            self.max_ms = value_ms
+
+    def percentile(self, q: float) -> Optional[float]:
+        """按桶估算分位数（返回所在桶的上界，并以实际最大值封顶）。"""
+        if not self.count:
+            return None
+        target = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= target and n:
+                upper = self.bounds_ms[i] if i < len(self.bounds_ms) else self.max_ms
+                return min(upper, self.max_ms)
+        return self.max_ms
+
+    def snapshot(self) -> dict:
+        return {
+            "count": self.count,
+            "mean_ms": (self.total_ms / self.count) if self.count else None,
+            "min_ms": self.min_ms,
+            "max_ms": self.max_ms,
+            "p50_ms": self.percentile(0.5),
+            "p90_ms": self.percentile(0.9),
+            "p99_ms": self.percentile(0.99),
+            "buckets": {
+                **{f"le_{b}": c for b, c in zip(self.bounds_ms, self.counts)},
+                "le_inf": self.counts[-1],
+            },
+        }
+
+
+class TurnLatencyTracer:
+    """单个角色的轮次延迟追踪器。"""
+
+    def __init__(self, name: str, clock: Callable[[], float] = time.perf_counter):
+        self.name = name
+        self.clock = clock
+        self.histograms: Dict[str, LatencyHistogram] = {stage: LatencyHistogram() for stage in STAGES}
+        self.recent_turns: deque = deque(maxlen=RECENT_TURNS)
+        self._lock = threading.Lock()
+        self._anchor: Optional[float] = None
+        self._anchor_wall: Optional[float] = None
+        self._marks: Dict[str, float] = {}
+
+    def now(self) -> float:
+        return self.clock()
+
+    def observe(self, stage: str, seconds: float) -> None:
+        """直接记录一次阶段耗时（用于逐块阶段）。"""
+        with self._lock:
+            self.histograms[stage].observe(seconds * 1000.0)
+
+    def observe_since(self, stage: str, start: Optional[float]) -> None:
+        if start is not None:
+            self.observe(stage, self.clock() - start)
+
+    def begin_turn(self, t: Optional[float] = None) -> None:
+        """用户输入结束，开始新一轮追踪（未完成的上一轮直接丢弃）。"""
+        with self._lock:
+            self._anchor = self.clock() if t is None else t
+            self._anchor_wall = time.time()
+            self._marks = {}
+
+    @property
+    def in_turn(self) -> bool:
+        return self._anchor is not None
+
+    def mark(self, stage: str, t: Optional[float] = None) -> None:
+        """记录本轮某阶段第一次出现的时间点；不在轮次内或已记录过时直接返回。"""
+        if self._anchor is None or stage in self._marks:
+            return
+        t = self.clock() if t is None else t
+        with self._lock:
+            if self._anchor is None or stage in self._marks:
+                return
+            if t - self._anchor > MAX_TURN_SECONDS:
+                self._finish_locked()
+                return
+            marks = self._marks
+            if stage == "first_token":
+                start = self._anchor
+            elif stage == "first_tts_byte":
+                start = marks.get("first_token", self._anchor)
+            elif stage == "first_speech_frame":
+                start = marks.get("first_tts_byte", marks.get("first_token", self._anchor))
+            else:
+                raise ValueError(f"unknown turn stage: {stage}")
+            marks[stage] = t
+            self.histograms[stage].observe((t - start) * 1000.0)
+            if stage == "first_speech_frame":
+                self.histograms["end_to_end"].observe((t - self._anchor) * 1000.0)
+                # 首帧语音已下发，本轮所有阶段记录完毕
+                self._finish_locked()
+
+    def end_turn(self) -> None:
+        """本轮回复结束（不会再有语音输出时调用）：保存本轮各阶段耗时并停止追踪。"""
+        with self._lock:
+            self._finish_locked()
+
+    def _finish_locked(self) -> None:
+        if self._anchor is None:
+            return
+        anchor, marks = self._anchor, self._marks
+        turn = {"started_at": self._anchor_wall}
+        for stage in ("first_token", "first_tts_byte", "first_speech_frame"):
+            if stage in marks:
+                turn[f"{stage}_ms"] = round((marks[stage] - anchor) * 1000.0, 1)
+        self.recent_turns.append(turn)
+        self._anchor = None
+        self._anchor_wall = None
+        self._marks = {}
+        if "first_speech_frame_ms" in turn:
+            logger.debug(f"⏱️ [{self.name}] 本轮首帧语音延迟 {turn['first_speech_frame_ms']}ms: {turn}")
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "stages": {stage: hist.snapshot() for stage, hist in self.histograms.items()},
+                "recent_turns": list(self.recent_turns),
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self.histograms = {stage: LatencyHistogram() for stage in STAGES}
+            self.recent_turns.clear()
+
+
+_tracers: Dict[str, TurnLatencyTracer] = {}
+_tracers_lock = threading.Lock()
+
+
+def get_turn_latency_tracer(lanlan_name: str) -> TurnLatencyTracer:
+    """获取角色对应的延迟追踪器（不存在时创建）。"""
+    tracer = _tracers.get(lanlan_name)
+    if tracer is None:
+        with _tracers_lock:
+            tracer = _tracers.get(lanlan_name)
+            if tracer is None:
+                tracer = _tracers[lanlan_name] = TurnLatencyTracer(lanlan_name)
+    return tracer
+
+
+def get_latency_snapshot(lanlan_name: Optional[str] = None) -> dict:
+    """获取一个或全部角色的延迟直方图快照。"""
+    with _tracers_lock:
+        tracers = dict(_tracers)
+    if lanlan_name is not None:
+        tracers = {lanlan_name: tracers[lanlan_name]} if lanlan_name in tracers else {}
+    return {
+        "stage_descriptions": STAGES,
+        "characters": {name: tracer.snapshot() for name, tracer in tracers.items()},
+    }
@@ -13,10 +13,9 @@ import os
 import sys
 import asyncio
 import base64
-import difflib
 import re
 import time
-from collections import deque
+from collections import OrderedDict
 from io import BytesIO
 from urllib.parse import unquote
 
@@ -44,30 +43,72 @@ from config.prompts_sys import (
 from utils.workshop_utils import get_workshop_path
 from utils.screenshot_utils import compress_screenshot, COMPRESS_TARGET_HEIGHT, COMPRESS_JPEG_QUALITY
 from utils.language_utils import detect_language, translate_text, normalize_language_code, get_global_language
+from utils.emotion_classifier import get_emotion_classifier
 from utils.web_scraper import (
     fetch_trending_content, format_trending_content,
     fetch_window_context_content, format_window_context_content,
     fetch_video_content, format_video_content,
     fetch_news_content, format_news_content,
     fetch_personal_dynamics, format_personal_dynamics,
+    get_active_window_title, get_account_digests,
 )
+from utils.proactive_prefetch import PrefetchSource, ProactivePrefetcher
+from utils.proactive_topic_index import get_proactive_topic_index
 from utils.logger_config import get_module_logger
 
 router = APIRouter(prefix="/api", tags=["system"])
 logger = get_module_logger(__name__, "Main")
 
-# --- 主动搭话近期记录暂存区 ---
-# {lanlan_name: deque([(timestamp, message), ...], maxlen=10)}
-_proactive_chat_history: dict[str, deque] = {}
-_proactive_topic_history: dict[str, deque] = {}
+# --- 主动搭话历史 ---
+# 搭话文本与话题按角色持久化在 utils.proactive_topic_index 中（MinHash LSH 近似去重）
 
-_RECENT_CHAT_MAX_AGE_SECONDS = 3600  # 1小时内的搭话记录
-_RECENT_TOPIC_MAX_AGE_SECONDS = 3600  # 1小时内避免重复外部话题
-_PROACTIVE_SIMILARITY_THRESHOLD = 0.94  # 高阈值，尽量避免误杀
+_RECENT_CHAT_MAX_AGE_SECONDS = 3600  # 注入 prompt 的近期搭话：1小时内
+_RECENT_CHAT_PROMPT_LIMIT = 10  # 注入 prompt 的近期搭话条数
+_PROACTIVE_DEDUP_MAX_AGE_SECONDS = 14 * 24 * 3600  # 14天内避免重复搭话文本与外部话题
+_PROACTIVE_SIMILARITY_THRESHOLD = 0.7  # 字符 3-gram Jaccard，约相当于原 difflib 比例 0.94，高阈值尽量避免误杀
+_TOPIC_TITLE_SIMILARITY_THRESHOLD = 0.8  # 话题标题近似重复（URL 不同但同一条新闻）
 _PHASE1_FETCH_PER_SOURCE = 10  # Phase 1 每个信息源固定抓取条数
 _PHASE1_TOTAL_TOPIC_TARGET = 20  # Phase 1 输入给筛选模型的总候选目标条数
 
 
+def _window_material_matches_current(content: dict) -> bool:
+    """窗口上下文素材只在活跃窗口未切换时可用"""
+    title = content.get('window_title')
+    return bool(title) and title == get_active_window_title()
+
+
+def _account_material_matches_current(content: dict) -> bool:
+    """依赖登录态的素材只在抓取时的账号仍是当前账号时可用（切换/退出账号后改为现场抓取）"""
+    digests = content.get('account_digests') or {}
+    return get_account_digests(digests) == digests
+
+
+# --- 主动搭话素材预取池 ---
+# 外部来源提前在后台抓取，触发主动搭话时直接从池中取用，不再等待最慢的来源。
+_proactive_prefetcher = ProactivePrefetcher([
+    PrefetchSource('news', lambda: fetch_news_content(limit=_PHASE1_FETCH_PER_SOURCE),
+                   refresh_interval=240, max_age=900, timeout=8, hourly_budget=20),
+    PrefetchSource('video', lambda: fetch_video_content(limit=_PHASE1_FETCH_PER_SOURCE),
+                   refresh_interval=240, max_age=900, timeout=8, hourly_budget=20),
+    # 首页推荐与个人动态依赖登录态：使用前校验账号未切换
+    PrefetchSource('home', lambda: fetch_trending_content(bilibili_limit=_PHASE1_FETCH_PER_SOURCE,
+                                                           weibo_limit=_PHASE1_FETCH_PER_SOURCE),
+                   refresh_interval=240, max_age=900, timeout=8, hourly_budget=20,
+                   validate=_account_material_matches_current),
+    PrefetchSource('personal', lambda: fetch_personal_dynamics(limit=_PHASE1_FETCH_PER_SOURCE),
+                   refresh_interval=150, max_age=600, timeout=10, hourly_budget=30,
+                   validate=_account_material_matches_current),
+    # 窗口上下文依赖当前活跃窗口：刷新更频繁，使用前校验窗口标题
+    PrefetchSource('window', lambda: fetch_window_context_content(limit=5),
+                   refresh_interval=60, max_age=300, timeout=15, hourly_budget=40,
+                   validate=_window_material_matches_current),
+])
+
+
+def get_proactive_prefetcher() -> ProactivePrefetcher:
+    return _proactive_prefetcher
+
+
 def _extract_links_from_raw(mode: str, raw_data: dict) -> list[dict]:
     """
     从原始 web 数据中提取链接信息列表
@@ -204,18 +245,16 @@ def _format_recent_proactive_chats(lanlan_name: str, lang: str = 'zh') -> str:
     """
     将近期搭话记录格式化为可注入prompt的文本段（含相对时间和来源通道）
     逻辑：
-    - 从 _proactive_chat_history 中获取指定模型的搭话记录
-    - 过滤出最近 _RECENT_CHAT_MAX_AGE_SECONDS 秒内的记录
+    - 从去重索引中获取指定模型最近 _RECENT_CHAT_MAX_AGE_SECONDS 秒内的搭话记录
     - 根据 lang 格式化时间标签（'zh'、'en'、'ja'、'ko'）
     - 格式化来源通道标签（'vision'、'web'）
     """
-    history = _proactive_chat_history.get(lanlan_name)
-    if not history:
-        return ""
-    now = time.time()
-    recent = [entry for entry in history if now - entry[0] < _RECENT_CHAT_MAX_AGE_SECONDS]
+    recent = get_proactive_topic_index().recent_messages(
+        lanlan_name, _RECENT_CHAT_MAX_AGE_SECONDS, limit=_RECENT_CHAT_PROMPT_LIMIT
+    )
     if not recent:
         return ""
+    now = time.time()
 
     _time_labels = {
         'zh': {0: '刚刚', 'm': '{}分钟前', 'h': '{}小时前'},
@@ -251,9 +290,7 @@ def _format_recent_proactive_chats(lanlan_name: str, lang: str = 'zh') -> str:
     header = _loc(RECENT_PROACTIVE_CHATS_HEADER, lang)
     footer = _loc(RECENT_PROACTIVE_CHATS_FOOTER, lang)
     lines = []
-    for entry in recent:
-        ts, msg = entry[0], entry[1]
-        ch = entry[2] if len(entry) > 2 else ''
+    for ts, msg, ch in recent:
         tag = _rel(ts)
         if ch:
             tag += f"·{cl.get(ch, ch)}"
@@ -265,58 +302,26 @@ def _record_proactive_chat(lanlan_name: str, message: str, channel: str = ''):
     """
     记录一次成功的主动搭话（附带来源通道）
     逻辑：
-    - 获取当前时间戳
-    - 将搭话记录（时间戳、消息内容、通道）追加到 _proactive_chat_history 中指定模型的队列中
-    - 若队列已满，自动弹出最早的记录,确保队列长度不超过 maxlen（默认 10）
+    - 将搭话记录（时间戳、消息内容、通道）写入去重索引（内存 + sqlite 持久化）
+    - 会同步写盘，异步调用方应通过 asyncio.to_thread 调用
     args:
     - lanlan_name: 模型名称
     - message: 搭话内容
     - channel: 来源通道（可选，默认 'vision'）
     """
-    if lanlan_name not in _proactive_chat_history:
-        _proactive_chat_history[lanlan_name] = deque(maxlen=10)
-    _proactive_chat_history[lanlan_name].append((time.time(), message, channel))
-
-
-def _normalize_text_for_similarity(text: str) -> str:
-    """
-    文本归一化（保守策略）：
-    - 小写
-    - 合并连续空白
-    仅做轻量归一，避免因过度清洗导致误杀。
-    """
-    text = (text or "").strip().lower()
-    return re.sub(r'\s+', ' ', text)
+    get_proactive_topic_index().record_message(lanlan_name, message, channel)
 
 
 def _is_similar_to_recent_proactive_chat(lanlan_name: str, message: str) -> tuple[bool, float]:
     """
     判断 message 是否与近期主动搭话高度相似（高阈值防误杀）。
-    返回 (is_duplicate, best_score)。
+    返回 (is_duplicate, best_score)，best_score 为 LSH 候选中的最高 Jaccard。
     """
-    history = _proactive_chat_history.get(lanlan_name)
-    if not history or not message.strip():
+    if not message.strip():
         return False, 0.0
-
-    now = time.time()
-    current = _normalize_text_for_similarity(message)
-    if not current:
-        return False, 0.0
-
-    best = 0.0
-    for entry in history:
-        ts, old_msg = entry[0], entry[1]
-        if now - ts >= _RECENT_CHAT_MAX_AGE_SECONDS:
-            continue
-        old_norm = _normalize_text_for_similarity(old_msg)
-        if not old_norm:
-            continue
-        score = difflib.SequenceMatcher(None, current, old_norm).ratio()
-        if score > best:
-            best = score
-        if score >= _PROACTIVE_SIMILARITY_THRESHOLD:
-            return True, score
-    return False, best
+    return get_proactive_topic_index().find_similar_message(
+        lanlan_name, message, _PROACTIVE_SIMILARITY_THRESHOLD, max_age=_PROACTIVE_DEDUP_MAX_AGE_SECONDS
+    )
 
 
 def _build_topic_dedup_key(topic_title: str = '', topic_source: str = '', topic_url: str = '') -> str:
@@ -333,31 +338,25 @@ def _build_topic_dedup_key(topic_title: str = '', topic_source: str = '', topic_
     return ''
 
 
-def _is_recent_topic_used(lanlan_name: str, topic_key: str) -> bool:
+def _is_recent_topic_used(lanlan_name: str, topic_key: str, topic_title: str = '') -> bool:
     """
-    判断某个话题 key 是否在近期已被使用。
+    判断某个话题是否在近期已被使用：key 精确命中，或标题与已用话题近似重复。
     """
     if not topic_key:
         return False
-    history = _proactive_topic_history.get(lanlan_name)
-    if not history:
-        return False
-    now = time.time()
-    for ts, old_key in history:
-        if now - ts < _RECENT_TOPIC_MAX_AGE_SECONDS and old_key == topic_key:
-            return True
-    return False
+    return get_proactive_topic_index().is_topic_used(
+        lanlan_name, topic_key, title=topic_title,
+        title_threshold=_TOPIC_TITLE_SIMILARITY_THRESHOLD, max_age=_PROACTIVE_DEDUP_MAX_AGE_SECONDS,
+    )
 
 
-def _record_topic_usage(lanlan_name: str, topic_key: str):
+def _record_topic_usage(lanlan_name: str, topic_key: str, topic_title: str = ''):
     """
-    记录一次话题 key 使用。
+    记录一次话题使用（会同步写盘，异步调用方应通过 asyncio.to_thread 调用）。
     """
     if not topic_key:
         return
-    if lanlan_name not in _proactive_topic_history:
-        _proactive_topic_history[lanlan_name] = deque(maxlen=100)
-    _proactive_topic_history[lanlan_name].append((time.time(), topic_key))
+    get_proactive_topic_index().record_topic(lanlan_name, topic_key, title=topic_title)
 
 
 def _is_path_within_base(base_dir: str, candidate_path: str) -> bool:
@@ -517,12 +516,47 @@ def _log_personal_dynamics(lanlan_name: str, personal_content: dict):
     else:
         print(f"[{lanlan_name}] 成功获取个人动态 - 但未获取到具体内容")
 
+# 情绪分析 LLM 客户端（按 api_key/base_url 复用，避免每次请求重新建立连接）
+# 请求参数可以覆盖 api_key，因此保留少量客户端；被淘汰的客户端关闭其连接池
+_EMOTION_CLIENT_MAX = 4
+_emotion_clients: "OrderedDict[tuple, AsyncOpenAI]" = OrderedDict()
+
+
+def _get_emotion_client(api_key: str, base_url: str) -> AsyncOpenAI:
+    key = (api_key, base_url)
+    client = _emotion_clients.get(key)
+    if client is not None:
+        _emotion_clients.move_to_end(key)
+        return client
+    client = AsyncOpenAI(api_key=api_key, base_url=base_url)
+    _emotion_clients[key] = client
+    while len(_emotion_clients) > _EMOTION_CLIENT_MAX:
+        _, evicted = _emotion_clients.popitem(last=False)
+        asyncio.create_task(evicted.close())
+    return client
+
+
+def _push_emotion_to_monitor(lanlan_name, emotion: str, confidence: float):
+    """将情绪结果推送到 monitor（如果提供了 lanlan_name）"""
+    sync_message_queue = get_sync_message_queue()
+    if lanlan_name and lanlan_name in sync_message_queue:
+        sync_message_queue[lanlan_name].put({
+            "type": "json",
+            "data": {
+                "type": "emotion",
+                "emotion": emotion,
+                "confidence": confidence
+            }
+        })
+
+
 @router.post('/emotion/analysis')
 async def emotion_analysis(request: Request):
     """
     表情分析接口
     func:
-    - 接收文本输入，调用配置的情绪分析模型进行分析，返回情绪类别和置信度
+    - 接收文本输入，先查结果缓存并用本地多语言词表规则快速分类，有把握时直接返回（不访问网络）
+    - 本地置信度不足时才调用配置的情绪分析模型进行分析，返回情绪类别和置信度，并缓存结果
     - 支持从请求参数覆盖默认配置的API密钥和模型名称，增强灵活性
     - 对模型响应进行智能解析，兼容不同格式（纯文本、markdown代码块、JSON字符串等），提高鲁棒性
     - 根据置信度自动调整情绪类别，当置信度较低时将情绪设置为 neutral，提升结果可靠性
@@ -537,6 +571,18 @@ async def emotion_analysis(request: Request):
         text = data['text']
         api_key = data.get('api_key')
         model = data.get('model')
+        lanlan_name = data.get('lanlan_name')
+        
+        # 快路径：结果缓存 / 本地规则分类（微秒级，表情与语音同步）
+        classifier = get_emotion_classifier()
+        local_result = classifier.classify(text)
+        if local_result is not None:
+            _push_emotion_to_monitor(lanlan_name, local_result.emotion, local_result.confidence)
+            return {
+                "emotion": local_result.emotion,
+                "confidence": local_result.confidence,
+                "source": local_result.source
+            }
         
         # 使用参数或默认配置，使用 .get() 安全获取避免 KeyError
         emotion_config = _config_manager.get_model_api_config('emotion')
@@ -554,8 +600,8 @@ async def emotion_analysis(request: Request):
         if not model:
             return {"error": "情绪分析模型配置缺失: 模型名称未提供且配置中未设置默认模型"}
         
-        # 创建异步客户端
-        client = AsyncOpenAI(api_key=api_key, base_url=emotion_base_url)
+        # 复用异步客户端
+        client = _get_emotion_client(api_key, emotion_base_url)
         
         # 构建请求消息
         messages = [
@@ -614,22 +660,16 @@ async def emotion_analysis(request: Request):
             if confidence < 0.3:
                 emotion = "neutral"
             
-            # 获取 lanlan_name 并推送到 monitor
-            lanlan_name = data.get('lanlan_name')
-            sync_message_queue = get_sync_message_queue()
-            if lanlan_name and lanlan_name in sync_message_queue:
-                sync_message_queue[lanlan_name].put({
-                    "type": "json",
-                    "data": {
-                        "type": "emotion",
-                        "emotion": emotion,
-                        "confidence": confidence
-                    }
-                })
+            # 缓存 LLM 结果，相同文本不再重复请求
+            classifier.remember(text, emotion, confidence)
+            
+            # 推送到 monitor
+            _push_emotion_to_monitor(lanlan_name, emotion, confidence)
             
             return {
                 "emotion": emotion,
-                "confidence": confidence
+                "confidence": confidence,
+                "source": "llm"
             }
         except json.JSONDecodeError:
             # 如果JSON解析失败，返回简单的情感判断
@@ -1183,6 +1223,105 @@ async def proxy_image(image_path: str):
         logger.error(f"代理图片访问失败: {str(e)}")
         return JSONResponse(content={"success": False, "error": f"访问图片失败: {str(e)}"}, status_code=500)
 
+@router.get('/tts/cache_stats')
+async def get_tts_cache_stats():
+    """
+    获取 TTS 短句音频缓存的命中率与占用情况
+    """
+    try:
+        from main_logic.tts_audio_cache import get_tts_audio_cache
+        return JSONResponse({"success": True, "stats": get_tts_audio_cache().get_stats()})
+    except Exception as e:
+        logger.error(f"获取TTS缓存统计失败: {e}")
+        return JSONResponse({"success": False, "error": str(e)}, status_code=500)
+
+@router.get('/latency/stats')
+async def get_latency_stats(lanlan_name: str = None):
+    """
+    获取各角色的轮次延迟直方图（按阶段）与最近若干轮的阶段耗时
+    """
+    try:
+        from main_logic.turn_latency import get_latency_snapshot
+        return JSONResponse({"success": True, **get_latency_snapshot(lanlan_name)})
+    except Exception as e:
+        logger.error(f"获取延迟统计失败: {e}")
+        return JSONResponse({"success": False, "error": str(e)}, status_code=500)
+
+@router.get('/vision/cache_stats')
+async def get_vision_cache_stats():
+    """
+    获取视觉模型画面描述缓存的命中率与占用情况
+    """
+    try:
+        from utils.screenshot_utils import get_vision_description_cache
+        return JSONResponse({"success": True, "stats": get_vision_description_cache().get_stats()})
+    except Exception as e:
+        logger.error(f"获取视觉描述缓存统计失败: {e}")
+        return JSONResponse({"success": False, "error": str(e)}, status_code=500)
+
+@router.get('/translate/cache_stats')
+async def get_translation_cache_stats():
+    """
+    获取持久化翻译缓存的命中率与占用情况
+    """
+    try:
+        from utils.translation_cache import get_translation_cache
+        stats = await asyncio.to_thread(get_translation_cache().get_stats)
+        return JSONResponse({"success": True, "stats": stats})
+    except Exception as e:
+        logger.error(f"获取翻译缓存统计失败: {e}")
+        return JSONResponse({"success": False, "error": str(e)}, status_code=500)
+
+@router.get('/emotion/cache_stats')
+async def get_emotion_cache_stats():
+    """
+    获取情绪分析本地快路径与结果缓存的命中情况
+    """
+    try:
+        return JSONResponse({"success": True, "stats": get_emotion_classifier().get_stats()})
+    except Exception as e:
+        logger.error(f"获取情绪分析统计失败: {e}")
+        return JSONResponse({"success": False, "error": str(e)}, status_code=500)
+
+@router.get('/web_scraper/cache_stats')
+async def get_web_scraper_cache_stats():
+    """
+    获取热榜/搜索/个人动态抓取结果缓存与条件请求（304）的命中情况
+    """
+    try:
+        from utils.web_scraper import get_conditional_cache, get_source_cache
+        return JSONResponse({
+            "success": True,
+            "stats": get_source_cache().get_stats(),
+            "conditional": get_conditional_cache().get_stats(),
+        })
+    except Exception as e:
+        logger.error(f"获取抓取缓存统计失败: {e}")
+        return JSONResponse({"success": False, "error": str(e)}, status_code=500)
+
+@router.get('/proactive/prefetch_stats')
+async def get_proactive_prefetch_stats():
+    """
+    获取主动搭话素材预取池的命中情况与各来源状态
+    """
+    try:
+        return JSONResponse({"success": True, "stats": _proactive_prefetcher.get_stats()})
+    except Exception as e:
+        logger.error(f"获取搭话素材预取统计失败: {e}")
+        return JSONResponse({"success": False, "error": str(e)}, status_code=500)
+
+@router.get('/proactive/dedup_stats')
+async def get_proactive_dedup_stats():
+    """
+    获取主动搭话去重索引的命中情况与各角色的历史条数
+    """
+    try:
+        index = await asyncio.to_thread(get_proactive_topic_index)
+        return JSONResponse({"success": True, "stats": index.get_stats()})
+    except Exception as e:
+        logger.error(f"获取搭话去重索引统计失败: {e}")
+        return JSONResponse({"success": False, "error": str(e)}, status_code=500)
+
 @router.get('/get_window_title')
 async def get_window_title_api():
     """
@@ -1255,6 +1394,9 @@ async def proactive_chat(request: Request):
             }, status_code=409)
         
         print(f"[{lanlan_name}] 开始主动搭话流程（两阶段架构）...")
+
+        # 首次使用时载入持久化的搭话/话题历史，放到线程中避免阻塞事件循环
+        await asyncio.to_thread(get_proactive_topic_index)
         
         # ========== 解析 enabled_modes ==========
         enabled_modes = data.get('enabled_modes', [])
@@ -1306,7 +1448,7 @@ async def proactive_chat(request: Request):
                 return (mode, {'window_title': window_title, 'screenshot_b64': compressed_b64})
             
             elif mode == 'news':
-                news_content = await fetch_news_content(limit=_PHASE1_FETCH_PER_SOURCE)
+                news_content = await _proactive_prefetcher.get('news')
                 if not news_content['success']:
                     raise ValueError(f"获取新闻失败: {news_content.get('error')}")
                 formatted = format_news_content(news_content)
@@ -1316,7 +1458,7 @@ async def proactive_chat(request: Request):
                 return (mode, {'formatted_content': formatted, 'raw_data': news_content, 'links': links})
             
             elif mode == 'video':
-                video_content = await fetch_video_content(limit=_PHASE1_FETCH_PER_SOURCE)
+                video_content = await _proactive_prefetcher.get('video')
                 if not video_content['success']:
                     raise ValueError(f"获取视频失败: {video_content.get('error')}")
                 formatted = format_video_content(video_content)
@@ -1325,7 +1467,7 @@ async def proactive_chat(request: Request):
                 return (mode, {'formatted_content': formatted, 'raw_data': video_content, 'links': links})
             
             elif mode == 'window':
-                window_context_content = await fetch_window_context_content(limit=5)
+                window_context_content = await _proactive_prefetcher.get('window')
                 if not window_context_content['success']:
                     raise ValueError(f"获取窗口上下文失败: {window_context_content.get('error')}")
                 formatted = format_window_context_content(window_context_content)
@@ -1335,10 +1477,7 @@ async def proactive_chat(request: Request):
                 return (mode, {'formatted_content': formatted, 'raw_data': window_context_content, 'links': []})
             
             elif mode == 'home':
-                trending_content = await fetch_trending_content(
-                    bilibili_limit=_PHASE1_FETCH_PER_SOURCE,
-                    weibo_limit=_PHASE1_FETCH_PER_SOURCE
-                )
+                trending_content = await _proactive_prefetcher.get('home')
                 if not trending_content['success']:
                     raise ValueError(f"获取首页推荐失败: {trending_content.get('error')}")
                 formatted = format_trending_content(trending_content)
@@ -1347,7 +1486,7 @@ async def proactive_chat(request: Request):
                 return (mode, {'formatted_content': formatted, 'raw_data': trending_content, 'links': links})
 
             elif mode == 'personal':
-                personal_dynamics = await fetch_personal_dynamics(limit=_PHASE1_FETCH_PER_SOURCE)
+                personal_dynamics = await _proactive_prefetcher.get('personal')
                 if not personal_dynamics['success']:
                     raise ValueError(f"获取个人动态失败: {personal_dynamics.get('error')}")
                 formatted = format_personal_dynamics(personal_dynamics)
@@ -1358,7 +1497,8 @@ async def proactive_chat(request: Request):
             else:
                 raise ValueError(f"未知模式: {mode}")
         
-        # 并行获取所有信息源
+        # 并行获取所有信息源（预取池中有可用素材时直接返回，并保持这些来源的后台刷新）
+        _proactive_prefetcher.touch(enabled_modes)
         fetch_tasks = [_fetch_source(m) for m in enabled_modes]
         fetch_results = await asyncio.gather(*fetch_tasks, return_exceptions=True)
         
@@ -1565,7 +1705,7 @@ async def proactive_chat(request: Request):
                     url = link.get('url', '')
                     key = _build_topic_dedup_key(topic_title=title, topic_source=source, topic_url=url)
                     if key:
-                        if key in seen_topic_keys or _is_recent_topic_used(lanlan_name, key):
+                        if key in seen_topic_keys or _is_recent_topic_used(lanlan_name, key, title):
                             continue
                         seen_topic_keys.add(key)
                     selected_links.append(link)
@@ -1607,6 +1747,7 @@ async def proactive_chat(request: Request):
         phase1_topics: list[tuple[str, str]] = []  # [(channel, topic_summary), ...]
         source_links: list[dict] = []  # [{"title": ..., "url": ..., "source": ...}]
         selected_web_topic_key = ''
+        selected_web_topic_title = ''
         
         # --- Web 通道: 1 次 LLM 筛选 ---
         if merged_web_content:
@@ -1628,11 +1769,12 @@ async def proactive_chat(request: Request):
                             topic_source=parsed.get('source', ''),
                             topic_url=(matched.get('url', '') if matched else ''),
                         )
-                        if topic_key and _is_recent_topic_used(lanlan_name, topic_key):
+                        if topic_key and _is_recent_topic_used(lanlan_name, topic_key, parsed.get('title', '')):
                             print(f"[{lanlan_name}] Phase 1 话题去重命中，跳过: {parsed.get('title','')[:60]}")
                             web_result_text = "[PASS] duplicate topic"
                         else:
                             selected_web_topic_key = topic_key
+                            selected_web_topic_title = parsed.get('title', '')
                             if matched:
                                 source_links.append({
                                     'title': parsed.get('title', matched.get('title', '')),
@@ -1881,9 +2023,9 @@ async def proactive_chat(request: Request):
         await mgr.finish_proactive_delivery(response_text)
 
         # 记录主动搭话
-        _record_proactive_chat(lanlan_name, response_text, primary_channel)
+        await asyncio.to_thread(_record_proactive_chat, lanlan_name, response_text, primary_channel)
         if source_tag != 'SCREEN' and selected_web_topic_key:
-            _record_topic_usage(lanlan_name, selected_web_topic_key)
+            await asyncio.to_thread(_record_topic_usage, lanlan_name, selected_web_topic_key, selected_web_topic_title)
 
         return JSONResponse({
             "success": True,
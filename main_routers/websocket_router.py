@@ -90,6 +90,10 @@ async def websocket_endpoint(websocket: WebSocket, lanlan_name: str):
                 user_language = message.get("language")
                 session_manager[lanlan_name].set_user_language(user_language)
                 logger.info(f"收到用户语言设置: {user_language}")
+
+            # 前端支持的语音下行格式（通常随 start_session 携带）
+            if "audio_formats" in message:
+                session_manager[lanlan_name].set_audio_output_formats(message.get("audio_formats"))
             
             # logger.debug(f"WebSocket received action: {action}") # Optional debug log
 
@@ -105,7 +109,8 @@ async def websocket_endpoint(websocket: WebSocket, lanlan_name: str):
                     await session_manager[lanlan_name].send_status(f"Invalid input type: {input_type}")
 
             elif action == "stream_data":
-                asyncio.create_task(session_manager[lanlan_name].stream_data(message))
+                mgr = session_manager[lanlan_name]
+                asyncio.create_task(mgr.stream_data(message, received_at=mgr.latency.now()))
 
             elif action == "end_session":
                 session_manager[lanlan_name].active_session_is_idle = False
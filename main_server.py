@@ -155,6 +155,9 @@ def cleanup():
     for k in sync_shutdown_event:
         try:
             sync_shutdown_event[k].set()
+            # 唤醒阻塞等待消息的连接器，使其立即检查退出标志
+            if k in sync_message_queue:
+                sync_message_queue[k].wake()
         except Exception:
             pass
 
@@ -287,7 +290,7 @@ async def initialize_character_data():
     for k in catgirl_names:
         is_new_character = False
         if k not in sync_message_queue:
-            sync_message_queue[k] = Queue()
+            sync_message_queue[k] = cross_server.SyncMessageQueue()
             sync_shutdown_event[k] = ThreadEvent()
             session_id[k] = None
             sync_process[k] = None
@@ -413,6 +416,8 @@ async def initialize_character_data():
                 logger.info(f"正在停止已删除角色 {k} 的同步连接器线程...")
                 if k in sync_shutdown_event:
                     sync_shutdown_event[k].set()
+                    if k in sync_message_queue:
+                        sync_message_queue[k].wake()
                 sync_process[k].join(timeout=3)  # 等待线程正常结束
                 if sync_process[k].is_alive():
                     logger.warning(f"⚠️ 同步连接器线程 {k} 未能在超时内停止，将作为daemon线程自动清理")
@@ -872,6 +877,15 @@ async def shutdown_server_async():
         except Exception as e:
             logger.debug(f"取消创意工坊后台任务时出错: {e}")
         
+        # 停止主动搭话素材预取，并关闭网页抓取共享的 HTTP 连接池
+        try:
+            from main_routers.system_router import get_proactive_prefetcher
+            from utils.web_scraper import close_http_client
+            await get_proactive_prefetcher().stop()
+            await close_http_client()
+        except Exception as e:
+            logger.debug(f"关闭网页抓取连接池时出错: {e}")
+
         # 向memory_server发送关闭信号
         try:
             from config import MEMORY_SERVER_PORT
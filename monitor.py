@@ -187,6 +187,7 @@ async def get_index(request: Request, lanlan_name: str):
 # 存储所有连接的客户端
 connected_clients = set()
 subtitle_clients = set()
+binary_upstreams = set()  # 主服务器的二进制同步连接，用于告知当前查看客户端数量
 current_subtitle = ""
 should_clear_next = False
 
@@ -324,6 +325,9 @@ async def sync_endpoint(websocket: WebSocket, lanlan_name:str):
 async def sync_binary_endpoint(websocket: WebSocket, lanlan_name:str):
     await websocket.accept()
     print(f"✅ [BINARY] 主服务器二进制连接已建立: {websocket.client}")
+    binary_upstreams.add(websocket)
+    # 主服务器只在有查看客户端时才转发音频
+    await notify_listener_count()
 
     try:
         while True:
@@ -337,6 +341,18 @@ async def sync_binary_endpoint(websocket: WebSocket, lanlan_name:str):
         print(f"❌ [BINARY] 主服务器二进制连接已断开: {websocket.client}")
     except Exception as e:
         logger.error(f"❌ [BINARY] 二进制同步端点错误: {e}")
+    finally:
+        binary_upstreams.discard(websocket)
+
+
+# 通知主服务器当前查看客户端数量（没有客户端时主服务器停止转发音频）
+async def notify_listener_count():
+    message = json.dumps({"type": "listeners", "count": len(connected_clients)})
+    for upstream in list(binary_upstreams):
+        try:
+            await upstream.send_text(message)
+        except Exception:
+            binary_upstreams.discard(upstream)
 
 
 # 客户端连接端点
@@ -347,6 +363,7 @@ async def websocket_endpoint(websocket: WebSocket, lanlan_name:str):
 
     # 添加到连接集合
     connected_clients.add(websocket)
+    await notify_listener_count()
 
     try:
         # 保持连接直到客户端断开
@@ -369,6 +386,7 @@ async def websocket_endpoint(websocket: WebSocket, lanlan_name:str):
         # 安全地移除客户端（即使已经被移除也不会报错）
         connected_clients.discard(websocket)
         print(f"🗑️ [CLIENT] 已移除客户端，当前剩余: {len(connected_clients)}")
+        await notify_listener_count()
 
 
 # 广播消息到所有客户端
@@ -391,6 +409,8 @@ async def broadcast_message(message):
     for client in disconnected_clients:
         connected_clients.discard(client)
         print(f"🗑️ [BROADCAST] 移除断开的客户端: {client.client}")
+    if disconnected_clients:
+        await notify_listener_count()
     
     if success_count > 0:
         print(f"✅ [BROADCAST] 成功广播到 {success_count} 个客户端" + (f", 失败并移除 {fail_count} 个" if fail_count > 0 else ""))
@@ -416,6 +436,8 @@ async def broadcast_binary(data):
     for client in disconnected_clients:
         connected_clients.discard(client)
         print(f"🗑️ [BINARY BROADCAST] 移除断开的客户端: {client.client}")
+    if disconnected_clients:
+        await notify_listener_count()
     
     if success_count > 0:
         print(f"✅ [BINARY BROADCAST] 成功广播音频到 {success_count} 个客户端" + (f", 失败并移除 {fail_count} 个" if fail_count > 0 else ""))
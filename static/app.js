@@ -692,6 +692,7 @@ function init_app() {
                                     // 发送start session事件
                                     socket.send(JSON.stringify({
                                         action: 'start_session',
+                                        audio_formats: getSupportedAudioFormats(),
                                         input_type: 'audio'
                                     }));
 
@@ -3350,6 +3351,7 @@ function init_app() {
             if (socket.readyState === WebSocket.OPEN) {
                 socket.send(JSON.stringify({
                     action: 'start_session',
+                    audio_formats: getSupportedAudioFormats(),
                     input_type: 'audio'
                 }));
 
@@ -3688,6 +3690,7 @@ function init_app() {
             if (socket.readyState === WebSocket.OPEN) {
                 socket.send(JSON.stringify({
                     action: 'start_session',
+                    audio_formats: getSupportedAudioFormats(),
                     input_type: 'text',
                     new_session: true
                 }));
@@ -3842,6 +3845,7 @@ function init_app() {
                 if (socket.readyState === WebSocket.OPEN) {
                     socket.send(JSON.stringify({
                         action: 'start_session',
+                        audio_formats: getSupportedAudioFormats(),
                         input_type: 'text',
                         new_session: false
                     }));
@@ -75,6 +75,16 @@ async function getOggOpusDecoder() {
     }
 }
 
+// 声明本客户端可接收的语音下行格式（随 start_session 发送给服务端协商）
+// 解码库加载成功时优先接收 OGG/Opus，否则只接收 PCM16
+function getSupportedAudioFormats() {
+    const module = window["ogg-opus-decoder"];
+    if (module && module.OggOpusDecoder) {
+        return ['ogg_opus', 'pcm16'];
+    }
+    return ['pcm16'];
+}
+
 // 重置解码器（在新的音频流开始时调用）
 // 使用 reset() 而非 free()：reset() 是为新的音频流做状态重置，实例仍可复用
 async function resetOggOpusDecoder() {
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+"""
+会话专用 DSP 线程（utils/audio_processor.py 的 AudioDSPWorker）— 单元测试
+
+用桩 processor 代替 RNNoise，覆盖范围:
+- 音频块按提交顺序处理
+- shutdown 时正在处理的音频块处理完，排队中的音频块被取消
+- shutdown 后再次 process 会重建线程
+"""
+
+import asyncio
+import os
+import sys
+import threading
+
+import pytest
+
+# 确保项目根目录在 sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from utils.audio_processor import AudioDSPWorker
+
+
+class _StubProcessor:
+    """记录处理顺序；gate 未放行前阻塞在第一个音频块上"""
+
+    def __init__(self):
+        self.seen = []
+        self.started = threading.Event()
+        self.gate = threading.Event()
+        self.gate.set()
+
+    def process_chunk(self, audio_bytes: bytes) -> bytes:
+        self.started.set()
+        self.gate.wait(5)
+        self.seen.append(audio_bytes)
+        return audio_bytes[::-1]
+
+
+@pytest.mark.unit
+class TestAudioDSPWorker:
+    async def test_chunks_processed_in_order(self):
+        processor = _StubProcessor()
+        worker = AudioDSPWorker(processor, name="test-dsp")
+        try:
+            chunks = [bytes([i, 0]) for i in range(20)]
+            results = await asyncio.gather(*(worker.process(c) for c in chunks))
+        finally:
+            worker.shutdown()
+        assert processor.seen == chunks
+        assert results == [c[::-1] for c in chunks]
+        stats = worker.get_stats()
+        assert stats["processed"] == 20 and stats["pending"] == 0
+
+    async def test_shutdown_finishes_running_chunk_and_cancels_queued(self):
+        processor = _StubProcessor()
+        processor.gate.clear()
+        worker = AudioDSPWorker(processor, name="test-dsp")
+        running = asyncio.create_task(worker.process(b"\x01\x00"))
+        queued = asyncio.create_task(worker.process(b"\x02\x00"))
+        assert await asyncio.to_thread(processor.started.wait, 5)
+
+        worker.shutdown()
+        processor.gate.set()
+        assert await running == b"\x00\x01"
+        with pytest.raises(asyncio.CancelledError):
+            await queued
+        assert processor.seen == [b"\x01\x00"]
+
+        # 关闭后再次调用会自动重建线程
+        assert await worker.process(b"\x03\x00") == b"\x00\x03"
+        worker.shutdown()
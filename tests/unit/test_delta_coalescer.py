@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+"""
+文本增量合包（main_logic/delta_coalescer.py）— 单元测试
+
+覆盖范围:
+- 新消息首个增量立即发送，之后的增量在 40ms 时间窗到期后合并为一帧
+- key 变化时旧 key 下的文本先发送；flush 立即发送、discard 丢弃
+- 定时 flush 与新消息首帧交错时帧仍按产生顺序发出
+- 在真实 LLMSessionManager 中：轮次结束时合包文本先于 turn end / TTS 结束信号发出，
+  打断与响应丢弃时未发送的文本被丢弃
+"""
+
+import asyncio
+import os
+import sys
+import threading
+from queue import Queue
+
+import pytest
+
+# 确保项目根目录在 sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from starlette.websockets import WebSocketState
+
+from main_logic.core import LLMSessionManager
+from main_logic.delta_coalescer import DEFAULT_WINDOW_MS, DeltaCoalescer
+from utils.config_manager import get_config_manager
+
+WINDOW_S = DEFAULT_WINDOW_MS / 1000
+
+
+class _Recorder:
+    def __init__(self):
+        self.frames = []
+        self.times = []
+
+    async def emit(self, text, is_first_chunk, key):
+        self.frames.append((text, is_first_chunk, key))
+        self.times.append(asyncio.get_running_loop().time())
+
+
+# ==================== DeltaCoalescer ====================
+
+@pytest.mark.unit
+class TestDeltaCoalescer:
+    async def test_first_delta_immediate_rest_merged_after_window(self):
+        rec = _Recorder()
+        coalescer = DeltaCoalescer(rec.emit)
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        await coalescer.push("你", is_first_chunk=True, key="s1")
+        assert rec.frames == [("你", True, "s1")]
+        for delta in ("好", "呀", "！"):
+            await coalescer.push(delta, key="s1")
+            await asyncio.sleep(0.005)
+        assert len(rec.frames) == 1
+
+        await asyncio.sleep(WINDOW_S * 2)
+        assert rec.frames == [("你", True, "s1"), ("好呀！", False, "s1")]
+        # 合并帧在时间窗到期后才发送（从第一个被缓冲的增量算起）
+        assert rec.times[1] - start >= WINDOW_S * 0.9
+        assert coalescer.get_stats() == {"deltas_in": 4, "frames_out": 2, "deltas_per_frame": 2.0}
+
+    async def test_key_change_flushes_old_key(self):
+        rec = _Recorder()
+        coalescer = DeltaCoalescer(rec.emit)
+        await coalescer.push("a", key="s1")
+        await coalescer.push("b", key="s1")
+        await coalescer.push("c", key="s2")
+        await coalescer.flush()
+        assert rec.frames == [("ab", False, "s1"), ("c", False, "s2")]
+
+    async def test_flush_and_discard(self):
+        rec = _Recorder()
+        coalescer = DeltaCoalescer(rec.emit)
+        await coalescer.push("a")
+        await coalescer.flush()
+        assert rec.frames == [("a", False, None)]
+
+        await coalescer.push("b")
+        coalescer.discard()
+        await asyncio.sleep(WINDOW_S * 2)
+        assert rec.frames == [("a", False, None)]
+
+        # 空文本的非首帧增量被忽略；空的首帧仍然发送（标记新消息）
+        await coalescer.push("")
+        await coalescer.push("", is_first_chunk=True)
+        assert rec.frames[-1] == ("", True, None)
+
+    async def test_frames_keep_order_when_timer_races_new_message(self):
+        rec = _Recorder()
+        emit_started = asyncio.Event()
+        release = asyncio.Event()
+
+        async def slow_emit(text, is_first_chunk, key):
+            emit_started.set()
+            await release.wait()
+            await rec.emit(text, is_first_chunk, key)
+
+        coalescer = DeltaCoalescer(slow_emit, window_ms=10)
+        await coalescer.push("old")
+        # 定时 flush 开始发送 "old" 并阻塞在 emit 中
+        await asyncio.wait_for(emit_started.wait(), 1)
+        new_message = asyncio.create_task(coalescer.push("new", is_first_chunk=True))
+        await asyncio.sleep(0.01)
+        release.set()
+        await new_message
+        assert [frame[0] for frame in rec.frames] == ["old", "new"]
+
+    async def test_emit_errors_do_not_propagate(self):
+        async def failing_emit(text, is_first_chunk, key):
+            raise RuntimeError("ws closed")
+
+        coalescer = DeltaCoalescer(failing_emit)
+        await coalescer.push("a", is_first_chunk=True)
+        await coalescer.push("b")
+        await coalescer.flush()
+
+
+# ==================== LLMSessionManager 中的合包出口 ====================
+
+class _FakeWebSocket:
+    client_state = WebSocketState.CONNECTED
+
+    def __init__(self):
+        self.sent_json = []
+
+    async def send_json(self, message):
+        self.sent_json.append(message)
+
+    async def send_bytes(self, payload):
+        pass
+
+
+@pytest.fixture
+def manager():
+    lanlan_name = get_config_manager().get_character_data()[1]
+    mgr = LLMSessionManager(Queue(), lanlan_name, "prompt")
+    mgr.websocket = _FakeWebSocket()
+    mgr.use_tts = True
+    mgr.tts_ready = True
+    stop = threading.Event()
+    mgr.tts_thread = threading.Thread(target=stop.wait, daemon=True)
+    mgr.tts_thread.start()
+    yield mgr
+    stop.set()
+
+
+def _drain(q: Queue) -> list:
+    items = []
+    while not q.empty():
+        items.append(q.get_nowait())
+    return items
+
+
+def _ws_frames(mgr) -> list:
+    return [(m["text"], m["isNewMessage"]) for m in mgr.websocket.sent_json if m.get("type") == "gemini_response"]
+
+
+@pytest.mark.unit
+class TestManagerOutlets:
+    async def test_turn_end_after_coalesced_text(self, manager):
+        manager.current_speech_id = "s1"
+        deltas = ["今天", "天气", "真不错", "，", "出去", "走走吧"]
+        await manager.handle_output_transcript(deltas[0], is_first_chunk=True)
+        for delta in deltas[1:]:
+            await manager.handle_output_transcript(delta)
+        # 时间窗尚未到期：只有首帧已发送
+        assert _ws_frames(manager) == [("今天", True)]
+
+        await manager.handle_response_complete()
+        sent = manager.websocket.sent_json
+        assert _ws_frames(manager) == [("今天", True), ("".join(deltas[1:]), False)]
+        assert sent[-1] == {"type": "system", "data": "turn end"}
+
+        sync = _drain(manager.sync_message_queue)
+        texts = [m["data"]["text"] for m in sync if m["type"] == "json"]
+        assert "".join(texts) == "".join(deltas)
+        assert sync[-1] == {"type": "system", "data": "turn end"}
+        assert [i for i, m in enumerate(sync) if m["type"] == "json"] == [0, 1]
+
+        tts = _drain(manager.tts_request_queue)
+        assert tts == [("s1", "今天"), ("s1", "".join(deltas[1:])), (None, None)]
+
+    async def test_timer_flush_reaches_both_outlets(self, manager):
+        manager.current_speech_id = "s1"
+        await manager.handle_output_transcript("你好", is_first_chunk=True)
+        await manager.handle_output_transcript("呀")
+        await manager.handle_output_transcript("！")
+        await asyncio.sleep(WINDOW_S * 2)
+        assert _ws_frames(manager) == [("你好", True), ("呀！", False)]
+        assert _drain(manager.tts_request_queue) == [("s1", "你好"), ("s1", "呀！")]
+
+    async def test_interrupt_discards_pending_tts_text(self, manager):
+        manager.current_speech_id = "s1"
+        await manager.handle_output_transcript("旧回复", is_first_chunk=True)
+        await manager.handle_output_transcript("还没说完")
+        # 用户打断：新一轮开始，旧回复尚未发送给 TTS 的文本被丢弃
+        await manager.handle_new_message()
+        await asyncio.sleep(WINDOW_S * 2)
+        tts = [item for item in _drain(manager.tts_request_queue) if item[0] != "__interrupt__"]
+        assert tts == [("s1", "旧回复")]
+        assert manager.current_speech_id != "s1"
+
+    async def test_discarded_response_drops_pending_frames(self, manager):
+        await manager.handle_output_transcript("被丢弃", is_first_chunk=True)
+        await manager.handle_output_transcript("的回复")
+        await manager.handle_response_discarded("repetition", 1, 3, True)
+        await asyncio.sleep(WINDOW_S * 2)
+        assert _ws_frames(manager) == [("被丢弃", True)]
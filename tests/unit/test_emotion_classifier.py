@@ -0,0 +1,184 @@
+# -*- coding: utf-8 -*-
+"""
+本地情绪快速分类（utils/emotion_classifier.py）与情绪分析客户端复用 — 单元测试
+
+覆盖范围:
+- 否定出现在情绪词前（"不开心"、"not happy"）与之后（"嬉しくない"）时不会判成开心
+- 单个弱信号（"www.example.com"、单独的"麻烦"/"damn"）不在本地定论，交给 LLM
+- 普通词中包含的短情绪词（"滚动"、"えっと"、"헐거워진"）不计入；限定上下文的形式仍能识别
+- 置信度门限：得分接近的混合情绪、提高门限后的结果都回退到 LLM
+- 结果缓存按 LRU 淘汰，remember 写回 LLM 结果
+- system_router 的情绪分析客户端按 (api_key, base_url) 复用，被淘汰的客户端会关闭
+"""
+
+import asyncio
+import importlib
+import os
+import sys
+
+import pytest
+
+# 确保项目根目录在 sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+import utils.emotion_classifier as emotion_module
+from utils.emotion_classifier import EmotionClassifier, classify_emotion_local
+
+
+def _emotion(text):
+    result = classify_emotion_local(text)
+    return result[0] if result else None
+
+
+@pytest.mark.unit
+class TestNegation:
+    @pytest.mark.parametrize("text", ["好开心呀！！", "I am so happy!!", "嬉しい！！"])
+    def test_plain_happy(self, text):
+        assert _emotion(text) == "happy"
+
+    @pytest.mark.parametrize("text", [
+        "一点都不开心！！",          # 否定在前（中文）
+        "not happy!!",              # 否定在前（英文）
+        "嬉しくない！！",            # 否定在后（日语形容词否定形）
+        "楽しくないよ！！",
+        "我今天一点都不开心，呜呜",
+        "I am not happy, so sad",
+        "嬉しくないよ、悲しい",
+    ])
+    def test_negated_happy_turns_sad(self, text):
+        assert _emotion(text) == "sad"
+
+    @pytest.mark.parametrize("text", ["不开心", "I am not happy", "嬉しくない", "not glad"])
+    def test_bare_negation_never_happy(self, text):
+        assert _emotion(text) != "happy"
+
+    def test_negated_other_emotions_only_cancel(self):
+        # 否定只抵消 sad/angry/surprised，不会转成别的情绪
+        assert classify_emotion_local("悲しくない") is None
+        assert classify_emotion_local("不生气") is None
+
+
+@pytest.mark.unit
+class TestWeakSignals:
+    @pytest.mark.parametrize("text", [
+        "www.example.com", "麻烦", "damn", "haha", "开心", "你好", "明天见", "", "   ",
+    ])
+    def test_weak_or_missing_signal_falls_back(self, text):
+        assert classify_emotion_local(text) is None
+
+    def test_classifier_counts_fallbacks(self):
+        classifier = EmotionClassifier()
+        assert classifier.classify("damn") is None
+        assert classifier.get_stats()["llm_fallbacks"] == 1
+
+
+@pytest.mark.unit
+class TestAmbiguousTerms:
+    @pytest.mark.parametrize("text", [
+        "页面滚动到底部了",
+        "我在床上打滚",
+        "滚烫的咖啡要小心哦",
+        "えっと、今日は何しようかな",
+        "헐거워진 나사",
+    ])
+    def test_substring_of_ordinary_word_not_classified(self, text):
+        assert classify_emotion_local(text) is None
+
+    def test_ordinary_word_result_not_cached(self):
+        classifier = EmotionClassifier()
+        assert classifier.classify("页面滚动到底部了") is None
+        assert classifier.get_stats()["cache_entries"] == 0
+
+    @pytest.mark.parametrize("text, emotion", [
+        ("滚开！", "angry"),
+        ("给我滚", "angry"),
+        ("滚蛋吧你", "angry"),
+        ("えっ！", "surprised"),
+        ("えっ？本当に？", "surprised"),
+        ("えっ", "surprised"),
+        ("헐 대박", "surprised"),
+    ])
+    def test_bounded_forms_still_classified(self, text, emotion):
+        assert _emotion(text) == emotion
+
+
+@pytest.mark.unit
+class TestConfidenceGate:
+    def test_mixed_emotions_fall_back(self):
+        assert classify_emotion_local("哈哈，气死我了") is None
+
+    def test_local_results_meet_threshold(self):
+        for text in ("好耶！太好了哈哈", "真的吗？没想到", "气死我了！！", "damn it, I hate this"):
+            emotion, confidence = classify_emotion_local(text)
+            assert confidence >= emotion_module.LOCAL_CONFIDENCE_THRESHOLD
+            assert confidence <= 0.95
+
+    def test_raised_threshold_falls_back(self, monkeypatch):
+        assert classify_emotion_local("太好了") == ("happy", 0.79)
+        monkeypatch.setattr(emotion_module, "LOCAL_CONFIDENCE_THRESHOLD", 0.8)
+        assert classify_emotion_local("太好了") is None
+
+
+@pytest.mark.unit
+class TestResultCache:
+    def test_lru_eviction(self):
+        classifier = EmotionClassifier(cache_size=2)
+        assert classifier.classify("好耶！太好了哈哈").source == "local"
+        assert classifier.classify("气死我了！！").source == "local"
+        # 访问后移到队尾，下一次淘汰的是 "气死我了！！"
+        assert classifier.classify("好耶！太好了哈哈").source == "cache"
+        assert classifier.classify("真的吗？没想到").source == "local"
+        assert classifier.classify("好耶！太好了哈哈").source == "cache"
+        assert classifier.classify("气死我了！！").source == "local"
+        stats = classifier.get_stats()
+        assert stats["cache_entries"] == 2
+        assert stats["cache_hits"] == 2 and stats["local_hits"] == 4
+
+    def test_remember_llm_result(self):
+        classifier = EmotionClassifier()
+        text = "今天下雨了"
+        assert classifier.classify(text) is None
+        classifier.remember(text, "sad", 0.7)
+        # 按规范化文本命中（大小写、空白不同）
+        cached = classifier.classify("  今天下雨了 ")
+        assert cached == ("sad", 0.7, "cache")
+
+    def test_remember_ignores_invalid(self):
+        classifier = EmotionClassifier()
+        classifier.remember("今天下雨了", "confused", 0.9)
+        classifier.remember("   ", "sad", 0.9)
+        assert classifier.get_stats()["cache_entries"] == 0
+
+    def test_empty_text_is_neutral(self):
+        assert EmotionClassifier().classify("") == ("neutral", 0.5, "local")
+
+
+# ==================== 情绪分析客户端复用 ====================
+
+class _FakeAsyncOpenAI:
+    def __init__(self, api_key=None, base_url=None):
+        self.key = (api_key, base_url)
+        self.closed = False
+
+    async def close(self):
+        self.closed = True
+
+
+@pytest.mark.unit
+class TestEmotionClientReuse:
+    async def test_clients_reused_and_evicted_ones_closed(self, monkeypatch):
+        system_router = importlib.import_module("main_routers.system_router")
+        monkeypatch.setattr(system_router, "AsyncOpenAI", _FakeAsyncOpenAI)
+        monkeypatch.setattr(system_router, "_emotion_clients", type(system_router._emotion_clients)())
+
+        first = system_router._get_emotion_client("k0", "https://a")
+        assert system_router._get_emotion_client("k0", "https://a") is first
+
+        clients = [first] + [
+            system_router._get_emotion_client(f"k{i}", "https://a")
+            for i in range(1, system_router._EMOTION_CLIENT_MAX + 1)
+        ]
+        await asyncio.sleep(0)
+        assert first.closed
+        assert not any(client.closed for client in clients[1:])
+        assert len(system_router._emotion_clients) == system_router._EMOTION_CLIENT_MAX
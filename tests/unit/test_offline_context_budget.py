@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+"""
+文本模式上下文预算（main_logic/omni_offline_client.py 的 OmniOfflineClient._prepare_context）— 单元测试
+
+直接构造对话历史，不发起网络请求，覆盖范围:
+- 超过 image_ttl_turns 轮或超出 max_image_bytes 的旧图片替换为文字说明，最新一轮的图片总是保留
+- 估算 token 超出 max_context_tokens 时从最早的消息开始丢弃，保留系统指令与最新消息，且不以助手消息开头
+- 上下文中有图片时切到视觉模型，图片全部被省略后切回 text_model
+"""
+
+import os
+import sys
+
+import pytest
+
+# 确保项目根目录在 sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+from main_logic.omni_offline_client import OmniOfflineClient, _message_images, _message_text
+
+
+def _image(size: int = 100) -> dict:
+    return {"type": "image_url", "image_url": {"url": "x" * size}}
+
+
+def _vision_message(text: str, *images) -> HumanMessage:
+    return HumanMessage(content=list(images) + [{"type": "text", "text": text}])
+
+
+def _make_client(**kwargs) -> OmniOfflineClient:
+    client = OmniOfflineClient(
+        base_url="http://stub", api_key="k", model="text-model", vision_model="vision-model", **kwargs
+    )
+    client._conversation_history = [SystemMessage(content="你是一只猫娘")]
+    return client
+
+
+def _image_counts(client) -> list:
+    return [len(_message_images(m)) for m in client._conversation_history if isinstance(m, HumanMessage)]
+
+
+@pytest.mark.unit
+class TestImageEviction:
+    def test_images_older_than_ttl_replaced_by_note(self):
+        client = _make_client(image_ttl_turns=2)
+        client._conversation_history += [
+            _vision_message("第一张", _image()), AIMessage(content="看到了"),
+            _vision_message("第二张", _image()), AIMessage(content="嗯嗯"),
+            _vision_message("第三张", _image(), _image()),
+        ]
+        client._prepare_context()
+
+        assert _image_counts(client) == [0, 1, 2]
+        oldest = client._conversation_history[1]
+        # 图片全部省略的消息变成纯文本，保留原文字
+        assert oldest.content == "[此前发送过1张图片，已从上下文中省略] 第一张"
+        assert client.last_request_stats["images_evicted"] == 1
+        assert client.model == "vision-model"
+
+    def test_byte_budget_keeps_latest_turn(self):
+        client = _make_client(max_image_bytes=250, image_ttl_turns=5)
+        client._conversation_history += [
+            _vision_message("旧截图", _image(100), _image(100)), AIMessage(content="好"),
+            _vision_message("新截图", _image(200), _image(200)),
+        ]
+        client._prepare_context()
+
+        # 最新一轮即使超出字节预算也完整保留；更早的图片只保留预算内的部分
+        assert _image_counts(client) == [0, 2]
+        client._conversation_history.append(AIMessage(content="好"))
+        client._conversation_history.append(_vision_message("再来", _image(100)))
+        client._prepare_context()
+        assert _image_counts(client) == [0, 0, 1]
+
+    def test_partially_kept_message_has_note_and_text(self):
+        client = _make_client(max_image_bytes=150, image_ttl_turns=5)
+        client._conversation_history += [
+            _vision_message("两张图", _image(100), _image(100)), AIMessage(content="好"),
+            HumanMessage(content="继续"),
+        ]
+        client._prepare_context()
+
+        message = client._conversation_history[1]
+        assert len(_message_images(message)) == 1
+        assert _message_text(message) == "[此前发送过1张图片，已从上下文中省略]两张图"
+
+
+@pytest.mark.unit
+class TestTokenBudget:
+    def test_oldest_messages_dropped_within_budget(self):
+        client = _make_client(max_context_tokens=60)
+        for i in range(10):
+            client._conversation_history += [HumanMessage(content=f"第{i}轮提问内容"), AIMessage(content=f"第{i}轮回答内容")]
+        client._conversation_history.append(HumanMessage(content="最新的问题"))
+        client._prepare_context()
+
+        history = client._conversation_history
+        assert isinstance(history[0], SystemMessage)
+        assert history[-1].content == "最新的问题"
+        # 丢弃后不以助手消息开头
+        assert isinstance(history[1], HumanMessage)
+        stats = client.last_request_stats
+        assert stats["tokens"] <= 60
+        assert stats["messages_dropped"] == 21 - (len(history) - 1)
+        assert client.get_payload_stats()["totals"]["messages_dropped"] == stats["messages_dropped"]
+
+    def test_latest_message_kept_even_over_budget(self):
+        client = _make_client(max_context_tokens=10)
+        client._conversation_history += [
+            HumanMessage(content="早先的消息"), AIMessage(content="早先的回答"),
+            HumanMessage(content="一条非常非常长的消息" * 20),
+        ]
+        client._prepare_context()
+        assert [type(m) for m in client._conversation_history] == [SystemMessage, HumanMessage]
+
+    def test_within_budget_untouched(self):
+        client = _make_client()
+        client._conversation_history += [HumanMessage(content="你好"), AIMessage(content="喵"), HumanMessage(content="在吗")]
+        before = list(client._conversation_history)
+        client._prepare_context()
+        assert client._conversation_history == before
+        assert client.last_request_stats["messages_dropped"] == 0
+
+
+@pytest.mark.unit
+class TestModelSwitch:
+    def test_switch_back_to_text_model_after_images_evicted(self):
+        client = _make_client(image_ttl_turns=2)
+        client._conversation_history.append(_vision_message("看看这个", _image()))
+        client._prepare_context()
+        assert client.model == "vision-model"
+        assert client.llm.model_name == "vision-model"
+
+        # 图片仍在 TTL 内：继续用视觉模型
+        client._conversation_history += [AIMessage(content="看到了"), HumanMessage(content="然后呢")]
+        client._prepare_context()
+        assert client.model == "vision-model"
+
+        # 超过 TTL 后图片被省略，切回文本模型
+        client._conversation_history += [AIMessage(content="嗯"), HumanMessage(content="好的")]
+        client._prepare_context()
+        assert _image_counts(client) == [0, 0, 0]
+        assert client.model == "text-model"
+        assert client.llm.model_name == "text-model"
+        assert client.last_request_stats["model"] == "text-model"
+
+    def test_image_dropped_by_token_budget_switches_back(self):
+        client = _make_client(max_context_tokens=1000, image_ttl_turns=5)
+        client._conversation_history.append(_vision_message("看看这个", _image()))
+        client._prepare_context()
+        assert client.model == "vision-model"
+
+        client._conversation_history += [AIMessage(content="好"), HumanMessage(content="下一个问题")]
+        client._prepare_context()
+        # 带图消息按每张图约 1000 token 计入预算，被整条丢弃
+        assert [_message_text(m) for m in client._conversation_history[1:]] == ["下一个问题"]
+        assert client.model == "text-model"
+
+    def test_no_vision_model_stays_on_text_model(self):
+        client = OmniOfflineClient(base_url="http://stub", api_key="k", model="text-model")
+        client._conversation_history = [_vision_message("看看这个", _image())]
+        client._prepare_context()
+        assert client.model == "text-model"
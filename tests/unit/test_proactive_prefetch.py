@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+"""
+主动搭话素材预取池（utils/proactive_prefetch.py）— 单元测试
+
+覆盖范围:
+- 池中素材新鲜时直接返回，不再抓取
+- 校验失败（如窗口已切换）或过期时现场抓取
+- 单次抓取超时、失败结果不进入池
+- 后台刷新受每小时预算限制，来源空闲后刷新循环退出
+- 个人动态素材记录抓取时的账号，切换/退出账号后不再从池中返回
+"""
+
+import asyncio
+import importlib
+import os
+import sys
+
+import pytest
+
+# 确保项目根目录在 sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+import utils.web_scraper as web_scraper
+from utils.proactive_prefetch import PrefetchSource, ProactivePrefetcher
+
+
+class _CountingFetch:
+    def __init__(self, delay: float = 0.0, success: bool = True):
+        self.calls = 0
+        self.delay = delay
+        self.success = success
+
+    async def __call__(self):
+        self.calls += 1
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        return {'success': self.success, 'version': self.calls}
+
+
+def _source(fetch, **kwargs):
+    params = dict(refresh_interval=60, max_age=300, timeout=1.0, hourly_budget=30)
+    params.update(kwargs)
+    return PrefetchSource('news', fetch, **params)
+
+
+@pytest.mark.unit
+class TestProactivePrefetcher:
+    async def test_pool_hit_after_first_fetch(self):
+        fetch = _CountingFetch()
+        prefetcher = ProactivePrefetcher([_source(fetch)])
+        first = await prefetcher.get('news')
+        first['version'] = 'mutated'
+        second = await prefetcher.get('news')
+        assert fetch.calls == 1
+        assert second == {'success': True, 'version': 1}
+        stats = prefetcher.get_stats()
+        assert stats['pool_hits'] == 1 and stats['live_fetches'] == 1
+
+    async def test_invalid_or_expired_material_refetched(self):
+        valid = {'ok': True}
+        fetch = _CountingFetch()
+        prefetcher = ProactivePrefetcher([_source(fetch, max_age=0.05, validate=lambda _: valid['ok'])])
+        await prefetcher.get('news')
+        valid['ok'] = False
+        assert (await prefetcher.get('news'))['version'] == 2
+        valid['ok'] = True
+        await asyncio.sleep(0.06)
+        assert (await prefetcher.get('news'))['version'] == 3
+
+    async def test_concurrent_gets_share_one_fetch(self):
+        fetch = _CountingFetch(delay=0.05)
+        prefetcher = ProactivePrefetcher([_source(fetch)])
+        results = await asyncio.gather(*(prefetcher.get('news') for _ in range(4)))
+        assert fetch.calls == 1
+        assert all(r['version'] == 1 for r in results)
+
+    async def test_timeout_and_failure_not_pooled(self):
+        slow = _CountingFetch(delay=1.0)
+        prefetcher = ProactivePrefetcher([_source(slow, timeout=0.05)])
+        result = await prefetcher.get('news')
+        assert not result['success'] and '超时' in result['error']
+        assert prefetcher.get_stats()['timeouts'] == 1
+
+        failing = _CountingFetch(success=False)
+        prefetcher = ProactivePrefetcher([_source(failing)])
+        await prefetcher.get('news')
+        await prefetcher.get('news')
+        assert failing.calls == 2
+
+    async def test_background_refresh_respects_budget(self):
+        fetch = _CountingFetch()
+        prefetcher = ProactivePrefetcher([_source(fetch, refresh_interval=0, hourly_budget=3)], tick=0.01)
+        prefetcher.touch(['news', 'vision'])
+        await asyncio.sleep(0.2)
+        try:
+            assert fetch.calls == 3
+            stats = prefetcher.get_stats()
+            assert stats['budget_skips'] > 0
+            assert stats['sources']['news']['fetches_last_hour'] == 3
+            # 预取完成后触发搭话直接命中池
+            assert (await prefetcher.get('news'))['version'] == 3
+            assert fetch.calls == 3
+        finally:
+            await prefetcher.stop()
+
+    async def test_refresh_loop_stops_when_idle(self):
+        fetch = _CountingFetch()
+        prefetcher = ProactivePrefetcher([_source(fetch)], tick=0.01, idle_timeout=0.05)
+        prefetcher.touch(['news'])
+        await asyncio.sleep(0.15)
+        assert fetch.calls == 1
+        assert not prefetcher.get_stats()['running']
+        await prefetcher.stop()
+
+
+@pytest.mark.unit
+class TestAccountBoundMaterial:
+    async def test_personal_material_dropped_after_account_switch(self, monkeypatch):
+        system_router = importlib.import_module("main_routers.system_router")
+        cookies = {'weibo': {'SUB': 'alice'}}
+        monkeypatch.setattr(web_scraper, '_get_platform_cookies', lambda name: dict(cookies.get(name, {})))
+        monkeypatch.setattr(web_scraper, 'is_china_region', lambda: True)
+        calls = []
+
+        async def weibo(limit=10):
+            calls.append(cookies['weibo'].get('SUB'))
+            return {'success': True, 'statuses': [{'author': calls[-1], 'content': 'hi'}]}
+
+        async def bilibili(limit=10):
+            return {'success': False, 'error': '未登录'}
+
+        monkeypatch.setattr(web_scraper, 'fetch_weibo_personal_dynamic', weibo)
+        monkeypatch.setattr(web_scraper, 'fetch_bilibili_personal_dynamic', bilibili)
+        source = PrefetchSource('personal', lambda: web_scraper.fetch_personal_dynamics(limit=3),
+                                refresh_interval=150, max_age=600, timeout=1.0,
+                                validate=system_router._account_material_matches_current)
+        prefetcher = ProactivePrefetcher([source])
+
+        alice = await prefetcher.get('personal')
+        assert (await prefetcher.get('personal')) == alice
+        # 摘要不包含 Cookie 原文
+        assert 'alice' not in str(alice['account_digests'])
+
+        cookies['weibo'] = {'SUB': 'bob'}
+        bob = await prefetcher.get('personal')
+        cookies['weibo'] = {}
+        logged_out = await prefetcher.get('personal')
+        assert calls == ['alice', 'bob', None]
+        assert bob['weibo_dynamic']['statuses'][0]['author'] == 'bob'
+        assert logged_out['account_digests'] == {'bilibili': '', 'weibo': ''}
+        assert prefetcher.get_stats()['pool_hits'] == 1
+
+    def test_material_without_accounts_always_valid(self):
+        system_router = importlib.import_module("main_routers.system_router")
+        assert system_router._account_material_matches_current({'success': True, 'region': 'non-china'})
@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+"""
+主动搭话持久化去重索引（utils/proactive_topic_index.py）— 单元测试
+
+覆盖范围:
+- 近似重复的搭话文本命中（改标点、改个别词），不相关文本不命中
+- 按角色隔离；超出 max_age 的历史不参与判断
+- 话题 key 精确命中，URL 不同但标题近似的话题命中
+- 重启（重新打开同一 sqlite 文件）后历史仍在，过期记录在载入时清理
+- 查询耗时与历史条数无关（性能测试）
+"""
+
+import os
+import random
+import sys
+import time
+
+import pytest
+
+# 确保项目根目录在 sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from utils.proactive_topic_index import ProactiveTopicIndex, jaccard, normalize_text, shingle_hashes
+
+_BASE = "今天天气真好呀，要不要一起出去走走？顺便看看最近新开的那家咖啡店，听说他们的拿铁很不错哦"
+_THRESHOLD = 0.7
+
+
+def _random_text(rng: random.Random, length: int = 60) -> str:
+    return ''.join(chr(rng.randrange(0x4e00, 0x4e00 + 3000)) for _ in range(length))
+
+
+@pytest.mark.unit
+class TestShingles:
+    def test_normalize_and_jaccard(self):
+        assert normalize_text("  Hello\n\tWorld ") == "hello world"
+        a = shingle_hashes(normalize_text(_BASE))
+        assert jaccard(a, a) == 1.0
+        assert jaccard(a, shingle_hashes("完全不同的一句话")) < 0.1
+        assert len(shingle_hashes("ab")) == 1 and len(shingle_hashes("")) == 0
+
+
+@pytest.mark.unit
+class TestMessageDedup:
+    def test_near_duplicates_detected(self):
+        index = ProactiveTopicIndex(None)
+        index.record_message('小天', _BASE, 'web')
+        for candidate in (_BASE, _BASE.replace('，', '！'), _BASE[:-3] + '呢', _BASE.upper()):
+            hit, score = index.find_similar_message('小天', candidate, _THRESHOLD)
+            assert hit and score >= _THRESHOLD, candidate
+        hit, _ = index.find_similar_message('小天', "你在写代码吗？要注意休息哦，别太累了", _THRESHOLD)
+        assert not hit
+
+    def test_isolated_per_character_and_by_age(self):
+        index = ProactiveTopicIndex(None)
+        index.record_message('小天', _BASE, ts=time.time() - 7200)
+        assert not index.find_similar_message('小雪', _BASE, _THRESHOLD)[0]
+        assert not index.find_similar_message('小天', _BASE, _THRESHOLD, max_age=3600)[0]
+        assert index.find_similar_message('小天', _BASE, _THRESHOLD)[0]
+
+    def test_recent_messages(self):
+        index = ProactiveTopicIndex(None)
+        now = time.time()
+        index.record_message('小天', '很久以前', ts=now - 7200)
+        for i in range(12):
+            index.record_message('小天', f'第{i}条搭话', 'vision', ts=now - 100 + i)
+        recent = index.recent_messages('小天', max_age=3600, limit=10)
+        assert [msg for _, msg, _ in recent] == [f'第{i}条搭话' for i in range(2, 12)]
+        assert recent[-1][2] == 'vision'
+
+
+@pytest.mark.unit
+class TestTopicDedup:
+    def test_topic_key_and_similar_title(self):
+        index = ProactiveTopicIndex(None)
+        index.record_topic('小天', 'url::https://a.example/news/1', title='苹果发布会正式推出新款 iPhone 17 系列手机')
+        assert index.is_topic_used('小天', 'url::https://a.example/news/1')
+        # 另一家媒体的同一条新闻
+        assert index.is_topic_used('小天', 'url::https://b.example/x', title='苹果发布会正式推出新款iPhone 17系列手机',
+                                   title_threshold=0.8)
+        assert not index.is_topic_used('小天', 'url::https://b.example/x', title='苹果发布会正式推出新款iPhone 17系列手机')
+        assert not index.is_topic_used('小天', 'url::https://c.example/y', title='周末天气预报：多地迎来降温',
+                                       title_threshold=0.8)
+
+
+@pytest.mark.unit
+class TestPersistence:
+    def test_history_survives_reopen(self, tmp_path):
+        db_path = tmp_path / 'proactive_topics.sqlite3'
+        index = ProactiveTopicIndex(db_path)
+        index.record_message('小天', _BASE, 'web')
+        index.record_topic('小天', 'url::https://a.example/1', title='一条新闻标题')
+        index.record_message('小天', '两周多以前说过的话', ts=time.time() - 15 * 24 * 3600)
+
+        reopened = ProactiveTopicIndex(db_path)
+        assert reopened.find_similar_message('小天', _BASE[:-1], _THRESHOLD)[0]
+        assert reopened.is_topic_used('小天', 'url::https://a.example/1')
+        assert [msg for _, msg, _ in reopened.recent_messages('小天', max_age=3600)] == [_BASE]
+        stats = reopened.get_stats()
+        assert stats['persistent'] and stats['characters']['小天'] == {'messages': 1, 'topics': 1, 'titles': 1}
+
+    def test_prune_drops_expired_and_overflow(self):
+        index = ProactiveTopicIndex(None, retention_seconds=3600, max_entries=10)
+        now = time.time()
+        index.record_message('小天', _BASE, ts=now - 7200)
+        rng = random.Random(0)
+        for _ in range(20):
+            index.record_message('小天', _random_text(rng), ts=now)
+        index.prune()
+        assert index.get_stats()['characters']['小天']['messages'] <= 10
+        assert not index.find_similar_message('小天', _BASE, _THRESHOLD)[0]
+
+    def test_unwritable_path_falls_back_to_memory(self, tmp_path):
+        blocker = tmp_path / 'file'
+        blocker.write_text('x')
+        index = ProactiveTopicIndex(blocker / 'sub' / 'db.sqlite3')
+        index.record_message('小天', _BASE)
+        assert index.find_similar_message('小天', _BASE, _THRESHOLD)[0]
+        assert not index.get_stats()['persistent']
+
+
+class TestDedupBenchmark:
+
+    @pytest.mark.performance
+    def test_query_cost_independent_of_history(self):
+        rng = random.Random(42)
+        queries = [_random_text(rng) for _ in range(500)]
+        timings = {}
+        for size in (100, 5000):
+            index = ProactiveTopicIndex(None, max_entries=size)
+            for _ in range(size):
+                index.record_message('小天', _random_text(rng))
+            start = time.perf_counter()
+            for query in queries:
+                index.find_similar_message('小天', query, _THRESHOLD)
+            timings[size] = (time.perf_counter() - start) / len(queries) * 1e6
+
+        print(f"\n[性能] 去重查询: 历史 100 条 {timings[100]:.1f}µs/次, 历史 5000 条 {timings[5000]:.1f}µs/次")
+
+        # 仅在显式启用性能测试时断言严格阈值
+        if os.environ.get('RUN_PERF_TESTS', '').lower() == 'true':
+            assert timings[5000] < 500
+            assert timings[5000] < timings[100] * 2
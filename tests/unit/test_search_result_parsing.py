@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+"""
+搜索结果页流式解析（utils/web_scraper.py 的 parse_google_results / parse_baidu_results）— 单元测试
+
+fixture 页面位于 tests/test_inputs/search_pages/，*.expected.json 为旧的
+BeautifulSoup 整树解析在同一页面上的输出，新解析器需与之完全一致。
+
+覆盖范围:
+- fixture 页面结果与旧解析一致（不同 limit）
+- 内联脚本中的伪 HTML、广告、嵌套容器、未闭合标签、字符实体
+- 凑够 limit 条结果即停止解析
+- 百度无结果容器时回退到 h3 标题
+- 基准：每页解析耗时（对比 BeautifulSoup 建整棵 DOM 树）
+"""
+
+import json
+import os
+import sys
+import time
+
+import pytest
+from bs4 import BeautifulSoup
+
+# 确保项目根目录在 sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+import utils.web_scraper as web_scraper
+from utils.web_scraper import parse_baidu_results, parse_google_results
+
+PAGES_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'test_inputs', 'search_pages'))
+
+
+def _load_page(name: str) -> str:
+    with open(os.path.join(PAGES_DIR, f'{name}_results.html'), encoding='utf-8') as f:
+        return f.read()
+
+
+def _load_expected(name: str) -> list:
+    with open(os.path.join(PAGES_DIR, f'{name}_results.expected.json'), encoding='utf-8') as f:
+        return json.load(f)
+
+
+# ==================== fixture 页面 ====================
+
+@pytest.mark.unit
+class TestFixturePages:
+    @pytest.mark.parametrize("limit", [1, 3, 5, 10])
+    def test_google_matches_expected(self, limit):
+        assert parse_google_results(_load_page('google'), limit) == _load_expected('google')[:limit]
+
+    @pytest.mark.parametrize("limit", [1, 3, 5, 10])
+    def test_baidu_matches_expected(self, limit):
+        assert parse_baidu_results(_load_page('baidu'), limit) == _load_expected('baidu')[:limit]
+
+    def test_google_page_details(self):
+        results = parse_google_results(_load_page('google'), 10)
+        titles = [r['title'] for r in results]
+        # 广告与 "Sponsored" 结果被过滤，脚本中的伪结果不会被解析
+        assert not any('Sponsored' in t or 'Ad ·' in t or t == 'fake' for t in titles)
+        # /url?q= 包装链接被还原，字符实体被解码
+        assert results[0]['url'] == 'https://docs.python.org/3/library/asyncio.html'
+        assert any('AsyncIO & Async/Await' in t for t in titles)
+
+    def test_baidu_page_details(self):
+        results = parse_baidu_results(_load_page('baidu'), 10)
+        titles = [r['title'] for r in results]
+        assert not any('广告' in t or '百度' in t or '假结果' in t for t in titles)
+        assert results[0]['url'] == 'https://www.baidu.com/link?url=abc001'
+
+
+# ==================== 解析语义 ====================
+
+@pytest.mark.unit
+class TestStreamingParser:
+    def test_unclosed_tags_closed_by_parent(self):
+        html = (
+            '<div class="g"><a href="https://a.example/">First result title<div>nested</a>'
+            '<span>' + 'x' * 60 + '</div>'
+            '<div class="g"><h3>Second result title</h3><a href="/url?q=https://b.example/&amp;sa=U">b</a></div>'
+        )
+        results = parse_google_results(html, 5)
+        assert results == [
+            {'title': 'First result titlenested', 'abstract': 'x' * 60, 'url': 'https://a.example/'},
+            {'title': 'Second result title', 'abstract': '', 'url': 'https://b.example/'},
+        ]
+
+    def test_nested_containers_in_document_order(self):
+        html = (
+            '<div class="c-container"><a href="/link?url=outer">外层结果标题文字</a>'
+            '<div class="c-container"><a href="/link?url=inner">内层结果标题文字</a></div></div>'
+        )
+        assert [r['url'] for r in parse_baidu_results(html, 5)] == [
+            'https://www.baidu.com/link?url=outer',
+            'https://www.baidu.com/link?url=inner',
+        ]
+
+    def test_stops_once_limit_reached(self, monkeypatch):
+        page = _load_page('google')
+        seen = []
+        real_starttag = web_scraper._GoogleResultParser.handle_starttag
+
+        def counting_starttag(self, tag, attrs):
+            seen.append(tag)
+            return real_starttag(self, tag, attrs)
+
+        monkeypatch.setattr(web_scraper._GoogleResultParser, 'handle_starttag', counting_starttag)
+        parse_google_results(page, 1)
+        early = len(seen)
+        seen.clear()
+        parse_google_results(page, 50)
+        assert early < len(seen) / 3
+
+    def test_baidu_h3_fallback(self):
+        html = (
+            '<h3><a href="/link?url=1">第一个标题结果</a></h3>'
+            '<div class="other"><h3><a href="https://x.example/2">第二个标题结果</a></h3></div>'
+            '<h3>没有链接</h3><h3><a href="/link?url=4">第四个标题结果</a></h3>'
+        )
+        assert parse_baidu_results(html, 3) == [
+            {'title': '第一个标题结果', 'abstract': '', 'url': 'https://www.baidu.com/link?url=1'},
+            {'title': '第二个标题结果', 'abstract': '', 'url': 'https://x.example/2'},
+        ]
+
+    def test_baidu_nested_h3_closed_by_identity(self):
+        # 内层 h3 随 </span> 一起闭合，链接属于外层 h3（与 BeautifulSoup html.parser 的树一致）
+        html = '<h3><span class="content-right_a"><h3></span><a href="https://h20.com">Some reasonably long title text 72'
+        assert parse_baidu_results(html, 5) == [
+            {'title': 'Some reasonably long title text 72', 'abstract': '', 'url': 'https://h20.com'},
+        ]
+        soup = BeautifulSoup(html, 'html.parser')
+        assert [h3.find('a') is not None for h3 in soup.find_all('h3')] == [True, False]
+
+    @pytest.mark.parametrize("html", ['', '<html', '<div class="g"><a href=', '<<<>>>'])
+    def test_malformed_input(self, html):
+        assert parse_google_results(html, 5) == []
+        assert parse_baidu_results(html, 5) == []
+
+
+# ==================== 基准 ====================
+
+class TestParseBenchmark:
+
+    @pytest.mark.performance
+    @pytest.mark.parametrize("engine", ['google', 'baidu'])
+    def test_parse_time_per_page(self, engine):
+        page = _load_page(engine)
+        parse = parse_google_results if engine == 'google' else parse_baidu_results
+        rounds = 30
+
+        start = time.perf_counter()
+        for _ in range(rounds):
+            BeautifulSoup(page, 'html.parser')
+        tree_ms = (time.perf_counter() - start) / rounds * 1000
+
+        timings = {}
+        for limit in (5, 10):
+            start = time.perf_counter()
+            for _ in range(rounds):
+                parse(page, limit)
+            timings[limit] = (time.perf_counter() - start) / rounds * 1000
+
+        print(
+            f"\n[性能] {engine} 结果页 {len(page) // 1024}KB: "
+            f"BeautifulSoup 建树 {tree_ms:.2f}ms/页, "
+            f"流式解析 limit=5 {timings[5]:.2f}ms/页, limit=10 {timings[10]:.2f}ms/页"
+        )
+
+        # 仅在显式启用性能测试时断言严格阈值
+        if os.environ.get('RUN_PERF_TESTS', '').lower() == 'true':
+            assert timings[10] < tree_ms, "流式解析不应慢于仅建 DOM 树"
@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+"""
+语音下行通道（main_logic/speech_output.py）— 单元测试
+
+覆盖范围:
+- 下行格式协商（客户端未声明 / 仅 PCM16 / 支持 Opus）
+- PCM16 小块合包：每秒语音的帧数与带宽，以及合包延迟上限
+- 打断时丢弃未发送的音频
+- OGG/Opus 编码后的带宽与帧数（需要 PyAV，未安装时跳过）
+"""
+
+import asyncio
+import os
+import sys
+
+import numpy as np
+import pytest
+
+# 确保项目根目录在 sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from main_logic.speech_output import (
+    AUDIO_FORMAT_OGG_OPUS,
+    AUDIO_FORMAT_PCM16,
+    BYTES_PER_MS,
+    SpeechOutputStream,
+    negotiate_audio_format,
+    opus_encoding_available,
+)
+
+# ==================== 辅助函数 ====================
+
+# 典型 TTS worker 的输出粒度：每块约 10ms 的 48kHz PCM16
+CHUNK_MS = 10
+
+
+def _speech_pcm(seconds: float) -> bytes:
+    """生成近似语音的 48kHz PCM16（谐波 + 包络），避免纯静音让编码器过度压缩"""
+    t = np.arange(int(48000 * seconds)) / 48000
+    envelope = 0.5 + 0.5 * np.sin(2 * np.pi * 3 * t)
+    signal = sum(np.sin(2 * np.pi * f * t) / (i + 1) for i, f in enumerate((180, 360, 540, 1200, 2400)))
+    signal = 0.3 * envelope * signal / np.max(np.abs(signal))
+    return (signal * 32767).astype(np.int16).tobytes()
+
+
+class _FrameRecorder:
+    def __init__(self):
+        self.frames = []
+
+    async def __call__(self, speech_id, payload, audio_format):
+        self.frames.append((speech_id, payload, audio_format))
+
+
+async def _stream_speech(stream: SpeechOutputStream, pcm: bytes, speech_id: str = "s1"):
+    chunk = CHUNK_MS * BYTES_PER_MS
+    for i in range(0, len(pcm), chunk):
+        await stream.push_pcm(speech_id, pcm[i:i + chunk])
+    await stream.close()
+
+
+# ==================== 格式协商 ====================
+
+@pytest.mark.unit
+class TestNegotiation:
+    def test_legacy_client_gets_pcm(self):
+        assert negotiate_audio_format(None) == AUDIO_FORMAT_PCM16
+
+    def test_pcm_only_client(self):
+        assert negotiate_audio_format([AUDIO_FORMAT_PCM16]) == AUDIO_FORMAT_PCM16
+
+    def test_opus_client(self):
+        expected = AUDIO_FORMAT_OGG_OPUS if opus_encoding_available() else AUDIO_FORMAT_PCM16
+        assert negotiate_audio_format([AUDIO_FORMAT_OGG_OPUS, AUDIO_FORMAT_PCM16]) == expected
+
+
+# ==================== PCM16 合包 ====================
+
+@pytest.mark.unit
+class TestPcmCoalescing:
+    async def test_frames_per_second_of_speech(self):
+        recorder = _FrameRecorder()
+        stream = SpeechOutputStream(recorder, AUDIO_FORMAT_PCM16, max_chunk_ms=200)
+        pcm = _speech_pcm(2.0)
+        await _stream_speech(stream, pcm)
+
+        stats = stream.get_stats()
+        # 未合包时每秒 1000/CHUNK_MS=100 帧；合包后每帧最多 200ms
+        assert stats["frames_per_audio_second"] <= 1000 / 200 + 1
+        assert b"".join(p for _, p, _ in recorder.frames) == pcm
+        # PCM16 不压缩：48kHz * 16bit = 768kbit/s
+        assert stats["kbps"] == pytest.approx(768, rel=0.01)
+
+    async def test_small_chunk_sent_within_delay_bound(self):
+        recorder = _FrameRecorder()
+        stream = SpeechOutputStream(recorder, AUDIO_FORMAT_PCM16, max_delay_ms=40)
+        await stream.push_pcm("s1", b"\x01\x00" * 480)
+        assert recorder.frames == []
+        await asyncio.sleep(0.1)
+        assert len(recorder.frames) == 1
+        assert stream.get_stats()["max_added_delay_ms"] < 100
+
+    async def test_discard_drops_pending_audio(self):
+        recorder = _FrameRecorder()
+        stream = SpeechOutputStream(recorder, AUDIO_FORMAT_PCM16, max_delay_ms=40)
+        await stream.push_pcm("s1", b"\x01\x00" * 480)
+        stream.discard()
+        await asyncio.sleep(0.1)
+        assert recorder.frames == []
+
+    async def test_speech_id_change_flushes_previous(self):
+        recorder = _FrameRecorder()
+        stream = SpeechOutputStream(recorder, AUDIO_FORMAT_PCM16)
+        await stream.push_pcm("s1", b"\x01\x00" * 480)
+        await stream.push_pcm("s2", b"\x02\x00" * 480)
+        await stream.close()
+        assert [sid for sid, _, _ in recorder.frames] == ["s1", "s2"]
+
+
+# ==================== OGG/Opus 编码 ====================
+
+@pytest.mark.unit
+@pytest.mark.skipif(not opus_encoding_available(), reason="PyAV/libopus not installed")
+class TestOpusOutput:
+    async def test_bandwidth_and_frames_per_second(self):
+        recorder = _FrameRecorder()
+        stream = SpeechOutputStream(recorder, AUDIO_FORMAT_OGG_OPUS, max_chunk_ms=200)
+        await _stream_speech(stream, _speech_pcm(3.0))
+
+        stats = stream.get_stats()
+        print(f"\nOpus: {stats['kbps']:.1f} kbit/s, {stats['frames_per_audio_second']:.1f} frames/s")
+        assert all(fmt == AUDIO_FORMAT_OGG_OPUS for _, _, fmt in recorder.frames)
+        # 每帧都是完整的 OGG 页，前端可按魔数识别
+        assert all(p[:4] == b"OggS" for _, p, _ in recorder.frames)
+        # 相比 PCM16 的 768kbit/s 至少降低一个数量级
+        assert stats["kbps"] < 768 / 10
+        assert stats["frames_per_audio_second"] <= 1000 / 200 + 2
+
+    async def test_each_speech_is_a_separate_ogg_stream(self):
+        recorder = _FrameRecorder()
+        stream = SpeechOutputStream(recorder, AUDIO_FORMAT_OGG_OPUS)
+        await stream.push_pcm("s1", _speech_pcm(0.5))
+        await stream.push_pcm("s2", _speech_pcm(0.5))
+        await stream.close()
+
+        first_by_speech = {}
+        for sid, payload, _ in recorder.frames:
+            first_by_speech.setdefault(sid, payload)
+        # 每条流的第一页带 OpusHead
+        assert set(first_by_speech) == {"s1", "s2"}
+        assert all(b"OpusHead" in p for p in first_by_speech.values())
@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+"""
+任务去重（brain/deduper.py 的 TaskDeduper）— 单元测试
+
+使用计数的桩 LLM 代替真实模型，覆盖范围:
+- 归一化后完全相同的任务直接判重，不调用 LLM
+- 同一书写系统且词面完全不重叠的任务直接判为不重复，不调用 LLM；
+  换说法的复述与跨语言的任务仍交给 LLM
+- 仍需 LLM 判断时只发送未被本地排除的候选
+- LLM 判决按 (新任务, 已有任务) 归一化后缓存，重复提交不再调用
+- LLM 失败 / 配额耗尽时不缓存
+- 一组典型提交序列下 LLM 调用次数明显少于逐次调用
+"""
+
+import json
+import os
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+# 确保项目根目录在 sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+import brain.deduper as deduper_module
+from brain.deduper import TaskDeduper, is_clearly_distinct, normalize_task
+
+
+class _CountingLLM:
+    """按 (新任务, 已有任务描述) 判断重复的桩 LLM，记录调用次数与收到的候选数"""
+
+    def __init__(self, duplicates=(), fail: bool = False):
+        self.duplicates = set(duplicates)
+        self.fail = fail
+        self.calls = 0
+        self.candidate_counts = []
+
+    async def ainvoke(self, messages):
+        self.calls += 1
+        if self.fail:
+            raise RuntimeError("llm down")
+        prompt = messages[-1]["content"]
+        lines = prompt.splitlines()
+        new_task = lines[1]
+        existing = [line[2:] for line in lines if line.startswith("- id=")]
+        self.candidate_counts.append(len(existing))
+        for entry in existing:
+            tid, desc = entry[len("id="):].split(": ", 1)
+            if (new_task, desc) in self.duplicates:
+                return SimpleNamespace(content=json.dumps([tid, True]))
+        return SimpleNamespace(content="[null, false]")
+
+
+class _Quota:
+    def __init__(self, ok: bool = True):
+        self.ok = ok
+
+    def consume_agent_daily_quota(self, source="", units=1):
+        return self.ok, {"used": 0, "limit": None}
+
+
+@pytest.fixture
+def quota(monkeypatch):
+    stub = _Quota()
+    monkeypatch.setattr(deduper_module, "get_config_manager", lambda: stub)
+    return stub
+
+
+_REGISTRY = [
+    ("t1", "在哔哩哔哩搜索猫咪视频并打开第一个"),
+    ("t2", "Summarize the latest emails in my inbox"),
+    ("t3", "打开浏览器查一下北京明天的天气"),
+    ("t4", "Download the quarterly report PDF from the finance portal"),
+]
+
+
+# 词面重叠很少、但语义相同的复述，以及跨语言的同一任务：必须交给 LLM 判断
+_PARAPHRASES = [
+    ("给妈妈发微信说我晚点回家", "微信告诉我妈我会晚些到家"),
+    ("打开浏览器搜索天气", "帮我查一下今天的天气"),
+    ("帮我在B站搜索猫咪视频", "打开哔哩哔哩找几个小猫的视频"),
+    ("Check tomorrow's weather in Beijing", "查一下北京明天的天气"),
+    ("Send mom a message that I'll be late", "给妈妈发消息说我会晚点到"),
+]
+
+
+@pytest.mark.unit
+class TestLexicalHelpers:
+    def test_normalize_task(self):
+        assert normalize_task("  Open  the Browser! ") == normalize_task("open the browser")
+        assert normalize_task("打开浏览器。") == "打开浏览器"
+
+    def test_clearly_distinct(self):
+        assert is_clearly_distinct("Summarize my emails", "Download the quarterly report")
+        assert is_clearly_distinct("播放一首周杰伦的歌", "打开浏览器查一下北京明天的天气")
+        assert not is_clearly_distinct("查一下北京明天的天气", "打开浏览器查一下北京明天的天气")
+        assert not is_clearly_distinct("", "anything")
+
+    @pytest.mark.parametrize("new_task, existing", _PARAPHRASES)
+    def test_paraphrases_not_settled_locally(self, new_task, existing):
+        assert not is_clearly_distinct(new_task, existing)
+
+
+@pytest.mark.unit
+class TestTaskDeduper:
+    async def test_identical_task_skips_llm(self, quota):
+        llm = _CountingLLM()
+        deduper = TaskDeduper(llm=llm)
+        res = await deduper.judge("  summarize the latest emails in my inbox. ", _REGISTRY)
+        assert res == {"duplicate": True, "matched_id": "t2"}
+        assert llm.calls == 0
+
+    async def test_clearly_distinct_skips_llm(self, quota):
+        llm = _CountingLLM()
+        deduper = TaskDeduper(llm=llm)
+        english = [(tid, desc) for tid, desc in _REGISTRY if desc.isascii()]
+        res = await deduper.judge("Play some jazz music on Spotify", english)
+        assert res == {"duplicate": False, "matched_id": None}
+        assert llm.calls == 0
+        assert deduper.get_stats()["distinct"] == len(english)
+
+    @pytest.mark.parametrize("new_task, existing", _PARAPHRASES)
+    async def test_paraphrases_reach_llm(self, quota, new_task, existing):
+        llm = _CountingLLM(duplicates={(new_task, existing)})
+        deduper = TaskDeduper(llm=llm)
+        res = await deduper.judge(new_task, [("t9", existing)])
+        assert res == {"duplicate": True, "matched_id": "t9"}
+        assert llm.calls == 1
+
+    async def test_only_plausible_candidates_sent_and_verdict_cached(self, quota):
+        new_task = "查一下北京明天的天气"
+        llm = _CountingLLM(duplicates={(new_task, "打开浏览器查一下北京明天的天气")})
+        deduper = TaskDeduper(llm=llm)
+        first = await deduper.judge(new_task, _REGISTRY)
+        assert first == {"duplicate": True, "matched_id": "t3"}
+        # t1 同为中文且无共同词被本地排除；英文候选跨书写系统，仍交给 LLM
+        assert llm.calls == 1 and llm.candidate_counts == [3]
+
+        # 同一对任务（措辞只差标点/空白）再次提交时直接命中缓存
+        second = await deduper.judge("查一下 北京明天的天气？", _REGISTRY)
+        assert second == first
+        assert llm.calls == 1
+        assert deduper.get_stats()["cache_hits"] == 1
+
+    async def test_negative_verdict_cached_per_pair(self, quota):
+        new_task = "Download the annual report PDF"
+        llm = _CountingLLM()
+        deduper = TaskDeduper(llm=llm)
+        assert not (await deduper.judge(new_task, _REGISTRY))["duplicate"]
+        assert not (await deduper.judge(new_task, _REGISTRY))["duplicate"]
+        assert llm.calls == 1
+        # 注册表新增的任务仍需判断，已判过的候选不再发送
+        await deduper.judge(new_task, _REGISTRY + [("t5", "Download the annual report PDF for 2025")])
+        assert llm.calls == 2 and llm.candidate_counts == [3, 1]
+
+    async def test_failures_not_cached(self, quota):
+        llm = _CountingLLM(fail=True)
+        deduper = TaskDeduper(llm=llm)
+        new_task = "Download the annual report PDF"
+        assert await deduper.judge(new_task, _REGISTRY) == {"duplicate": False, "matched_id": None}
+        llm.fail = False
+        await deduper.judge(new_task, _REGISTRY)
+        assert llm.calls == 2
+
+        quota.ok = False
+        await deduper.judge("查一下上海明天的天气", _REGISTRY)
+        assert llm.calls == 2
+        assert deduper.get_stats()["cached_verdicts"] == 3
+
+    async def test_llm_calls_reduced_over_submission_stream(self, quota):
+        submissions = [
+            "在哔哩哔哩搜索猫咪视频并打开第一个",    # 与 t1 相同
+            "Play some jazz music on Spotify",      # 需要 LLM（中文候选跨书写系统）
+            "查一下北京明天的天气",                  # 需要 LLM（t3 的子集）
+            "查一下北京明天的天气！",                # 缓存
+            "Download the annual report PDF",       # 需要 LLM（与 t4 相近但不同）
+            "download the annual report pdf",       # 缓存
+            "Summarize the latest emails in my inbox",
+            "Play some jazz music on Spotify",
+        ] * 3
+        llm = _CountingLLM(duplicates={("查一下北京明天的天气", "打开浏览器查一下北京明天的天气")})
+        deduper = TaskDeduper(llm=llm)
+        for task in submissions:
+            await deduper.judge(task, _REGISTRY)
+        print(f"\n[去重] {len(submissions)} 次提交, LLM 调用 {llm.calls} 次 (原先每次提交 1 次), stats={deduper.get_stats()}")
+        assert llm.calls == 3
@@ -0,0 +1,293 @@
+# -*- coding: utf-8 -*-
+"""
+翻译持久化缓存（utils/translation_cache.py）与批量翻译（utils/language_utils.py 的 TranslationService）— 单元测试
+
+使用临时目录中的 sqlite 文件与桩 LLM，覆盖范围:
+- 磁盘层按 last_access 做 LRU 淘汰；内存层命中时只在超过 TOUCH_INTERVAL_SECONDS 后回写 last_access
+- get_many 中重复的请求都能拿到结果
+- 批量回复解析：```json 代码块、条数不符、含非字符串元素
+- 批量结果无法解析时逐条回退到 translate_text_robust
+- translate_dict 与原先逐字段递归翻译的结果一致（嵌套字典、逗号分隔的昵称、字符串列表）
+"""
+
+import asyncio
+import json
+import os
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+# 确保项目根目录在 sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+import utils.translation_cache as translation_cache
+from utils.language_utils import TranslationService
+from utils.translation_cache import TOUCH_INTERVAL_SECONDS, TranslationCache, make_translation_key
+
+
+class _FakeClock:
+    def __init__(self, t: float = 1_000_000.0):
+        self.t = t
+
+    def time(self):
+        return self.t
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = _FakeClock()
+    monkeypatch.setattr(translation_cache, "time", fake)
+    return fake
+
+
+def _last_access(cache: TranslationCache, text: str) -> float:
+    key = make_translation_key(text, "zh-CN", "en", "llm:test")
+    return cache._conn.execute("SELECT last_access FROM translations WHERE key = ?", (key,)).fetchone()[0]
+
+
+def _put(cache: TranslationCache, text: str):
+    cache.put(text, "zh-CN", "en", "llm:test", f"T({text})")
+
+
+def _get(cache: TranslationCache, text: str):
+    return cache.get(text, "zh-CN", "en", "llm:test")
+
+
+# ==================== 持久化缓存 ====================
+
+@pytest.mark.unit
+class TestTranslationCache:
+    def test_disk_lru_evicts_least_recently_accessed(self, tmp_path, clock):
+        db_path = tmp_path / "translations.sqlite3"
+        cache = TranslationCache(db_path, max_entries=3)
+        for i, text in enumerate(("你好", "谢谢", "再见")):
+            clock.t += 10
+            _put(cache, text)
+
+        # 新实例的内存层为空：读取走磁盘并刷新 last_access
+        reopened = TranslationCache(db_path, max_entries=3)
+        clock.t += 10
+        assert _get(reopened, "你好") == "T(你好)"
+        clock.t += 10
+        _put(reopened, "晚安")
+
+        assert _get(reopened, "谢谢") is None
+        assert [_get(reopened, t) for t in ("你好", "再见", "晚安")] == ["T(你好)", "T(再见)", "T(晚安)"]
+        stats = reopened.get_stats()
+        assert stats["entries"] == 3 and stats["evictions"] == 1
+
+    def test_memory_hit_touches_disk_only_after_interval(self, tmp_path, clock):
+        cache = TranslationCache(tmp_path / "translations.sqlite3")
+        _put(cache, "你好")
+        stored_at = _last_access(cache, "你好")
+
+        clock.t += TOUCH_INTERVAL_SECONDS / 2
+        assert cache.peek("你好", "zh-CN", "en", "llm:test") == "T(你好)"
+        assert _get(cache, "你好") == "T(你好)"
+        assert _last_access(cache, "你好") == stored_at
+
+        clock.t += TOUCH_INTERVAL_SECONDS
+        # peek 不访问磁盘：条目过久未回写时让调用方改走 get_many
+        assert cache.peek("你好", "zh-CN", "en", "llm:test") is None
+        assert _get(cache, "你好") == "T(你好)"
+        assert _last_access(cache, "你好") == clock.t
+        assert cache.peek("你好", "zh-CN", "en", "llm:test") == "T(你好)"
+        assert cache.get_stats()["disk_hits"] == 0
+
+    def test_get_many_with_duplicate_keys(self, tmp_path, clock):
+        db_path = tmp_path / "translations.sqlite3"
+        _put(TranslationCache(db_path), "你好")
+        cache = TranslationCache(db_path)
+        hello = ("你好", "zh-CN", "en", "llm:test")
+        missing = ("没有", "zh-CN", "en", "llm:test")
+
+        # 磁盘命中
+        assert cache.get_many([hello, missing, hello, missing]) == ["T(你好)", None, "T(你好)", None]
+        # 内存命中
+        assert cache.get_many([hello, hello]) == ["T(你好)", "T(你好)"]
+        stats = cache.get_stats()
+        assert stats["disk_hits"] == 2 and stats["memory_hits"] == 2 and stats["misses"] == 2
+
+    def test_put_skips_empty(self, tmp_path):
+        cache = TranslationCache(tmp_path / "translations.sqlite3")
+        cache.put_many([("", "zh-CN", "en", "llm:test", "x"), ("你好", "zh-CN", "en", "llm:test", "")])
+        assert cache.get_stats()["entries"] == 0
+
+    def test_unwritable_path_falls_back_to_memory(self, tmp_path):
+        blocker = tmp_path / "file"
+        blocker.write_text("x")
+        cache = TranslationCache(blocker / "sub" / "translations.sqlite3")
+        assert not cache.enabled
+        _put(cache, "你好")
+        assert _get(cache, "你好") == "T(你好)"
+
+
+# ==================== 批量翻译 ====================
+
+def _translate(text: str) -> str:
+    return f"T({text})"
+
+
+class _StubLLM:
+    """单条请求返回 T(原文)；批量请求（JSON 数组）默认返回同样长度的数组，可用 batch_reply 改写"""
+
+    def __init__(self, batch_reply=None):
+        self.batch_reply = batch_reply
+        self.single_calls = []
+        self.batch_calls = []
+
+    async def ainvoke(self, messages):
+        content = messages[-1].content
+        try:
+            texts = json.loads(content)
+        except ValueError:
+            texts = None
+        if isinstance(texts, list):
+            self.batch_calls.append(texts)
+            if self.batch_reply is not None:
+                return SimpleNamespace(content=self.batch_reply(texts))
+            return SimpleNamespace(content=json.dumps([_translate(t) for t in texts], ensure_ascii=False))
+        self.single_calls.append(content)
+        return SimpleNamespace(content=_translate(content))
+
+
+class _StubConfigManager:
+    def get_model_api_config(self, model_type):
+        return {"model": "test", "api_key": "k", "base_url": "http://stub"}
+
+
+@pytest.fixture
+def make_service(tmp_path):
+    def factory(llm, db_name="translations.sqlite3"):
+        service = TranslationService(_StubConfigManager())
+        service._cache = TranslationCache(tmp_path / db_name)
+        service._get_llm_client = lambda: llm
+        return service
+    return factory
+
+
+_TEXTS = ["你好", "谢谢你", "明天见"]
+
+
+@pytest.mark.unit
+class TestBatchTranslation:
+    async def test_single_batch_call_and_cached(self, make_service):
+        llm = _StubLLM()
+        service = make_service(llm)
+        assert await service.translate_texts(_TEXTS + ["你好", "", "hello"], "en") == [
+            "T(你好)", "T(谢谢你)", "T(明天见)", "T(你好)", "", "hello",
+        ]
+        assert llm.batch_calls == [_TEXTS] and llm.single_calls == []
+
+        # 全部命中缓存，不再调用 LLM
+        assert await service.translate_texts(_TEXTS, "en") == [_translate(t) for t in _TEXTS]
+        assert len(llm.batch_calls) == 1
+
+    async def test_single_miss_uses_robust_path(self, make_service):
+        llm = _StubLLM()
+        service = make_service(llm)
+        assert await service.translate_texts(["你好", "你好"], "en") == ["T(你好)", "T(你好)"]
+        assert llm.batch_calls == [] and llm.single_calls == ["你好"]
+
+    async def test_fenced_json_reply(self, make_service):
+        def fenced(texts):
+            return "```json\n" + json.dumps([_translate(t) for t in texts], ensure_ascii=False) + "\n```"
+
+        llm = _StubLLM(batch_reply=fenced)
+        service = make_service(llm)
+        assert await service.translate_texts(_TEXTS, "en") == [_translate(t) for t in _TEXTS]
+        assert llm.single_calls == []
+
+    @pytest.mark.parametrize("reply", [
+        lambda texts: json.dumps([_translate(t) for t in texts[:-1]], ensure_ascii=False),  # 条数不符
+        lambda texts: json.dumps([_translate(texts[0])] + [1] * (len(texts) - 1)),        # 非字符串元素
+        lambda texts: json.dumps({"translations": texts}),                                  # 不是数组
+        lambda texts: "Sure! Here are the translations.",                                   # 不是 JSON
+    ])
+    async def test_unparseable_batch_falls_back_per_item(self, make_service, reply):
+        llm = _StubLLM(batch_reply=reply)
+        service = make_service(llm)
+        assert await service.translate_texts(_TEXTS, "en") == [_translate(t) for t in _TEXTS]
+        assert len(llm.batch_calls) == 1
+        assert sorted(llm.single_calls) == sorted(_TEXTS)
+
+    async def test_blank_batch_item_keeps_original(self, make_service):
+        llm = _StubLLM(batch_reply=lambda texts: json.dumps(["  "] + [_translate(t) for t in texts[1:]]))
+        service = make_service(llm)
+        assert await service.translate_texts(_TEXTS, "en") == ["你好", "T(谢谢你)", "T(明天见)"]
+        # 未翻译的条目不写入缓存
+        assert service._cache.get("你好", "zh-CN", "en", "llm:test") is None
+
+
+# ==================== translate_dict ====================
+
+async def _reference_translate_dict(service, data, target_lang, fields_to_translate=None):
+    """原先的逐字段递归实现（每个字符串单独调用 translate_text_robust）"""
+    if not data:
+        return data
+    result = data.copy()
+    translate_all = fields_to_translate is None
+    fields_set = set(fields_to_translate or [])
+    for key, value in result.items():
+        should_translate = translate_all or key in fields_set
+        if should_translate and isinstance(value, str) and value.strip():
+            if key in {'昵称', 'nickname'} and ', ' in value:
+                items = [item.strip() for item in value.split(', ')]
+                translated_items = await asyncio.gather(*[
+                    service.translate_text_robust(item, target_lang) for item in items
+                ])
+                result[key] = ', '.join(translated_items)
+            else:
+                result[key] = await service.translate_text_robust(value, target_lang)
+        elif isinstance(value, dict):
+            if should_translate:
+                result[key] = await _reference_translate_dict(service, value, target_lang, fields_to_translate)
+        elif isinstance(value, list):
+            if should_translate and value and all(isinstance(item, str) for item in value):
+                result[key] = await asyncio.gather(*[
+                    service.translate_text_robust(item, target_lang) for item in value
+                ])
+    return result
+
+
+_PROFILE = {
+    "档案名": "小天",
+    "昵称": "小天, 天天, 阿天",
+    "性别": "女",
+    "年龄": 17,
+    "爱好": ["画画", "唱歌", ""],
+    "混合列表": ["画画", 3],
+    "空白": "   ",
+    "外观": {"发色": "银色", "瞳色": "蓝色", "细节": {"饰品": "发卡"}},
+    "already": "hello world",
+    "live2d": "mao_pro",
+}
+
+
+@pytest.mark.unit
+class TestTranslateDict:
+    @pytest.mark.parametrize("fields", [
+        None,
+        [],
+        ["昵称", "爱好", "外观", "发色"],
+        ["档案名", "外观"],
+    ])
+    async def test_matches_per_field_recursion(self, make_service, fields):
+        reference_llm = _StubLLM()
+        expected = await _reference_translate_dict(make_service(reference_llm, "reference.sqlite3"), _PROFILE, "en", fields)
+        llm = _StubLLM()
+        actual = await make_service(llm).translate_dict(_PROFILE, "en", fields)
+        assert actual == expected
+        # 原先每个字符串一次调用，现在所有字段合并为一次批量调用
+        if len(reference_llm.single_calls) > 1:
+            assert len(llm.batch_calls) == 1 and llm.single_calls == []
+
+    async def test_nickname_items_translated_separately(self, make_service):
+        result = await make_service(_StubLLM()).translate_dict({"nickname": "小天, 天天"}, "en")
+        assert result == {"nickname": "T(小天), T(天天)"}
+
+    async def test_input_not_mutated(self, make_service):
+        data = json.loads(json.dumps(_PROFILE, ensure_ascii=False))
+        await make_service(_StubLLM()).translate_dict(data, "en")
+        assert data == _PROFILE
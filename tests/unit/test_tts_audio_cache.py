@@ -0,0 +1,298 @@
+# -*- coding: utf-8 -*-
+"""
+TTS 短句音频缓存（main_logic/tts_audio_cache.py）与缓存包装 worker（main_logic/tts_client.py 的 _AudioCachingWorker）— 单元测试
+
+使用临时目录中的 sqlite 文件与桩 TTS worker，覆盖范围:
+- 命中 / 未命中 / 文本规范化 / 长句不缓存 / 前缀判断（含其他线程并发 put 时）/ 重新打开后索引仍在
+- 总大小超出 max_bytes 时按 last_access 淘汰最久未用的条目
+- 包装 worker：首次合成录制入缓存；再次说同一句时直接回放 PCM（按块）/ OGG（整段），不调用 provider
+- 缓存未命中与被淘汰的句子仍交给 provider 合成
+- worker 池按 pool_key 区分被包装的 provider
+"""
+
+import hashlib
+import os
+import queue
+import sys
+import threading
+import time
+
+import pytest
+
+# 确保项目根目录在 sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+import main_logic.tts_audio_cache as tts_audio_cache
+from main_logic.tts_audio_cache import TTSAudioCache
+from main_logic.tts_client import TTS_SHUTDOWN_SIGNAL, _TTS_FORMAT_OGG, _TTS_FORMAT_PCM, _AudioCachingWorker
+from main_logic.tts_worker_pool import _provider_name
+
+
+class _FakeClock:
+    def __init__(self, t: float = 1_000_000.0):
+        self.t = t
+
+    def time(self):
+        return self.t
+
+
+def _audio(text: str, size: int = 20000) -> bytes:
+    digest = hashlib.sha256(text.encode("utf-8")).digest()
+    return (digest * (size // len(digest) + 1))[:size]
+
+
+# ==================== TTSAudioCache ====================
+
+@pytest.mark.unit
+class TestTTSAudioCache:
+    def test_hit_miss_and_normalization(self, tmp_path):
+        cache = TTSAudioCache(tmp_path / "tts.sqlite3")
+        cache.put("qwen", "v1", " 早上好  呀 ", _TTS_FORMAT_PCM, b"pcm")
+
+        assert cache.get("qwen", "v1", "早上好 呀", _TTS_FORMAT_PCM) == b"pcm"
+        # provider / 音色 / 格式任一不同都不命中
+        assert cache.get("qwen", "v2", "早上好 呀", _TTS_FORMAT_PCM) is None
+        assert cache.get("openai", "v1", "早上好 呀", _TTS_FORMAT_PCM) is None
+        assert cache.get("qwen", "v1", "早上好 呀", _TTS_FORMAT_OGG) is None
+        stats = cache.get_stats()
+        assert stats["hits"] == 1 and stats["misses"] == 3 and stats["hit_rate"] == 0.25
+
+    def test_only_short_sentences_cached(self, tmp_path):
+        cache = TTSAudioCache(tmp_path / "tts.sqlite3", max_text_chars=5)
+        cache.put("qwen", "v1", "你好", _TTS_FORMAT_PCM, b"a")
+        cache.put("qwen", "v1", "这句话太长了不缓存", _TTS_FORMAT_PCM, b"b")
+        cache.put("qwen", "v1", "空音频", _TTS_FORMAT_PCM, b"")
+        assert cache.get_stats()["entries"] == 1
+        assert not cache.is_cacheable("   ")
+
+    def test_prefix_lookup_and_reopen(self, tmp_path):
+        db_path = tmp_path / "tts.sqlite3"
+        TTSAudioCache(db_path).put("qwen", "v1", "晚安，做个好梦", _TTS_FORMAT_PCM, b"x" * 10)
+
+        reopened = TTSAudioCache(db_path)
+        assert reopened.has_prefix("qwen", "v1", _TTS_FORMAT_PCM, "晚安")
+        assert not reopened.has_prefix("qwen", "v1", _TTS_FORMAT_PCM, "早安")
+        assert not reopened.has_prefix("qwen", "v2", _TTS_FORMAT_PCM, "晚安")
+        assert reopened.get_stats()["bytes"] == 10
+
+    def test_prefix_lookup_while_another_thread_puts(self, tmp_path):
+        cache = TTSAudioCache(tmp_path / "tts.sqlite3", max_text_chars=10)
+        for i in range(2000):
+            cache._texts.setdefault(("qwen", "v1", _TTS_FORMAT_PCM), set()).add(f"句{i}")
+        errors = []
+        done = threading.Event()
+
+        def writer():
+            try:
+                for i in range(300):
+                    cache.put("qwen", "v1", f"新句{i}", _TTS_FORMAT_PCM, b"x")
+            except Exception as e:
+                errors.append(e)
+            finally:
+                done.set()
+
+        thread = threading.Thread(target=writer)
+        thread.start()
+        try:
+            while not done.is_set():
+                cache.has_prefix("qwen", "v1", _TTS_FORMAT_PCM, "没有")
+        except RuntimeError as e:
+            errors.append(e)
+        thread.join()
+        assert errors == []
+        assert cache.has_prefix("qwen", "v1", _TTS_FORMAT_PCM, "新句299")
+
+    def test_lru_eviction_by_total_bytes(self, tmp_path, monkeypatch):
+        clock = _FakeClock()
+        monkeypatch.setattr(tts_audio_cache, "time", clock)
+        cache = TTSAudioCache(tmp_path / "tts.sqlite3", max_bytes=400)
+        for text in ("一", "二", "三", "四"):
+            clock.t += 1
+            cache.put("qwen", "v1", text, _TTS_FORMAT_PCM, b"x" * 100)
+        clock.t += 1
+        assert cache.get("qwen", "v1", "一", _TTS_FORMAT_PCM)  # 刷新 last_access
+
+        clock.t += 1
+        cache.put("qwen", "v1", "五", _TTS_FORMAT_PCM, b"x" * 100)
+        assert cache.get("qwen", "v1", "二", _TTS_FORMAT_PCM) is None
+        assert not cache.has_prefix("qwen", "v1", _TTS_FORMAT_PCM, "二")
+        assert all(cache.get("qwen", "v1", t, _TTS_FORMAT_PCM) for t in ("一", "三", "四", "五"))
+        stats = cache.get_stats()
+        assert stats["evictions"] == 1 and stats["bytes"] == 400
+
+        # 单条超过总预算 1/4 的音频不缓存
+        cache.put("qwen", "v1", "六", _TTS_FORMAT_PCM, b"x" * 101)
+        assert cache.get("qwen", "v1", "六", _TTS_FORMAT_PCM) is None
+
+    def test_unwritable_path_disables_cache(self, tmp_path):
+        blocker = tmp_path / "file"
+        blocker.write_text("x")
+        cache = TTSAudioCache(blocker / "sub" / "tts.sqlite3")
+        assert not cache.enabled
+        cache.put("qwen", "v1", "你好", _TTS_FORMAT_PCM, b"x")
+        assert cache.get("qwen", "v1", "你好", _TTS_FORMAT_PCM) is None
+
+
+# ==================== _AudioCachingWorker ====================
+
+class _FakeProvider:
+    """桩 TTS worker：记录收到的文本，每个回合结束时按文本输出确定的音频"""
+
+    def __init__(self, fmt: str):
+        self.fmt = fmt
+        self.turns = []
+
+    def __call__(self, request_queue, response_queue, audio_api_key, voice_id):
+        response_queue.put(("__ready__", True))
+        text = ""
+        while True:
+            sid, tts_text = request_queue.get()
+            if sid == TTS_SHUTDOWN_SIGNAL:
+                break
+            if sid == "__interrupt__":
+                text = ""
+                continue
+            if sid is None:
+                self.turns.append(text)
+                data = _audio(text)
+                if self.fmt == _TTS_FORMAT_OGG:
+                    response_queue.put(("__audio__", self._sid, data))
+                else:
+                    for i in range(0, len(data), 4800):
+                        response_queue.put(data[i:i + 4800])
+                text = ""
+                continue
+            self._sid = sid
+            text += tts_text or ""
+
+
+class _Harness:
+    def __init__(self, cache: TTSAudioCache, fmt: str, provider: str = "qwen_realtime"):
+        self.cache = cache
+        self.provider = _FakeProvider(fmt)
+        self.worker = _AudioCachingWorker(self.provider, provider, fmt)
+        # 缩短等待时间，使测试在毫秒级完成
+        self.worker.QUIET_SECONDS = 0.05
+        self.worker.POLL_SECONDS = 0.02
+        self.worker.HOLD_GAP_SECONDS = 0.5
+        self.requests = queue.Queue()
+        self.responses = queue.Queue()
+        self.thread = threading.Thread(
+            target=self.worker, args=(self.requests, self.responses, "key", "voice"), daemon=True
+        )
+
+    def say(self, sid: str, *parts: str) -> None:
+        for part in parts:
+            self.requests.put((sid, part))
+        self.requests.put((None, None))
+
+    def collect_audio(self, expected_bytes: int, timeout: float = 3.0) -> list:
+        """收集响应直到凑够 expected_bytes 字节的音频"""
+        messages = []
+        received = 0
+        deadline = time.time() + timeout
+        while received < expected_bytes and time.time() < deadline:
+            try:
+                msg = self.responses.get(timeout=0.05)
+            except queue.Empty:
+                continue
+            if isinstance(msg, bytes):
+                received += len(msg)
+            elif isinstance(msg, tuple) and msg[0] == "__audio__":
+                received += len(msg[2])
+            else:
+                continue
+            messages.append(msg)
+        return messages
+
+    def wait_stored(self, count: int, timeout: float = 3.0) -> None:
+        deadline = time.time() + timeout
+        while self.cache.get_stats()["stores"] < count and time.time() < deadline:
+            time.sleep(0.01)
+        assert self.cache.get_stats()["stores"] == count
+
+
+@pytest.fixture
+def harness(tmp_path, monkeypatch):
+    cache = TTSAudioCache(tmp_path / "tts.sqlite3")
+    monkeypatch.setattr(tts_audio_cache, "get_tts_audio_cache", lambda: cache)
+    started = []
+
+    def factory(fmt=_TTS_FORMAT_PCM, provider="qwen_realtime"):
+        h = _Harness(cache, fmt, provider)
+        h.thread.start()
+        started.append(h)
+        return h
+
+    yield factory
+    for h in started:
+        h.requests.put((TTS_SHUTDOWN_SIGNAL, None))
+        h.thread.join(timeout=5)
+
+
+@pytest.mark.unit
+class TestAudioCachingWorker:
+    def test_pcm_hit_replays_without_provider(self, harness):
+        h = harness(_TTS_FORMAT_PCM)
+        h.say("s1", "你好", "呀")
+        first = h.collect_audio(20000)
+        assert b"".join(first) == _audio("你好呀")
+        h.wait_stored(1)
+
+        h.say("s2", "你好", "呀")
+        replayed = h.collect_audio(20000)
+        assert b"".join(replayed) == _audio("你好呀")
+        # 按 REPLAY_CHUNK_BYTES 分块回放
+        assert [len(c) for c in replayed] == [9600, 9600, 800]
+        assert h.provider.turns == ["你好呀"]
+        assert h.cache.get_stats()["hits"] == 1
+
+    def test_ogg_hit_replays_single_frame(self, harness):
+        h = harness(_TTS_FORMAT_OGG, provider="cosyvoice_vc")
+        h.say("s1", "晚安")
+        assert h.collect_audio(20000) == [("__audio__", "s1", _audio("晚安"))]
+        h.wait_stored(1)
+
+        h.say("s2", "晚安")
+        assert h.collect_audio(20000) == [("__audio__", "s2", _audio("晚安"))]
+        assert h.provider.turns == ["晚安"]
+
+    def test_miss_and_evicted_sentences_reach_provider(self, harness):
+        h = harness(_TTS_FORMAT_PCM)
+        h.say("s1", "早上好")
+        h.collect_audio(20000)
+        h.wait_stored(1)
+
+        # 已缓存句子的前缀但整句不同：等待后透传给 provider
+        h.say("s2", "早上好", "，今天也要加油")
+        assert b"".join(h.collect_audio(20000)) == _audio("早上好，今天也要加油")
+        h.wait_stored(2)
+
+        # 被淘汰后重新合成
+        h.cache.max_bytes = 20000
+        h.cache.put("qwen_realtime", "voice", "占位", _TTS_FORMAT_PCM, b"x" * 100)
+        assert h.cache.get("qwen_realtime", "voice", "早上好", _TTS_FORMAT_PCM) is None
+        h.say("s3", "早上好")
+        assert b"".join(h.collect_audio(20000)) == _audio("早上好")
+        assert h.provider.turns == ["早上好", "早上好，今天也要加油", "早上好"]
+
+    def test_cache_keyed_by_provider(self, harness):
+        first = harness(_TTS_FORMAT_PCM, provider="gptsovits@http://a")
+        first.say("s1", "你好")
+        first.collect_audio(20000)
+        first.wait_stored(1)
+
+        second = harness(_TTS_FORMAT_PCM, provider="gptsovits@http://b")
+        second.say("s1", "你好")
+        second.collect_audio(20000)
+        assert second.provider.turns == ["你好"]
+
+
+@pytest.mark.unit
+def test_pool_key_distinguishes_wrapped_providers():
+    provider = _FakeProvider(_TTS_FORMAT_PCM)
+    a = _AudioCachingWorker(provider, "gptsovits@http://a", _TTS_FORMAT_PCM)
+    b = _AudioCachingWorker(provider, "gptsovits@http://b", _TTS_FORMAT_PCM)
+    assert _provider_name(a) == "gptsovits@http://a"
+    assert _provider_name(a) != _provider_name(b)
+    assert not hasattr(a, "__name__")
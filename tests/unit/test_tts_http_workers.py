@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+"""
+逐句合成的 HTTP 类 TTS worker（main_logic/tts_client.py 的 openai / gemini worker）— 单元测试
+
+用桩客户端代替真实 API，worker 在真实线程中运行，覆盖范围:
+- OpenAI worker 在句子合成途中收到退出信号时能正常退出
+- Gemini worker 被打断的回合合成失败时不再上报错误（避免旧错误发到新回合）
+"""
+
+import os
+import queue
+import sys
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+# 确保项目根目录在 sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+import main_logic.tts_client as tts_client
+from main_logic.tts_client import TTS_SHUTDOWN_SIGNAL, gemini_tts_worker, openai_tts_worker
+
+_SENTENCE = "这是一句足够长的完整句子。"
+
+
+def _start_worker(target, *args):
+    request_queue, response_queue = queue.Queue(), queue.Queue()
+    thread = threading.Thread(target=target, args=(request_queue, response_queue, *args), daemon=True)
+    thread.start()
+    assert response_queue.get(timeout=5) == ("__ready__", True)
+    return thread, request_queue, response_queue
+
+
+def _drain(response_queue) -> list:
+    items = []
+    while True:
+        try:
+            items.append(response_queue.get_nowait())
+        except queue.Empty:
+            return items
+
+
+# ==================== OpenAI ====================
+
+class _HangingSpeechResponse:
+    def __init__(self, started: threading.Event):
+        self.started = started
+
+    async def __aenter__(self):
+        import asyncio
+        self.started.set()
+        await asyncio.sleep(3600)
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+def _fake_openai_client(started: threading.Event):
+    def factory(api_key=None):
+        speech = SimpleNamespace(with_streaming_response=SimpleNamespace(
+            create=lambda **kwargs: _HangingSpeechResponse(started)
+        ))
+        return SimpleNamespace(audio=SimpleNamespace(speech=speech))
+    return factory
+
+
+@pytest.mark.unit
+class TestOpenAITTSWorker:
+    def test_shutdown_while_sentence_in_flight(self, monkeypatch):
+        import openai
+        started = threading.Event()
+        monkeypatch.setattr(openai, "AsyncOpenAI", _fake_openai_client(started))
+
+        thread, request_queue, _ = _start_worker(openai_tts_worker, "key", "marin")
+        request_queue.put(("s1", _SENTENCE))
+        assert started.wait(5), "句子合成未开始"
+
+        request_queue.put((TTS_SHUTDOWN_SIGNAL, None))
+        thread.join(5)
+        assert not thread.is_alive(), "合成途中退出时 worker 线程卡住"
+
+
+# ==================== Gemini ====================
+
+class _FakeHttpxClient:
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def get(self, *args, **kwargs):
+        return None
+
+    def close(self):
+        pass
+
+
+@pytest.mark.unit
+class TestGeminiTTSWorker:
+    @pytest.fixture
+    def failing_call(self, monkeypatch):
+        import httpx
+        monkeypatch.setattr(httpx, "Client", _FakeHttpxClient)
+        state = SimpleNamespace(release=threading.Event(), attempts=0, lock=threading.Lock())
+
+        def fake_call(http_client, url, text, voice_id, timeout_s=20):
+            state.release.wait(5)
+            with state.lock:
+                state.attempts += 1
+            raise RuntimeError("boom")
+
+        monkeypatch.setattr(tts_client, "_gemini_tts_httpx_call", fake_call)
+        return state
+
+    def _run_turn(self, failing_call, interrupt: bool) -> list:
+        thread, request_queue, response_queue = _start_worker(gemini_tts_worker, "key", "Leda")
+        request_queue.put(("s1", _SENTENCE))
+        if interrupt:
+            request_queue.put(("__interrupt__", None))
+            time.sleep(0.1)
+        failing_call.release.set()
+        deadline = time.time() + 5
+        while failing_call.attempts < 3 and time.time() < deadline:
+            time.sleep(0.01)
+        time.sleep(0.1)
+        request_queue.put((TTS_SHUTDOWN_SIGNAL, None))
+        thread.join(5)
+        return [item for item in _drain(response_queue) if isinstance(item, tuple) and item[0] == "__error__"]
+
+    def test_error_reported_for_current_turn(self, failing_call):
+        errors = self._run_turn(failing_call, interrupt=False)
+        assert len(errors) == 1 and "boom" in errors[0][1]
+
+    def test_error_dropped_for_abandoned_turn(self, failing_call):
+        assert self._run_turn(failing_call, interrupt=True) == []
@@ -0,0 +1,246 @@
+# -*- coding: utf-8 -*-
+"""
+TTS worker 共用 WAV/PCM 解码（main_logic/tts_pcm.py）— 单元测试
+
+覆盖范围:
+- RIFF header 按 chunk 解析（非 44 字节 header）、格式校验
+- 流式 WAV chunk：header 只完整解析一次，后续 chunk 走签名快路径
+- 奇数长度 chunk 的尾字节跨 chunk 保留
+- int16 直通 soxr 与旧 float32 重采样路径结果一致
+- 吞吐基准：对比旧的 io.BytesIO + wave.open + float32 往返路径
+"""
+
+import io
+import os
+import struct
+import sys
+import time
+import wave
+
+import numpy as np
+import pytest
+import soxr
+
+# 确保项目根目录在 sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+import main_logic.tts_pcm as tts_pcm
+from main_logic.tts_pcm import PCMResampler, WavChunkDecoder, parse_wav_header, resample_pcm
+
+
+def _sine_pcm(seconds: float, sample_rate: int = 24000, freq: float = 440.0, amp: float = 0.5) -> bytes:
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    return (np.sin(2 * np.pi * freq * t) * amp * 32767).astype(np.int16).tobytes()
+
+
+def _wav_bytes(pcm: bytes, sample_rate: int = 24000, channels: int = 1, sampwidth: int = 2) -> bytes:
+    buf = io.BytesIO()
+    with wave.open(buf, 'wb') as wf:
+        wf.setnchannels(channels)
+        wf.setsampwidth(sampwidth)
+        wf.setframerate(sample_rate)
+        wf.writeframes(pcm)
+    return buf.getvalue()
+
+
+def _wav_with_list_chunk(pcm: bytes, sample_rate: int = 24000) -> bytes:
+    """带 LIST chunk 的 WAV（header 不是 44 字节）。"""
+    fmt = struct.pack('<HHIIHH', 1, 1, sample_rate, sample_rate * 2, 2, 16)
+    info = b'INFOISFT\x05\x00\x00\x00test\x00\x00'
+    body = (
+        b'WAVE'
+        + b'fmt ' + struct.pack('<I', len(fmt)) + fmt
+        + b'LIST' + struct.pack('<I', len(info)) + info
+        + b'data' + struct.pack('<I', len(pcm)) + pcm
+    )
+    return b'RIFF' + struct.pack('<I', len(body)) + body
+
+
+def _legacy_wav_resample(chunks, resampler) -> bytes:
+    """旧路径：每个 chunk 用 io.BytesIO + wave.open 解析，再经 float32 往返重采样。"""
+    out = []
+    for chunk in chunks:
+        with io.BytesIO(chunk) as wav_io:
+            with wave.open(wav_io, 'rb') as wav_file:
+                pcm_data = wav_file.readframes(wav_file.getnframes())
+        audio_float = np.frombuffer(pcm_data, dtype=np.int16).astype(np.float32) / 32768.0
+        resampled = resampler.resample_chunk(audio_float)
+        out.append((resampled * 32768.0).clip(-32768, 32767).astype(np.int16).tobytes())
+    return b''.join(out)
+
+
+# ==================== header 解析 ====================
+
+@pytest.mark.unit
+class TestParseWavHeader:
+    def test_standard_header(self):
+        pcm = _sine_pcm(0.1)
+        fmt = parse_wav_header(_wav_bytes(pcm))
+        assert (fmt.sample_rate, fmt.channels, fmt.bits_per_sample) == (24000, 1, 16)
+        assert fmt.data_offset == 44
+        assert fmt.data_size == len(pcm)
+
+    def test_extra_chunk_before_data(self):
+        pcm = _sine_pcm(0.05, sample_rate=32000)
+        data = _wav_with_list_chunk(pcm, sample_rate=32000)
+        fmt = parse_wav_header(data)
+        assert fmt.sample_rate == 32000
+        assert fmt.data_offset > 44
+        assert data[fmt.data_offset:] == pcm
+
+    @pytest.mark.parametrize("data", [
+        b'',
+        b'RIFF\x00\x00\x00\x00WAVE',
+        b'OggS' + b'\x00' * 60,
+    ])
+    def test_invalid_or_truncated(self, data):
+        with pytest.raises(ValueError):
+            parse_wav_header(data)
+
+    def test_rejects_non_pcm16(self):
+        with pytest.raises(ValueError):
+            parse_wav_header(_wav_bytes(b'\x00' * 8, sampwidth=1))
+        float_wav = bytearray(_wav_bytes(b'\x00' * 8))
+        float_wav[20:22] = struct.pack('<H', 3)  # WAVE_FORMAT_IEEE_FLOAT
+        with pytest.raises(ValueError):
+            parse_wav_header(bytes(float_wav))
+
+
+# ==================== 流式 chunk 解码 ====================
+
+@pytest.mark.unit
+class TestWavChunkDecoder:
+    def test_header_parsed_once_per_stream(self, monkeypatch):
+        calls = []
+        real_parse = tts_pcm.parse_wav_header
+
+        def counting_parse(buf):
+            calls.append(len(buf))
+            return real_parse(buf)
+
+        monkeypatch.setattr(tts_pcm, 'parse_wav_header', counting_parse)
+        pcm = _sine_pcm(0.5)
+        pieces = [pcm[i:i + 1920] for i in range(0, len(pcm), 1920)]
+        decoder = WavChunkDecoder("test")
+        decoded = b''.join(bytes(decoder.decode(_wav_bytes(p))) for p in pieces)
+        assert decoded == pcm
+        assert len(calls) == 1
+
+    def test_format_change_reparses(self):
+        decoder = WavChunkDecoder("test")
+        decoder.decode(_wav_bytes(_sine_pcm(0.01), sample_rate=24000))
+        decoder.decode(_wav_bytes(_sine_pcm(0.01, sample_rate=32000), sample_rate=32000))
+        assert decoder.format.sample_rate == 32000
+
+    def test_raw_pcm_after_header(self):
+        decoder = WavChunkDecoder("test")
+        head = _sine_pcm(0.01)
+        decoder.decode(_wav_bytes(head))
+        tail = b'\x01\x02\x03'
+        assert bytes(decoder.decode(tail)) == tail
+
+    def test_returns_view_without_copy(self):
+        chunk = _wav_bytes(_sine_pcm(0.01))
+        view = WavChunkDecoder("test").decode(chunk)
+        assert isinstance(view, memoryview)
+        assert view.obj is chunk
+
+    def test_raw_pcm_without_header_rejected(self):
+        with pytest.raises(ValueError):
+            WavChunkDecoder("test").decode(b'\x00\x01' * 10)
+
+    def test_stereo_rejected(self):
+        with pytest.raises(ValueError):
+            WavChunkDecoder("test").decode(_wav_bytes(b'\x00' * 16, channels=2))
+
+
+# ==================== 重采样 ====================
+
+@pytest.mark.unit
+class TestPCMResampler:
+    def test_odd_chunks_keep_every_byte(self):
+        pcm = _sine_pcm(0.2)
+        resampler = PCMResampler(24000, 24000)
+        out = b''.join(resampler.process(pcm[i:i + 777]) for i in range(0, len(pcm), 777))
+        assert out == pcm
+
+    def test_odd_chunks_match_aligned_resampling(self):
+        pcm = _sine_pcm(0.2)
+        odd = PCMResampler(24000)
+        aligned = PCMResampler(24000)
+        out_odd = b''.join(odd.process(pcm[i:i + 777]) for i in range(0, len(pcm), 777)) + odd.flush()
+        out_aligned = b''.join(aligned.process(pcm[i:i + 960]) for i in range(0, len(pcm), 960)) + aligned.flush()
+        assert len(out_odd) == len(out_aligned) == len(pcm) * 2
+        diff = np.abs(np.frombuffer(out_odd, np.int16).astype(np.int32) - np.frombuffer(out_aligned, np.int16))
+        assert diff.max() <= 3
+
+    def test_matches_legacy_float_path(self):
+        pcm = _sine_pcm(0.5)
+        chunks = [_wav_bytes(pcm[i:i + 1920]) for i in range(0, len(pcm), 1920)]
+        legacy = _legacy_wav_resample(chunks, soxr.ResampleStream(24000, 48000, 1, dtype='float32'))
+
+        decoder = WavChunkDecoder("test")
+        resampler = PCMResampler(24000)
+        new = b''.join(resampler.process(decoder.decode(c)) for c in chunks)
+
+        assert len(new) == len(legacy)
+        diff = np.abs(np.frombuffer(new, np.int16).astype(np.int32) - np.frombuffer(legacy, np.int16))
+        assert diff.max() <= 3
+
+    def test_clear_drops_carry(self):
+        resampler = PCMResampler(24000, 24000)
+        resampler.process(b'\x00\x00\x01')
+        resampler.clear()
+        # 新一轮音频不应拼接上一轮的奇数尾字节
+        assert resampler.process(b'\x02\x00') == b'\x02\x00'
+
+    def test_flush_emits_tail(self):
+        resampler = PCMResampler(24000)
+        pcm = _sine_pcm(0.1)
+        out = resampler.process(pcm)
+        tail = resampler.flush()
+        assert len(tail) > 0
+        assert len(out) + len(tail) == len(pcm) * 2
+
+    def test_one_shot_resample(self):
+        pcm = _sine_pcm(0.1) + b'\x01'
+        out = resample_pcm(pcm, 24000)
+        assert len(out) == (len(pcm) - 1) * 2
+        assert resample_pcm(pcm, 48000) == pcm[:-1]
+
+
+# ==================== 吞吐基准 ====================
+
+class TestThroughputBenchmark:
+
+    @pytest.mark.performance
+    def test_wav_chunk_decode_resample_throughput(self):
+        """
+        StepFun 形态的流：每 40ms 一个带 header 的 WAV chunk（24kHz → 48kHz）。
+        对比旧路径（io.BytesIO + wave.open + float32 往返）与共用解码路径的吞吐。
+        """
+        seconds = 30.0
+        pcm = _sine_pcm(seconds)
+        chunks = [_wav_bytes(pcm[i:i + 1920]) for i in range(0, len(pcm), 1920)]
+
+        start = time.perf_counter()
+        _legacy_wav_resample(chunks, soxr.ResampleStream(24000, 48000, 1, dtype='float32'))
+        legacy_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        decoder = WavChunkDecoder("bench")
+        resampler = PCMResampler(24000)
+        for c in chunks:
+            resampler.process(decoder.decode(c))
+        new_s = time.perf_counter() - start
+
+        print(
+            f"\n[性能] {len(chunks)} 个 WAV chunk / {seconds:.0f}s 音频: "
+            f"旧路径 {legacy_s * 1000:.1f}ms ({seconds / legacy_s:.0f}x 实时), "
+            f"共用解码 {new_s * 1000:.1f}ms ({seconds / new_s:.0f}x 实时), "
+            f"加速 {legacy_s / new_s:.2f}x"
+        )
+
+        # 仅在显式启用性能测试时断言严格阈值
+        if os.environ.get('RUN_PERF_TESTS', '').lower() == 'true':
+            assert new_s < legacy_s, "共用解码路径不应慢于旧的 wave + float32 路径"
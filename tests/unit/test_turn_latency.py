@@ -0,0 +1,288 @@
+# -*- coding: utf-8 -*-
+"""
+轮次延迟追踪（main_logic/turn_latency.py）— 单元测试
+
+覆盖范围:
+- 直方图分桶与分位数估算
+- 轮次阶段只记录首次出现、首帧语音下发后结束本轮、超时轮次被放弃
+- 真实的 LLMSessionManager + OmniRealtimeClient，由桩实时模型服务端与桩 TTS worker
+  （真实线程 + 队列）驱动一轮语音对话，断言各阶段耗时
+- 只有 speech_stopped 开始新一轮，其他触发 handle_new_message 的路径不会
+"""
+
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+from queue import Queue
+
+import pytest
+
+# 确保项目根目录在 sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from starlette.websockets import WebSocketState
+
+from main_logic.core import LLMSessionManager
+from main_logic.omni_realtime_client import OmniRealtimeClient
+from main_logic.speech_output import BYTES_PER_MS
+from main_logic.turn_latency import LatencyHistogram, TurnLatencyTracer
+from utils.config_manager import get_config_manager
+
+# 计时容差（毫秒）：只要求各阶段落在注入延迟附近，避免受调度抖动影响
+TOLERANCE_MS = 60
+
+
+class _FakeClock:
+    def __init__(self):
+        self.t = 0.0
+
+    def __call__(self):
+        return self.t
+
+
+# ==================== 直方图 ====================
+
+@pytest.mark.unit
+class TestLatencyHistogram:
+    def test_percentiles_follow_buckets(self):
+        hist = LatencyHistogram()
+        for v in [3] * 90 + [150] * 10:
+            hist.observe(v)
+        snap = hist.snapshot()
+        assert snap["count"] == 100
+        assert snap["p50_ms"] == 5
+        assert snap["p99_ms"] == 150  # 桶上界 200 以实际最大值封顶
+        assert snap["buckets"]["le_5"] == 90
+        assert snap["buckets"]["le_200"] == 10
+
+    def test_empty(self):
+        assert LatencyHistogram().snapshot()["p50_ms"] is None
+
+
+# ==================== 轮次追踪 ====================
+
+@pytest.mark.unit
+class TestTurnTracer:
+    def test_stage_intervals(self):
+        clock = _FakeClock()
+        tracer = TurnLatencyTracer("t", clock=clock)
+        tracer.begin_turn()
+        clock.t = 0.3
+        tracer.mark("first_token")
+        clock.t = 0.35
+        tracer.mark("first_token")  # 重复打点被忽略
+        clock.t = 0.5
+        tracer.mark("first_tts_byte")
+        clock.t = 0.54
+        tracer.mark("first_speech_frame")
+
+        stages = tracer.snapshot()["stages"]
+        assert stages["first_token"]["max_ms"] == pytest.approx(300)
+        assert stages["first_token"]["count"] == 1
+        assert stages["first_tts_byte"]["max_ms"] == pytest.approx(200)
+        assert stages["first_speech_frame"]["max_ms"] == pytest.approx(40)
+        assert stages["end_to_end"]["max_ms"] == pytest.approx(540)
+        # 首帧下发后本轮结束，之后的输出不再计入
+        assert not tracer.in_turn
+        assert tracer.snapshot()["recent_turns"][-1]["first_speech_frame_ms"] == pytest.approx(540)
+
+    def test_native_audio_frame_measured_from_first_token(self):
+        clock = _FakeClock()
+        tracer = TurnLatencyTracer("t", clock=clock)
+        tracer.begin_turn()
+        clock.t = 0.2
+        tracer.mark("first_token")
+        clock.t = 0.25
+        tracer.mark("first_speech_frame")
+        assert tracer.snapshot()["stages"]["first_speech_frame"]["max_ms"] == pytest.approx(50)
+
+    def test_marks_outside_turn_are_ignored(self):
+        tracer = TurnLatencyTracer("t", clock=_FakeClock())
+        tracer.mark("first_token")
+        assert tracer.snapshot()["stages"]["first_token"]["count"] == 0
+
+    def test_stale_turn_is_abandoned(self):
+        clock = _FakeClock()
+        tracer = TurnLatencyTracer("t", clock=clock)
+        tracer.begin_turn()
+        clock.t = 120.0
+        tracer.mark("first_speech_frame")
+        assert not tracer.in_turn
+        assert tracer.snapshot()["stages"]["end_to_end"]["count"] == 0
+
+
+# ==================== 桩后端驱动的端到端轮次 ====================
+
+class _FakeRealtimeServer:
+    """桩实时模型服务端（OmniRealtimeClient 的 ws）：首个音频块时报告 speech_started，
+    收到 chunks 个音频块后延迟 vad_delay 报告 speech_stopped 与用户转录，再延迟 token_delay 输出首个回复转录。"""
+
+    def __init__(self, chunks, vad_delay, token_delay):
+        self.chunks = chunks
+        self.vad_delay = vad_delay
+        self.token_delay = token_delay
+        self.appends = 0
+        self.events: asyncio.Queue = asyncio.Queue()
+
+    async def send(self, message):
+        if json.loads(message).get("type") != "input_audio_buffer.append":
+            return
+        self.appends += 1
+        if self.appends == 1:
+            self._emit("input_audio_buffer.speech_started")
+        if self.appends == self.chunks:
+            asyncio.create_task(self._respond())
+
+    async def _respond(self):
+        await asyncio.sleep(self.vad_delay)
+        self._emit("input_audio_buffer.speech_stopped")
+        self._emit("response.created", response={"id": "r1"})
+        self._emit("conversation.item.input_audio_transcription.completed", transcript="你好")
+        await asyncio.sleep(self.token_delay)
+        self._emit("response.audio_transcript.delta", delta="你好呀")
+
+    def _emit(self, event_type, **fields):
+        self.events.put_nowait(json.dumps({"type": event_type, **fields}))
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        message = await self.events.get()
+        if message is None:
+            raise StopAsyncIteration
+        return message
+
+    async def close(self):
+        self.events.put_nowait(None)
+
+
+class _FakeWebSocket:
+    """前端 websocket：记录下发的 JSON 与二进制帧"""
+
+    client_state = WebSocketState.CONNECTED
+
+    def __init__(self):
+        self.sent_json = []
+        self.frames = []
+
+    async def send_json(self, message):
+        self.sent_json.append(message)
+
+    async def send_bytes(self, payload):
+        self.frames.append(payload)
+
+
+def _stub_tts_worker(request_queue: Queue, response_queue: Queue, synth_delay: float):
+    """桩 TTS worker：与真实 worker 相同的队列协议，每段文本合成 synth_delay 后输出 10ms 小块。"""
+    response_queue.put(("__ready__", True))
+    while True:
+        sid, text = request_queue.get()
+        if sid == "__shutdown__":
+            break
+        if sid is None or sid == "__interrupt__":
+            continue
+        time.sleep(synth_delay)
+        for _ in range(5):
+            response_queue.put(b"\x01\x00" * 480)
+
+
+def _make_manager(tts_delay: float):
+    """真实的 LLMSessionManager（默认角色配置），TTS 使用桩 worker"""
+    lanlan_name = get_config_manager().get_character_data()[1]
+    manager = LLMSessionManager(Queue(), lanlan_name, "prompt")
+    manager.latency = TurnLatencyTracer("stub")
+    manager.websocket = _FakeWebSocket()
+    manager.use_tts = True
+    manager.tts_thread = threading.Thread(
+        target=_stub_tts_worker,
+        args=(manager.tts_request_queue, manager.tts_response_queue, tts_delay),
+        daemon=True,
+    )
+    manager.tts_thread.start()
+    return manager
+
+
+def _make_session(manager, server):
+    session = OmniRealtimeClient(
+        base_url="",
+        api_key="stub",
+        model="qwen-omni",
+        on_text_delta=manager.handle_text_data,
+        on_audio_delta=manager.handle_audio_data,
+        on_new_message=manager.handle_new_message,
+        on_speech_stopped=manager.handle_speech_stopped,
+        on_input_transcript=manager.handle_input_transcript,
+        on_output_transcript=manager.handle_output_transcript,
+        on_response_done=manager.handle_response_complete,
+        api_type="qwen",
+    )
+    session.ws = server
+    manager.session = session
+    manager.is_active = True
+    manager.session_ready = True
+    return session
+
+
+@pytest.mark.unit
+async def test_stub_turn_stage_timings():
+    vad_delay, token_delay, tts_delay = 0.05, 0.12, 0.08
+    chunks = 10
+    manager = _make_manager(tts_delay)
+    server = _FakeRealtimeServer(chunks, vad_delay, token_delay)
+    session = _make_session(manager, server)
+    tracer = manager.latency
+    receiver = asyncio.create_task(session.handle_messages())
+    tts_handler = asyncio.create_task(manager.tts_response_handler())
+    try:
+        for _ in range(chunks):
+            # 对应 websocket_router：收到消息时读取时钟，再由 create_task 调度 stream_data
+            received_at = tracer.now()
+            await asyncio.sleep(0)
+            await manager.stream_data({"input_type": "audio", "data": [0] * 480}, received_at)
+        deadline = time.monotonic() + 3
+        while tracer.in_turn or not manager.websocket.frames:
+            assert time.monotonic() < deadline, "本轮未在超时内结束"
+            await asyncio.sleep(0.01)
+    finally:
+        receiver.cancel()
+        tts_handler.cancel()
+        await asyncio.gather(receiver, tts_handler, return_exceptions=True)
+        manager.tts_request_queue.put(("__shutdown__", None))
+        manager.tts_thread.join(timeout=1)
+        session._dsp_worker.shutdown()
+
+    snap = tracer.snapshot()
+    stages = snap["stages"]
+    for stage in ("ws_queue", "dsp", "upstream_send"):
+        assert stages[stage]["count"] == chunks
+
+    first_token = stages["first_token"]["max_ms"]
+    first_tts = stages["first_tts_byte"]["max_ms"]
+    first_frame = stages["first_speech_frame"]["max_ms"]
+    end_to_end = stages["end_to_end"]["max_ms"]
+    # 轮次起点为 speech_stopped，因此首个输出耗时只包含模型延迟
+    assert token_delay * 1000 * 0.9 <= first_token <= token_delay * 1000 + TOLERANCE_MS
+    assert tts_delay * 1000 * 0.9 <= first_tts <= tts_delay * 1000 + TOLERANCE_MS
+    # 10ms 小块在 40ms 合包延迟上限到期后下发
+    assert 40 * 0.9 <= first_frame <= 40 + TOLERANCE_MS
+    assert end_to_end == pytest.approx(first_token + first_tts + first_frame, abs=1.0)
+    assert b"".join(manager.websocket.frames)[:BYTES_PER_MS * 10] == b"\x01\x00" * 480
+    assert snap["recent_turns"][-1]["first_speech_frame_ms"] == pytest.approx(end_to_end, abs=0.1)
+
+
+@pytest.mark.unit
+async def test_new_message_without_speech_stopped_does_not_begin_turn():
+    # Gemini 首个回复内容、主动搭话被用户打断时只调用 handle_new_message，不应开始新一轮
+    manager = _make_manager(tts_delay=0)
+    try:
+        await manager.handle_new_message()
+        assert not manager.latency.in_turn
+        await manager.handle_speech_stopped()
+        assert manager.latency.in_turn
+    finally:
+        manager.tts_request_queue.put(("__shutdown__", None))
+        manager.tts_thread.join(timeout=1)
@@ -0,0 +1,474 @@
+# -*- coding: utf-8 -*-
+"""
+网页抓取共享连接池与按来源 TTL 缓存（utils/web_scraper.py）— 单元测试
+
+使用本地 stub HTTP 服务器（http.server 线程）代替真实站点，覆盖范围:
+- 共享客户端复用同一条 keep-alive 连接
+- 共享客户端不保存响应下发的 Cookie，登录态 Cookie 只随显式请求头发送
+- 热榜抓取在 TTL 内直接命中缓存，返回值互不影响
+- 过期后先返回旧数据并在后台刷新（stale-while-revalidate）
+- 并发请求只发起一次抓取；失败结果不缓存
+- 窗口上下文按归一化标题缓存：同一应用/文档内重复触发不再调用 LLM 与搜索
+- 个人动态：ETag 条件请求命中 304 时复用上次数据；各平台并发抓取并共用截止时间
+- 依赖登录态的来源（个人动态、B站个性化首页推荐）的结果缓存按账号区分
+"""
+
+import asyncio
+import json
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import pytest
+
+# 确保项目根目录在 sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+import utils.web_scraper as web_scraper
+from utils.web_scraper import ConditionalCache, SourceCache, cached_source, get_http_client
+
+
+class _StubState:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.requests = []
+        self.status = 200
+        self.version = 0
+        self.not_modified = 0
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        with self.server.state.lock:
+            self.server.state.connections += 1
+
+    def do_GET(self):
+        state = self.server.state
+        with state.lock:
+            state.version += 1
+            state.requests.append((self.path, self.headers.get('Cookie')))
+            version = state.version
+            status = state.status
+        if self.path.startswith('/hot.json'):
+            # 个人订阅流：内容固定，支持 ETag 条件请求
+            etag = '"feed-1"'
+            if self.headers.get('If-None-Match') == etag:
+                with state.lock:
+                    state.not_modified += 1
+                self.send_response(304)
+                self.send_header('ETag', etag)
+                self.end_headers()
+                return
+            body = json.dumps({'data': {'children': [
+                {'data': {'title': f'feed {i}', 'subreddit': 'test', 'score': 10, 'permalink': f'/r/test/{i}'}}
+                for i in range(3)
+            ]}}).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.send_header('ETag', etag)
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        if self.path.startswith('/r/popular/hot.json'):
+            payload = {'data': {'children': [
+                {'data': {'title': f'post {version}-{i}', 'subreddit': 'test', 'score': 1200,
+                          'num_comments': 3, 'permalink': f'/r/test/{i}'}}
+                for i in range(3)
+            ]}}
+        else:
+            payload = {'version': version}
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Set-Cookie', f'session=stub{version}; Path=/')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def stub_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _StubHandler)
+    server.daemon_threads = True
+    server.state = _StubState()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture(autouse=True)
+async def fresh_scraper_state(monkeypatch):
+    monkeypatch.setattr(web_scraper, '_source_cache', SourceCache())
+    monkeypatch.setattr(web_scraper, '_conditional_cache', ConditionalCache())
+    # 跳过抓取前的随机延迟
+    monkeypatch.setattr(web_scraper.random, 'uniform', lambda a, b: 0)
+    yield
+    # 等待未完成的后台刷新，避免事件循环关闭时遗留协程
+    await asyncio.gather(*web_scraper.get_source_cache()._inflight.values(), return_exceptions=True)
+    await web_scraper.close_http_client()
+
+
+def _base_url(server) -> str:
+    return f"http://127.0.0.1:{server.server_address[1]}"
+
+
+class _RewriteTransport(httpx.AsyncHTTPTransport):
+    """把真实站点的请求改写到本地 stub 服务器。"""
+
+    def __init__(self, port: int):
+        super().__init__()
+        self.port = port
+
+    async def handle_async_request(self, request):
+        request.url = request.url.copy_with(scheme='http', host='127.0.0.1', port=self.port)
+        return await super().handle_async_request(request)
+
+
+def _route_to_stub(monkeypatch, server):
+    client = httpx.AsyncClient(
+        transport=_RewriteTransport(server.server_address[1]),
+        follow_redirects=True,
+        cookies=web_scraper._NoPersistCookieJar(),
+    )
+    monkeypatch.setattr(web_scraper, 'get_http_client', lambda: client)
+    return client
+
+
+# ==================== 共享客户端 ====================
+
+@pytest.mark.unit
+class TestSharedHttpClient:
+    async def test_reuses_keepalive_connection(self, stub_server):
+        base = _base_url(stub_server)
+        for i in range(5):
+            response = await get_http_client().get(f"{base}/item/{i}")
+            assert response.status_code == 200
+        assert len(stub_server.state.requests) == 5
+        assert stub_server.state.connections == 1
+
+    async def test_same_client_within_loop(self):
+        assert get_http_client() is get_http_client()
+
+    async def test_recreated_after_close(self):
+        client = get_http_client()
+        await web_scraper.close_http_client()
+        assert client.is_closed
+        assert get_http_client() is not client
+
+    async def test_response_cookies_not_persisted(self, stub_server):
+        base = _base_url(stub_server)
+        client = get_http_client()
+        await client.get(f"{base}/first")
+        await client.get(f"{base}/second")
+        await client.get(f"{base}/login", headers=web_scraper._cookie_header({'SUB': 'abc', 'x': '1'}))
+        cookies = [cookie for _, cookie in stub_server.state.requests]
+        assert cookies == [None, None, 'SUB=abc; x=1']
+
+
+# ==================== 来源缓存 ====================
+
+@pytest.mark.unit
+class TestSourceCache:
+    async def test_trending_served_from_cache_within_ttl(self, monkeypatch, stub_server):
+        client = _route_to_stub(monkeypatch, stub_server)
+        try:
+            first = await web_scraper.fetch_reddit_popular(3)
+            first['posts'].clear()
+            second = await web_scraper.fetch_reddit_popular(limit=3)
+        finally:
+            await client.aclose()
+        assert second['success'] and len(second['posts']) == 3
+        assert len(stub_server.state.requests) == 1
+        stats = web_scraper.get_source_cache().get_stats()
+        assert stats['hits'] == 1 and stats['misses'] == 1
+        assert stats['sources'] == {'reddit_popular': 1}
+
+    async def test_stale_while_revalidate(self, stub_server):
+        base = _base_url(stub_server)
+
+        @cached_source("stub", ttl=0.05, stale_ttl=60)
+        async def fetch_version():
+            response = await get_http_client().get(f"{base}/version")
+            return {'success': True, 'version': response.json()['version']}
+
+        assert (await fetch_version())['version'] == 1
+        await asyncio.sleep(0.1)
+        # 过期后立即返回旧数据，同时在后台刷新
+        assert (await fetch_version())['version'] == 1
+        cache = web_scraper.get_source_cache()
+        await asyncio.gather(*cache._inflight.values())
+        assert (await fetch_version())['version'] == 2
+        assert cache.get_stats()['stale_hits'] == 1
+
+    async def test_expired_beyond_stale_window_refetches(self, stub_server):
+        base = _base_url(stub_server)
+
+        @cached_source("stub", ttl=0.01, stale_ttl=0.01)
+        async def fetch_version():
+            response = await get_http_client().get(f"{base}/version")
+            return {'success': True, 'version': response.json()['version']}
+
+        assert (await fetch_version())['version'] == 1
+        await asyncio.sleep(0.05)
+        assert (await fetch_version())['version'] == 2
+
+    async def test_concurrent_requests_single_flight(self, stub_server):
+        base = _base_url(stub_server)
+
+        @cached_source("stub", ttl=60)
+        async def fetch_version(query: str):
+            response = await get_http_client().get(f"{base}/search", params={'q': query})
+            return {'success': True, 'version': response.json()['version']}
+
+        results = await asyncio.gather(*(fetch_version("same") for _ in range(5)))
+        assert {r['version'] for r in results} == {1}
+        assert len(stub_server.state.requests) == 1
+        await fetch_version("other")
+        assert len(stub_server.state.requests) == 2
+
+    async def test_failed_results_not_cached(self, stub_server):
+        base = _base_url(stub_server)
+        stub_server.state.status = 503
+
+        @cached_source("stub", ttl=60)
+        async def fetch_version():
+            response = await get_http_client().get(f"{base}/version")
+            return {'success': response.status_code == 200, 'version': response.json()['version']}
+
+        assert not (await fetch_version())['success']
+        stub_server.state.status = 200
+        result = await fetch_version()
+        assert result['success'] and result['version'] == 2
+        assert web_scraper.get_source_cache().get_stats()['failures'] == 1
+
+    async def test_stale_entry_kept_when_refresh_fails(self, stub_server):
+        base = _base_url(stub_server)
+
+        @cached_source("stub", ttl=0.05, stale_ttl=60)
+        async def fetch_version():
+            response = await get_http_client().get(f"{base}/version")
+            return {'success': response.status_code == 200, 'version': response.json()['version']}
+
+        assert (await fetch_version())['version'] == 1
+        await asyncio.sleep(0.1)
+        stub_server.state.status = 503
+        assert (await fetch_version())['version'] == 1
+        cache = web_scraper.get_source_cache()
+        await asyncio.gather(*cache._inflight.values())
+        assert (await fetch_version())['version'] == 1
+
+
+# ==================== 窗口上下文缓存 ====================
+
+@pytest.mark.unit
+class TestWindowContextCache:
+    @pytest.fixture
+    def window_env(self, monkeypatch):
+        calls = {'llm': 0, 'search': 0}
+        title = {'raw': '● main.py - Visual Studio Code'}
+
+        def fake_window_title(include_raw=False):
+            raw = title['raw']
+            sanitized = raw[:30] + '...' if len(raw) > 30 else raw
+            return {'sanitized': sanitized, 'raw': raw} if include_raw else sanitized
+
+        async def fake_llm(window_title):
+            calls['llm'] += 1
+            return {'success': True, 'queries': [f'{window_title} 教程', f'{window_title} 用法', f'{window_title} 示例']}
+
+        async def fake_search(query, limit=5):
+            calls['search'] += 1
+            return {'success': True, 'query': query,
+                    'results': [{'title': f'{query} 结果', 'abstract': '', 'url': f'https://example.com/{query}'}]}
+
+        monkeypatch.setattr(web_scraper, 'is_china_region', lambda: True)
+        monkeypatch.setattr(web_scraper, 'get_active_window_title', fake_window_title)
+        monkeypatch.setattr(web_scraper, '_request_diverse_queries', fake_llm)
+        monkeypatch.setattr(web_scraper, 'search_baidu', fake_search)
+        return calls, title
+
+    def test_normalize_window_title(self):
+        normalize = web_scraper.normalize_window_title
+        assert normalize('(3) 收件箱') == normalize('[12] 收件箱') == '收件箱'
+        assert normalize('● Main  Module') == normalize('main module')
+        assert normalize('报告 v2') != normalize('报告 v3')
+
+    async def test_same_context_costs_no_llm_or_search(self, window_env):
+        calls, title = window_env
+        first = await web_scraper.fetch_window_context_content(limit=5)
+        assert first['success'] and len(first['search_results']) == 3
+        assert calls == {'llm': 1, 'search': 3}
+
+        # 保存后未保存标记消失，仍视为同一上下文
+        title['raw'] = 'main.py - Visual Studio Code'
+        second = await web_scraper.fetch_window_context_content(limit=5)
+        assert calls == {'llm': 1, 'search': 3}
+        assert second['search_results'] == first['search_results']
+        assert second['window_title'] == 'main.py - Visual Studio Code'
+
+        title['raw'] = 'README.md - Visual Studio Code'
+        await web_scraper.fetch_window_context_content(limit=5)
+        assert calls == {'llm': 2, 'search': 6}
+
+    async def test_failed_query_generation_not_cached(self, window_env, monkeypatch):
+        calls, _ = window_env
+
+        async def failing_llm(window_title):
+            calls['llm'] += 1
+            return {'success': False, 'error': 'boom'}
+
+        monkeypatch.setattr(web_scraper, '_request_diverse_queries', failing_llm)
+        assert await web_scraper.generate_diverse_queries('main') == ['main', 'main', 'main']
+        await web_scraper.generate_diverse_queries('main')
+        assert calls['llm'] == 2
+
+
+# ==================== 个人动态 ====================
+
+@pytest.mark.unit
+class TestPersonalDynamics:
+    async def test_unchanged_feed_served_from_304(self, monkeypatch, stub_server):
+        monkeypatch.setattr(web_scraper, '_get_platform_cookies', lambda name: {'reddit_session': 'abc'})
+        client = _route_to_stub(monkeypatch, stub_server)
+        try:
+            # 绕过结果缓存，模拟 TTL 过期后的重新抓取
+            first = await web_scraper.fetch_reddit_personal_dynamic.__wrapped__(3)
+            second = await web_scraper.fetch_reddit_personal_dynamic.__wrapped__(3)
+        finally:
+            await client.aclose()
+        assert first['success'] and len(first['posts']) == 3
+        assert second == first
+        assert stub_server.state.not_modified == 1
+        stats = web_scraper.get_conditional_cache().get_stats()
+        assert stats['requests'] == 2 and stats['not_modified'] == 1
+        # 登录态 Cookie 只以摘要形式参与 key
+        assert all('abc' not in key[1] for key in web_scraper.get_conditional_cache()._entries)
+
+    async def test_validators_kept_per_account(self, monkeypatch, stub_server):
+        cookies = {'reddit_session': 'alice'}
+        monkeypatch.setattr(web_scraper, '_get_platform_cookies', lambda name: dict(cookies))
+        client = _route_to_stub(monkeypatch, stub_server)
+        try:
+            await web_scraper.fetch_reddit_personal_dynamic.__wrapped__(3)
+            cookies['reddit_session'] = 'bob'
+            await web_scraper.fetch_reddit_personal_dynamic.__wrapped__(3)
+        finally:
+            await client.aclose()
+        assert stub_server.state.not_modified == 0
+
+    async def test_result_cache_keyed_by_account(self, monkeypatch, stub_server):
+        cookies = {'reddit_session': 'alice'}
+        monkeypatch.setattr(web_scraper, '_get_platform_cookies', lambda name: dict(cookies))
+        client = _route_to_stub(monkeypatch, stub_server)
+        try:
+            alice = await web_scraper.fetch_reddit_personal_dynamic(3)
+            await web_scraper.fetch_reddit_personal_dynamic(3)
+            cookies['reddit_session'] = 'bob'
+            bob = await web_scraper.fetch_reddit_personal_dynamic(3)
+            cookies['reddit_session'] = 'alice'
+            assert await web_scraper.fetch_reddit_personal_dynamic(3) == alice
+            # 退出登录后不再返回之前账号的缓存结果
+            cookies.clear()
+            logged_out = await web_scraper.fetch_reddit_personal_dynamic(3)
+        finally:
+            await client.aclose()
+        assert alice['success'] and bob['success']
+        assert not logged_out['success']
+        assert [cookie for _, cookie in stub_server.state.requests] == [
+            'reddit_session=alice', 'reddit_session=bob',
+        ]
+        # 结果缓存的 key 同样只保存 Cookie 摘要
+        assert all('alice' not in str(key) for key in web_scraper.get_source_cache()._entries)
+
+    async def test_bilibili_homepage_keyed_by_account(self, monkeypatch):
+        homepage = pytest.importorskip("bilibili_api.homepage")
+        cookies = {'SESSDATA': 'alice'}
+        monkeypatch.setattr(web_scraper, '_get_platform_cookies', lambda name: dict(cookies))
+        calls = []
+
+        async def get_videos(credential=None):
+            user = credential.sessdata if credential else 'guest'
+            calls.append(user)
+            return {'item': [{'bvid': f'BV{user}', 'title': f'{user} 的推荐'}]}
+
+        monkeypatch.setattr(homepage, 'get_videos', get_videos)
+        alice = await web_scraper.fetch_bilibili_trending(5)
+        await web_scraper.fetch_bilibili_trending(5)
+        cookies['SESSDATA'] = 'bob'
+        bob = await web_scraper.fetch_bilibili_trending(5)
+        # 首页推荐按登录账号个性化：切换账号后不返回上一个账号的缓存
+        assert calls == ['alice', 'bob']
+        assert alice['videos'][0]['bvid'] == 'BValice'
+        assert bob['videos'][0]['bvid'] == 'BVbob'
+
+    async def test_platforms_fetched_concurrently_under_deadline(self, monkeypatch):
+        async def slow_bilibili(limit=10):
+            await asyncio.sleep(5)
+            return {'success': True, 'dynamics': []}
+
+        async def weibo(limit=10):
+            await asyncio.sleep(0.1)
+            return {'success': True, 'statuses': [{'author': 'a', 'content': 'b'}]}
+
+        monkeypatch.setattr(web_scraper, 'is_china_region', lambda: True)
+        monkeypatch.setattr(web_scraper, 'fetch_bilibili_personal_dynamic', slow_bilibili)
+        monkeypatch.setattr(web_scraper, 'fetch_weibo_personal_dynamic', weibo)
+
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        result = await web_scraper.fetch_personal_dynamics(limit=3, deadline=0.3)
+        assert loop.time() - start < 1.0
+        assert result['success'] and result['region'] == 'china'
+        assert result['weibo_dynamic']['success']
+        assert not result['bilibili_dynamic']['success']
+
+    async def test_total_time_bounded_by_slowest_platform(self, monkeypatch):
+        def delayed(seconds, key):
+            async def fetch(limit=10):
+                await asyncio.sleep(seconds)
+                return {'success': True, key: []}
+            return fetch
+
+        monkeypatch.setattr(web_scraper, 'is_china_region', lambda: False)
+        monkeypatch.setattr(web_scraper, 'fetch_reddit_personal_dynamic', delayed(0.3, 'posts'))
+        monkeypatch.setattr(web_scraper, 'fetch_twitter_personal_dynamic', delayed(0.3, 'tweets'))
+
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        result = await web_scraper.fetch_personal_dynamics(limit=3)
+        assert loop.time() - start < 0.55
+        assert result['reddit_dynamic']['success'] and result['twitter_dynamic']['success']
+
+    async def test_timed_out_fetch_still_fills_cache(self, monkeypatch):
+        calls = []
+
+        @cached_source("stub_personal", ttl=60)
+        async def slow_weibo(limit=10):
+            calls.append(limit)
+            await asyncio.sleep(0.3)
+            return {'success': True, 'statuses': []}
+
+        async def bilibili(limit=10):
+            return {'success': False, 'error': '未提供Bilibili认证信息'}
+
+        monkeypatch.setattr(web_scraper, 'is_china_region', lambda: True)
+        monkeypatch.setattr(web_scraper, 'fetch_bilibili_personal_dynamic', bilibili)
+        monkeypatch.setattr(web_scraper, 'fetch_weibo_personal_dynamic', slow_weibo)
+
+        first = await web_scraper.fetch_personal_dynamics(limit=3, deadline=0.05)
+        assert not first['success']
+        await asyncio.gather(*web_scraper.get_source_cache()._inflight.values())
+        second = await web_scraper.fetch_personal_dynamics(limit=3, deadline=0.05)
+        assert second['success'] and calls == [3]
@@ -17,7 +17,9 @@ Limiter：限幅器，防止音频削波
 
 import numpy as np
 from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
 from utils.logger_config import get_module_logger
+import asyncio
 import soxr
 import time
 import os
@@ -469,3 +471,181 @@ class AudioProcessor:
         
         # Convert back to int16
         return (output * 32768.0).clip(-32768, 32767).astype(np.int16)
+
+
+class AudioDSPWorker:
+    """
+    单个 AudioProcessor 专用的单线程 DSP worker。
+
+    以前麦克风音频块通过 ``loop.run_in_executor(None, ...)`` 交给事件循环共享的默认线程池，
+    要和翻译等其他阻塞任务争抢线程。这里每个会话独占一个单线程 executor：
+
+    - 音频块严格按提交顺序处理（单线程的 FIFO 队列），AudioProcessor 的非线程安全状态
+      无需 asyncio 锁也能保持一致；
+    - 默认线程池上的无关阻塞任务不会再卡住麦克风链路。
+
+    排队耗时（提交 → 开始）与处理耗时用于诊断，见 ``get_stats()``。
+
+    executor 按需创建、由 ``shutdown()`` 关闭；关闭后再次调用 ``process()`` 会自动重建。
+    """
+
+    # 排队的音频块达到该数量时告警（48kHz 10ms 帧 → 约 0.5 秒）
+    BACKLOG_WARN_THRESHOLD = 50
+
+    def __init__(self, processor: AudioProcessor, name: str = "audio-dsp"):
+        self.processor = processor
+        self.name = name
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._pending = 0
+        self._backlog_warned = False
+        self.reset_stats()
+
+    def reset_stats(self) -> None:
+        """清空累计的延迟统计"""
+        self._processed = 0
+        self._queue_wait_total = 0.0
+        self._queue_wait_max = 0.0
+        self._process_time_total = 0.0
+        self._process_time_max = 0.0
+        self._max_pending = 0
+
+    def _ensure_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=self.name)
+        return self._executor
+
+    def _run(self, audio_chunk: bytes, enqueued_at: float) -> bytes:
+        started_at = time.perf_counter()
+        try:
+            return self.processor.process_chunk(audio_chunk)
+        finally:
+            finished_at = time.perf_counter()
+            queue_wait = started_at - enqueued_at
+            process_time = finished_at - started_at
+            self._processed += 1
+            self._queue_wait_total += queue_wait
+            self._process_time_total += process_time
+            if queue_wait > self._queue_wait_max:
+                self._queue_wait_max = queue_wait
+            if process_time > self._process_time_max:
+                self._process_time_max = process_time
+
+    async def process(self, audio_chunk: bytes) -> bytes:
+        """在专用 DSP 线程上执行 ``processor.process_chunk``"""
+        loop = asyncio.get_running_loop()
+        executor = self._ensure_executor()
+        self._pending += 1
+        if self._pending > self._max_pending:
+            self._max_pending = self._pending
+        if self._pending >= self.BACKLOG_WARN_THRESHOLD and not self._backlog_warned:
+            self._backlog_warned = True
+            logger.warning(f"⚠️ [{self.name}] DSP backlog reached {self._pending} chunks")
+        try:
+            return await loop.run_in_executor(executor, self._run, audio_chunk, time.perf_counter())
+        finally:
+            self._pending -= 1
+            if self._pending == 0:
+                self._backlog_warned = False
+
+    @property
+    def pending(self) -> int:
+        """已提交但尚未处理完的音频块数量"""
+        return self._pending
+
+    def get_stats(self) -> dict:
+        """返回 DSP 排队耗时 / 处理耗时统计（毫秒）"""
+        n = self._processed
+        return {
+            "processed": n,
+            "pending": self._pending,
+            "max_pending": self._max_pending,
+            "queue_wait_avg_ms": (self._queue_wait_total / n * 1000.0) if n else 0.0,
+            "queue_wait_max_ms": self._queue_wait_max * 1000.0,
+            "process_avg_ms": (self._process_time_total / n * 1000.0) if n else 0.0,
+            "process_max_ms": self._process_time_max * 1000.0,
+        }
+
+    def shutdown(self) -> None:
+        """
+        停止 DSP 线程，不等待其退出。
+
+        正在处理的音频块会处理完；排队中尚未开始的音频块直接取消（会话已关闭，不再需要），
+        等待它们的调用方会收到 CancelledError。
+        """
+        executor = self._executor
+        self._executor = None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+class PCMRingBuffer:
+    """
+    固定容量的 PCM 音频环形缓冲。
+
+    写满后新数据覆盖最旧的音频，无论生产者领先消费者多久，内存占用都有上限。
+    ``dropped_bytes`` 记录被覆盖的字节数。
+    """
+
+    def __init__(self, capacity_bytes: int):
+        # 容量按 int16 采样对齐
+        self.capacity = max(2, capacity_bytes - capacity_bytes % 2)
+        self._buf = bytearray(self.capacity)
+        self._start = 0
+        self._size = 0
+        self.dropped_bytes = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def write(self, data: bytes) -> None:
+        n = len(data)
+        if n == 0:
+            return
+        if n >= self.capacity:
+            # 只保留最新的 capacity 字节
+            self.dropped_bytes += self._size + n - self.capacity
+            self._buf[:] = data[n - self.capacity:]
+            self._start = 0
+            self._size = self.capacity
+            return
+        overflow = self._size + n - self.capacity
+        if overflow > 0:
+            self._start = (self._start + overflow) % self.capacity
+            self._size -= overflow
+            self.dropped_bytes += overflow
+        end = (self._start + self._size) % self.capacity
+        first = min(n, self.capacity - end)
+        self._buf[end:end + first] = data[:first]
+        if first < n:
+            self._buf[:n - first] = data[first:]
+        self._size += n
+
+    def read(self, max_bytes: int) -> bytes:
+        """取出最旧的至多 ``max_bytes`` 字节音频"""
+        n = min(max_bytes, self._size)
+        if n <= 0:
+            return b""
+        first = min(n, self.capacity - self._start)
+        out = bytes(self._buf[self._start:self._start + first])
+        if first < n:
+            out += bytes(self._buf[:n - first])
+        self._start = (self._start + n) % self.capacity
+        self._size -= n
+        return out
+
+    def skip(self, n: int) -> int:
+        """丢弃最旧的至多 ``n`` 字节，返回实际丢弃的字节数"""
+        n = min(max(n, 0), self._size)
+        self._start = (self._start + n) % self.capacity
+        self._size -= n
+        return n
+
+    def drop_tail(self, n: int) -> int:
+        """丢弃最新的至多 ``n`` 字节，返回实际丢弃的字节数"""
+        n = min(max(n, 0), self._size)
+        self._size -= n
+        return n
+
+    def clear(self) -> None:
+        self._start = 0
+        self._size = 0
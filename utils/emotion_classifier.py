@@ -0,0 +1,242 @@
+# -*- coding: utf-8 -*-
+"""
+本地情绪快速分类（/emotion/analysis 的前置快路径）
+
+/emotion/analysis 只是为了给 Live2D/VRM 选一个表情，却要对每条回复调用一次 LLM，
+表情变化总是比语音晚一个网络往返。这里用确定性的多语言词表与规则先做一次分类：
+
+- 词表覆盖中/英/日/韩/俄常见情绪词、网络用语、emoji 与颜文字，
+  全部编译成一个正则，一次扫描完成匹配（微秒级）；
+- 简单处理否定（"不开心"、"not happy"、"嬉しくない"）和感叹/疑问标点；
+- 只有得分足够且明显领先时才直接给出结果，其余情况返回 None，由调用方回退到 LLM；
+- 最终结果（无论来自本地规则还是 LLM）按规范化文本缓存。
+
+情绪类别与 emotion_analysis_prompt 保持一致：happy / sad / angry / surprised / neutral。
+"""
+
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, NamedTuple, Optional, Tuple
+
+from utils.logger_config import get_module_logger
+
+logger = get_module_logger(__name__)
+
+EMOTIONS = ("happy", "sad", "angry", "surprised", "neutral")
+
+# 本地结果至少需要达到的置信度，低于该值交给 LLM
+LOCAL_CONFIDENCE_THRESHOLD = 0.75
+# 本地结果至少需要的原始得分（避免单个弱信号定论）
+MIN_LOCAL_SCORE = 2.0
+RESULT_CACHE_SIZE = 512
+
+# 情绪 -> {词: 权重}。英文/俄文字母词按整词匹配，其余按子串匹配
+_LEXICON: Dict[str, Dict[str, float]] = {
+    "happy": {
+        # 中文
+        "开心": 2, "高兴": 2, "快乐": 2, "好耶": 2.5, "太好了": 2.5, "哈哈": 2, "嘿嘿": 1.5, "嘻嘻": 1.5,
+        "喜欢": 1.5, "幸福": 2, "愉快": 2, "开森": 2, "谢谢": 1, "感谢": 1, "棒": 1.5, "可爱": 1,
+        "真好": 2, "爱你": 2, "期待": 1, "欢迎": 1, "恭喜": 2, "嗯嗯": 0.5, "喵~": 1,
+        # English
+        "happy": 2, "glad": 2, "great": 1.5, "awesome": 2, "yay": 2.5, "love": 1.5, "haha": 2, "lol": 2,
+        "wonderful": 2, "thanks": 1, "thank you": 1, "nice": 1.5, "fun": 1.5, "excited": 2, "congrats": 2,
+        "cute": 1, "delighted": 2, "yippee": 2.5,
+        # 日本語
+        "嬉しい": 2, "うれしい": 2, "楽しい": 2, "たのしい": 2, "やった": 2.5, "大好き": 2, "ありがとう": 1,
+        "よかった": 2, "わーい": 2.5, "笑": 1, "www": 2,
+        # 한국어
+        "기뻐": 2, "좋아": 1.5, "행복": 2, "신나": 2, "고마워": 1, "ㅋㅋ": 2, "ㅎㅎ": 1.5,
+        # Русский
+        "рад": 2, "рада": 2, "счастлив": 2, "ура": 2.5, "спасибо": 1, "здорово": 2, "класс": 1.5, "хаха": 2,
+        # emoji / 颜文字
+        "😄": 2.5, "😊": 2, "😁": 2.5, "😆": 2.5, "🥰": 2.5, "😍": 2.5, "❤": 1.5, "♪": 1, "🎉": 2.5,
+        "(^_^)": 2, "^_^": 2, "^^": 1.5, "(≧▽≦)": 2.5, "o(^▽^)o": 2.5, ":)": 2, ":d": 2.5,
+    },
+    "sad": {
+        "难过": 2.5, "伤心": 2.5, "悲伤": 2.5, "哭": 1.5, "呜呜": 2.5, "555": 2, "可惜": 1.5, "遗憾": 1.5,
+        "孤单": 2, "寂寞": 2, "想你": 1.5, "失望": 2, "委屈": 2.5, "抱歉": 1, "对不起": 1.5, "唉": 1.5,
+        "心疼": 2, "难受": 2,
+        "sad": 2.5, "sorry": 1, "unfortunately": 1.5, "miss you": 1.5, "lonely": 2, "cry": 1.5,
+        "disappointed": 2, "heartbroken": 2.5, "upset": 2, "sigh": 1.5,
+        "悲しい": 2.5, "かなしい": 2.5, "寂しい": 2, "さびしい": 2, "残念": 1.5, "泣": 1.5, "ごめん": 1,
+        "슬퍼": 2.5, "외로워": 2, "미안": 1, "ㅠㅠ": 2.5, "ㅜㅜ": 2.5,
+        "грустно": 2.5, "печально": 2.5, "жаль": 1.5, "одиноко": 2, "извини": 1,
+        "😢": 2.5, "😭": 2.5, "😞": 2, "🥺": 1.5, "💔": 2.5, "t_t": 2.5, "qaq": 2.5, "(;_;)": 2.5, ":(": 2,
+    },
+    "angry": {
+        "生气": 2.5, "气死": 3, "可恶": 2.5, "讨厌": 2, "烦": 1.5, "滚开": 3, "滚蛋": 3, "给我滚": 3, "混蛋": 3, "哼": 1.5,
+        "愤怒": 2.5, "恼火": 2.5, "不爽": 2, "闭嘴": 2.5, "过分": 2,
+        "angry": 2.5, "mad": 2, "annoying": 2, "annoyed": 2, "hate": 2, "furious": 3, "shut up": 2.5,
+        "damn": 2, "stupid": 2,
+        "怒": 2, "ムカつく": 3, "むかつく": 3, "うるさい": 2, "嫌い": 2, "ふざけるな": 3,
+        "화나": 2.5, "짜증": 2.5, "싫어": 2,
+        "злой": 2.5, "злюсь": 2.5, "бесит": 3, "ненавижу": 2.5,
+        "😠": 3, "😡": 3, "🤬": 3, "💢": 2.5, "(╬": 2.5, ">_<": 1,
+    },
+    "surprised": {
+        "哇": 2, "天哪": 2.5, "天呐": 2.5, "居然": 2, "竟然": 2, "真的吗": 2.5, "没想到": 2.5, "惊讶": 2.5,
+        "什么？！": 3, "诶": 1.5, "欸": 1.5, "不会吧": 2.5, "震惊": 2.5,
+        "wow": 2.5, "whoa": 2.5, "omg": 2.5, "really?": 2, "no way": 2.5, "surprised": 2.5, "unbelievable": 2.5,
+        "what?!": 3,
+        "えっ": 2.5, "びっくり": 2.5, "まさか": 2.5, "本当に？": 2, "すごい": 1.5,
+        "헐": 2.5, "대박": 2, "진짜?": 2, "놀라": 2.5,
+        "ого": 2.5, "вау": 2.5, "неужели": 2.5, "правда?": 2,
+        "😮": 2.5, "😲": 2.5, "😱": 2.5, "🤯": 2.5, "(°o°)": 2.5, "o_o": 2, "!?": 2, "?!": 2, "！？": 2, "？！": 2,
+    },
+}
+
+# 否定：出现在情绪词前（中/英/俄/韩）或紧跟其后（日语形容词否定）
+_NEGATION_BEFORE = re.compile(
+    r"(不|没|没有|别|并不|不太|不是|(?<![a-z])(?:not|never|no)|n't|(?<![а-яё])не|안|못)\s*$"
+)
+_NEGATION_WINDOW = 7
+_NEGATION_AFTER = re.compile(r"^(くない|じゃない|ではない)")
+# 被否定时情绪的转向（None 表示只抵消，不计入其他情绪）
+_NEGATED = {"happy": "sad", "sad": None, "angry": None, "surprised": None}
+# 日语い形容词：否定形改变词尾（嬉しい → 嬉しくない），无法靠后缀匹配，单独收录否定形
+_JA_ADJECTIVE = re.compile(r"[\u3040-\u309f\u4e00-\u9fff]*[\u3041-\u3093]い")
+
+_EXCLAMATION = re.compile(r"[!！]{2,}")
+
+# 容易出现在普通词里的短词（"えっと"、"헐거워진"）：只在给定上下文中计入，匹配到的文本仍是词本身
+_CONTEXT_BOUNDS: Dict[str, Tuple[str, str]] = {
+    "えっ": ("", r"(?=[!！?？]|$)"),
+    "헐": (r"(?<![\uac00-\ud7a3])", r"(?![\uac00-\ud7a3])"),
+}
+
+
+class EmotionResult(NamedTuple):
+    emotion: str
+    confidence: float
+    source: str  # "local" / "llm" / "cache"
+
+
+def _build_pattern() -> Tuple["re.Pattern", Dict[str, Tuple[Optional[str], float]]]:
+    terms: Dict[str, Tuple[Optional[str], float]] = {}
+    for emotion, words in _LEXICON.items():
+        for word, weight in words.items():
+            terms[word.lower()] = (emotion, float(weight))
+            if _JA_ADJECTIVE.fullmatch(word):
+                terms[word[:-1] + "くない"] = (_NEGATED[emotion], float(weight))
+    parts = []
+    # 长词优先，保证 "愤怒" 优先于 "怒"、"什么？！" 优先于 "？！"
+    for term in sorted(terms, key=len, reverse=True):
+        escaped = re.escape(term)
+        if term in _CONTEXT_BOUNDS:
+            before, after = _CONTEXT_BOUNDS[term]
+            escaped = f"{before}{escaped}{after}"
+        elif re.fullmatch(r"[a-z' ]+", term):
+            escaped = rf"(?<![a-z']){escaped}(?![a-z'])"
+        elif re.fullmatch(r"[а-яё ]+", term):
+            escaped = rf"(?<![а-яё]){escaped}(?![а-яё])"
+        parts.append(escaped)
+    return re.compile("|".join(parts)), terms
+
+
+_PATTERN, _TERMS = _build_pattern()
+
+
+def normalize_emotion_text(text: str) -> str:
+    """缓存键用的文本规范化：小写、合并空白。"""
+    return " ".join((text or "").lower().split())
+
+
+def classify_emotion_local(text: str) -> Optional[Tuple[str, float]]:
+    """本地规则分类。置信度不足时返回 None（应交给 LLM）。"""
+    normalized = normalize_emotion_text(text)
+    if not normalized:
+        return None
+    scores = {emotion: 0.0 for emotion in _LEXICON}
+    for match in _PATTERN.finditer(normalized):
+        emotion, weight = _TERMS[match.group(0)]
+        if emotion is None:
+            continue
+        start, end = match.span()
+        if _NEGATION_BEFORE.search(normalized[max(0, start - _NEGATION_WINDOW):start]) or _NEGATION_AFTER.match(normalized[end:end + 4]):
+            emotion = _NEGATED[emotion]
+            if emotion is None:
+                continue
+        scores[emotion] += weight
+    if _EXCLAMATION.search(normalized):
+        # 连续感叹号强化已有的主要情绪
+        top = max(scores, key=scores.get)
+        if scores[top] > 0:
+            scores[top] += 1.0
+
+    ranked = sorted(scores.items(), key=lambda kv: kv[1], reverse=True)
+    (emotion, top), (_, second) = ranked[0], ranked[1]
+    if top < MIN_LOCAL_SCORE:
+        return None
+    # 领先幅度决定置信度；得分越高越接近上限
+    confidence = (top - second) / (top + 1.0)
+    confidence = round(min(0.95, confidence + min(top, 6.0) * 0.03), 2)
+    if confidence < LOCAL_CONFIDENCE_THRESHOLD:
+        return None
+    return emotion, confidence
+
+
+class EmotionClassifier:
+    """本地快路径 + 结果缓存（LLM 结果由调用方通过 remember 写回）。"""
+
+    def __init__(self, cache_size: int = RESULT_CACHE_SIZE):
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"cache_hits": 0, "local_hits": 0, "llm_fallbacks": 0}
+
+    def classify(self, text: str) -> Optional[EmotionResult]:
+        """先查缓存，再走本地规则；两者都没有把握时返回 None。"""
+        key = normalize_emotion_text(text)
+        if not key:
+            return EmotionResult("neutral", 0.5, "local")
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                self._stats["cache_hits"] += 1
+                return EmotionResult(cached[0], cached[1], "cache")
+        local = classify_emotion_local(key)
+        with self._lock:
+            if local is None:
+                self._stats["llm_fallbacks"] += 1
+                return None
+            self._stats["local_hits"] += 1
+            self._put_locked(key, local)
+        return EmotionResult(local[0], local[1], "local")
+
+    def remember(self, text: str, emotion: str, confidence: float) -> None:
+        """缓存 LLM 给出的结果。"""
+        key = normalize_emotion_text(text)
+        if not key or emotion not in EMOTIONS:
+            return
+        with self._lock:
+            self._put_locked(key, (emotion, confidence))
+
+    def _put_locked(self, key: str, value: Tuple[str, float]) -> None:
+        self._cache[key] = value
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["cache_entries"] = len(self._cache)
+        total = stats["cache_hits"] + stats["local_hits"] + stats["llm_fallbacks"]
+        stats["llm_avoided_rate"] = ((total - stats["llm_fallbacks"]) / total) if total else 0.0
+        return stats
+
+
+_emotion_classifier: Optional[EmotionClassifier] = None
+_emotion_classifier_lock = threading.Lock()
+
+
+def get_emotion_classifier() -> EmotionClassifier:
+    """获取进程级情绪分类器单例。"""
+    global _emotion_classifier
+    if _emotion_classifier is None:
+        with _emotion_classifier_lock:
+            if _emotion_classifier is None:
+                _emotion_classifier = EmotionClassifier()
+    return _emotion_classifier
@@ -13,13 +13,13 @@ import locale
 import threading
 import asyncio
 import os
-import hashlib
-from collections import OrderedDict
-from typing import Optional, Tuple, List, Any, Dict
+import json
+from typing import Optional, Tuple, List, Any, Dict, Callable
 from langchain_openai import ChatOpenAI
 from langchain_core.messages import SystemMessage, HumanMessage
 from utils.config_manager import get_config_manager
 from utils.logger_config import get_module_logger
+from utils.translation_cache import get_translation_cache
 
 logger = get_module_logger(__name__)
 
@@ -623,6 +623,32 @@ def detect_language(text: str) -> str:
         return 'unknown'
 
 
+# translate_text 降级链上的翻译后端（按优先级查询缓存）
+_PUBLIC_TRANSLATION_BACKENDS = ('google', 'translatepy', 'llm')
+
+
+async def _lookup_cached_translation(text: str, source_lang: str, target_lang: str, backends) -> Optional[str]:
+    """按后端优先级查询持久化翻译缓存，未命中或缓存不可用时返回 None"""
+    try:
+        cache = get_translation_cache()
+        results = await asyncio.to_thread(
+            cache.get_many, [(text, source_lang, target_lang, backend) for backend in backends]
+        )
+    except Exception as e:
+        logger.debug(f"查询翻译缓存失败: {e}")
+        return None
+    return next((r for r in results if r), None)
+
+
+async def _store_cached_translation(text: str, source_lang: str, target_lang: str, backend: str, translated: str) -> None:
+    if not translated or translated == text:
+        return
+    try:
+        await asyncio.to_thread(get_translation_cache().put, text, source_lang, target_lang, backend, translated)
+    except Exception as e:
+        logger.debug(f"写入翻译缓存失败: {e}")
+
+
 async def translate_text(text: str, target_lang: str, source_lang: Optional[str] = None, skip_google: bool = False) -> Tuple[str, bool]:
     """
     翻译文本到目标语言
@@ -659,6 +685,12 @@ async def translate_text(text: str, target_lang: str, source_lang: Optional[str]
         logger.debug(f"跳过翻译: 源语言({source_lang}) == 目标语言({target_lang}) 或源语言未知")
         return text, google_failed
     
+    # 持久化缓存：任一翻译后端的历史结果都可以直接复用
+    cached = await _lookup_cached_translation(text, source_lang, target_lang, _PUBLIC_TRANSLATION_BACKENDS)
+    if cached is not None:
+        logger.debug(f"💾 [翻译服务] 命中翻译缓存: {source_lang} -> {target_lang}")
+        return cached, google_failed
+    
     # 判断当前区域，决定翻译服务优先级
     try:
         is_china = is_china_region()
@@ -743,6 +775,7 @@ async def translate_text(text: str, target_lang: str, source_lang: Optional[str]
             translated_text = await _try_google_translate(timeout=5.0)  # 5秒超时
             if translated_text:
                 logger.info(f"✅ [翻译服务] Google翻译成功: {source_lang} -> {target_lang}")
+                await _store_cached_translation(text, source_lang, target_lang, 'google', translated_text)
                 return translated_text, google_failed
             else:
                 logger.debug("❌ [翻译服务] Google翻译不可用（超时或失败），立即降级到 translatepy")
@@ -757,6 +790,7 @@ async def translate_text(text: str, target_lang: str, source_lang: Optional[str]
                 translated_text = await translate_with_translatepy(text, source_lang, target_lang)
                 if translated_text:
                     logger.info(f"✅ [翻译服务] translatepy翻译成功: {source_lang} -> {target_lang}")
+                    await _store_cached_translation(text, source_lang, target_lang, 'translatepy', translated_text)
                     return translated_text, google_failed
                 else:
                     logger.debug("❌ [翻译服务] translatepy翻译返回空结果，回退到 LLM 翻译")
@@ -775,6 +809,7 @@ async def translate_text(text: str, target_lang: str, source_lang: Optional[str]
             translated_text = await _try_google_translate()
             if translated_text:
                 logger.info(f"✅ [翻译服务] Google翻译成功: {source_lang} -> {target_lang}")
+                await _store_cached_translation(text, source_lang, target_lang, 'google', translated_text)
                 return translated_text, google_failed
             else:
                 logger.debug("❌ [翻译服务] Google翻译失败，回退到 LLM 翻译")
@@ -826,6 +861,7 @@ async def translate_text(text: str, target_lang: str, source_lang: Optional[str]
         translated_text = response.content.strip()
         
         logger.info(f"✅ [翻译服务] LLM翻译成功: {source_lang} -> {target_lang}")
+        await _store_cached_translation(text, source_lang, target_lang, 'llm', translated_text)
         return translated_text, google_failed
         
     except Exception as e:
@@ -867,11 +903,19 @@ async def get_user_language_async() -> str:
 
 
 
-# 缓存配置
-CACHE_MAX_SIZE = 1000
 SUPPORTED_LANGUAGES = ['zh', 'zh-CN', 'en', 'ja', 'ko', 'ru']
 DEFAULT_LANGUAGE = 'zh-CN'
 
+# 目标语言 -> 提示词中的语言名称
+_TARGET_LANGUAGE_NAMES = {
+    'en': "English",
+    'ja': "Japanese",
+    'ko': "Korean",
+    'ru': "Russian",
+    'zh-CN': "简体中文",
+}
+
+
 class TranslationService:
     """翻译服务类"""
     
@@ -884,9 +928,8 @@ class TranslationService:
         """
         self.config_manager = config_manager
         self._llm_client = None
-        self._cache = OrderedDict()
-        self._cache_lock = None  # 懒加载：在首次使用时创建异步锁
-        self._cache_lock_init_lock = threading.Lock()  # 用于保护异步锁的创建过程
+        self._cache = None  # 懒加载：持久化翻译缓存（多进程共享）
+        self._cache_init_lock = threading.Lock()
 
     def _get_llm_client(self) -> Optional[ChatOpenAI]:
         """获取LLM客户端（用于翻译，复用 emotion 模型配置）"""
@@ -914,41 +957,61 @@ class TranslationService:
             logger.error(f"翻译服务：初始化LLM客户端失败: {e}")
             return None
     
-    async def _get_from_cache(self, text: str, target_lang: str) -> Optional[str]:
-        """从缓存获取翻译结果"""
-        async with self._get_cache_lock():
-            cache_key = self._get_cache_key(text, target_lang)
-            return self._cache.get(cache_key)
+    def _get_cache(self):
+        """懒加载获取持久化翻译缓存"""
+        if self._cache is None:
+            with self._cache_init_lock:
+                if self._cache is None:
+                    self._cache = get_translation_cache()
+        return self._cache
     
-    def _get_cache_lock(self):
-        """懒加载获取缓存锁"""
-        if self._cache_lock is None:
-            with self._cache_lock_init_lock:
-                if self._cache_lock is None:
-                    self._cache_lock = asyncio.Lock()
-        return self._cache_lock
+    def _backend_name(self) -> str:
+        """缓存键中的后端标识（同一模型的翻译结果可以复用）"""
+        if self._llm_client is not None:
+            return f"llm:{getattr(self._llm_client, 'model_name', '')}"
+        try:
+            return f"llm:{self.config_manager.get_model_api_config('emotion').get('model', '')}"
+        except Exception:
+            return "llm:"
     
-    async def _save_to_cache(self, text: str, target_lang: str, translated: str):
-        """保存翻译结果到缓存"""
-        async with self._get_cache_lock():
-            if len(self._cache) >= CACHE_MAX_SIZE:
-                first_key = next(iter(self._cache))
-                del self._cache[first_key]
-                
-            cache_key = self._get_cache_key(text, target_lang)
-            self._cache[cache_key] = translated
+    async def _get_many_from_cache(self, texts: List[str], sources: List[str], target_lang: str) -> List[Optional[str]]:
+        """批量查询缓存（内存层命中直接返回，其余一次磁盘查询）"""
+        try:
+            cache = self._get_cache()
+            backend = self._backend_name()
+            results = [cache.peek(text, source, target_lang, backend) for text, source in zip(texts, sources)]
+            pending = [i for i, r in enumerate(results) if r is None]
+            if pending:
+                found = await asyncio.to_thread(
+                    cache.get_many, [(texts[i], sources[i], target_lang, backend) for i in pending]
+                )
+                for i, translated in zip(pending, found):
+                    results[i] = translated
+            return results
+        except Exception as e:
+            logger.debug(f"翻译服务：查询缓存失败: {e}")
+            return [None] * len(texts)
+    
+    async def _get_from_cache(self, text: str, source_lang: str, target_lang: str) -> Optional[str]:
+        """从缓存获取翻译结果"""
+        return (await self._get_many_from_cache([text], [source_lang], target_lang))[0]
+    
+    async def _save_many_to_cache(self, entries: List[Tuple[str, str, str, str]]):
+        """批量保存 (原文, 源语言, 目标语言, 译文) 到缓存"""
+        try:
+            backend = self._backend_name()
+            await asyncio.to_thread(
+                self._get_cache().put_many,
+                [(text, source, target, backend, translated) for text, source, target, translated in entries],
+            )
+        except Exception as e:
+            logger.debug(f"翻译服务：写入缓存失败: {e}")
     
     def _normalize_language_code(self, lang: str) -> str:
         """归一化语言代码"""
         if not lang:
             return DEFAULT_LANGUAGE
         return normalize_language_code(lang, format='full')
-    
-    def _get_cache_key(self, text: str, target_lang: str) -> str:
-        """生成缓存键"""
-        normalized_lang = self._normalize_language_code(target_lang)
-        text_hash = hashlib.md5(text.encode('utf-8')).hexdigest()
-        return f"{normalized_lang}:{text_hash}"
 
     def _detect_language(self, text: str) -> str:
         """检测文本语言"""
@@ -959,6 +1022,17 @@ class TranslationService:
             return 'en'
         return lang
     
+    def _source_language_name(self, detected_lang_normalized: str, target_lang_normalized: str) -> str:
+        """提示词中的源语言名称"""
+        if target_lang_normalized == 'en':
+            return "Chinese" if detected_lang_normalized == 'zh-CN' else "Japanese" if detected_lang_normalized == 'ja' else "the source language"
+        elif target_lang_normalized == 'ja':
+            return "Chinese" if detected_lang_normalized == 'zh-CN' else "English" if detected_lang_normalized == 'en' else "the source language"
+        elif target_lang_normalized in ('ko', 'ru'):
+            return "Chinese" if detected_lang_normalized == 'zh-CN' else "English" if detected_lang_normalized == 'en' else "Japanese" if detected_lang_normalized == 'ja' else "the source language"
+        else:  # zh-CN
+            return "English" if detected_lang_normalized == 'en' else "Japanese" if detected_lang_normalized == 'ja' else "Russian" if detected_lang_normalized == 'ru' else "the source language"
+    
     async def translate_text_robust(self, text: str, target_lang: str) -> str:
         """
         稳健的翻译文本服务 (核心内部组件使用)
@@ -977,7 +1051,7 @@ class TranslationService:
         if detected_lang_normalized == target_lang_normalized:
             return text
         
-        cached = await self._get_from_cache(text, target_lang_normalized)
+        cached = await self._get_from_cache(text, detected_lang_normalized, target_lang_normalized)
         if cached is not None:
             return cached
         
@@ -987,21 +1061,8 @@ class TranslationService:
             return text
         
         try:
-            if target_lang_normalized == 'en':
-                target_lang_name = "English"
-                source_lang_name = "Chinese" if detected_lang_normalized == 'zh-CN' else "Japanese" if detected_lang_normalized == 'ja' else "the source language"
-            elif target_lang_normalized == 'ja':
-                target_lang_name = "Japanese"
-                source_lang_name = "Chinese" if detected_lang_normalized == 'zh-CN' else "English" if detected_lang_normalized == 'en' else "the source language"
-            elif target_lang_normalized == 'ko':
-                target_lang_name = "Korean"
-                source_lang_name = "Chinese" if detected_lang_normalized == 'zh-CN' else "English" if detected_lang_normalized == 'en' else "Japanese" if detected_lang_normalized == 'ja' else "the source language"
-            elif target_lang_normalized == 'ru':
-                target_lang_name = "Russian"
-                source_lang_name = "Chinese" if detected_lang_normalized == 'zh-CN' else "English" if detected_lang_normalized == 'en' else "Japanese" if detected_lang_normalized == 'ja' else "the source language"
-            else:  # zh-CN
-                target_lang_name = "简体中文"
-                source_lang_name = "English" if detected_lang_normalized == 'en' else "Japanese" if detected_lang_normalized == 'ja' else "Russian" if detected_lang_normalized == 'ru' else "the source language"
+            target_lang_name = _TARGET_LANGUAGE_NAMES.get(target_lang_normalized, "简体中文")
+            source_lang_name = self._source_language_name(detected_lang_normalized, target_lang_normalized)
             
             system_prompt = f"""You are a professional translator. Translate the given text from {source_lang_name} to {target_lang_name}.
 
@@ -1021,7 +1082,7 @@ Rules:
             if not translated:
                 logger.warning(f"翻译服务：LLM返回空结果，使用原文: '{text[:50]}...'")
                 return text            
-            await self._save_to_cache(text, target_lang_normalized, translated)
+            await self._save_many_to_cache([(text, detected_lang_normalized, target_lang_normalized, translated)])
             
             logger.debug(f"翻译服务：'{text[:50]}...' -> '{translated[:50]}...' ({target_lang})")
             return translated
@@ -1030,6 +1091,108 @@ Rules:
             logger.error(f"翻译服务：翻译失败: {e}，返回原文")
             return text
     
+    async def translate_texts(self, texts: List[str], target_lang: str) -> List[str]:
+        """
+        批量翻译（translate_dict 使用）：一次缓存查询，未命中的文本合并为一次 LLM 调用。
+        批量结果无法解析时逐条回退到 translate_text_robust。
+        """
+        target_lang_normalized = self._normalize_language_code(target_lang)
+        if not texts or target_lang_normalized not in SUPPORTED_LANGUAGES:
+            return list(texts)
+        
+        # 去重，并跳过空文本与已是目标语言的文本
+        pending: Dict[str, str] = {}
+        for text in texts:
+            if text in pending or not text or not text.strip():
+                continue
+            detected = self._normalize_language_code(self._detect_language(text))
+            if detected != target_lang_normalized:
+                pending[text] = detected
+        if not pending:
+            return list(texts)
+        
+        unique = list(pending)
+        sources = [pending[t] for t in unique]
+        cached = await self._get_many_from_cache(unique, sources, target_lang_normalized)
+        translations = {t: c for t, c in zip(unique, cached) if c is not None}
+        misses = [t for t in unique if t not in translations]
+        
+        if len(misses) == 1:
+            translations[misses[0]] = await self.translate_text_robust(misses[0], target_lang)
+        elif misses:
+            batch = await self._translate_batch_llm(misses, target_lang_normalized)
+            if batch is not None:
+                translations.update(batch)
+                await self._save_many_to_cache([
+                    (t, pending[t], target_lang_normalized, batch[t]) for t in misses if batch[t] != t
+                ])
+            else:
+                results = await asyncio.gather(*[self.translate_text_robust(t, target_lang) for t in misses])
+                translations.update(zip(misses, results))
+        
+        return [translations.get(text) or text for text in texts]
+    
+    async def _translate_batch_llm(self, texts: List[str], target_lang_normalized: str) -> Optional[Dict[str, str]]:
+        """一次 LLM 调用翻译多条文本（JSON 数组进、JSON 数组出），失败返回 None"""
+        llm = self._get_llm_client()
+        if llm is None:
+            logger.warning("翻译服务：LLM客户端不可用，返回原文")
+            return {t: t for t in texts}
+        
+        target_lang_name = _TARGET_LANGUAGE_NAMES.get(target_lang_normalized, "简体中文")
+        system_prompt = f"""You are a professional translator. You will receive a JSON array of strings. Translate each string to {target_lang_name}.
+
+Rules:
+1. Keep the meaning and tone of each string exactly the same
+2. Maintain any special formatting (like commas, spaces)
+3. For character names or nicknames, translate naturally
+4. If a string is already in {target_lang_name}, return it unchanged
+5. Return ONLY a JSON array of the translated strings, in the same order and with the same length, no explanations"""
+        try:
+            response = await llm.ainvoke([
+                SystemMessage(content=system_prompt),
+                HumanMessage(content=json.dumps(texts, ensure_ascii=False))
+            ])
+            content = response.content.strip()
+            if content.startswith("```"):
+                content = content.strip("`").strip()
+                if content.startswith("json"):
+                    content = content[4:]
+            translated = json.loads(content)
+            if (not isinstance(translated, list) or len(translated) != len(texts)
+                    or not all(isinstance(t, str) for t in translated)):
+                raise ValueError(f"批量翻译结果格式不匹配（期望 {len(texts)} 条）")
+            logger.debug(f"翻译服务：批量翻译 {len(texts)} 条文本 ({target_lang_normalized})")
+            return {src: (dst.strip() or src) for src, dst in zip(texts, translated)}
+        except Exception as e:
+            logger.warning(f"翻译服务：批量翻译失败，逐条翻译: {e}")
+            return None
+    
+    def _map_dict_fields(
+        self,
+        data: Dict[str, Any],
+        translate_all: bool,
+        fields_set: set,
+        fn: Callable[[str], str],
+    ) -> Dict[str, Any]:
+        """按 translate_dict 的字段规则，对每个需要翻译的字符串应用 fn"""
+        result = data.copy()
+        for key, value in result.items():
+            should_translate = translate_all or key in fields_set
+            
+            if should_translate and isinstance(value, str) and value.strip():
+                if key in {'昵称', 'nickname'} and ', ' in value:
+                    result[key] = ', '.join(fn(item.strip()) for item in value.split(', '))
+                else:
+                    result[key] = fn(value)
+            elif isinstance(value, dict):
+                if should_translate:
+                    result[key] = self._map_dict_fields(value, translate_all, fields_set, fn)
+            elif isinstance(value, list):
+                if should_translate and value and all(isinstance(item, str) for item in value):
+                    result[key] = [fn(item) for item in value]
+        return result
+    
     async def translate_dict(
         self,
         data: Dict[str, Any],
@@ -1037,44 +1200,32 @@ Rules:
         fields_to_translate: Optional[list] = None
     ) -> Dict[str, Any]:
         """
-        翻译字典中的指定字段
+        翻译字典中的指定字段（所有字段合并为一次批量翻译）
         """
         if not data:
             return data
         
-        result = data.copy()
-        
         if fields_to_translate is None:
             translate_all = True
             fields_set = set()
-        elif len(fields_to_translate) == 0:
-            translate_all = False
-            fields_set = set()
         else:
             translate_all = False
             fields_set = set(fields_to_translate)
         
-        for key, value in result.items():
-            should_translate = translate_all or key in fields_set
-            
-            if should_translate and isinstance(value, str) and value.strip():
-                if key in {'昵称', 'nickname'} and ', ' in value:
-                    items = [item.strip() for item in value.split(', ')]
-                    translated_items = await asyncio.gather(*[
-                        self.translate_text_robust(item, target_lang) for item in items
-                    ])
-                    result[key] = ', '.join(translated_items)
-                else:
-                    result[key] = await self.translate_text_robust(value, target_lang)
-            elif isinstance(value, dict):
-                if should_translate:
-                    result[key] = await self.translate_dict(value, target_lang, fields_to_translate)
-            elif isinstance(value, list):
-                if should_translate and value and all(isinstance(item, str) for item in value):
-                    result[key] = await asyncio.gather(*[
-                        self.translate_text_robust(item, target_lang) for item in value
-                    ])
-        return result
+        # 第一遍收集需要翻译的文本，批量翻译后第二遍替换
+        texts: List[str] = []
+        
+        def collect(text: str) -> str:
+            texts.append(text)
+            return text
+        
+        self._map_dict_fields(data, translate_all, fields_set, collect)
+        if not texts:
+            return data.copy()
+        
+        translated = await self.translate_texts(texts, target_lang)
+        mapping = dict(zip(texts, translated))
+        return self._map_dict_fields(data, translate_all, fields_set, lambda text: mapping.get(text, text))
 
 # 全局翻译服务实例（延迟初始化）
 _translation_service_instance: Optional[TranslationService] = None
@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+"""
+主动搭话素材的后台预取池
+
+/proactive_chat 触发时才去抓取热榜、新闻、窗口上下文等素材，搭话总要等最慢的外部来源。
+这里为每个来源维护一份"最近一次成功抓取"的素材：
+- 有来源被 touch（即最近被主动搭话使用过）时启动后台刷新循环，按各来源的刷新间隔
+  提前抓取；超过 idle_timeout 没有被使用的来源不再刷新，全部空闲后循环自动退出；
+- 每次抓取都有独立超时，后台刷新另受每小时次数预算限制，避免空闲时持续消耗外部请求；
+- get() 优先返回池中未过期且通过校验的素材；否则现场抓取（与进行中的后台抓取合并），
+  调用方被取消时抓取任务继续执行，结果留给下一次触发使用。
+
+仅在单个事件循环内使用，不做线程同步。
+"""
+
+import asyncio
+import copy
+import functools
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Deque, Dict, Iterable, Optional, Tuple
+
+from utils.logger_config import get_module_logger
+
+logger = get_module_logger(__name__)
+
+_BUDGET_WINDOW_SECONDS = 3600.0
+
+
+@dataclass
+class PrefetchSource:
+    """一个可预取的素材来源"""
+    name: str
+    fetch: Callable[[], Awaitable[Dict[str, Any]]]
+    refresh_interval: float                  # 后台刷新间隔 (s)
+    max_age: float                           # 素材超过该时长不再直接使用 (s)
+    timeout: float                           # 单次抓取超时 (s)
+    hourly_budget: int = 30                  # 每小时后台抓取次数上限
+    # 使用前校验素材是否仍然适用（如活跃窗口已切换），返回 False 时改为现场抓取
+    validate: Optional[Callable[[Dict[str, Any]], bool]] = None
+
+
+class ProactivePrefetcher:
+    """按来源预取并缓存主动搭话素材"""
+
+    def __init__(self, sources: Iterable[PrefetchSource], tick: float = 5.0, idle_timeout: float = 1800.0):
+        self._sources: Dict[str, PrefetchSource] = {s.name: s for s in sources}
+        self.tick = tick
+        self.idle_timeout = idle_timeout
+        # name -> (fetched_at, result)
+        self._pool: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+        self._inflight: Dict[str, asyncio.Task] = {}
+        # name -> 最近一次被使用的时间
+        self._demand: Dict[str, float] = {}
+        # name -> 最近一小时内发起抓取的时间
+        self._fetch_times: Dict[str, Deque[float]] = {name: deque() for name in self._sources}
+        self._task: Optional[asyncio.Task] = None
+        self._stats = {
+            "pool_hits": 0, "live_fetches": 0, "background_fetches": 0,
+            "timeouts": 0, "failures": 0, "budget_skips": 0,
+        }
+
+    def touch(self, names: Iterable[str]) -> None:
+        """记录来源被使用，并确保后台刷新循环在当前事件循环中运行。"""
+        now = time.monotonic()
+        for name in names:
+            if name in self._sources:
+                self._demand[name] = now
+        if not self._demand:
+            return
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done() or self._task.get_loop() is not loop:
+            self._task = loop.create_task(self._run())
+
+    async def get(self, name: str) -> Dict[str, Any]:
+        """获取来源素材：池中可用则直接返回，否则现场抓取（受该来源超时限制）。"""
+        source = self._sources[name]
+        entry = self._pool.get(name)
+        if entry is not None and time.monotonic() - entry[0] < source.max_age and self._is_valid(source, entry[1]):
+            self._stats["pool_hits"] += 1
+            return copy.deepcopy(entry[1])
+        self._stats["live_fetches"] += 1
+        # shield：调用方被取消时抓取继续，结果仍会进入池中
+        result = await asyncio.shield(self._start_fetch(source))
+        return copy.deepcopy(result)
+
+    def _is_valid(self, source: PrefetchSource, result: Dict[str, Any]) -> bool:
+        if source.validate is None:
+            return True
+        try:
+            return bool(source.validate(result))
+        except Exception as e:
+            logger.debug(f"预取素材校验失败 [{source.name}]: {e}")
+            return False
+
+    def _start_fetch(self, source: PrefetchSource) -> asyncio.Task:
+        task = self._inflight.get(source.name)
+        if task is not None and not task.done() and task.get_loop() is asyncio.get_running_loop():
+            return task
+        self._fetch_times[source.name].append(time.monotonic())
+        task = asyncio.create_task(self._fetch(source))
+        self._inflight[source.name] = task
+        task.add_done_callback(functools.partial(self._on_fetch_done, source.name))
+        return task
+
+    def _on_fetch_done(self, name: str, task: asyncio.Task) -> None:
+        if self._inflight.get(name) is task:
+            del self._inflight[name]
+
+    async def _fetch(self, source: PrefetchSource) -> Dict[str, Any]:
+        try:
+            result = await asyncio.wait_for(source.fetch(), timeout=source.timeout)
+        except asyncio.TimeoutError:
+            self._stats["timeouts"] += 1
+            logger.warning(f"⏱️ 搭话素材 [{source.name}] 抓取超时 ({source.timeout:.0f}s)")
+            return {'success': False, 'error': f'抓取超时 ({source.timeout:.0f}s)'}
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self._stats["failures"] += 1
+            logger.warning(f"搭话素材 [{source.name}] 抓取异常: {e}")
+            return {'success': False, 'error': str(e)}
+        if isinstance(result, dict) and result.get('success'):
+            self._pool[source.name] = (time.monotonic(), result)
+        else:
+            self._stats["failures"] += 1
+        return result
+
+    def _within_budget(self, source: PrefetchSource, now: float) -> bool:
+        times = self._fetch_times[source.name]
+        while times and now - times[0] >= _BUDGET_WINDOW_SECONDS:
+            times.popleft()
+        return len(times) < source.hourly_budget
+
+    def _refresh_due(self, now: float) -> None:
+        for name, last_used in list(self._demand.items()):
+            if now - last_used >= self.idle_timeout:
+                del self._demand[name]
+                continue
+            source = self._sources[name]
+            task = self._inflight.get(name)
+            if task is not None and not task.done():
+                continue
+            entry = self._pool.get(name)
+            if entry is not None and now - entry[0] < source.refresh_interval:
+                continue
+            if not self._within_budget(source, now):
+                self._stats["budget_skips"] += 1
+                continue
+            self._stats["background_fetches"] += 1
+            self._start_fetch(source)
+
+    async def _run(self) -> None:
+        logger.info("🔄 主动搭话素材预取已启动")
+        try:
+            while True:
+                self._refresh_due(time.monotonic())
+                if not self._demand:
+                    break
+                await asyncio.sleep(self.tick)
+        finally:
+            logger.info("主动搭话素材预取已停止（无活跃来源）")
+
+    async def stop(self) -> None:
+        """停止后台刷新并取消进行中的抓取（服务退出时调用）。"""
+        tasks = [t for t in (self._task, *self._inflight.values()) if t is not None and not t.done()]
+        self._task = None
+        self._demand.clear()
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def get_stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        sources = {}
+        for name, source in self._sources.items():
+            entry = self._pool.get(name)
+            times = self._fetch_times[name]
+            sources[name] = {
+                "age": round(now - entry[0], 1) if entry is not None else None,
+                "fresh": entry is not None and now - entry[0] < source.max_age,
+                "inflight": name in self._inflight,
+                "active": name in self._demand,
+                "fetches_last_hour": sum(1 for t in times if now - t < _BUDGET_WINDOW_SECONDS),
+                "hourly_budget": source.hourly_budget,
+            }
+        served = self._stats["pool_hits"] + self._stats["live_fetches"]
+        return {
+            **self._stats,
+            "pool_hit_rate": (self._stats["pool_hits"] / served) if served else 0.0,
+            "running": self._task is not None and not self._task.done(),
+            "sources": sources,
+        }
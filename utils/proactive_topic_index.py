@@ -0,0 +1,421 @@
+# -*- coding: utf-8 -*-
+"""
+主动搭话的持久化去重索引（按角色）
+
+以前主动搭话的去重只看内存中最近 10 条搭话（difflib 逐条比对，耗时随文本长度平方增长）
+和最近 100 个话题 key，只覆盖约一小时，重启即丢失，稍早之前说过的话题会被再次提起。
+
+这里按角色维护几周内的历史：
+- 搭话文本与话题标题：归一化后取字符 3-gram shingle，计算 MinHash 签名并按 LSH 分桶。
+  查询时只取与候选同桶的历史条目，再用 shingle 集合的精确 Jaccard 复核，
+  耗时与历史条数基本无关（微秒级）；
+- 话题 key（URL 或 来源+标题）：精确匹配。
+
+历史保存在 sqlite3 文件中，启动时载入 retention 内的记录并重建签名（签名不落盘）。
+查询只访问内存；record_* 会同步写入一行，异步调用方应通过 asyncio.to_thread 调用。
+"""
+
+import re
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from utils.config_manager import get_config_manager
+from utils.logger_config import get_module_logger
+
+logger = get_module_logger(__name__)
+
+DEFAULT_RETENTION_SECONDS = 14 * 24 * 3600
+# 每个角色每类（搭话文本/话题标题）最多保留的条数
+DEFAULT_MAX_ENTRIES = 5000
+DEFAULT_NUM_PERM = 128
+# 32 个 band × 4 行：Jaccard 0.7 的近重复进入候选的概率约 99.98%
+DEFAULT_BANDS = 32
+SHINGLE_SIZE = 3
+# 超过该间隔才在写入时清理过期记录
+_PRUNE_INTERVAL_SECONDS = 3600
+
+_SHINGLE_MULTIPLIER = np.uint64(1000003)
+_SHINGLE_MASK = np.uint64(0xFFFFFFFF)
+_SHIFT = np.uint64(32)
+
+_KIND_MESSAGE = 'message'
+_KIND_TOPIC = 'topic'
+
+
+def normalize_text(text: str, compact: bool = False) -> str:
+    """
+    轻量归一化：小写并合并连续空白（保守策略，避免过度清洗导致误杀）
+
+    compact=True 时去掉全部空白与标点，用于不同媒体排版各异的话题标题。
+    """
+    text = (text or '').strip().lower()
+    if compact:
+        return re.sub(r'[\W_]+', '', text)
+    return re.sub(r'\s+', ' ', text)
+
+
+def shingle_hashes(text: str, size: int = SHINGLE_SIZE) -> np.ndarray:
+    """返回字符 size-gram 的 32 位哈希（去重、升序），不足 size 个字符时整体作为一个 shingle"""
+    if not text:
+        return np.empty(0, dtype=np.uint64)
+    codepoints = np.frombuffer(text.encode('utf-32-le'), dtype=np.uint32).astype(np.uint64)
+    count = max(len(codepoints) - size + 1, 1)
+    hashes = np.zeros(count, dtype=np.uint64)
+    for i in range(min(size, len(codepoints))):
+        hashes = (hashes * _SHINGLE_MULTIPLIER + codepoints[i:i + count]) & _SHINGLE_MASK
+    return np.unique(hashes)
+
+
+def jaccard(a: np.ndarray, b: np.ndarray) -> float:
+    """两个已去重 shingle 集合的 Jaccard 相似度"""
+    if not len(a) or not len(b):
+        return 0.0
+    shared = len(np.intersect1d(a, b, assume_unique=True))
+    return shared / (len(a) + len(b) - shared)
+
+
+class MinHasher:
+    """MinHash 签名：每个排列为 multiply-shift 哈希 ((a·x + b) mod 2^64) >> 32"""
+
+    def __init__(self, num_perm: int = DEFAULT_NUM_PERM, seed: int = 1):
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        # uint64 乘加按 2^64 回绕，省去逐元素取模
+        self._a = rng.integers(0, 1 << 63, size=num_perm, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+        self._b = rng.integers(0, 1 << 63, size=num_perm, dtype=np.uint64)
+
+    def signature(self, shingles: np.ndarray) -> np.ndarray:
+        if not len(shingles):
+            return np.full(self.num_perm, 0xFFFFFFFF, dtype=np.uint32)
+        values = np.multiply.outer(self._a, shingles)
+        values += self._b[:, None]
+        values >>= _SHIFT
+        return values.min(axis=1).astype(np.uint32)
+
+
+@dataclass
+class _Entry:
+    ts: float
+    text: str
+    channel: str
+    shingles: np.ndarray
+    signature: np.ndarray
+
+
+class _LshIndex:
+    """单个角色、单一类别的 MinHash LSH 索引（条目按时间顺序追加）"""
+
+    def __init__(self, bands: int, rows: int):
+        self.bands = bands
+        self._entries: Dict[int, _Entry] = {}
+        # 每个 band 一张表：band 哈希 -> 条目 id 列表
+        self._buckets: List[Dict[int, List[int]]] = [{} for _ in range(bands)]
+        # 把一个 band 的 rows 个签名值线性组合成一个 64 位哈希
+        self._band_multipliers = np.random.default_rng(2).integers(0, 1 << 63, size=rows, dtype=np.uint64)
+        self._next_id = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _band_hashes(self, signature: np.ndarray) -> List[int]:
+        return (signature.reshape(self.bands, -1).astype(np.uint64) @ self._band_multipliers).tolist()
+
+    def _index_entry(self, entry_id: int, entry: _Entry) -> None:
+        for buckets, band_hash in zip(self._buckets, self._band_hashes(entry.signature)):
+            buckets.setdefault(band_hash, []).append(entry_id)
+
+    def add(self, entry: _Entry) -> None:
+        entry_id = self._next_id
+        self._next_id += 1
+        self._entries[entry_id] = entry
+        self._index_entry(entry_id, entry)
+
+    def query(self, shingles: np.ndarray, signature: np.ndarray, threshold: float, since: float) -> Tuple[bool, float]:
+        """在同桶候选中找 Jaccard 达到 threshold 的条目，返回 (是否命中, 候选中的最高分)"""
+        candidates: Set[int] = set()
+        for buckets, band_hash in zip(self._buckets, self._band_hashes(signature)):
+            bucket = buckets.get(band_hash)
+            if bucket:
+                candidates.update(bucket)
+        best = 0.0
+        for entry_id in candidates:
+            entry = self._entries.get(entry_id)
+            if entry is None or entry.ts < since:
+                continue
+            score = jaccard(shingles, entry.shingles)
+            if score >= threshold:
+                return True, score
+            best = max(best, score)
+        return False, best
+
+    def recent(self, since: float, limit: int) -> List[_Entry]:
+        result = []
+        for entry in reversed(self._entries.values()):
+            if entry.ts < since or len(result) >= limit:
+                break
+            result.append(entry)
+        result.reverse()
+        return result
+
+    def prune(self, cutoff: float, max_entries: int) -> None:
+        expired = [entry_id for entry_id, entry in self._entries.items() if entry.ts < cutoff]
+        overflow = len(self._entries) - len(expired) - max_entries
+        if overflow > 0:
+            # 超出上限时多清掉 10%，避免每次写入都重建分桶
+            overflow += max_entries // 10
+            expired_ids = set(expired)
+            kept = [entry_id for entry_id in self._entries if entry_id not in expired_ids]
+            expired.extend(kept[:overflow])
+        if not expired:
+            return
+        for entry_id in expired:
+            self._entries.pop(entry_id, None)
+        for buckets in self._buckets:
+            buckets.clear()
+        for entry_id, entry in self._entries.items():
+            self._index_entry(entry_id, entry)
+
+
+@dataclass
+class _CharacterIndex:
+    messages: _LshIndex
+    titles: _LshIndex
+    # topic_key -> 最近一次使用时间
+    topic_keys: Dict[str, float] = field(default_factory=dict)
+
+
+class ProactiveTopicIndex:
+    """按角色的主动搭话文本/话题去重索引（线程安全，db_path 为 None 时仅在内存中）"""
+
+    def __init__(
+        self,
+        db_path: Optional[Path],
+        retention_seconds: float = DEFAULT_RETENTION_SECONDS,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        num_perm: int = DEFAULT_NUM_PERM,
+        bands: int = DEFAULT_BANDS,
+    ):
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) 必须是 bands ({bands}) 的整数倍")
+        self.db_path = Path(db_path) if db_path is not None else None
+        self.retention_seconds = retention_seconds
+        self.max_entries = max_entries
+        self.bands = bands
+        self.rows = num_perm // bands
+        self._hasher = MinHasher(num_perm)
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._characters: Dict[str, _CharacterIndex] = {}
+        self._last_prune = time.time()
+        self._stats = {"message_checks": 0, "message_hits": 0, "topic_checks": 0, "topic_hits": 0,
+                       "records": 0, "errors": 0}
+        if self.db_path is not None:
+            self._open()
+
+    def _open(self) -> None:
+        try:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.db_path), check_same_thread=False, timeout=5.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS proactive_history ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT, lanlan_name TEXT, kind TEXT, ts REAL,"
+                " text TEXT, channel TEXT, topic_key TEXT)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_proactive_history_ts ON proactive_history(ts)")
+            conn.execute("DELETE FROM proactive_history WHERE ts < ?", (time.time() - self.retention_seconds,))
+            conn.commit()
+            rows = conn.execute(
+                "SELECT lanlan_name, kind, ts, text, channel, topic_key FROM proactive_history ORDER BY ts, id"
+            ).fetchall()
+            self._conn = conn
+        except Exception as e:
+            logger.warning(f"⚠️ 主动搭话去重索引无法持久化，仅使用内存: {e}")
+            self._conn = None
+            return
+        for lanlan_name, kind, ts, text, channel, topic_key in rows:
+            if kind == _KIND_MESSAGE:
+                self._add_message_locked(lanlan_name, text or '', channel or '', ts)
+            elif kind == _KIND_TOPIC:
+                self._add_topic_locked(lanlan_name, topic_key or '', text or '', ts)
+        logger.info(f"🗂️ 主动搭话去重索引已加载: {len(rows)} 条 ({self.db_path})")
+
+    def _character(self, lanlan_name: str) -> _CharacterIndex:
+        index = self._characters.get(lanlan_name)
+        if index is None:
+            index = _CharacterIndex(
+                messages=_LshIndex(self.bands, self.rows), titles=_LshIndex(self.bands, self.rows)
+            )
+            self._characters[lanlan_name] = index
+        return index
+
+    def _entry(self, text: str, channel: str, ts: float, compact: bool = False) -> Optional[_Entry]:
+        shingles = shingle_hashes(normalize_text(text, compact))
+        if not len(shingles):
+            return None
+        return _Entry(ts=ts, text=text, channel=channel, shingles=shingles, signature=self._hasher.signature(shingles))
+
+    def _add_message_locked(self, lanlan_name: str, message: str, channel: str, ts: float) -> None:
+        entry = self._entry(message, channel, ts)
+        if entry is not None:
+            self._character(lanlan_name).messages.add(entry)
+
+    def _add_topic_locked(self, lanlan_name: str, topic_key: str, title: str, ts: float) -> None:
+        index = self._character(lanlan_name)
+        if topic_key:
+            index.topic_keys[topic_key] = max(ts, index.topic_keys.get(topic_key, 0.0))
+        entry = self._entry(title, '', ts, compact=True) if title else None
+        if entry is not None:
+            index.titles.add(entry)
+
+    # ---------- 查询（仅内存） ----------
+
+    def find_similar_message(self, lanlan_name: str, message: str, threshold: float,
+                             max_age: Optional[float] = None) -> Tuple[bool, float]:
+        """判断 message 是否与 max_age 内的搭话高度相似，返回 (is_duplicate, best_score)"""
+        shingles = shingle_hashes(normalize_text(message))
+        if not len(shingles):
+            return False, 0.0
+        signature = self._hasher.signature(shingles)
+        since = time.time() - (self.retention_seconds if max_age is None else max_age)
+        with self._lock:
+            self._stats["message_checks"] += 1
+            index = self._characters.get(lanlan_name)
+            if index is None:
+                return False, 0.0
+            hit, score = index.messages.query(shingles, signature, threshold, since)
+            if hit:
+                self._stats["message_hits"] += 1
+            return hit, score
+
+    def recent_messages(self, lanlan_name: str, max_age: float, limit: int = 10) -> List[Tuple[float, str, str]]:
+        """返回 max_age 内最近 limit 条搭话 [(timestamp, message, channel), ...]，按时间升序"""
+        since = time.time() - max_age
+        with self._lock:
+            index = self._characters.get(lanlan_name)
+            if index is None:
+                return []
+            return [(entry.ts, entry.text, entry.channel) for entry in index.messages.recent(since, limit)]
+
+    def is_topic_used(self, lanlan_name: str, topic_key: str, title: str = '',
+                      title_threshold: float = 1.0, max_age: Optional[float] = None) -> bool:
+        """话题 key 精确命中，或标题与已用话题的 Jaccard 达到 title_threshold 时视为已使用"""
+        if not topic_key and not title:
+            return False
+        since = time.time() - (self.retention_seconds if max_age is None else max_age)
+        shingles = shingle_hashes(normalize_text(title, compact=True)) if title and title_threshold < 1.0 else None
+        signature = self._hasher.signature(shingles) if shingles is not None and len(shingles) else None
+        with self._lock:
+            self._stats["topic_checks"] += 1
+            index = self._characters.get(lanlan_name)
+            if index is None:
+                return False
+            hit = bool(topic_key) and index.topic_keys.get(topic_key, 0.0) >= since
+            if not hit and signature is not None:
+                hit, _ = index.titles.query(shingles, signature, title_threshold, since)
+            if hit:
+                self._stats["topic_hits"] += 1
+            return hit
+
+    # ---------- 写入 ----------
+
+    def record_message(self, lanlan_name: str, message: str, channel: str = '', ts: Optional[float] = None) -> None:
+        """记录一次成功的主动搭话"""
+        if not (message or '').strip():
+            return
+        ts = time.time() if ts is None else ts
+        with self._lock:
+            self._add_message_locked(lanlan_name, message, channel, ts)
+            self._persist_locked(lanlan_name, _KIND_MESSAGE, ts, message, channel, '')
+
+    def record_topic(self, lanlan_name: str, topic_key: str, title: str = '', ts: Optional[float] = None) -> None:
+        """记录一次话题使用（key 用于精确匹配，title 用于近似匹配）"""
+        if not topic_key and not title:
+            return
+        ts = time.time() if ts is None else ts
+        with self._lock:
+            self._add_topic_locked(lanlan_name, topic_key, title, ts)
+            self._persist_locked(lanlan_name, _KIND_TOPIC, ts, title, '', topic_key)
+
+    def _persist_locked(self, lanlan_name: str, kind: str, ts: float, text: str, channel: str, topic_key: str) -> None:
+        self._stats["records"] += 1
+        now = time.time()
+        prune = now - self._last_prune >= _PRUNE_INTERVAL_SECONDS
+        if prune:
+            self._last_prune = now
+            self._prune_memory_locked(now - self.retention_seconds)
+        if self._conn is None:
+            return
+        try:
+            self._conn.execute(
+                "INSERT INTO proactive_history (lanlan_name, kind, ts, text, channel, topic_key)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (lanlan_name, kind, ts, text, channel, topic_key),
+            )
+            if prune:
+                self._conn.execute("DELETE FROM proactive_history WHERE ts < ?", (now - self.retention_seconds,))
+            self._conn.commit()
+        except Exception as e:
+            self._stats["errors"] += 1
+            logger.warning(f"⚠️ 写入主动搭话去重索引失败: {e}")
+
+    def _prune_memory_locked(self, cutoff: float) -> None:
+        for index in self._characters.values():
+            index.messages.prune(cutoff, self.max_entries)
+            index.titles.prune(cutoff, self.max_entries)
+            for key in [k for k, ts in index.topic_keys.items() if ts < cutoff]:
+                del index.topic_keys[key]
+            if len(index.topic_keys) > self.max_entries:
+                newest = sorted(index.topic_keys.items(), key=lambda item: item[1])[-self.max_entries:]
+                index.topic_keys = dict(newest)
+
+    def prune(self) -> None:
+        """立即清理过期记录（通常由写入自动触发）"""
+        now = time.time()
+        with self._lock:
+            self._last_prune = now
+            self._prune_memory_locked(now - self.retention_seconds)
+            if self._conn is None:
+                return
+            try:
+                self._conn.execute("DELETE FROM proactive_history WHERE ts < ?", (now - self.retention_seconds,))
+                self._conn.commit()
+            except Exception as e:
+                self._stats["errors"] += 1
+                logger.warning(f"⚠️ 清理主动搭话去重索引失败: {e}")
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            characters = {
+                name: {"messages": len(index.messages), "topics": len(index.topic_keys), "titles": len(index.titles)}
+                for name, index in self._characters.items()
+            }
+            stats = dict(self._stats)
+        return {
+            **stats,
+            "retention_days": round(self.retention_seconds / 86400, 1),
+            "persistent": self._conn is not None,
+            "characters": characters,
+        }
+
+
+_topic_index: Optional[ProactiveTopicIndex] = None
+_topic_index_lock = threading.Lock()
+
+
+def get_proactive_topic_index() -> ProactiveTopicIndex:
+    """获取进程级去重索引单例（位于 <app_docs_dir>/cache/proactive_topics.sqlite3）。"""
+    global _topic_index
+    if _topic_index is None:
+        with _topic_index_lock:
+            if _topic_index is None:
+                cache_dir = Path(get_config_manager().app_docs_dir) / "cache"
+                _topic_index = ProactiveTopicIndex(cache_dir / "proactive_topics.sqlite3")
+    return _topic_index
@@ -3,6 +3,9 @@
 提供截图分析功能，包括前端浏览器发送的截图和屏幕分享数据流处理
 """
 import base64
+import threading
+import time
+from collections import OrderedDict
 from typing import Optional
 from utils.logger_config import get_module_logger
 import asyncio
@@ -22,6 +25,11 @@ COMPRESS_TARGET_HEIGHT = 1080
 COMPRESS_JPEG_QUALITY = 75
 _LANCZOS = getattr(Image, 'LANCZOS', getattr(Image, 'ANTIALIAS', 1))
 
+# 视觉模型描述缓存：画面感知哈希汉明距离不超过该值、且在 TTL 内的描述可直接复用
+VISION_CACHE_MAX_ENTRIES = 32
+VISION_CACHE_TTL_SECONDS = 120.0
+VISION_CACHE_MAX_DISTANCE = 5
+
 def _validate_image_data(image_bytes: bytes) -> Optional[Image.Image]:
     """验证图片数据有效性"""
     try:
@@ -49,15 +57,45 @@ def compress_screenshot(
     return buf.getvalue()
 
 
-async def process_screen_data(data: str) -> Optional[str]:
+def compute_frame_hash(image: Image.Image) -> int:
+    """计算 64 位差值感知哈希（dHash），用于判断两帧画面是否近似相同"""
+    # JPEG 可在解码阶段直接按 1/2~1/8 缩放（DCT 缩放），避免完整解码大图
+    image.draft('L', (64, 64))
+    small = image.convert('L').resize((9, 8), _LANCZOS)
+    pixels = list(small.getdata())
+    value = 0
+    for row in range(8):
+        offset = row * 9
+        for col in range(8):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+
+def frame_hash_distance(a: int, b: int) -> int:
+    """两个感知哈希之间的汉明距离"""
+    return bin(a ^ b).count('1')
+
+
+def _decode_screen_frame(img_b64: str) -> Optional[tuple]:
+    """解码并验证一帧屏幕数据，返回 (尺寸, 感知哈希)；CPU 密集，在线程池中执行"""
+    img_bytes = base64.b64decode(img_b64)
+    image = _validate_image_data(img_bytes)
+    if image is None:
+        return None
+    size = image.size
+    return size, compute_frame_hash(image)
+
+
+async def process_screen_frame(data: str) -> Optional[tuple]:
     """
-    处理前端发送的屏幕分享数据流
-    前端已统一压缩到720p JPEG，此方法只做验证，不再二次缩放
+    处理前端发送的屏幕分享数据流，并计算用于去重的感知哈希
+    前端已统一压缩到720p JPEG，此方法只做验证，不再二次缩放；
+    base64 解码与 PIL 解码在线程池中执行，不阻塞事件循环
     
     参数:
         data: 前端发送的屏幕数据，格式为 'data:image/jpeg;base64,...'
     
-    返回: 验证后的base64字符串（不含data:前缀），如果验证失败则返回None
+    返回: (验证后的base64字符串（不含data:前缀）, 感知哈希)，如果验证失败则返回None
     """
     try:
         if not isinstance(data, str) or not data.startswith('data:image/jpeg;base64,'):
@@ -70,17 +108,15 @@ async def process_screen_data(data: str) -> Optional[str]:
             logger.error(f"屏幕数据过大: {len(img_b64)} 字节，超过限制 {MAX_BASE64_SIZE}")
             return None
         
-        img_bytes = base64.b64decode(img_b64)
-        
-        image = _validate_image_data(img_bytes)
-        if image is None:
+        decoded = await asyncio.to_thread(_decode_screen_frame, img_b64)
+        if decoded is None:
             logger.error("无效的图片数据")
             return None
         
-        w, h = image.size
+        (w, h), frame_hash = decoded
         logger.debug(f"屏幕数据验证完成: 尺寸 {w}x{h}")
         
-        return img_b64
+        return img_b64, frame_hash
             
     except ValueError as ve:
         logger.error(f"Base64解码错误 (屏幕数据): {ve}")
@@ -92,18 +128,117 @@ async def process_screen_data(data: str) -> Optional[str]:
         return None
 
 
+async def process_screen_data(data: str) -> Optional[str]:
+    """
+    处理前端发送的屏幕分享数据流（只返回验证后的base64，不含感知哈希）
+    
+    参数:
+        data: 前端发送的屏幕数据，格式为 'data:image/jpeg;base64,...'
+    
+    返回: 验证后的base64字符串（不含data:前缀），如果验证失败则返回None
+    """
+    result = await process_screen_frame(data)
+    return result[0] if result else None
+
+
+class VisionDescriptionCache:
+    """按画面感知哈希缓存视觉模型描述（有界 LRU + 新鲜度 TTL）"""
+
+    def __init__(
+        self,
+        max_entries: int = VISION_CACHE_MAX_ENTRIES,
+        ttl_seconds: float = VISION_CACHE_TTL_SECONDS,
+        max_distance: int = VISION_CACHE_MAX_DISTANCE,
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_distance = max_distance
+        # (frame_hash, context) -> (description, created_at)；context 包含模型、窗口标题等
+        self._entries: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, frame_hash: int, context: tuple) -> Optional[str]:
+        now = time.monotonic()
+        with self._lock:
+            best_key, best_distance = None, self.max_distance + 1
+            for key, (_, created_at) in list(self._entries.items()):
+                if now - created_at > self.ttl_seconds:
+                    del self._entries[key]
+                    continue
+                if key[1] != context:
+                    continue
+                distance = frame_hash_distance(frame_hash, key[0])
+                if distance < best_distance:
+                    best_key, best_distance = key, distance
+            if best_key is None:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(best_key)
+            self._hits += 1
+            return self._entries[best_key][0]
+
+    def put(self, frame_hash: int, context: tuple, description: str) -> None:
+        with self._lock:
+            key = (frame_hash, context)
+            self._entries[key] = (description, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": (self._hits / lookups) if lookups else 0.0,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+            }
+
+
+_vision_description_cache: Optional[VisionDescriptionCache] = None
+
+
+def get_vision_description_cache() -> VisionDescriptionCache:
+    """获取进程级视觉描述缓存单例"""
+    global _vision_description_cache
+    if _vision_description_cache is None:
+        _vision_description_cache = VisionDescriptionCache()
+    return _vision_description_cache
+
+
+def _frame_hash_from_b64(image_b64: str) -> Optional[int]:
+    try:
+        image = Image.open(BytesIO(base64.b64decode(image_b64)))
+        return compute_frame_hash(image)
+    except Exception as e:
+        logger.debug(f"计算画面感知哈希失败: {e}")
+        return None
+
+
 async def analyze_image_with_vision_model(
     image_b64: str,
     max_tokens: int = 500,
     window_title: str = '',
+    frame_hash: Optional[int] = None,
 ) -> Optional[str]:
     """
     使用视觉模型分析图片
+    画面与近期分析过的画面近似相同时直接复用缓存的描述（见 VisionDescriptionCache）
     
     参数:
         image_b64: 图片的base64编码（不含data:前缀）
         max_tokens: 最大输出token数，默认 500
         window_title: 可选的窗口标题，提供时会加入提示词以丰富上下文
+        frame_hash: 可选的画面感知哈希（process_screen_frame 已计算时传入），缺省时自动计算
         
     返回: 图片描述文本，失败则返回 None
     """
@@ -125,6 +260,15 @@ async def analyze_image_with_vision_model(
             logger.warning("Vision API key not configured, skipping image analysis")
             return None
         
+        if frame_hash is None:
+            frame_hash = await asyncio.to_thread(_frame_hash_from_b64, image_b64)
+        cache_context = (vision_model, vision_base_url, window_title, max_tokens)
+        if frame_hash is not None:
+            cached = get_vision_description_cache().get(frame_hash, cache_context)
+            if cached is not None:
+                logger.info("♻️ 画面未变化，复用缓存的视觉描述")
+                return cached
+        
         if api_config['is_custom']:
             logger.info(f"🖼️ Using custom VISION_MODEL ({vision_model}) to analyze image")
         else:
@@ -174,6 +318,8 @@ async def analyze_image_with_vision_model(
             description = response.choices[0].message.content
             if description and description.strip():
                 logger.info("✅ Image analysis complete")
+                if frame_hash is not None:
+                    get_vision_description_cache().put(frame_hash, cache_context, description.strip())
                 return description.strip()
         
         logger.warning("Vision model returned empty result")
@@ -0,0 +1,263 @@
+# -*- coding: utf-8 -*-
+"""
+翻译结果的持久化 LRU 缓存
+
+以前 TranslationService 的缓存是进程内 OrderedDict（先进先出淘汰），每次重启都会
+丢失；/api/translate 的字幕翻译则完全没有缓存。界面文案、状态消息、字幕会被反复翻译。
+
+这里按 (原文, 源语言, 目标语言, 翻译后端) 缓存翻译结果：
+- 磁盘层使用标准库 sqlite3（WAL 模式，多个服务进程共享同一个文件），
+  按 last_access 做真正的 LRU 淘汰，条目数受 max_entries 限制；
+- 进程内另有一层小的 OrderedDict LRU，热点条目命中时不访问磁盘，
+  只在距上次刷新超过 TOUCH_INTERVAL_SECONDS 时回写一次 last_access。
+
+sqlite 读写都是毫秒级的同步调用，异步调用方应通过 asyncio.to_thread 调用
+get_many / put_many（内存层命中可用 peek 同步查询）。
+"""
+
+import hashlib
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from utils.config_manager import get_config_manager
+from utils.logger_config import get_module_logger
+
+logger = get_module_logger(__name__)
+
+DEFAULT_MAX_ENTRIES = 20000
+DEFAULT_MEMORY_ENTRIES = 1000
+# 内存层命中时，距上次回写超过该时长才刷新磁盘中的 last_access
+TOUCH_INTERVAL_SECONDS = 300
+# sqlite 单条语句的参数上限保守取值
+_SQL_BATCH = 500
+
+# (text, source, target, backend)
+CacheRequest = Tuple[str, str, str, str]
+
+
+def make_translation_key(text: str, source: str, target: str, backend: str) -> str:
+    raw = "\x1f".join((backend or "", source or "", target or "", text))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class TranslationCache:
+    """线程安全、跨进程共享的翻译 LRU 缓存。"""
+
+    def __init__(
+        self,
+        db_path: Path,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        memory_entries: int = DEFAULT_MEMORY_ENTRIES,
+    ):
+        self.db_path = Path(db_path)
+        self.max_entries = max_entries
+        self.memory_entries = memory_entries
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        # key -> (translated, last_touch)
+        self._memory: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0, "evictions": 0, "errors": 0}
+        self._open()
+
+    def _open(self) -> None:
+        try:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.db_path), check_same_thread=False, timeout=5.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS translations ("
+                " key TEXT PRIMARY KEY, backend TEXT, source TEXT, target TEXT,"
+                " text TEXT, translated TEXT, last_access REAL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_translations_last_access ON translations(last_access)")
+            conn.commit()
+            count = conn.execute("SELECT COUNT(*) FROM translations").fetchone()[0]
+            self._conn = conn
+            logger.info(f"🗄️ 翻译缓存已加载: {count} 条 ({self.db_path})")
+        except Exception as e:
+            logger.warning(f"⚠️ 翻译持久化缓存不可用，仅使用内存缓存: {e}")
+            self._conn = None
+
+    @property
+    def enabled(self) -> bool:
+        return self._conn is not None
+
+    # ---------- 内存层 ----------
+
+    def _memory_get_locked(self, key: str) -> Optional[Tuple[str, float]]:
+        entry = self._memory.get(key)
+        if entry is not None:
+            self._memory.move_to_end(key)
+        return entry
+
+    def _memory_put_locked(self, key: str, translated: str, touched: float) -> None:
+        self._memory[key] = (translated, touched)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def peek(self, text: str, source: str, target: str, backend: str) -> Optional[str]:
+        """只查内存层（不访问磁盘，可在事件循环中直接调用）。
+
+        条目距上次回写超过 TOUCH_INTERVAL_SECONDS 时返回 None，由调用方改走 get_many
+        刷新磁盘中的 last_access，避免热点条目被其他进程当作冷数据淘汰。
+        """
+        key = make_translation_key(text, source, target, backend)
+        with self._lock:
+            entry = self._memory_get_locked(key)
+            if entry is None or time.time() - entry[1] >= TOUCH_INTERVAL_SECONDS:
+                return None
+            self._stats["memory_hits"] += 1
+            return entry[0]
+
+    # ---------- 批量读写 ----------
+
+    def get_many(self, requests: Sequence[CacheRequest]) -> List[Optional[str]]:
+        """批量查询，返回与 requests 一一对应的结果（未命中为 None）。"""
+        keys = [make_translation_key(*req) for req in requests]
+        results: List[Optional[str]] = [None] * len(keys)
+        missing: Dict[str, List[int]] = {}
+        touch: List[str] = []
+        now = time.time()
+        with self._lock:
+            for i, key in enumerate(keys):
+                entry = self._memory_get_locked(key)
+                if entry is None:
+                    missing.setdefault(key, []).append(i)
+                    continue
+                self._stats["memory_hits"] += 1
+                results[i] = entry[0]
+                if now - entry[1] >= TOUCH_INTERVAL_SECONDS:
+                    touch.append(key)
+                    self._memory[key] = (entry[0], now)
+            if missing and self._conn is not None:
+                try:
+                    found = self._select_locked(list(missing))
+                    for key, translated in found.items():
+                        for i in missing[key]:
+                            results[i] = translated
+                        self._memory_put_locked(key, translated, now)
+                        touch.append(key)
+                    self._stats["disk_hits"] += sum(len(missing[k]) for k in found)
+                    self._stats["misses"] += sum(len(v) for k, v in missing.items() if k not in found)
+                except Exception as e:
+                    self._stats["errors"] += 1
+                    logger.warning(f"⚠️ 读取翻译缓存失败: {e}")
+            else:
+                self._stats["misses"] += sum(len(v) for v in missing.values())
+        if touch:
+            self._touch(touch)
+        return results
+
+    def get(self, text: str, source: str, target: str, backend: str) -> Optional[str]:
+        return self.get_many([(text, source, target, backend)])[0]
+
+    def put_many(self, entries: Iterable[Tuple[str, str, str, str, str]]) -> None:
+        """批量写入 (text, source, target, backend, translated)。"""
+        now = time.time()
+        rows = []
+        with self._lock:
+            for text, source, target, backend, translated in entries:
+                if not text or not translated:
+                    continue
+                key = make_translation_key(text, source, target, backend)
+                self._memory_put_locked(key, translated, now)
+                rows.append((key, backend, source, target, text, translated, now))
+            if not rows or self._conn is None:
+                return
+            try:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO translations"
+                    " (key, backend, source, target, text, translated, last_access)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    rows,
+                )
+                self._stats["stores"] += len(rows)
+                self._evict_locked()
+                self._conn.commit()
+            except Exception as e:
+                self._stats["errors"] += 1
+                logger.warning(f"⚠️ 写入翻译缓存失败: {e}")
+
+    def put(self, text: str, source: str, target: str, backend: str, translated: str) -> None:
+        self.put_many([(text, source, target, backend, translated)])
+
+    def _select_locked(self, keys: List[str]) -> Dict[str, str]:
+        found: Dict[str, str] = {}
+        for start in range(0, len(keys), _SQL_BATCH):
+            batch = keys[start:start + _SQL_BATCH]
+            placeholders = ",".join("?" * len(batch))
+            for key, translated in self._conn.execute(
+                f"SELECT key, translated FROM translations WHERE key IN ({placeholders})", batch
+            ):
+                found[key] = translated
+        return found
+
+    def _touch(self, keys: List[str]) -> None:
+        if self._conn is None:
+            return
+        now = time.time()
+        with self._lock:
+            try:
+                self._conn.executemany(
+                    "UPDATE translations SET last_access = ? WHERE key = ?", [(now, key) for key in keys]
+                )
+                self._conn.commit()
+            except Exception as e:
+                self._stats["errors"] += 1
+                logger.debug(f"刷新翻译缓存访问时间失败: {e}")
+
+    def _evict_locked(self) -> None:
+        count = self._conn.execute("SELECT COUNT(*) FROM translations").fetchone()[0]
+        overflow = count - self.max_entries
+        if overflow <= 0:
+            return
+        evicted = [
+            row[0] for row in self._conn.execute(
+                "SELECT key FROM translations ORDER BY last_access LIMIT ?", (overflow,)
+            )
+        ]
+        self._conn.executemany("DELETE FROM translations WHERE key = ?", [(key,) for key in evicted])
+        for key in evicted:
+            self._memory.pop(key, None)
+        self._stats["evictions"] += len(evicted)
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            entries = None
+            if self._conn is not None:
+                try:
+                    entries = self._conn.execute("SELECT COUNT(*) FROM translations").fetchone()[0]
+                except Exception:
+                    pass
+            memory_entries = len(self._memory)
+        hits = stats["memory_hits"] + stats["disk_hits"]
+        lookups = hits + stats["misses"]
+        return {
+            **stats,
+            "hit_rate": (hits / lookups) if lookups else 0.0,
+            "entries": entries,
+            "memory_entries": memory_entries,
+            "max_entries": self.max_entries,
+            "enabled": self.enabled,
+        }
+
+
+_translation_cache: Optional[TranslationCache] = None
+_translation_cache_lock = threading.Lock()
+
+
+def get_translation_cache() -> TranslationCache:
+    """获取进程级翻译缓存单例（位于 <app_docs_dir>/cache/translations.sqlite3）。"""
+    global _translation_cache
+    if _translation_cache is None:
+        with _translation_cache_lock:
+            if _translation_cache is None:
+                cache_dir = Path(get_config_manager().app_docs_dir) / "cache"
+                _translation_cache = TranslationCache(cache_dir / "translations.sqlite3")
+    return _translation_cache
@@ -6,12 +6,20 @@
 同时支持获取活跃窗口标题和搜索功能
 """
 import asyncio
+import copy
+import functools
+import hashlib
+import inspect
 import httpx
 import random
 import re
 import platform
-from typing import Dict, List, Any, Optional, Union
-from urllib.parse import quote
+import time
+from collections import OrderedDict
+from html.parser import HTMLParser
+from http.cookiejar import CookieJar
+from typing import Awaitable, Callable, Dict, Hashable, Iterable, List, Any, Optional, Tuple, Union
+from urllib.parse import parse_qs, quote, urljoin, urlparse
 from utils.logger_config import get_module_logger
 from langchain_openai import ChatOpenAI
 from langchain_core.messages import SystemMessage
@@ -201,10 +209,308 @@ def _get_bilibili_credential() -> Any | None:
     
     return None
 
+# ==================================================
+# 共享 HTTP 连接池与按来源的 TTL 缓存
+# ==================================================
+#
+# 以前每次抓取都新建一个 httpx.AsyncClient，主动搭话每轮都要重新做 DNS/TLS 握手，
+# 并重新拉取几分钟才变化一次的热榜。这里提供：
+# - 进程级共享的连接池客户端（按事件循环复用）。共享客户端不保存响应下发的 Cookie，
+#   需要登录态的请求通过 _cookie_header 显式携带，避免不同来源/登录态之间串用；
+# - 按来源的 TTL 缓存：新鲜期内直接返回；过期但仍在 stale 窗口内时先返回旧数据，
+#   同时在后台刷新（stale-while-revalidate）；同一 key 的并发请求只发起一次抓取；
+#   只缓存 success 为真的结果，失败时继续使用旧数据。
+
+_HTTP_TIMEOUT = 5.0
+_HTTP_LIMITS = httpx.Limits(max_connections=32, max_keepalive_connections=16, keepalive_expiry=60.0)
+
+# 热榜/推荐：几分钟才变化一次
+_TRENDING_CACHE_TTL = 300.0
+_TRENDING_STALE_TTL = 1800.0
+# 搜索结果：同一窗口标题生成的查询词会反复出现
+_SEARCH_CACHE_TTL = 900.0
+_SEARCH_STALE_TTL = 3600.0
+# 个人关注动态：时效性更强
+_PERSONAL_CACHE_TTL = 180.0
+_PERSONAL_STALE_TTL = 900.0
+# 个人动态各平台并发抓取的共同截止时间 (s)
+_PERSONAL_FETCH_DEADLINE = 8.0
+# 窗口上下文：同一窗口标题生成的查询词基本不变，搜索结果按标题整体缓存
+_WINDOW_QUERIES_CACHE_TTL = 6 * 3600.0
+_WINDOW_CONTEXT_CACHE_TTL = 1800.0
+_WINDOW_CONTEXT_STALE_TTL = 1800.0
+
+
+class _NoPersistCookieJar(CookieJar):
+    """共享客户端使用的 Cookie 罐：丢弃响应中的 Set-Cookie。"""
+
+    def extract_cookies(self, response, request):
+        return None
+
+
+_http_client: Optional[httpx.AsyncClient] = None
+_http_client_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """
+    获取当前事件循环共享的 httpx.AsyncClient（连接池复用 TCP/TLS 连接）
+
+    默认 timeout 为 5 秒并跟随重定向，单次请求可通过 timeout= 覆盖。
+    调用方不要关闭返回的客户端。
+    """
+    global _http_client, _http_client_loop
+    loop = asyncio.get_running_loop()
+    if _http_client is None or _http_client.is_closed or _http_client_loop is not loop:
+        # 旧客户端绑定在已结束的事件循环上，无法再复用，直接替换
+        _http_client = httpx.AsyncClient(
+            timeout=_HTTP_TIMEOUT,
+            follow_redirects=True,
+            limits=_HTTP_LIMITS,
+            cookies=_NoPersistCookieJar(),
+        )
+        _http_client_loop = loop
+    return _http_client
+
+
+async def close_http_client() -> None:
+    """关闭共享客户端（服务退出时调用）"""
+    global _http_client, _http_client_loop
+    client, _http_client, _http_client_loop = _http_client, None, None
+    if client is not None and not client.is_closed:
+        try:
+            await client.aclose()
+        except Exception as e:
+            logger.debug(f"关闭共享 HTTP 客户端失败: {e}")
+
+
+def _cookie_header(cookies: Optional[Dict[str, str]]) -> Dict[str, str]:
+    """把登录态 Cookie 转成请求头（共享客户端不使用 per-request cookies 参数）"""
+    if not cookies:
+        return {}
+    return {'Cookie': '; '.join(f"{name}={value}" for name, value in cookies.items())}
+
+
+def _cookie_digest(cookie: str) -> str:
+    """登录态 Cookie 的摘要：缓存 key 用它区分账号，不保存 Cookie 原文"""
+    return hashlib.sha256(cookie.encode('utf-8')).hexdigest() if cookie else ''
+
+
+def _account_digest(platform: str) -> str:
+    """平台当前登录账号的 Cookie 摘要（未登录为空串）"""
+    return _cookie_digest(_cookie_header(_get_platform_cookies(platform)).get('Cookie', ''))
+
+
+def get_account_digests(platforms: Iterable[str]) -> Dict[str, str]:
+    """
+    各平台当前登录账号的摘要（平台名 -> 摘要）
+
+    依赖登录态的抓取结果在 'account_digests' 中记录抓取时的摘要，
+    结果被缓存/预取复用前与当前值比较，切换或退出账号后不再使用。
+    """
+    return {platform: _account_digest(platform) for platform in platforms}
+
+
+class SourceCache:
+    """按来源的 TTL + stale-while-revalidate 结果缓存（仅在事件循环内使用）"""
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        # key -> (fetched_at, result)
+        self._entries: "OrderedDict[Hashable, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self._stats = {"hits": 0, "stale_hits": 0, "misses": 0, "refreshes": 0, "failures": 0}
+
+    async def get_or_fetch(
+        self,
+        key: Hashable,
+        fetch: Callable[[], Awaitable[Dict[str, Any]]],
+        ttl: float,
+        stale_ttl: float = 0.0,
+    ) -> Dict[str, Any]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            age = time.monotonic() - entry[0]
+            if age < ttl:
+                self._stats["hits"] += 1
+                return copy.deepcopy(entry[1])
+            if age < ttl + stale_ttl:
+                self._stats["stale_hits"] += 1
+                self._refresh(key, fetch)
+                return copy.deepcopy(entry[1])
+        self._stats["misses"] += 1
+        # shield：调用方被取消时不影响共享的抓取任务
+        result = await asyncio.shield(self._refresh(key, fetch))
+        return copy.deepcopy(result)
+
+    def _refresh(self, key: Hashable, fetch: Callable[[], Awaitable[Dict[str, Any]]]) -> asyncio.Task:
+        task = self._inflight.get(key)
+        if task is not None and not task.done() and task.get_loop() is asyncio.get_running_loop():
+            return task
+        task = asyncio.create_task(self._run_fetch(key, fetch))
+        self._inflight[key] = task
+        task.add_done_callback(functools.partial(self._on_fetch_done, key))
+        return task
+
+    async def _run_fetch(self, key: Hashable, fetch: Callable[[], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+        self._stats["refreshes"] += 1
+        result = await fetch()
+        if isinstance(result, dict) and result.get('success'):
+            self._entries[key] = (time.monotonic(), result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        else:
+            self._stats["failures"] += 1
+        return result
+
+    def _on_fetch_done(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if task.cancelled():
+            return
+        exc = task.exception()
+        if exc is not None:
+            # 后台刷新无人等待结果，这里取走异常避免 "never retrieved" 警告
+            self._stats["failures"] += 1
+            logger.warning(f"后台刷新缓存失败: {key[0] if isinstance(key, tuple) else key}: {exc}")
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = dict(self._stats)
+        served = stats["hits"] + stats["stale_hits"]
+        lookups = served + stats["misses"]
+        sources: Dict[str, int] = {}
+        for key in self._entries:
+            source = key[0] if isinstance(key, tuple) else str(key)
+            sources[source] = sources.get(source, 0) + 1
+        return {
+            **stats,
+            "hit_rate": (served / lookups) if lookups else 0.0,
+            "entries": len(self._entries),
+            "inflight": len(self._inflight),
+            "sources": sources,
+        }
+
+
+_source_cache = SourceCache()
+
+
+def get_source_cache() -> SourceCache:
+    """获取进程级的抓取结果缓存"""
+    return _source_cache
+
+
+class ConditionalCache:
+    """
+    按 URL + 登录态记录 ETag/Last-Modified 与上次解析出的 JSON
+
+    再次请求时带上 If-None-Match/If-Modified-Since，服务端返回 304 时直接复用上次的数据，
+    不再下载和解析响应体；不返回校验头的接口照常完整下载。
+    """
+
+    def __init__(self, max_entries: int = 64):
+        self.max_entries = max_entries
+        # (url, cookie 摘要) -> (etag, last_modified, data)
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[Optional[str], Optional[str], Any]]" = OrderedDict()
+        self._stats = {"requests": 0, "conditional": 0, "not_modified": 0}
+
+    @staticmethod
+    def _key(url: str, headers: Dict[str, str]) -> Tuple[str, str]:
+        # 不同账号请求同一 URL 分开记录，只保存 Cookie 的摘要
+        return (url, _cookie_digest(headers.get('Cookie', '')))
+
+    async def get_json(self, url: str, headers: Dict[str, str], timeout: float = 10.0) -> Tuple[int, Any]:
+        """
+        发起条件 GET 并解析 JSON，返回 (状态码, 数据)
+
+        304 时返回 (200, 上次的数据)；其他非 200 响应的数据为 None。
+        返回的数据可能就是缓存中的对象，调用方不要修改。
+        """
+        key = self._key(url, headers)
+        entry = self._entries.get(key)
+        request_headers = dict(headers)
+        if entry is not None:
+            etag, last_modified, _ = entry
+            if etag:
+                request_headers['If-None-Match'] = etag
+            if last_modified:
+                request_headers['If-Modified-Since'] = last_modified
+            self._stats["conditional"] += 1
+        self._stats["requests"] += 1
+
+        response = await get_http_client().get(url, headers=request_headers, timeout=timeout)
+        if response.status_code == 304 and entry is not None:
+            self._stats["not_modified"] += 1
+            self._entries.move_to_end(key)
+            return 200, entry[2]
+        if response.status_code != 200:
+            return response.status_code, None
+
+        data = response.json()
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        if etag or last_modified:
+            self._entries[key] = (etag, last_modified, data)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        else:
+            self._entries.pop(key, None)
+        return 200, data
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        conditional = self._stats["conditional"]
+        return {
+            **self._stats,
+            "not_modified_rate": (self._stats["not_modified"] / conditional) if conditional else 0.0,
+            "entries": len(self._entries),
+        }
+
+
+_conditional_cache = ConditionalCache()
+
+
+def get_conditional_cache() -> ConditionalCache:
+    """获取进程级的条件请求缓存"""
+    return _conditional_cache
+
+
+def cached_source(source: str, ttl: float, stale_ttl: float = 0.0, account: Optional[str] = None):
+    """
+    为抓取函数加上按来源的 TTL 缓存
+
+    缓存 key 为 (source, 绑定默认值后的全部参数)，原函数可通过 __wrapped__ 绕过缓存调用。
+    account 为平台名时（个人动态等依赖登录态的来源），key 中再加上该平台当前 Cookie 的摘要，
+    切换或退出账号后不会返回上一个账号的缓存结果。
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            key = (source, tuple(bound.arguments.items()))
+            if account is not None:
+                key += (_account_digest(account),)
+            return await _source_cache.get_or_fetch(key, lambda: func(*args, **kwargs), ttl, stale_ttl)
+
+        return wrapper
+    return decorator
+
+
 # ==================================================
 # 热门内容获取函数
 # ==================================================
 
+# 登录后返回个性化推荐，缓存按账号区分
+@cached_source("bilibili_trending", ttl=_TRENDING_CACHE_TTL, stale_ttl=_TRENDING_STALE_TTL, account="bilibili")
 async def fetch_bilibili_trending(limit: int = 30) -> Dict[str, Any]:
     """
     获取B站首页推荐视频
@@ -288,6 +594,7 @@ async def fetch_bilibili_trending(limit: int = 30) -> Dict[str, Any]:
 
 
 
+@cached_source("reddit_popular", ttl=_TRENDING_CACHE_TTL, stale_ttl=_TRENDING_STALE_TTL)
 async def fetch_reddit_popular(limit: int = 10) -> Dict[str, Any]:
     """
     获取Reddit热门帖子
@@ -310,48 +617,48 @@ async def fetch_reddit_popular(limit: int = 10) -> Dict[str, Any]:
         
         await asyncio.sleep(random.uniform(0.1, 0.5))
         
-        async with httpx.AsyncClient(timeout=5.0, follow_redirects=True) as client:
-            response = await client.get(url, headers=headers)
-            response.raise_for_status()
-            data = response.json()
+        client = get_http_client()
+        response = await client.get(url, headers=headers)
+        response.raise_for_status()
+        data = response.json()
+        
+        posts = []
+        children = data.get('data', {}).get('children', [])
+        
+        for item in children[:limit]:
+            post_data = item.get('data', {})
             
-            posts = []
-            children = data.get('data', {}).get('children', [])
+            # 跳过NSFW内容
+            if post_data.get('over_18'):
+                continue
             
-            for item in children[:limit]:
-                post_data = item.get('data', {})
-                
-                # 跳过NSFW内容
-                if post_data.get('over_18'):
-                    continue
-                
-                subreddit = post_data.get('subreddit', '')
-                title = post_data.get('title', '')
-                score = post_data.get('score', 0)
-                num_comments = post_data.get('num_comments', 0)
-                permalink = post_data.get('permalink', '')
-                
-                posts.append({
-                    'title': title,
-                    'subreddit': f"r/{subreddit}",
-                    'score': _format_score(score),
-                    'comments': _format_score(num_comments),
-                    'url': f"https://www.reddit.com{permalink}" if permalink else ''
-                })
+            subreddit = post_data.get('subreddit', '')
+            title = post_data.get('title', '')
+            score = post_data.get('score', 0)
+            num_comments = post_data.get('num_comments', 0)
+            permalink = post_data.get('permalink', '')
+            
+            posts.append({
+                'title': title,
+                'subreddit': f"r/{subreddit}",
+                'score': _format_score(score),
+                'comments': _format_score(num_comments),
+                'url': f"https://www.reddit.com{permalink}" if permalink else ''
+            })
+        
+        if posts:
+            logger.info(f"从Reddit获取到{len(posts)}条热门帖子")
+            return {
+                'success': True,
+                'posts': posts
+            }
+        else:
+            return {
+                'success': False,
+                'error': 'Reddit返回空数据',
+                'posts': []
+            }
             
-            if posts:
-                logger.info(f"从Reddit获取到{len(posts)}条热门帖子")
-                return {
-                    'success': True,
-                    'posts': posts
-                }
-            else:
-                return {
-                    'success': False,
-                    'error': 'Reddit返回空数据',
-                    'posts': []
-                }
-                
     except httpx.TimeoutException:
         logger.exception("获取Reddit热门超时")
         return {
@@ -379,6 +686,7 @@ def _format_score(count: int) -> str:
     return "0"
 
 
+@cached_source("weibo_trending", ttl=_TRENDING_CACHE_TTL, stale_ttl=_TRENDING_STALE_TTL)
 async def fetch_weibo_trending(limit: int = 10) -> Dict[str, Any]:
     """
     获取微博热议话题
@@ -405,71 +713,71 @@ async def fetch_weibo_trending(limit: int = 10) -> Dict[str, Any]:
         # 添加随机延迟
         await asyncio.sleep(random.uniform(0.1, 0.5))
         
-        async with httpx.AsyncClient(timeout=5.0, follow_redirects=True) as client:
-            response = await client.get(url, headers=headers)
-            response.raise_for_status()
-            
-            # 检查是否重定向到登录页面
-            if 'passport' in str(response.url):
-                logger.warning("微博Cookie可能已过期，回退到公开API")
-                return await _fetch_weibo_trending_fallback(limit)
-            
-            html = response.text
-            soup = BeautifulSoup(html, 'html.parser')
-            
-            # 解析热搜列表 (td-02 class)
-            td_items = soup.find_all('td', class_='td-02')
-            
-            if not td_items:
-                logger.warning("未找到热搜数据，回退到公开API")
-                return await _fetch_weibo_trending_fallback(limit)
-            
-            trending_list = []
-            for i, td in enumerate(td_items):
-                if len(trending_list) >= limit:
-                    break
-                    
-                a_tag = td.find('a')
-                span = td.find('span')
+        client = get_http_client()
+        response = await client.get(url, headers=headers)
+        response.raise_for_status()
+        
+        # 检查是否重定向到登录页面
+        if 'passport' in str(response.url):
+            logger.warning("微博Cookie可能已过期，回退到公开API")
+            return await _fetch_weibo_trending_fallback(limit)
+        
+        html = response.text
+        soup = BeautifulSoup(html, 'html.parser')
+        
+        # 解析热搜列表 (td-02 class)
+        td_items = soup.find_all('td', class_='td-02')
+        
+        if not td_items:
+            logger.warning("未找到热搜数据，回退到公开API")
+            return await _fetch_weibo_trending_fallback(limit)
+        
+        trending_list = []
+        for i, td in enumerate(td_items):
+            if len(trending_list) >= limit:
+                break
                 
-                if a_tag:
-                    word = a_tag.get_text(strip=True)
-                    if not word:
-                        continue
-                    
-                    # 获取链接
-                    href = a_tag.get('href', '')
-                    # 构建完整URL（相对链接需要加上域名）
-                    if href and not href.startswith('http'):
-                        href = f"https://s.weibo.com{href}"
-                    
-                    # 解析热度值
-                    hot_text = span.get_text(strip=True) if span else ''
-                    # 热度可能包含类型标签如"剧集 336075"，需要提取数字
-                    import re
-                    hot_match = re.search(r'(\d+)', hot_text)
-                    raw_hot = int(hot_match.group(1)) if hot_match else 0
-                    
-                    # 提取标签（如"剧集"、"晚会"等）
-                    note = re.sub(r'\d+', '', hot_text).strip() if hot_text else ''
-                    
-                    trending_list.append({
-                        'word': word,
-                        'raw_hot': raw_hot,
-                        'note': note,
-                        'rank': i + 1,
-                        'url': href
-                    })
+            a_tag = td.find('a')
+            span = td.find('span')
             
-            if trending_list:
-                logger.info(f"成功从s.weibo.com获取{len(trending_list)}条热搜")
-                return {
-                    'success': True,
-                    'trending': trending_list
-                }
-            else:
-                return await _fetch_weibo_trending_fallback(limit)
+            if a_tag:
+                word = a_tag.get_text(strip=True)
+                if not word:
+                    continue
+                
+                # 获取链接
+                href = a_tag.get('href', '')
+                # 构建完整URL（相对链接需要加上域名）
+                if href and not href.startswith('http'):
+                    href = f"https://s.weibo.com{href}"
+                
+                # 解析热度值
+                hot_text = span.get_text(strip=True) if span else ''
+                # 热度可能包含类型标签如"剧集 336075"，需要提取数字
+                import re
+                hot_match = re.search(r'(\d+)', hot_text)
+                raw_hot = int(hot_match.group(1)) if hot_match else 0
+                
+                # 提取标签（如"剧集"、"晚会"等）
+                note = re.sub(r'\d+', '', hot_text).strip() if hot_text else ''
                 
+                trending_list.append({
+                    'word': word,
+                    'raw_hot': raw_hot,
+                    'note': note,
+                    'rank': i + 1,
+                    'url': href
+                })
+        
+        if trending_list:
+            logger.info(f"成功从s.weibo.com获取{len(trending_list)}条热搜")
+            return {
+                'success': True,
+                'trending': trending_list
+            }
+        else:
+            return await _fetch_weibo_trending_fallback(limit)
+            
     except Exception as e:
         logger.warning(f"s.weibo.com热搜获取失败: {e}，回退到公开API")
         return await _fetch_weibo_trending_fallback(limit)
@@ -496,42 +804,42 @@ async def _fetch_weibo_trending_fallback(limit: int = 10) -> Dict[str, Any]:
         
         await asyncio.sleep(random.uniform(0.1, 0.5))
         
-        async with httpx.AsyncClient(timeout=5.0, follow_redirects=True) as client:
-            response = await client.get(url, headers=headers)
-            response.raise_for_status()
-            data = response.json()
+        client = get_http_client()
+        response = await client.get(url, headers=headers)
+        response.raise_for_status()
+        data = response.json()
+        
+        if data.get('ok') == 1:
+            trending_list = []
+            realtime_list = data.get('data', {}).get('realtime', [])
             
-            if data.get('ok') == 1:
-                trending_list = []
-                realtime_list = data.get('data', {}).get('realtime', [])
-                
-                for item in realtime_list[:limit]:
-                    if item.get('is_ad'):
-                        continue
-                    
-                    word = item.get('word', '')
-                    # 构建搜索URL
-                    search_url = f"https://s.weibo.com/weibo?q={quote(word)}" if word else ''
-                    
-                    trending_list.append({
-                        'word': word,
-                        'raw_hot': item.get('raw_hot', 0),
-                        'note': item.get('note', ''),
-                        'rank': item.get('rank', 0),
-                        'url': search_url
-                    })
+            for item in realtime_list[:limit]:
+                if item.get('is_ad'):
+                    continue
                 
-                return {
-                    'success': True,
-                    'trending': trending_list[:limit]
-                }
-            else:
-                logger.error("微博公开API返回错误")
-                return {
-                    'success': False,
-                    'error': '微博API返回错误'
-                }
+                word = item.get('word', '')
+                # 构建搜索URL
+                search_url = f"https://s.weibo.com/weibo?q={quote(word)}" if word else ''
                 
+                trending_list.append({
+                    'word': word,
+                    'raw_hot': item.get('raw_hot', 0),
+                    'note': item.get('note', ''),
+                    'rank': item.get('rank', 0),
+                    'url': search_url
+                })
+            
+            return {
+                'success': True,
+                'trending': trending_list[:limit]
+            }
+        else:
+            logger.error("微博公开API返回错误")
+            return {
+                'success': False,
+                'error': '微博API返回错误'
+            }
+            
     except httpx.TimeoutException:
         logger.exception("获取微博热议话题超时")
         return {
@@ -546,6 +854,7 @@ async def _fetch_weibo_trending_fallback(limit: int = 10) -> Dict[str, Any]:
         }
 
 
+@cached_source("twitter_trending", ttl=_TRENDING_CACHE_TTL, stale_ttl=_TRENDING_STALE_TTL)
 async def fetch_twitter_trending(limit: int = 10) -> Dict[str, Any]:
     """
     获取Twitter/X热门话题
@@ -572,44 +881,44 @@ async def fetch_twitter_trending(limit: int = 10) -> Dict[str, Any]:
         
         await asyncio.sleep(random.uniform(0.1, 0.5))
         
-        async with httpx.AsyncClient(timeout=5.0, follow_redirects=True) as client:
-            response = await client.get(url, headers=headers)
-            response.raise_for_status()
-            html_content = response.text
-            
-            # 从页面解析热门话题
-            trending_list = []
-            
-            # 尝试从页面的JSON数据中提取热门话题
-            trend_pattern = r'"trend":\{[^}]*"name":"([^"]+)"'
-            tweet_count_pattern = r'"tweetCount":"([^"]+)"'
+        client = get_http_client()
+        response = await client.get(url, headers=headers)
+        response.raise_for_status()
+        html_content = response.text
+        
+        # 从页面解析热门话题
+        trending_list = []
+        
+        # 尝试从页面的JSON数据中提取热门话题
+        trend_pattern = r'"trend":\{[^}]*"name":"([^"]+)"'
+        tweet_count_pattern = r'"tweetCount":"([^"]+)"'
+        
+        trends = re.findall(trend_pattern, html_content)
+        tweet_counts = re.findall(tweet_count_pattern, html_content)
+        
+        for i, trend in enumerate(trends[:limit]):
+            if trend and not trend.startswith('#'):
+                trend = '#' + trend if not trend.startswith('@') else trend
             
-            trends = re.findall(trend_pattern, html_content)
-            tweet_counts = re.findall(tweet_count_pattern, html_content)
+            # 构建搜索URL
+            search_url = f"https://twitter.com/search?q={quote(trend)}" if trend else ''
             
-            for i, trend in enumerate(trends[:limit]):
-                if trend and not trend.startswith('#'):
-                    trend = '#' + trend if not trend.startswith('@') else trend
-                
-                # 构建搜索URL
-                search_url = f"https://twitter.com/search?q={quote(trend)}" if trend else ''
-                
-                trending_list.append({
-                    'word': trend,
-                    'tweet_count': tweet_counts[i] if i < len(tweet_counts) else 'N/A',
-                    'note': '',
-                    'rank': i + 1,
-                    'url': search_url
-                })
+            trending_list.append({
+                'word': trend,
+                'tweet_count': tweet_counts[i] if i < len(tweet_counts) else 'N/A',
+                'note': '',
+                'rank': i + 1,
+                'url': search_url
+            })
+        
+        if trending_list:
+            return {
+                'success': True,
+                'trending': trending_list
+            }
+        else:
+            return await _fetch_twitter_trending_fallback(limit)
             
-            if trending_list:
-                return {
-                    'success': True,
-                    'trending': trending_list
-                }
-            else:
-                return await _fetch_twitter_trending_fallback(limit)
-                
     except httpx.TimeoutException:
         logger.exception("获取Twitter热门超时")
         return {
@@ -686,20 +995,20 @@ async def _fetch_twitter_trending_fallback(limit: int = 10) -> Dict[str, Any]:
         try:
             await asyncio.sleep(random.uniform(0.1, 0.3))
             
-            async with httpx.AsyncClient(timeout=5.0, follow_redirects=True) as client:
-                response = await client.get(source['url'], headers=headers)
+            client = get_http_client()
+            response = await client.get(source['url'], headers=headers)
+            
+            if response.status_code == 200:
+                soup = BeautifulSoup(response.text, 'html.parser')
+                trending_list = source['parser'](soup, limit)
                 
-                if response.status_code == 200:
-                    soup = BeautifulSoup(response.text, 'html.parser')
-                    trending_list = source['parser'](soup, limit)
-                    
-                    if trending_list:
-                        logger.info(f"从{source['name']}获取到{len(trending_list)}条Twitter热门")
-                        return {
-                            'success': True,
-                            'trending': trending_list,
-                            'source': source['name'].lower().replace(' ', '')
-                        }
+                if trending_list:
+                    logger.info(f"从{source['name']}获取到{len(trending_list)}条Twitter热门")
+                    return {
+                        'success': True,
+                        'trending': trending_list,
+                        'source': source['name'].lower().replace(' ', '')
+                    }
         except Exception as e:
             logger.warning(f"{source['name']}获取失败: {e}")
             continue
@@ -739,6 +1048,8 @@ async def fetch_trending_content(bilibili_limit: int = 10, weibo_limit: int = 10
         if china_region:
             # Chinese region: Use Bilibili and Weibo
             logger.info("检测到中文区域，获取B站和微博热门内容")
+            # B站首页推荐在登录后是个性化的
+            account_digests = get_account_digests(['bilibili'])
             
             bilibili_task = fetch_bilibili_trending(bilibili_limit)
             weibo_task = fetch_weibo_trending(weibo_limit)
@@ -766,14 +1077,16 @@ async def fetch_trending_content(bilibili_limit: int = 10, weibo_limit: int = 10
                     'error': '无法获取任何热门内容',
                     'region': 'china',
                     'bilibili': bilibili_result,
-                    'weibo': weibo_result
+                    'weibo': weibo_result,
+                    'account_digests': account_digests
                 }
             
             return {
                 'success': True,
                 'region': 'china',
                 'bilibili': bilibili_result,
-                'weibo': weibo_result
+                'weibo': weibo_result,
+                'account_digests': account_digests
             }
         else:
             # 非中文区域：使用Reddit和Twitter
@@ -1158,6 +1471,19 @@ async def generate_diverse_queries(window_title: str) -> List[str]:
         为保护隐私，调用此函数前应先使用clean_window_title()清理标题，
         避免将文件路径、账号等敏感信息发送给LLM API
     """
+    key = ('window_queries', normalize_window_title(window_title), is_china_region())
+    result = await _source_cache.get_or_fetch(
+        key, lambda: _request_diverse_queries(window_title), ttl=_WINDOW_QUERIES_CACHE_TTL
+    )
+    if result.get('success'):
+        return result['queries']
+    # 回退到原始清理方法（失败结果不缓存，下次触发重新生成）
+    clean_title = clean_window_title(window_title)
+    return [clean_title, clean_title, clean_title]
+
+
+async def _request_diverse_queries(window_title: str) -> Dict[str, Any]:
+    """调用LLM生成查询关键词，返回 {'success': True, 'queries': [...]} 或失败信息"""
     try:
         # 导入配置管理器
         from utils.config_manager import ConfigManager
@@ -1239,7 +1565,7 @@ keyword three"""
             logger.info(f"为窗口标题「{sanitized_title}」生成的查询关键词: {queries}")
         else:
             logger.info(f"为窗口标题「{sanitized_title}」生成的查询关键词: {queries}")
-        return queries[:3]
+        return {'success': True, 'queries': queries[:3]}
         
     except Exception as e:
         # 异常日志中也使用脱敏标题
@@ -1248,9 +1574,7 @@ keyword three"""
             logger.warning(f"为窗口标题「{sanitized_title}」生成多样化查询失败，使用默认清理方法: {e}")
         else:
             logger.warning(f"为窗口标题「{sanitized_title}」生成多样化查询失败，使用默认清理方法: {e}")
-        # 回退到原始清理方法
-        clean_title = clean_window_title(window_title)
-        return [clean_title, clean_title, clean_title]
+        return {'success': False, 'error': str(e)}
 
 
 def clean_window_title(title: str) -> str:
@@ -1305,10 +1629,24 @@ def clean_window_title(title: str) -> str:
     
     return cleaned[:100]  # 限制长度
 
+
+def normalize_window_title(title: str) -> str:
+    """
+    归一化窗口标题，作为窗口上下文缓存的 key
+
+    在 clean_window_title 的基础上忽略大小写与空白差异，并去掉开头的未读计数
+    （如 "(3) "）和未保存标记（如 "● "），同一应用/文档的标题视为同一上下文。
+    """
+    normalized = title.casefold()
+    normalized = re.sub(r'^\s*[\(\[]\d+\+?[\)\]]\s*', '', normalized)
+    normalized = re.sub(r'^\s*[●•*]\s*', '', normalized)
+    return ' '.join(normalized.split())
+
 # =======================================================
 # 搜索函数
 # =======================================================
 
+@cached_source("search_google", ttl=_SEARCH_CACHE_TTL, stale_ttl=_SEARCH_STALE_TTL)
 async def search_google(query: str, limit: int = 10) -> Dict[str, Any]:
     """
     使用Google搜索关键词并获取搜索结果（用于非中文区域）
@@ -1346,27 +1684,27 @@ async def search_google(query: str, limit: int = 10) -> Dict[str, Any]:
         # 添加随机延迟
         await asyncio.sleep(random.uniform(0.2, 0.5))
         
-        async with httpx.AsyncClient(timeout=5.0, follow_redirects=True) as client:
-            response = await client.get(url, headers=headers)
-            response.raise_for_status()
-            html_content = response.text
-            
-            # 解析搜索结果
-            results = parse_google_results(html_content, limit)
+        client = get_http_client()
+        response = await client.get(url, headers=headers)
+        response.raise_for_status()
+        html_content = response.text
+        
+        # 解析搜索结果
+        results = parse_google_results(html_content, limit)
+        
+        if results:
+            return {
+                'success': True,
+                'query': query,
+                'results': results
+            }
+        else:
+            return {
+                'success': False,
+                'error': '未能解析到搜索结果',
+                'query': query
+            }
             
-            if results:
-                return {
-                    'success': True,
-                    'query': query,
-                    'results': results
-                }
-            else:
-                return {
-                    'success': False,
-                    'error': '未能解析到搜索结果',
-                    'query': query
-                }
-                
     except httpx.TimeoutException:
         logger.exception("Google搜索超时")
         return {
@@ -1381,6 +1719,239 @@ async def search_google(query: str, limit: int = 10) -> Dict[str, Any]:
         }
 
 
+# =======================================================
+# 搜索结果页流式解析
+# =======================================================
+#
+# 以前用 BeautifulSoup 为整页（几百 KB，大量内联脚本）建完整 DOM 树，再对每个结果
+# 做 find/find_all 与 lambda 类名匹配。这里改为基于 html.parser 的单遍事件解析：
+# 维护与 BeautifulSoup(html.parser) 相同的开闭标签栈语义（未闭合标签在父标签闭合时
+# 一并闭合），只为结果容器内需要的元素收集文本，凑够 limit 条结果即停止解析。
+
+_VOID_ELEMENTS = frozenset((
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input',
+    'link', 'meta', 'param', 'source', 'track', 'wbr',
+))
+# BeautifulSoup 的 get_text() 不包含这些标签内的文本
+_NON_TEXT_ELEMENTS = frozenset(('script', 'style', 'template'))
+# 单个文本收集的上限（标题/摘要判断只需要前几百个字符）
+_CAPTURE_MAX_CHARS = 1000
+
+
+class _ParseComplete(Exception):
+    """已取得足够的结果，提前结束解析"""
+
+
+class _TextCapture:
+    """收集某个元素内的文本，等价于 get_text(strip=True)"""
+    __slots__ = ('parts', 'size', 'closed')
+
+    def __init__(self):
+        self.parts: List[str] = []
+        self.size = 0
+        self.closed = False
+
+    def add(self, text: str) -> None:
+        if self.size < _CAPTURE_MAX_CHARS:
+            self.parts.append(text)
+            self.size += len(text)
+
+    @property
+    def text(self) -> str:
+        return ''.join(self.parts)
+
+
+class _SearchResultStreamParser(HTMLParser):
+    """
+    搜索结果页单遍解析的基类
+
+    子类实现 is_container / on_container_element / build_result；
+    结果按容器开始标签的文档顺序输出（与 find_all 一致），最多检查 max_containers 个容器。
+    """
+
+    def __init__(self, limit: int, max_containers: int):
+        super().__init__(convert_charrefs=True)
+        self.limit = limit
+        self.max_containers = max_containers
+        self.results: List[Dict[str, str]] = []
+        # 开放元素栈：[tag, 闭合回调列表或 None]
+        self._stack: List[list] = []
+        self._captures: List[_TextCapture] = []
+        self._non_text_depth = 0
+        # 按开始顺序记录的容器：[state, closed]
+        self._containers: List[list] = []
+        self._open_containers: List[list] = []
+        self._next_emit = 0
+
+    # ---------- 子类接口 ----------
+
+    def is_container(self, tag: str, attrs: Dict[str, Optional[str]]) -> bool:
+        raise NotImplementedError
+
+    def new_state(self) -> Dict[str, Any]:
+        return {}
+
+    def on_container_element(self, state: Dict[str, Any], tag: str, attrs: Dict[str, Optional[str]], node: list) -> None:
+        raise NotImplementedError
+
+    def build_result(self, state: Dict[str, Any]) -> Optional[Dict[str, str]]:
+        raise NotImplementedError
+
+    def on_element(self, tag: str, attrs: Dict[str, Optional[str]], node: list) -> None:
+        """每个开始标签都会调用（容器之外的收集逻辑）"""
+
+    def can_finish_early(self) -> bool:
+        """所有容器都已检查完时，是否还需要继续扫描页面"""
+        return True
+
+    # ---------- 解析入口 ----------
+
+    def parse(self, html_content: str) -> List[Dict[str, str]]:
+        try:
+            self.feed(html_content)
+            self.close()
+            # 文档结束时闭合所有未闭合的元素
+            while self._stack:
+                self._pop()
+        except _ParseComplete:
+            pass
+        return self.results[:self.limit]
+
+    # ---------- 元素栈与文本收集 ----------
+
+    def capture(self, node: list, on_close: Optional[Callable[[_TextCapture], None]] = None) -> _TextCapture:
+        cap = _TextCapture()
+        self._captures.append(cap)
+
+        def _close():
+            cap.closed = True
+            self._captures.remove(cap)
+            if on_close is not None:
+                on_close(cap)
+
+        self._on_close(node, _close)
+        return cap
+
+    @staticmethod
+    def _on_close(node: list, callback: Callable[[], None]) -> None:
+        if node[1] is None:
+            node[1] = []
+        node[1].append(callback)
+
+    def _pop(self) -> None:
+        tag, callbacks = self._stack.pop()
+        if tag in _NON_TEXT_ELEMENTS:
+            self._non_text_depth -= 1
+        if callbacks:
+            for callback in callbacks:
+                callback()
+
+    def handle_starttag(self, tag, attrs):
+        if tag in _VOID_ELEMENTS:
+            return
+        node = [tag, None]
+        self._stack.append(node)
+        if tag in _NON_TEXT_ELEMENTS:
+            self._non_text_depth += 1
+        attr_map = dict(attrs)
+        for container in self._open_containers:
+            self.on_container_element(container[0], tag, attr_map, node)
+        self.on_element(tag, attr_map, node)
+        if len(self._containers) < self.max_containers and self.is_container(tag, attr_map):
+            container = [self.new_state(), False]
+            self._containers.append(container)
+            self._open_containers.append(container)
+            self._on_close(node, functools.partial(self._close_container, container))
+
+    def handle_endtag(self, tag):
+        if tag in _VOID_ELEMENTS:
+            return
+        for i in range(len(self._stack) - 1, -1, -1):
+            if self._stack[i][0] == tag:
+                while len(self._stack) > i:
+                    self._pop()
+                return
+
+    def handle_data(self, data):
+        if self._captures and not self._non_text_depth:
+            text = data.strip()
+            if text:
+                for cap in self._captures:
+                    cap.add(text)
+
+    def _close_container(self, container: list) -> None:
+        container[1] = True
+        self._open_containers.remove(container)
+        while self._next_emit < len(self._containers) and self._containers[self._next_emit][1]:
+            result = self.build_result(self._containers[self._next_emit][0])
+            self._next_emit += 1
+            if result is not None:
+                self.results.append(result)
+                if len(self.results) >= self.limit:
+                    raise _ParseComplete()
+        if (self._next_emit == self.max_containers) and self.can_finish_early():
+            raise _ParseComplete()
+
+
+def _first_long_text(captures: List[_TextCapture], min_len: int) -> str:
+    for cap in captures:
+        if cap.closed and len(cap.text) > min_len:
+            return cap.text
+    return ''
+
+
+class _GoogleResultParser(_SearchResultStreamParser):
+    """Google 结果：div.g 容器内首个 a、首个 h3、VwiC3b 摘要或首个长 span"""
+
+    def is_container(self, tag, attrs):
+        return tag == 'div' and 'g' in (attrs.get('class') or '').split()
+
+    def new_state(self):
+        return {'href': None, 'link': None, 'h3': None, 'snippet': None, 'spans': []}
+
+    def on_container_element(self, state, tag, attrs, node):
+        if tag == 'a':
+            if state['link'] is None:
+                state['href'] = attrs.get('href') or ''
+                state['link'] = self.capture(node)
+        elif tag == 'h3':
+            if state['h3'] is None:
+                state['h3'] = self.capture(node)
+        elif tag == 'div':
+            if state['snippet'] is None and 'VwiC3b' in (attrs.get('class') or ''):
+                state['snippet'] = self.capture(node)
+        elif tag == 'span':
+            # 已找到摘要 div 时不再需要 span 回退
+            if state['snippet'] is None:
+                state['spans'].append(self.capture(node))
+
+    def build_result(self, state):
+        if state['link'] is None:
+            return None
+        title = state['h3'].text if state['h3'] is not None else state['link'].text
+        if not (title and 3 < len(title) < 200):
+            return None
+        href = state['href']
+        if href:
+            # Google有时会包装URL
+            if href.startswith('/url?'):
+                url = parse_qs(urlparse(href).query).get('q', [href])[0]
+            elif href.startswith('http'):
+                url = href
+            else:
+                url = urljoin('https://www.google.com', href)
+        else:
+            url = ''
+        if state['snippet'] is not None:
+            abstract = state['snippet'].text[:200]
+        else:
+            abstract = _first_long_text(state['spans'], 50)[:200]
+        # 跳过广告和不需要的结果
+        if any(skip in title.lower() for skip in ['ad', 'sponsored', 'javascript']):
+            return None
+        return {'title': title, 'abstract': abstract, 'url': url}
+
+
 def parse_google_results(html_content: str, limit: int = 5) -> List[Dict[str, str]]:
     """
     解析Google搜索结果页面
@@ -1392,76 +1963,17 @@ def parse_google_results(html_content: str, limit: int = 5) -> List[Dict[str, st
     Returns:
         搜索结果列表，每个结果包含 title, abstract, url
     """
-    results = []
-    
     try:
-        from urllib.parse import urljoin, urlparse, parse_qs
-        soup = BeautifulSoup(html_content, 'html.parser')
-        
-        # 查找搜索结果容器
-        # Google使用各种类名，尝试多个选择器
-        result_divs = soup.find_all('div', class_='g')
-        
-        for div in result_divs[:limit * 2]:
-            # 提取标题和链接
-            link = div.find('a')
-            if link:
-                # 获取h3标签作为标题
-                h3 = div.find('h3')
-                if h3:
-                    title = h3.get_text(strip=True)
-                else:
-                    title = link.get_text(strip=True)
-                
-                if title and 3 < len(title) < 200:
-                    # 提取URL
-                    href = link.get('href', '')
-                    if href:
-                        # Google有时会包装URL
-                        if href.startswith('/url?'):
-                            parsed = urlparse(href)
-                            qs = parse_qs(parsed.query)
-                            url = qs.get('q', [href])[0]
-                        elif href.startswith('http'):
-                            url = href
-                        else:
-                            url = urljoin('https://www.google.com', href)
-                    else:
-                        url = ''
-                    
-                    # 提取摘要/片段
-                    abstract = ""
-                    # 查找片段文本
-                    snippet_div = div.find('div', class_=lambda x: x and ('VwiC3b' in x if x else False))
-                    if snippet_div:
-                        abstract = snippet_div.get_text(strip=True)[:200]
-                    else:
-                        # 尝试其他常见的片段选择器
-                        spans = div.find_all('span')
-                        for span in spans:
-                            text = span.get_text(strip=True)
-                            if len(text) > 50:
-                                abstract = text[:200]
-                                break
-                    
-                    # 跳过广告和不需要的结果
-                    if not any(skip in title.lower() for skip in ['ad', 'sponsored', 'javascript']):
-                        results.append({
-                            'title': title,
-                            'abstract': abstract,
-                            'url': url
-                        })
-                        if len(results) >= limit:
-                            break
-        
+        results = _GoogleResultParser(limit, max_containers=limit * 2).parse(html_content)
         logger.info(f"解析到 {len(results)} 条Google搜索结果")
-        return results[:limit]
+        return results
         
     except Exception as e:
         logger.exception(f"解析Google搜索结果失败: {e}")
         return []
 
 
+@cached_source("search_baidu", ttl=_SEARCH_CACHE_TTL, stale_ttl=_SEARCH_STALE_TTL)
 async def search_baidu(query: str, limit: int = 5) -> Dict[str, Any]:
     """
     使用百度搜索关键词并获取搜索结果
@@ -1500,27 +2012,27 @@ async def search_baidu(query: str, limit: int = 5) -> Dict[str, Any]:
         # 添加随机延迟
         await asyncio.sleep(random.uniform(0.2, 0.5))
         
-        async with httpx.AsyncClient(timeout=5.0, follow_redirects=True) as client:
-            response = await client.get(url, headers=headers)
-            response.raise_for_status()
-            html_content = response.text
-            
-            # 解析搜索结果
-            results = parse_baidu_results(html_content, limit)
+        client = get_http_client()
+        response = await client.get(url, headers=headers)
+        response.raise_for_status()
+        html_content = response.text
+        
+        # 解析搜索结果
+        results = parse_baidu_results(html_content, limit)
+        
+        if results:
+            return {
+                'success': True,
+                'query': query,
+                'results': results
+            }
+        else:
+            return {
+                'success': False,
+                'error': '未能解析到搜索结果',
+                'query': query
+            }
             
-            if results:
-                return {
-                    'success': True,
-                    'query': query,
-                    'results': results
-                }
-            else:
-                return {
-                    'success': False,
-                    'error': '未能解析到搜索结果',
-                    'query': query
-                }
-                
     except httpx.TimeoutException:
         logger.exception("百度搜索超时")
         return {
@@ -1535,6 +2047,82 @@ async def search_baidu(query: str, limit: int = 5) -> Dict[str, Any]:
         }
 
 
+def _baidu_absolute_url(href: str) -> str:
+    """把百度结果链接转为绝对 URL"""
+    if not href:
+        return ''
+    if href.startswith('/'):
+        return urljoin('https://www.baidu.com', href)
+    if not href.startswith('http'):
+        return urljoin('https://www.baidu.com/', href)
+    return href
+
+
+class _BaiduResultParser(_SearchResultStreamParser):
+    """百度结果：c-container 容器内首个 a 与 content-right 摘要；无结果时回退到前 limit 个 h3"""
+
+    def __init__(self, limit: int, max_containers: int):
+        super().__init__(limit, max_containers)
+        # 回退用：文档中前 limit 个 h3 及其中首个 a
+        self._h3s: List[Dict[str, Any]] = []
+        self._open_h3s: List[Dict[str, Any]] = []
+
+    def is_container(self, tag, attrs):
+        return tag == 'div' and 'c-container' in (attrs.get('class') or '')
+
+    def new_state(self):
+        return {'href': None, 'link': None, 'abstract': None}
+
+    def on_container_element(self, state, tag, attrs, node):
+        if tag == 'a':
+            if state['link'] is None:
+                state['href'] = attrs.get('href') or ''
+                state['link'] = self.capture(node)
+        elif tag == 'span':
+            if state['abstract'] is None and 'content-right' in (attrs.get('class') or ''):
+                state['abstract'] = self.capture(node)
+
+    def on_element(self, tag, attrs, node):
+        if tag == 'a':
+            for h3 in self._open_h3s:
+                if h3['link'] is None:
+                    h3['href'] = attrs.get('href') or ''
+                    h3['link'] = self.capture(node)
+        elif tag == 'h3' and len(self._h3s) < self.limit:
+            h3 = {'href': None, 'link': None}
+            self._h3s.append(h3)
+            self._open_h3s.append(h3)
+            self._on_close(node, functools.partial(self._close_h3, h3))
+
+    def _close_h3(self, h3: Dict[str, Any]) -> None:
+        # 按身份移除：尚未找到链接的 h3 状态彼此相等，list.remove 会删错（嵌套 h3 时）
+        self._open_h3s[:] = [x for x in self._open_h3s if x is not h3]
+
+    def build_result(self, state):
+        if state['link'] is None:
+            return None
+        title = state['link'].text
+        if not (title and 5 < len(title) < 200):
+            return None
+        abstract = state['abstract'].text[:200] if state['abstract'] is not None else ''
+        if any(skip in title.lower() for skip in ['百度', '广告', 'javascript']):
+            return None
+        return {'title': title, 'abstract': abstract, 'url': _baidu_absolute_url(state['href'])}
+
+    def can_finish_early(self):
+        return bool(self.results) or (len(self._h3s) >= self.limit and not self._open_h3s)
+
+    def fallback_results(self) -> List[Dict[str, str]]:
+        results = []
+        for h3 in self._h3s:
+            if h3['link'] is None:
+                continue
+            title = h3['link'].text
+            if title and 5 < len(title) < 200:
+                results.append({'title': title, 'abstract': '', 'url': _baidu_absolute_url(h3['href'])})
+        return results
+
+
 def parse_baidu_results(html_content: str, limit: int = 5) -> List[Dict[str, str]]:
     """
     解析百度搜索结果页面
@@ -1546,77 +2134,16 @@ def parse_baidu_results(html_content: str, limit: int = 5) -> List[Dict[str, str
     Returns:
         搜索结果列表，每个结果包含 title, abstract, url
     """
-    results = []
-    
     try:
-        from urllib.parse import urljoin
-        soup = BeautifulSoup(html_content, 'html.parser')
-        
-        # 提取搜索结果容器
-        containers = soup.find_all('div', class_=lambda x: x and 'c-container' in x, limit=limit * 2)
-        
-        for container in containers:
-            # 提取标题和链接
-            link = container.find('a')
-            if link:
-                title = link.get_text(strip=True)
-                if title and 5 < len(title) < 200:
-                    # 提取 URL（处理相对和绝对 URL）
-                    href = link.get('href', '')
-                    if href:
-                        # 如果是相对 URL，转换为绝对 URL
-                        if href.startswith('/'):
-                            url = urljoin('https://www.baidu.com', href)
-                        elif not href.startswith('http'):
-                            url = urljoin('https://www.baidu.com/', href)
-                        else:
-                            url = href
-                    else:
-                        url = ''
-                    
-                    # 提取摘要
-                    abstract = ""
-                    content_span = container.find('span', class_=lambda x: x and 'content-right' in x)
-                    if content_span:
-                        abstract = content_span.get_text(strip=True)[:200]
-                    
-                    if not any(skip in title.lower() for skip in ['百度', '广告', 'javascript']):
-                        results.append({
-                            'title': title,
-                            'abstract': abstract,
-                            'url': url
-                        })
-                        if len(results) >= limit:
-                            break
-        
-        # 如果没找到结果，尝试提取 h3 标题
+        parser = _BaiduResultParser(limit, max_containers=limit * 2)
+        results = parser.parse(html_content)
+        
+        # 如果没找到结果，使用页面中的 h3 标题
         if not results:
-            h3_links = soup.find_all('h3')
-            for h3 in h3_links[:limit]:
-                link = h3.find('a')
-                if link:
-                    title = link.get_text(strip=True)
-                    if title and 5 < len(title) < 200:
-                        # 提取 URL
-                        href = link.get('href', '')
-                        if href:
-                            if href.startswith('/'):
-                                url = urljoin('https://www.baidu.com', href)
-                            elif not href.startswith('http'):
-                                url = urljoin('https://www.baidu.com/', href)
-                            else:
-                                url = href
-                        else:
-                            url = ''
-                        
-                        results.append({
-                            'title': title,
-                            'abstract': '',
-                            'url': url
-                        })
+            results = parser.fallback_results()[:limit]
         
         logger.info(f"解析到 {len(results)} 条百度搜索结果")
-        return results[:limit]
+        return results
         
     except Exception as e:
         logger.exception(f"解析百度搜索结果失败: {e}")
@@ -1708,6 +2235,98 @@ def format_search_results(search_result: Dict[str, Any]) -> str:
     return "\n".join(output_lines)
 
 
+async def _search_window_context(cleaned_title: str, sanitized_title: str,
+                                  china_region: bool, limit: int) -> Dict[str, Any]:
+    """
+    为已清理的窗口标题生成查询词并执行搜索，合并去重结果
+    """
+    # 使用清理后的标题生成多样化搜索查询（保护隐私）
+    search_queries = await generate_diverse_queries(cleaned_title)
+    
+    if not search_queries or all(not q or len(q) < 2 for q in search_queries):
+        if china_region:
+            return {
+                'success': False,
+                'error': '窗口标题无法提取有效的搜索关键词',
+                'window_title': sanitized_title
+            }
+        else:
+            return {
+                'success': False,
+                'error': '窗口标题无法提取有效的搜索关键词',
+                'window_title': sanitized_title
+            }
+    
+    # 日志中使用脱敏后的标题
+    if china_region:
+        logger.info(f"从窗口标题「{sanitized_title}」生成多样化查询: {search_queries}")
+    else:
+        logger.info(f"从窗口标题「{sanitized_title}」生成多样化查询: {search_queries}")
+    
+    # 执行搜索并合并结果
+    all_results = []
+    successful_queries = []
+    
+    # 根据区域选择搜索函数
+    search_func = search_baidu if china_region else search_google
+    
+    for query in search_queries:
+        if not query or len(query) < 2:
+            continue
+        
+        if china_region:
+            logger.info(f"使用查询关键词: {query}")
+        else:
+            logger.info(f"使用查询关键词: {query}")
+        
+        search_result = await search_func(query, limit)
+        
+        if search_result.get('success') and search_result.get('results'):
+            all_results.extend(search_result['results'])
+            successful_queries.append(query)
+    
+    # 去重结果（优先使用URL，如果URL缺失则使用title）
+    seen_keys = set()
+    unique_results = []
+    for result in all_results:
+        url = result.get('url', '')
+        title = result.get('title', '')
+        
+        # 优先使用URL进行去重，回退到title
+        dedup_key = url if url else title
+        
+        if dedup_key and dedup_key not in seen_keys:
+            seen_keys.add(dedup_key)
+            unique_results.append(result)
+    
+    # 限制总结果数量
+    unique_results = unique_results[:limit * 2]
+    
+    if not unique_results:
+        if china_region:
+            return {
+                'success': False,
+                'error': '所有查询均未获得搜索结果',
+                'window_title': sanitized_title,
+                'search_queries': search_queries
+            }
+        else:
+            return {
+                'success': False,
+                'error': '所有查询均未获得搜索结果',
+                'window_title': sanitized_title,
+                'search_queries': search_queries
+            }
+    
+    return {
+        'success': True,
+        'window_title': sanitized_title,
+        'search_queries': successful_queries,
+        'search_results': unique_results,
+        'region': 'china' if china_region else 'non-china'
+    }
+
+
 async def fetch_window_context_content(limit: int = 5) -> Dict[str, Any]:
     """
     获取当前活跃窗口标题并进行搜索
@@ -1748,91 +2367,17 @@ async def fetch_window_context_content(limit: int = 5) -> Dict[str, Any]:
         # 清理窗口标题以移除敏感信息，避免发送给LLM
         cleaned_title = clean_window_title(raw_title)
         
-        # 使用清理后的标题生成多样化搜索查询（保护隐私）
-        search_queries = await generate_diverse_queries(cleaned_title)
-        
-        if not search_queries or all(not q or len(q) < 2 for q in search_queries):
-            if china_region:
-                return {
-                    'success': False,
-                    'error': '窗口标题无法提取有效的搜索关键词',
-                    'window_title': sanitized_title
-                }
-            else:
-                return {
-                    'success': False,
-                    'error': '窗口标题无法提取有效的搜索关键词',
-                    'window_title': sanitized_title
-                }
-        
-        # 日志中使用脱敏后的标题
-        if china_region:
-            logger.info(f"从窗口标题「{sanitized_title}」生成多样化查询: {search_queries}")
-        else:
-            logger.info(f"从窗口标题「{sanitized_title}」生成多样化查询: {search_queries}")
-        
-        # 执行搜索并合并结果
-        all_results = []
-        successful_queries = []
-        
-        # 根据区域选择搜索函数
-        search_func = search_baidu if china_region else search_google
-        
-        for query in search_queries:
-            if not query or len(query) < 2:
-                continue
-            
-            if china_region:
-                logger.info(f"使用查询关键词: {query}")
-            else:
-                logger.info(f"使用查询关键词: {query}")
-            
-            search_result = await search_func(query, limit)
-            
-            if search_result.get('success') and search_result.get('results'):
-                all_results.extend(search_result['results'])
-                successful_queries.append(query)
-        
-        # 去重结果（优先使用URL，如果URL缺失则使用title）
-        seen_keys = set()
-        unique_results = []
-        for result in all_results:
-            url = result.get('url', '')
-            title = result.get('title', '')
-            
-            # 优先使用URL进行去重，回退到title
-            dedup_key = url if url else title
-            
-            if dedup_key and dedup_key not in seen_keys:
-                seen_keys.add(dedup_key)
-                unique_results.append(result)
-        
-        # 限制总结果数量
-        unique_results = unique_results[:limit * 2]
-        
-        if not unique_results:
-            if china_region:
-                return {
-                    'success': False,
-                    'error': '所有查询均未获得搜索结果',
-                    'window_title': sanitized_title,
-                    'search_queries': search_queries
-                }
-            else:
-                return {
-                    'success': False,
-                    'error': '所有查询均未获得搜索结果',
-                    'window_title': sanitized_title,
-                    'search_queries': search_queries
-                }
-        
-        return {
-            'success': True,
-            'window_title': sanitized_title,
-            'search_queries': successful_queries,
-            'search_results': unique_results,
-            'region': 'china' if china_region else 'non-china'
-        }
+        # 按归一化标题缓存整个窗口上下文：停留在同一应用/文档时不再重复调用LLM和搜索
+        key = ('window_context', normalize_window_title(cleaned_title), china_region, limit)
+        result = await _source_cache.get_or_fetch(
+            key,
+            lambda: _search_window_context(cleaned_title, sanitized_title, china_region, limit),
+            ttl=_WINDOW_CONTEXT_CACHE_TTL,
+            stale_ttl=_WINDOW_CONTEXT_STALE_TTL,
+        )
+        # 归一化后相同的标题仍可能有细微差别（如未读计数），返回当前窗口的脱敏标题
+        result['window_title'] = sanitized_title
+        return result
         
     except Exception as e:
         if is_china_region():
@@ -1972,91 +2517,91 @@ async def search_and_play_song(song_name: str) -> Dict[str, Any]:
             search_url = f"https://search.bilibili.com/all?keyword={encoded_song_name}&order=click&duration=0&tids_1=0"
             logger.info(f"B站搜索歌曲: {song_name}, URL: {search_url}")
             
-            async with httpx.AsyncClient(timeout=10.0, follow_redirects=True) as client:
-                response = await client.get(search_url, headers=headers)
-                response.raise_for_status()
-                
-                # 解析搜索结果，提取第一个视频的播放URL
-                soup = BeautifulSoup(response.text, 'html.parser')
-                # 查找第一个视频链接（B站搜索结果的视频项）
-                video_item = soup.find('a', class_='video-item__title') or soup.find('a', attrs={'href': re.compile(r'/video/')})
-                
-                if not video_item:
-                    logger.warning(f"B站未找到歌曲相关视频: {song_name}")
-                    return {
-                        'success': False,
-                        'error': f'B站未找到"{song_name}"相关视频',
-                        'platform': platform,
-                        'region': region
-                    }
-                
-                # 提取视频链接并构造嵌入式播放URL
-                video_href = video_item.get('href', '')
-                if not video_href.startswith('http'):
-                    video_href = f"https:{video_href}" if video_href.startswith('//') else f"https://www.bilibili.com{video_href}"
-                
-                # B站嵌入式播放URL（支持iframe嵌入）
-                # 提取BV号用于构造embed URL
-                bv_match = re.search(r'(BV\w+)', video_href)
-                if bv_match:
-                    embed_url = f"https://player.bilibili.com/player.html?bvid={bv_match.group(1)}&page=1"
-                else:
-                    embed_url = video_href
-                
-                logger.info(f"成功找到B站歌曲播放链接: {embed_url}")
+            client = get_http_client()
+            response = await client.get(search_url, headers=headers, timeout=10.0)
+            response.raise_for_status()
+            
+            # 解析搜索结果，提取第一个视频的播放URL
+            soup = BeautifulSoup(response.text, 'html.parser')
+            # 查找第一个视频链接（B站搜索结果的视频项）
+            video_item = soup.find('a', class_='video-item__title') or soup.find('a', attrs={'href': re.compile(r'/video/')})
+            
+            if not video_item:
+                logger.warning(f"B站未找到歌曲相关视频: {song_name}")
                 return {
-                    'success': True,
-                    'url': embed_url,
+                    'success': False,
+                    'error': f'B站未找到"{song_name}"相关视频',
                     'platform': platform,
                     'region': region
                 }
+            
+            # 提取视频链接并构造嵌入式播放URL
+            video_href = video_item.get('href', '')
+            if not video_href.startswith('http'):
+                video_href = f"https:{video_href}" if video_href.startswith('//') else f"https://www.bilibili.com{video_href}"
+            
+            # B站嵌入式播放URL（支持iframe嵌入）
+            # 提取BV号用于构造embed URL
+            bv_match = re.search(r'(BV\w+)', video_href)
+            if bv_match:
+                embed_url = f"https://player.bilibili.com/player.html?bvid={bv_match.group(1)}&page=1"
+            else:
+                embed_url = video_href
+            
+            logger.info(f"成功找到B站歌曲播放链接: {embed_url}")
+            return {
+                'success': True,
+                'url': embed_url,
+                'platform': platform,
+                'region': region
+            }
         
         else:
             # 非中文区域：YouTube搜索歌曲
             search_url = f"https://www.youtube.com/results?search_query={encoded_song_name}"
             logger.info(f"YouTube搜索歌曲: {song_name}, URL: {search_url}")
             
-            async with httpx.AsyncClient(timeout=10.0, follow_redirects=True) as client:
-                response = await client.get(search_url, headers=headers)
-                response.raise_for_status()
-                
-                # 解析YouTube搜索结果，提取第一个视频的ID
-                soup = BeautifulSoup(response.text, 'html.parser')
-                # YouTube搜索结果的视频项匹配（适配不同页面结构）
-                video_script = soup.find('script', string=re.compile(r'"videoId":"[\w-]+"'))
-                video_id = None
-                
-                if video_script:
-                    # 从JSON数据中提取第一个视频ID
-                    vid_match = re.search(r'"videoId":"([\w-]+)"', video_script.string)
+            client = get_http_client()
+            response = await client.get(search_url, headers=headers, timeout=10.0)
+            response.raise_for_status()
+            
+            # 解析YouTube搜索结果，提取第一个视频的ID
+            soup = BeautifulSoup(response.text, 'html.parser')
+            # YouTube搜索结果的视频项匹配（适配不同页面结构）
+            video_script = soup.find('script', string=re.compile(r'"videoId":"[\w-]+"'))
+            video_id = None
+            
+            if video_script:
+                # 从JSON数据中提取第一个视频ID
+                vid_match = re.search(r'"videoId":"([\w-]+)"', video_script.string)
+                if vid_match:
+                    video_id = vid_match.group(1)
+            else:
+                # 备用解析方式：查找视频链接的a标签
+                video_link = soup.find('a', attrs={'href': re.compile(r'/watch\?v=')})
+                if video_link:
+                    vid_match = re.search(r'v=([\w-]+)', video_link.get('href', ''))
                     if vid_match:
                         video_id = vid_match.group(1)
-                else:
-                    # 备用解析方式：查找视频链接的a标签
-                    video_link = soup.find('a', attrs={'href': re.compile(r'/watch\?v=')})
-                    if video_link:
-                        vid_match = re.search(r'v=([\w-]+)', video_link.get('href', ''))
-                        if vid_match:
-                            video_id = vid_match.group(1)
-                
-                if not video_id:
-                    logger.warning(f"YouTube未找到歌曲相关视频: {song_name}")
-                    return {
-                        'success': False,
-                        'error': f'YouTube未找到"{song_name}"相关视频',
-                        'platform': platform,
-                        'region': region
-                    }
-                
-                # YouTube嵌入式播放URL
-                embed_url = f"https://www.youtube.com/embed/{video_id}"
-                logger.info(f"成功找到YouTube歌曲播放链接: {embed_url}")
+            
+            if not video_id:
+                logger.warning(f"YouTube未找到歌曲相关视频: {song_name}")
                 return {
-                    'success': True,
-                    'url': embed_url,
+                    'success': False,
+                    'error': f'YouTube未找到"{song_name}"相关视频',
                     'platform': platform,
                     'region': region
                 }
+            
+            # YouTube嵌入式播放URL
+            embed_url = f"https://www.youtube.com/embed/{video_id}"
+            logger.info(f"成功找到YouTube歌曲播放链接: {embed_url}")
+            return {
+                'success': True,
+                'url': embed_url,
+                'platform': platform,
+                'region': region
+            }
     
     except httpx.TimeoutException:
         logger.error(f"{platform}搜索歌曲超时: {song_name}")
@@ -2134,6 +2679,7 @@ def _get_platform_cookies(platform_name: str) -> dict[str, str]:
 
 # 获取个人关注动态内容
 
+@cached_source("bilibili_personal", ttl=_PERSONAL_CACHE_TTL, stale_ttl=_PERSONAL_STALE_TTL, account="bilibili")
 async def fetch_bilibili_personal_dynamic(limit: int = 10) -> Dict[str, Any]:
     """
     获取B站推送的动态消息
@@ -2149,10 +2695,12 @@ async def fetch_bilibili_personal_dynamic(limit: int = 10) -> Dict[str, Any]:
         headers = {"User-Agent": get_random_user_agent(), "Referer": "https://t.bilibili.com/"}
         await asyncio.sleep(random.uniform(0.1, 0.5))
         
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url, headers=headers, cookies=credential.get_cookies(), timeout=10.0)
-            response.raise_for_status()
-            data = response.json()
+        status_code, data = await _conditional_cache.get_json(
+            url, {**headers, **_cookie_header(credential.get_cookies())}, timeout=10.0
+        )
+        if status_code != 200:
+            logger.error(f"获取B站动态失败，状态码: {status_code}")
+            return {'success': False, 'error': f"API请求失败，状态码: {status_code}"}
 
         if not isinstance(data, dict) or data.get("code") != 0:
             logger.error(f"获取B站动态失败，API返回: {data}")
@@ -2286,6 +2834,7 @@ async def fetch_kuaishou_personal_dynamic(limit: int = 10) -> Dict[str, Any]:
     """获取快手个人关注动态 (GraphQL 接口 + 严格 Cookie)"""
     pass
 
+@cached_source("weibo_personal", ttl=_PERSONAL_CACHE_TTL, stale_ttl=_PERSONAL_STALE_TTL, account="weibo")
 async def fetch_weibo_personal_dynamic(limit: int = 10) -> Dict[str, Any]:
     """
     获取微博动态
@@ -2330,81 +2879,81 @@ async def fetch_weibo_personal_dynamic(limit: int = 10) -> Dict[str, Any]:
         
         await asyncio.sleep(random.uniform(0.1, 0.5))
 
-        # 4. 移动端 API 非常宽容，直接用普通的 httpx 即可稳定发包
-        async with httpx.AsyncClient(timeout=10.0, follow_redirects=True) as client:
-            response = await client.get(url, headers=headers, cookies=req_cookies)
-            
-            if response.status_code != 200:
-                logger.error(f"❌ 移动端微博接口异常，状态码: {response.status_code}")
-                return {'success': False, 'error': f"API请求失败，状态码: {response.status_code}"}
+        # 4. 移动端 API 非常宽容，直接用普通的 httpx 即可稳定发包（关注流未变化时服务端返回 304）
+        status_code, data = await _conditional_cache.get_json(
+            url, {**headers, **_cookie_header(req_cookies)}, timeout=10.0
+        )
+        
+        if status_code != 200:
+            logger.error(f"❌ 移动端微博接口异常，状态码: {status_code}")
+            return {'success': False, 'error': f"API请求失败，状态码: {status_code}"}
+        
+        # 移动端如果未登录，通常会返回 ok: 0 或者重定向
+        if data.get('ok') != 1:
+            logger.error("❌ 微博拦截：返回 ok=0，说明你的 SUB 凭证已过期！")
+            return {'success': False, 'error': "微博凭证已过期，请去浏览器重新获取"}
+        
+        cards = data.get('data', {}).get('cards', [])
+        weibo_list = []
+        
+        for card in cards:
+            # card_type == 9 代表这是一条正常的微博博文卡片
+            if card.get('card_type') != 9:
+                continue
+                
+            mblog = card.get('mblog')
+            if not mblog:
+                continue
                 
-            data = response.json()
+            user = mblog.get('user', {})
+            author = user.get('screen_name') or '未知博主'
             
-            # 移动端如果未登录，通常会返回 ok: 0 或者重定向
-            if data.get('ok') != 1:
-                logger.error("❌ 微博拦截：返回 ok=0，说明你的 SUB 凭证已过期！")
-                return {'success': False, 'error': "微博凭证已过期，请去浏览器重新获取"}
+            # 提取正文并清理 HTML 标签
+            text = str(mblog.get('text') or '')
+            clean_text = re.sub(r'\s+', ' ', re.sub(r'<[^>]+>', '', text)).strip()
             
-            cards = data.get('data', {}).get('cards', [])
-            weibo_list = []
+            # 兼容并缝合转发内容
+            if mblog.get('retweeted_status'):
+                retweet = mblog['retweeted_status']
+                rt_author = retweet.get('user', {}).get('screen_name') or '原博主'
+                rt_text = str(retweet.get('text') or '')
+                rt_clean_text = re.sub(r'\s+', ' ', re.sub(r'<[^>]+>', '', rt_text)).strip()
+                clean_text = f"{clean_text} // [转发动态] @{rt_author}: {rt_clean_text}"
+            
+            display_text = clean_text if clean_text else "[分享了图片/动态]"
+            final_content = f"博主【{author}】: {display_text}"
+            mid = mblog.get('mid') or mblog.get('id', '')
+            
+            weibo_list.append({
+                'author': author,
+                'content': final_content,
+                'timestamp': mblog.get('created_at') or '',
+                'url': f"https://m.weibo.cn/detail/{mid}" # 使用移动端 URL
+            })
+            
+            if len(weibo_list) >= limit:
+                break
+
+        if weibo_list: 
+            logger.info(f"✅ 成功通过移动端接口获取到 {len(weibo_list)} 条微博个人动态")
+            logger.info("微博动态:")  # 统一对齐 B站 的提示词
+            for i, weibo in enumerate(weibo_list, 1):
+                content = weibo.get('content', '')
+                # 稍微放宽一点截断长度，保证显示效果更好
+                if len(content) > 50:
+                    content = content[:50] + "..."
+                # 去掉冗余的时间和作者，直接干干净净地打印 content
+                logger.info(f"  - {content}")
+            
+            return {'success': True, 'statuses': weibo_list}
+        else:
+            return {'success': False, 'error': '未解析到微博内容'}
             
-            for card in cards:
-                # card_type == 9 代表这是一条正常的微博博文卡片
-                if card.get('card_type') != 9:
-                    continue
-                    
-                mblog = card.get('mblog')
-                if not mblog:
-                    continue
-                    
-                user = mblog.get('user', {})
-                author = user.get('screen_name') or '未知博主'
-                
-                # 提取正文并清理 HTML 标签
-                text = str(mblog.get('text') or '')
-                clean_text = re.sub(r'\s+', ' ', re.sub(r'<[^>]+>', '', text)).strip()
-                
-                # 兼容并缝合转发内容
-                if mblog.get('retweeted_status'):
-                    retweet = mblog['retweeted_status']
-                    rt_author = retweet.get('user', {}).get('screen_name') or '原博主'
-                    rt_text = str(retweet.get('text') or '')
-                    rt_clean_text = re.sub(r'\s+', ' ', re.sub(r'<[^>]+>', '', rt_text)).strip()
-                    clean_text = f"{clean_text} // [转发动态] @{rt_author}: {rt_clean_text}"
-                
-                display_text = clean_text if clean_text else "[分享了图片/动态]"
-                final_content = f"博主【{author}】: {display_text}"
-                mid = mblog.get('mid') or mblog.get('id', '')
-                
-                weibo_list.append({
-                    'author': author,
-                    'content': final_content,
-                    'timestamp': mblog.get('created_at') or '',
-                    'url': f"https://m.weibo.cn/detail/{mid}" # 使用移动端 URL
-                })
-                
-                if len(weibo_list) >= limit:
-                    break
-
-            if weibo_list: 
-                logger.info(f"✅ 成功通过移动端接口获取到 {len(weibo_list)} 条微博个人动态")
-                logger.info("微博动态:")  # 统一对齐 B站 的提示词
-                for i, weibo in enumerate(weibo_list, 1):
-                    content = weibo.get('content', '')
-                    # 稍微放宽一点截断长度，保证显示效果更好
-                    if len(content) > 50:
-                        content = content[:50] + "..."
-                    # 去掉冗余的时间和作者，直接干干净净地打印 content
-                    logger.info(f"  - {content}")
-                
-                return {'success': True, 'statuses': weibo_list}
-            else:
-                return {'success': False, 'error': '未解析到微博内容'}
-                
     except Exception as e: 
         logger.error(f"微博动态解析发生错误: {e}")
         return {'success': False, 'error': str(e)}
 
+@cached_source("reddit_personal", ttl=_PERSONAL_CACHE_TTL, stale_ttl=_PERSONAL_STALE_TTL, account="reddit")
 async def fetch_reddit_personal_dynamic(limit: int = 10) -> Dict[str, Any]:
     """
     获取Reddit推送的动态帖子
@@ -2417,21 +2966,23 @@ async def fetch_reddit_personal_dynamic(limit: int = 10) -> Dict[str, Any]:
         headers = {'User-Agent': get_random_user_agent(), 'Accept': 'application/json'}
         await asyncio.sleep(random.uniform(0.1, 0.5))
 
-        async with httpx.AsyncClient(timeout=10.0, follow_redirects=True) as client:
-            response = await client.get(url, headers=headers, cookies=reddit_cookies)
-            data = response.json()
-            posts = [
-                {
-                    'title': pd.get('title', ''), 'subreddit': f"r/{pd.get('subreddit', '')}",
-                    'score': _format_score(pd.get('score', 0)), 
-                    'url': f"https://www.reddit.com{pd.get('permalink', '')}"
-                }
-                for item in data.get('data', {}).get('children', [])[:limit]
-                if not (pd := item.get('data', {})).get('over_18')
-            ]
-            if posts:
-                logger.info(f"✅ 成功获取到 {len(posts)} 条Reddit订阅帖子")
-            return {'success': True, 'posts': posts}
+        status_code, data = await _conditional_cache.get_json(
+            url, {**headers, **_cookie_header(reddit_cookies)}, timeout=10.0
+        )
+        if status_code != 200:
+            return {'success': False, 'error': f"API请求失败，状态码: {status_code}"}
+        posts = [
+            {
+                'title': pd.get('title', ''), 'subreddit': f"r/{pd.get('subreddit', '')}",
+                'score': _format_score(pd.get('score', 0)), 
+                'url': f"https://www.reddit.com{pd.get('permalink', '')}"
+            }
+            for item in data.get('data', {}).get('children', [])[:limit]
+            if not (pd := item.get('data', {})).get('over_18')
+        ]
+        if posts:
+            logger.info(f"✅ 成功获取到 {len(posts)} 条Reddit订阅帖子")
+        return {'success': True, 'posts': posts}
     except Exception as e: 
         return {'success': False, 'error': str(e)}
 
@@ -2443,30 +2994,31 @@ async def _fetch_twitter_personal_web_scraping(limit: int = 10, cookies: Optiona
     try:
         url = "https://twitter.com/home"
         headers = {'User-Agent': get_random_user_agent()}
-        async with httpx.AsyncClient(timeout=10.0, follow_redirects=True) as client:
-            res = await client.get(url, headers=headers, cookies=cookies)
+        client = get_http_client()
+        res = await client.get(url, headers={**headers, **_cookie_header(cookies)}, timeout=10.0)
+        
+        # 如果被重定向到了登录页，说明 Cookie 彻底失效了
+        if "login" in str(res.url) or "logout" in str(res.url):
+            return {'success': False, 'error': 'Twitter Cookie 已过期，网页端拒绝访问'}
             
-            # 如果被重定向到了登录页，说明 Cookie 彻底失效了
-            if "login" in str(res.url) or "logout" in str(res.url):
-                return {'success': False, 'error': 'Twitter Cookie 已过期，网页端拒绝访问'}
-                
-            tweets = []
-            tweet_texts = re.findall(r'"tweet":\{[^}]*"full_text":"([^"]+)"', res.text)
-            screen_names = re.findall(r'"screen_name":"([^"]+)"', res.text)
+        tweets = []
+        tweet_texts = re.findall(r'"tweet":\{[^}]*"full_text":"([^"]+)"', res.text)
+        screen_names = re.findall(r'"screen_name":"([^"]+)"', res.text)
+        
+        for i, text in enumerate(tweet_texts[:limit]):
+            clean_text = re.sub(r'https://t\.co/\w+', '', text).strip()
+            tweets.append({
+                'author': f"@{screen_names[i] if i<len(screen_names) else 'Unknown'}", 
+                'content': clean_text,
+                'timestamp': '刚刚'  # 保持与主 API 数据字典格式的统一
+            })
             
-            for i, text in enumerate(tweet_texts[:limit]):
-                clean_text = re.sub(r'https://t\.co/\w+', '', text).strip()
-                tweets.append({
-                    'author': f"@{screen_names[i] if i<len(screen_names) else 'Unknown'}", 
-                    'content': clean_text,
-                    'timestamp': '刚刚'  # 保持与主 API 数据字典格式的统一
-                })
-                
-            return {'success': True, 'tweets': tweets} if tweets else {'success': False, 'error': '网页正则抓取失败，页面结构可能已变更'}
+        return {'success': True, 'tweets': tweets} if tweets else {'success': False, 'error': '网页正则抓取失败，页面结构可能已变更'}
     except Exception as e: 
         logger.error(f"Twitter 网页抓取 fallback 失败: {e}")
         return {'success': False, 'error': str(e)}
 
+@cached_source("twitter_personal", ttl=_PERSONAL_CACHE_TTL, stale_ttl=_PERSONAL_STALE_TTL, account="twitter")
 async def fetch_twitter_personal_dynamic(limit: int = 10) -> Dict[str, Any]:
     """
     获取 Twitter 个人时间线
@@ -2504,84 +3056,113 @@ async def fetch_twitter_personal_dynamic(limit: int = 10) -> Dict[str, Any]:
         
         await asyncio.sleep(random.uniform(0.1, 0.5))
 
-        async with httpx.AsyncClient(timeout=10.0, follow_redirects=True) as client:
-            response = await client.get(url, headers=headers, cookies=twitter_cookies)
+        status_code, data = await _conditional_cache.get_json(
+            url, {**headers, **_cookie_header(twitter_cookies)}, timeout=10.0
+        )
+        
+        # 状态码非 200 时，平滑降级到备用网页刮削方案
+        if status_code != 200: 
+            logger.warning(f"Twitter API 拒绝访问 (状态码: {status_code})，回退到网页刮削...")
+            return await _fetch_twitter_personal_web_scraping(limit, twitter_cookies)
+            
+        # 真正去解析返回的推文数据，替换掉之前的占位符
+        if not isinstance(data, list):
+            return {'success': False, 'error': 'API 返回数据格式异常'}
+            
+        tweets = []
+        for tweet in data[:limit]:
+            user = tweet.get('user', {})
+            author = user.get('screen_name') or 'Unknown'
+            # tweet_mode=extended 时，正文在 full_text 里
+            text = str(tweet.get('full_text') or tweet.get('text') or '')
+            
+            # 清理推文末尾自带的分享短链接 (https://t.co/xxx)
+            clean_text = re.sub(r'https://t\.co/\w+', '', text).strip()
+            
+            # 处理转推 (Retweet) 的前缀拼接
+            if 'retweeted_status' in tweet:
+                rt_user = tweet['retweeted_status'].get('user', {}).get('screen_name', 'Unknown')
+                rt_text = str(tweet['retweeted_status'].get('full_text') or '')
+                rt_clean_text = re.sub(r'https://t\.co/\w+', '', rt_text).strip()
+                clean_text = f"RT @{rt_user}: {rt_clean_text}"
+            
+            tweets.append({
+                'author': f"@{author}", 
+                'content': clean_text,
+                'timestamp': tweet.get('created_at', '')
+            })
+            
+        if tweets:
+            logger.info(f"✅ 成功获取到 {len(tweets)} 条 Twitter 个人时间线动态")
+            return {'success': True, 'tweets': tweets}
+        else:
+            return {'success': False, 'error': '未解析到推文内容'}
             
-            # 状态码非 200 时，平滑降级到备用网页刮削方案
-            if response.status_code != 200: 
-                logger.warning(f"Twitter API 拒绝访问 (状态码: {response.status_code})，回退到网页刮削...")
-                return await _fetch_twitter_personal_web_scraping(limit, twitter_cookies)
-                
-            # 真正去解析返回的推文数据，替换掉之前的占位符
-            data = response.json()
-            if not isinstance(data, list):
-                return {'success': False, 'error': 'API 返回数据格式异常'}
-                
-            tweets = []
-            for tweet in data[:limit]:
-                user = tweet.get('user', {})
-                author = user.get('screen_name') or 'Unknown'
-                # tweet_mode=extended 时，正文在 full_text 里
-                text = str(tweet.get('full_text') or tweet.get('text') or '')
-                
-                # 清理推文末尾自带的分享短链接 (https://t.co/xxx)
-                clean_text = re.sub(r'https://t\.co/\w+', '', text).strip()
-                
-                # 处理转推 (Retweet) 的前缀拼接
-                if 'retweeted_status' in tweet:
-                    rt_user = tweet['retweeted_status'].get('user', {}).get('screen_name', 'Unknown')
-                    rt_text = str(tweet['retweeted_status'].get('full_text') or '')
-                    rt_clean_text = re.sub(r'https://t\.co/\w+', '', rt_text).strip()
-                    clean_text = f"RT @{rt_user}: {rt_clean_text}"
-                
-                tweets.append({
-                    'author': f"@{author}", 
-                    'content': clean_text,
-                    'timestamp': tweet.get('created_at', '')
-                })
-                
-            if tweets:
-                logger.info(f"✅ 成功获取到 {len(tweets)} 条 Twitter 个人时间线动态")
-                return {'success': True, 'tweets': tweets}
-            else:
-                return {'success': False, 'error': '未解析到推文内容'}
-                
     except Exception as e: 
         logger.error(f"Twitter API 获取失败: {e}")
         return {'success': False, 'error': str(e)}
 
-async def fetch_personal_dynamics(limit: int = 10) -> Dict[str, Any]:
+async def _gather_with_deadline(
+    coros: Dict[str, Awaitable[Dict[str, Any]]], deadline: float
+) -> Dict[str, Dict[str, Any]]:
+    """
+    并发执行多个抓取并共用一个截止时间，按原顺序返回各自结果
+
+    超时或抛异常的抓取记为失败结果。带 @cached_source 的抓取在缓存里被 shield，
+    这里取消等待不会中断抓取本身，结果仍会写入缓存供下一次使用。
+    """
+    tasks = {key: asyncio.ensure_future(coro) for key, coro in coros.items()}
+    try:
+        await asyncio.wait(tasks.values(), timeout=deadline)
+    finally:
+        pending = {task for task in tasks.values() if not task.done()}
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    results = {}
+    for key, task in tasks.items():
+        if task in pending:
+            logger.warning(f"⏱️ {key} 超过 {deadline:.0f}s 截止时间，本次跳过")
+            results[key] = {'success': False, 'error': f'抓取超时 ({deadline:.0f}s)'}
+        elif task.exception() is not None:
+            results[key] = {'success': False, 'error': str(task.exception())}
+        else:
+            results[key] = task.result()
+    return results
+
+
+async def fetch_personal_dynamics(limit: int = 10, deadline: float = _PERSONAL_FETCH_DEADLINE) -> Dict[str, Any]:
     """
     独立获取全平台个人登录态下的订阅/关注动态
+
+    各平台并发抓取并共用 deadline，耗时取决于最慢的单个平台；超时的平台本次记为失败。
     """
     try:
-        china_region = is_china_region()
-        if china_region:
+        if is_china_region():
             logger.info("检测到中文区域，获取B站和微博个人动态")
-            b_dyn, w_dyn = await asyncio.gather(
-                fetch_bilibili_personal_dynamic(limit),
-                fetch_weibo_personal_dynamic(limit),
-                return_exceptions=True
-            )
-            # 异常隔离与安全降级
-            b_dyn = {'success': False, 'error': str(b_dyn)} if isinstance(b_dyn, Exception) else b_dyn
-            w_dyn = {'success': False, 'error': str(w_dyn)} if isinstance(w_dyn, Exception) else w_dyn
-
-            top_success = b_dyn.get('success', False) or w_dyn.get('success', False)
-            return {'success': top_success, 'region': 'china', 
-                    'bilibili_dynamic': b_dyn, 'weibo_dynamic': w_dyn}
+            region = 'china'
+            platforms = {
+                'bilibili_dynamic': fetch_bilibili_personal_dynamic,
+                'weibo_dynamic': fetch_weibo_personal_dynamic,
+            }
+            accounts = ['bilibili', 'weibo']
         else:
             logger.info("检测到非中文区域，获取Reddit和Twitter个人动态")
-            r_dyn, t_dyn = await asyncio.gather(
-                fetch_reddit_personal_dynamic(limit),
-                fetch_twitter_personal_dynamic(limit),
-                return_exceptions=True
-            )
-            r_dyn = {'success': False, 'error': str(r_dyn)} if isinstance(r_dyn, Exception) else r_dyn
-            t_dyn = {'success': False, 'error': str(t_dyn)} if isinstance(t_dyn, Exception) else t_dyn
-            
-            top_success = r_dyn.get('success', False) or t_dyn.get('success', False)
-            return {'success': top_success, 'region': 'non-china', 'reddit_dynamic': r_dyn, 'twitter_dynamic': t_dyn}
+            region = 'non-china'
+            platforms = {
+                'reddit_dynamic': fetch_reddit_personal_dynamic,
+                'twitter_dynamic': fetch_twitter_personal_dynamic,
+            }
+            accounts = ['reddit', 'twitter']
+
+        # 抓取前记录账号：抓取途中切换账号时，结果在下一次使用前校验失败
+        account_digests = get_account_digests(accounts)
+        # 异常隔离与安全降级：单个平台失败或超时不影响其他平台
+        results = await _gather_with_deadline({key: fetch(limit) for key, fetch in platforms.items()}, deadline)
+        top_success = any(result.get('success', False) for result in results.values())
+        return {'success': top_success, 'region': region, **results, 'account_digests': account_digests}
     except Exception as e:
         logger.error(f"获取个人动态内容失败: {e}")
         return {'success': False, 'error': str(e)}